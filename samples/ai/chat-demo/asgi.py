@@ -0,0 +1,10 @@
+"""
+ASGI entrypoint, counterpart of `wsgi.py`.
+
+Serves the chat API, CloudEvents and the static client from the chat
+service's own event loop:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+from python_server.asgi import app as app
@@ -0,0 +1,28 @@
+import { describe, it, expect } from 'vitest';
+import { messagesReducer } from '../reducers/messagesReducer';
+import type { ChatMessage } from '../contexts/ChatClientContext';
+
+const pending = (): ChatMessage[] =>
+  messagesReducer(messagesReducer([], { type: 'userMessage', payload: { id: 'u1', content: 'Hi', userId: 'You' } }), { type: 'addPlaceholder' });
+
+describe('AI queue status', () => {
+  it('shows the queue position on the pending placeholder', () => {
+    const next = messagesReducer(pending(), { type: 'placeholderStatus', payload: { content: 'Waiting for the AI assistant (position 2)...' } });
+    expect(next[1]).toMatchObject({ isPlaceholder: true, streaming: true, content: 'Waiting for the AI assistant (position 2)...' });
+    // the answer still replaces the placeholder
+    const streamed = messagesReducer(next, { type: 'streamChunk', payload: { messageId: 'm1', chunk: 'Hel', sender: 'AI Assistant' } });
+    expect(streamed[1]).toMatchObject({ id: 'm1', content: 'Hel', isPlaceholder: false });
+  });
+
+  it('drops the placeholder when the request is turned away', () => {
+    const next = messagesReducer(pending(), { type: 'dropPlaceholder' });
+    expect(next.map((m) => m.id)).toEqual(['u1']);
+    expect(next.some((m) => m.streaming)).toBe(false);
+  });
+
+  it('leaves messages alone when nothing is pending', () => {
+    const state = messagesReducer([], { type: 'userMessage', payload: { id: 'u1', content: 'Hi', userId: 'You' } });
+    expect(messagesReducer(state, { type: 'dropPlaceholder' })).toBe(state);
+    expect(messagesReducer(state, { type: 'placeholderStatus', payload: { content: 'x' } })).toBe(state);
+  });
+});
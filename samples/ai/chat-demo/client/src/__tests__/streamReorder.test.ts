@@ -0,0 +1,27 @@
+import { describe, it, expect } from 'vitest';
+import { StreamReorderBuffer } from '../utils/streamReorder';
+
+describe('StreamReorderBuffer', () => {
+  it('passes chunks without an index straight through', () => {
+    const buf = new StreamReorderBuffer();
+    expect(buf.push('m1', 'Hel')).toEqual({ chunks: ['Hel'], ended: false });
+    expect(buf.end('m1')).toEqual({ chunks: [], ended: true });
+  });
+
+  it('releases indexed chunks in order and ends after the last one', () => {
+    const buf = new StreamReorderBuffer();
+    expect(buf.push('m1', 'lo', 1).chunks).toEqual([]);
+    expect(buf.push('m1', 'Hel', 0).chunks).toEqual(['Hel', 'lo']);
+    // end marker arrives before the final chunk
+    expect(buf.end('m1', 3)).toEqual({ chunks: [], ended: false });
+    expect(buf.push('m1', '!', 2)).toEqual({ chunks: ['!'], ended: true });
+  });
+
+  it('flushes what arrived when a chunk never shows up', () => {
+    const buf = new StreamReorderBuffer();
+    buf.push('m1', 'a', 0);
+    buf.push('m1', 'c', 2);
+    expect(buf.end('m1', 3).ended).toBe(false);
+    expect(buf.flush('m1')).toEqual({ chunks: ['c'], ended: true });
+  });
+});
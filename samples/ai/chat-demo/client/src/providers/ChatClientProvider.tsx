@@ -7,6 +7,10 @@ import { messagesReducer, initialMessagesState } from "../reducers/messagesReduc
 import type { MessagesAction } from "../reducers/messagesReducer";
 import { ChatSettingsContext } from "../contexts/ChatSettingsContext";
 import { DEFAULT_ROOM_ID } from "../lib/constants";
+import { StreamReorderBuffer } from "../utils/streamReorder";
+
+// How long to wait for chunks still missing after a stream's end marker
+const STREAM_REORDER_TIMEOUT_MS = 2000;
 
 interface ChatClientProviderProps {
   children: ReactNode;
@@ -38,6 +42,8 @@ export const ChatClientProvider: React.FC<ChatClientProviderProps> = ({ children
   const initStartedRef = React.useRef(false);
   const connectingRef = React.useRef(false);
   const prevRoomsRef = React.useRef<Set<string>>(new Set());
+  // Restores order of indexed streaming chunks (sent concurrently in Web PubSub mode)
+  const reorderRef = React.useRef(new StreamReorderBuffer());
   // Stable client id across tabs (per origin)
 
   if (!settingsContext) {
@@ -110,6 +116,7 @@ export const ChatClientProvider: React.FC<ChatClientProviderProps> = ({ children
         break;
       case "streamEnd":
       case "completeMessage":
+      case "dropPlaceholder":
       case "clear":
         rs.isStreaming = false;
         break;
@@ -130,6 +137,9 @@ export const ChatClientProvider: React.FC<ChatClientProviderProps> = ({ children
       const userMessageId = Date.now().toString();
       updateRoomMessages(roomIdRef.current, { type: "userMessage", payload: { id: userMessageId, content: messageText, userId: userIdRef.current ?? "" } });
 
+      // A previous "AI busy" notice no longer applies to this attempt
+      setUiNotice((n) => (n?.type === "error" ? undefined : n));
+
       // Show a local 'Thinking...' placeholder before AI starts streaming
       updateRoomMessages(roomIdRef.current, { type: "addPlaceholder" });
 
@@ -237,15 +247,34 @@ export const ChatClientProvider: React.FC<ChatClientProviderProps> = ({ children
             messageId?: string;
             streaming?: boolean;
             streamingEnd?: boolean;
+            index?: number;
             message?: string;
             from?: string;
             roomId?: string;
             type?: string;
+            state?: string;
+            position?: number;
             rooms?: Array<{ name?: string; messages?: number }>;
           };
           // Determine the target room strictly from payload
           const targetRoom = messageData?.roomId;
           if (!targetRoom) return;
+          // Transient AI queue state (no messageId, never stored)
+          if (messageData?.type === "ai-status") {
+            if (messageData.state === "queued") {
+              const position = messageData.position ?? 0;
+              const content = position > 0 ? `Waiting for the AI assistant (position ${position})...` : "Waiting for the AI assistant...";
+              updateRoomMessages(targetRoom, { type: "placeholderStatus", payload: { content } });
+            } else if (messageData.state === "started") {
+              updateRoomMessages(targetRoom, { type: "placeholderStatus", payload: { content: "Thinking..." } });
+            } else if (messageData.state === "full" || messageData.state === "expired" || messageData.state === "error") {
+              updateRoomMessages(targetRoom, { type: "dropPlaceholder" });
+              if (targetRoom === roomIdRef.current) {
+                setUiNotice({ type: "error", text: messageData.message || "The AI assistant is busy, please try again shortly." });
+              }
+            }
+            return;
+          }
           const messageId = messageData?.messageId;
           const streaming = !!messageData?.streaming;
           const streamingEnd = !!messageData?.streamingEnd;
@@ -253,13 +282,26 @@ export const ChatClientProvider: React.FC<ChatClientProviderProps> = ({ children
           const sender = messageData?.from || "AI Assistant";
           const isFromCurrentUser = sender === userIdRef.current;
 
+          const deliver = (id: string, result: { chunks: string[]; ended: boolean }) => {
+            for (const chunk of result.chunks) {
+              updateRoomMessages(targetRoom, { type: "streamChunk", payload: { messageId: id, chunk, sender } });
+            }
+            if (result.ended) updateRoomMessages(targetRoom, { type: "streamEnd", payload: { messageId: id } });
+          };
+
           // Handle streaming end signal
           if (streaming && streamingEnd) {
-            if (messageId) updateRoomMessages(targetRoom, { type: "streamEnd", payload: { messageId } });
+            if (messageId) {
+              const result = reorderRef.current.end(messageId, messageData?.index);
+              deliver(messageId, result);
+              if (!result.ended) {
+                setTimeout(() => deliver(messageId, reorderRef.current.flush(messageId)), STREAM_REORDER_TIMEOUT_MS);
+              }
+            }
             return;
           }
           if (streaming) {
-            if (messageId && messageContent) updateRoomMessages(targetRoom, { type: "streamChunk", payload: { messageId, chunk: messageContent, sender } });
+            if (messageId && messageContent) deliver(messageId, reorderRef.current.push(messageId, messageContent, messageData?.index));
           } else {
             if (messageId) updateRoomMessages(targetRoom, { type: "completeMessage", payload: { messageId, content: messageContent, sender, isFromCurrentUser } });
           }
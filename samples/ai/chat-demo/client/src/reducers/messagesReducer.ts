@@ -9,6 +9,8 @@ export type MessagesAction =
   | { type: "setAll"; payload: ChatMessage[] }
   | { type: "userMessage"; payload: { id: string; content: string; userId: string } }
   | { type: "addPlaceholder" }
+  | { type: "placeholderStatus"; payload: { content: string } }
+  | { type: "dropPlaceholder" }
   | { type: "streamChunk"; payload: { messageId: string; chunk: string; sender: string } }
   | { type: "streamEnd"; payload: { messageId: string } }
   | { type: "completeMessage"; payload: { messageId: string; content?: string; sender: string; isFromCurrentUser: boolean } };
@@ -64,6 +66,20 @@ export function messagesReducer(state: MessagesState, action: MessagesAction): M
       };
       return [...state, thinking];
     }
+    case "placeholderStatus": {
+      // AI request still waiting (e.g. queued behind other rooms): only the text changes
+      const lastPh = findLastPlaceholderIndex(state);
+      if (lastPh === -1) return state;
+      const next = [...state];
+      next[lastPh] = { ...next[lastPh], content: action.payload.content };
+      return next;
+    }
+    case "dropPlaceholder": {
+      // AI request turned away: no answer will come for the pending placeholder
+      const lastPh = findLastPlaceholderIndex(state);
+      if (lastPh === -1) return state;
+      return [...state.slice(0, lastPh), ...state.slice(lastPh + 1)];
+    }
     case "streamChunk": {
       const { messageId, chunk, sender } = action.payload;
       const existingIndex = state.findIndex((m) => m.id === messageId);
@@ -0,0 +1,68 @@
+/**
+ * Restores chunk order for streamed AI messages.
+ *
+ * The Web PubSub transport sends several chunks of one response concurrently,
+ * so they can arrive out of order. Each chunk carries a consecutive `index`
+ * and the end marker carries the chunk count. Chunks without an index (self-host
+ * transport) pass straight through.
+ */
+interface StreamState {
+  next: number;
+  pending: Map<number, string>;
+  total?: number;
+}
+
+export interface ReorderResult {
+  chunks: string[];
+  ended: boolean;
+}
+
+export class StreamReorderBuffer {
+  private streams = new Map<string, StreamState>();
+
+  private state(messageId: string): StreamState {
+    let s = this.streams.get(messageId);
+    if (!s) {
+      s = { next: 0, pending: new Map() };
+      this.streams.set(messageId, s);
+    }
+    return s;
+  }
+
+  private drain(messageId: string, s: StreamState): ReorderResult {
+    const chunks: string[] = [];
+    while (s.pending.has(s.next)) {
+      chunks.push(s.pending.get(s.next) as string);
+      s.pending.delete(s.next);
+      s.next++;
+    }
+    const ended = s.total !== undefined && s.next >= s.total;
+    if (ended) this.streams.delete(messageId);
+    return { chunks, ended };
+  }
+
+  /** Accept one chunk; returns the chunks that are now deliverable, in order. */
+  push(messageId: string, chunk: string, index?: number): ReorderResult {
+    if (typeof index !== "number") return { chunks: [chunk], ended: false };
+    const s = this.state(messageId);
+    if (index >= s.next) s.pending.set(index, chunk);
+    return this.drain(messageId, s);
+  }
+
+  /** Record the end marker; the stream ends once `total` chunks were delivered. */
+  end(messageId: string, total?: number): ReorderResult {
+    if (typeof total !== "number") return this.flush(messageId);
+    const s = this.state(messageId);
+    s.total = total;
+    return this.drain(messageId, s);
+  }
+
+  /** Give up waiting for missing chunks: deliver what arrived, in index order. */
+  flush(messageId: string): ReorderResult {
+    const s = this.streams.get(messageId);
+    this.streams.delete(messageId);
+    if (!s) return { chunks: [], ended: true };
+    const chunks = [...s.pending.entries()].sort((a, b) => a[0] - b[0]).map(([, c]) => c);
+    return { chunks, ended: true };
+  }
+}
@@ -21,4 +21,8 @@ GITHUB_TOKEN="{{GITHUB_TOKEN}}"
 
 # # Real Azure Storage alternative (remove emulator line above):
 # # AZURE_STORAGE_ACCOUNT="{{your_account_name}}"
+
+# # Or keep history on local disk (write-ahead log + snapshots), no Azure Storage needed:
+# # STORAGE_MODE="wal"
+# # CHAT_WAL_DIR="./chat-wal"
 ###########################
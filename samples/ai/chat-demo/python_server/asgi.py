@@ -0,0 +1,116 @@
+"""ASGI app and server bootstrap wiring.
+
+Alternative to the Flask `app` (python_server.app): one event loop - the
+ASGI server's - runs the chat service, the room store and the HTTP API, so
+API handlers await the store directly instead of hopping from a WSGI thread
+onto a background loop. The chat service is built and started in the
+lifespan startup hook (on the server's loop) and stopped on shutdown.
+
+    uvicorn python_server.asgi:app --host 0.0.0.0 --port 5000
+    HTTP_SERVER=asgi python -m python_server.main
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+from .chat_handlers import register_chat_handlers
+from .task_manager import ConnectionTaskManager
+from .core import build_room_store
+from .chat_service.factory import build_chat_service
+from .core.runtime_config import resolve_runtime_config
+from .core.asgi_api import Request, Response, create_chat_asgi_app, json_ok
+from .core.chat_model_client import aclose_chat_client
+
+load_dotenv()
+
+host = os.getenv("HOST", "localhost")
+port = int(os.getenv("PORT", "5000"))
+
+_here = Path(__file__).parent.resolve()
+_packaged_static = _here / "static"
+_dev_dist = (_here.parent / "client" / "dist").resolve()
+STATIC_DIST = _packaged_static if _packaged_static.exists() else _dev_dist
+
+log_level_name = os.getenv("LOG_LEVEL", "INFO").upper()
+if not hasattr(logging, log_level_name):
+    log_level_name = "INFO"
+logging.basicConfig(
+    level=getattr(logging, log_level_name, logging.INFO),
+    format=os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s %(name)s: %(message)s"),
+)
+logger = logging.getLogger("python_server.asgi")
+
+try:
+    _runtime = resolve_runtime_config()
+except Exception as e:
+    raise SystemExit(f"Runtime configuration error: {e}")
+logger.info("Runtime modes: transport=%s storage=%s (ASGI)", _runtime.transport.value, _runtime.storage.value)
+room_store = build_room_store(logger, storage_mode=_runtime.storage)
+chat_service: Any | None = None  # set by the lifespan startup hook
+_chat_task: "asyncio.Task[None] | None" = None
+
+
+async def _startup() -> None:
+    global chat_service, _chat_task
+    loop = asyncio.get_running_loop()
+    cs = build_chat_service(
+        os.getenv("PUBLIC_WS_ENDPOINT"),
+        host,
+        port + 1,
+        room_store,
+        logger,
+        loop=loop,
+        transport_mode=_runtime.transport,
+    )
+    register_chat_handlers(cs, logger, ConnectionTaskManager(loop))
+    chat_service = cs
+
+    async def starter() -> None:
+        # self-host: serves the WebSocket endpoint until stopped
+        try:
+            logger.info("Starting chat service...")
+            await cs.start_chat()
+        except Exception as e:  # noqa: BLE001
+            logger.exception("Chat service failed: %s", e)
+
+    _chat_task = loop.create_task(starter())
+
+
+async def _shutdown() -> None:
+    if chat_service is not None:
+        await chat_service.stop()
+    if _chat_task is not None:
+        await _chat_task
+    await aclose_chat_client()
+
+
+app = create_chat_asgi_app(
+    room_store_ref=lambda: room_store,
+    chat_service_ref=lambda: chat_service,
+    static_dir=STATIC_DIST,
+    on_startup=[_startup],
+    on_shutdown=[_shutdown],
+)
+
+
+@app.route('/healthz')
+async def healthz(request: Request) -> Response:
+    return json_ok({"status": "ok"})
+
+
+@app.route('/readyz')
+async def readyz(request: Request) -> Response:
+    return json_ok({
+        "ready": chat_service is not None,
+        "transport": _runtime.transport.value,
+        "storage": _runtime.storage.value,
+    })
+
+
+__all__ = ["app", "host", "port"]
@@ -0,0 +1,13 @@
+"""Micro and load benchmarks for the chat-demo python server.
+
+Each module is a standalone script, run from the chat-demo folder:
+
+    python -m python_server.benchmarks.bench_fanout
+
+Benchmarks only use in-process fakes (no network, no Azure resources) unless
+a module documents otherwise, so they are safe to run locally and in CI.
+``fake_model_server`` is an OpenAI-compatible model stub on loopback for the
+end-to-end ones (``bench_e2e_latency``).
+"""
+
+__all__ = []
@@ -0,0 +1,42 @@
+"""Shared helpers for benchmark scripts (timing + percentile reporting)."""
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Sequence
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Return the *pct* percentile (0-100) of *samples* using nearest-rank."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_ms(samples: Sequence[float]) -> Dict[str, float]:
+    """Summarize second-based *samples* as p50/p99/max milliseconds."""
+    return {
+        "p50_ms": percentile(samples, 50) * 1000.0,
+        "p99_ms": percentile(samples, 99) * 1000.0,
+        "max_ms": (max(samples) * 1000.0) if samples else 0.0,
+    }
+
+
+def print_table(headers: Sequence[str], rows: List[Sequence[object]]) -> None:
+    """Print a fixed-width text table."""
+    cells = [[str(h) for h in headers]] + [[_fmt(c) for c in r] for r in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for n, row in enumerate(cells):
+        print("  ".join(c.rjust(w) for c, w in zip(row, widths)))
+        if n == 0:
+            print("  ".join("-" * w for w in widths))
+
+
+def _fmt(value: object) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+__all__ = ["percentile", "summarize_ms", "print_table"]
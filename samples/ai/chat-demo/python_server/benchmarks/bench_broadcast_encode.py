@@ -0,0 +1,113 @@
+"""CPU cost per broadcast: per-recipient framing vs encode-once `PreparedFrame`.
+
+Drives real legacy websockets protocol objects (the ones the self-host
+server hands to its handler) attached to an in-memory transport, so the
+numbers include the library's own encode/frame/write path. Reports CPU
+milliseconds per broadcast to a 5k-member room.
+
+    python -m python_server.benchmarks.bench_broadcast_encode [--members 5000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Sequence
+
+from websockets.legacy.protocol import WebSocketCommonProtocol
+from websockets.protocol import State
+
+from ..chat_service.base import ClientConnectionContext
+from ..chat_service.transports.frames import PreparedFrame
+from ..chat_service.transports.self_host import _InMemoryClientManager
+from ._common import percentile, print_table
+
+
+class _NullTransport(asyncio.Transport):
+    """Write sink that never applies backpressure."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.bytes_written = 0
+
+    def write(self, data: Any) -> None:
+        self.bytes_written += len(data)
+
+    def is_closing(self) -> bool:
+        return False
+
+    def set_write_buffer_limits(self, high: int | None = None, low: int | None = None) -> None:
+        return None
+
+    def get_write_buffer_size(self) -> int:
+        return 0
+
+    def get_extra_info(self, name: str, default: Any = None) -> Any:
+        return default
+
+
+def _open_protocol(loop: asyncio.AbstractEventLoop) -> WebSocketCommonProtocol:
+    proto = WebSocketCommonProtocol()
+    proto.is_client = False
+    proto.connection_made(_NullTransport())
+    proto.state = State.OPEN
+    proto.transfer_data_task = loop.create_future()  # type: ignore[assignment]  # never completes: connection stays open
+    proto.extensions = []
+    return proto
+
+
+def _payload(i: int) -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "from": "group",
+        "group": "room_bench",
+        "dataType": "json",
+        "data": {"messageId": "m-_bench", "message": f"token {i} ", "from": "AI Assistant", "streaming": True, "roomId": "bench"},
+        "fromUserId": "AI Assistant",
+    }
+
+
+async def _room(members: int) -> _InMemoryClientManager:
+    loop = asyncio.get_running_loop()
+    mgr = _InMemoryClientManager(max_concurrency=members, send_timeout=None)
+    for i in range(members):
+        cid = f"c{i}"
+        await mgr.add_client(cid, ClientConnectionContext("/ws", cid), _open_protocol(loop))
+        await mgr.add_client_to_group(cid, "room")
+    return mgr
+
+
+async def _measure(mgr: _InMemoryClientManager, rounds: int, prepared: bool) -> List[float]:
+    samples: List[float] = []
+    for i in range(rounds):
+        started = time.process_time()
+        payload = _payload(i)
+        await mgr.send_to_group("room", PreparedFrame(payload) if prepared else json.dumps(payload))
+        samples.append(time.process_time() - started)
+    return samples
+
+
+async def run(members: int, rounds: int) -> None:
+    mgr = await _room(members)
+    await _measure(mgr, 2, prepared=False)  # warm up
+    rows: List[Sequence[object]] = []
+    baseline = 0.0
+    for label, prepared in (("per-recipient send(str)", False), ("encode-once PreparedFrame", True)):
+        samples = await _measure(mgr, rounds, prepared)
+        mean_ms = sum(samples) / len(samples) * 1000.0
+        baseline = baseline or mean_ms
+        rows.append((label, members, mean_ms, percentile(samples, 99) * 1000.0, baseline / mean_ms if mean_ms else 0.0))
+    print_table(("mode", "members", "cpu_ms_mean", "cpu_ms_p99", "speedup"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=5_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.members, args.rounds))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,133 @@
+"""JSON vs ``protobuf.webpubsub.azure.v1`` codec cost on chat message shapes.
+
+Times the server-side paths the self-host transport actually runs:
+downstream encode (outbound payload -> frame bytes) and upstream decode
+(client frame -> JSON-protocol dict), plus the client-side downstream decode.
+Chat ``data`` stays a JSON object inside ``MessageData.text_data``, so the
+protobuf savings are mostly in frame size (the envelope), which matters most
+for short streaming tokens; CPU cost is close to the C ``json`` module.
+
+    python -m python_server.benchmarks.bench_codec [--iterations 50000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from ..chat_service.transports.protobuf_codec import decode_upstream, encode_downstream, protobuf_available
+from ._common import print_table
+
+
+def _token_frame() -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "from": "group",
+        "group": "room_general",
+        "dataType": "json",
+        "data": {"messageId": "m-5f2c1a9e", "message": " the", "from": "AI Assistant", "streaming": True, "roomId": "general"},
+        "fromUserId": "AI Assistant",
+    }
+
+
+def _chat_frame() -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "from": "group",
+        "group": "room_general",
+        "dataType": "json",
+        "data": {
+            "messageId": "m-5f2c1a9e",
+            "message": "Sure - here is a short summary of the design discussion so far, with the open questions at the end.",
+            "from": "alice",
+            "roomId": "general",
+        },
+        "fromUserId": "alice",
+    }
+
+
+def _ack_frame() -> Dict[str, Any]:
+    return {"type": "ack", "ackId": 42, "success": True}
+
+
+def _pb() -> Any:
+    from ..chat_service.transports import pubsub_pb2
+
+    return pubsub_pb2
+
+
+def _upstream_pair() -> Tuple[bytes, bytes]:
+    pb = _pb()
+    data = {"group": "room_general", "message": "hello everyone", "from": "alice"}
+    as_json = json.dumps({"type": "sendToGroup", "group": "room_general", "ackId": 5, "dataType": "json", "data": data}).encode()
+    msg = pb.UpstreamMessage()
+    msg.send_to_group_message.group = "room_general"
+    msg.send_to_group_message.ack_id = 5
+    msg.send_to_group_message.data.text_data = json.dumps(data)
+    return as_json, msg.SerializeToString()
+
+
+def _decode_downstream_protobuf(raw: bytes) -> Any:
+    msg = _pb().DownstreamMessage.FromString(raw)
+    if msg.WhichOneof("message") == "data_message":
+        return json.loads(msg.data_message.data.text_data)
+    return msg
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return time.perf_counter() - started
+
+
+def run(iterations: int) -> None:
+    rows: List[Sequence[object]] = []
+
+    def row(label: str, size_json: int, size_pb: int, t_json: float, t_pb: float) -> None:
+        rows.append((
+            label,
+            size_json,
+            size_pb,
+            iterations / t_json / 1000.0,
+            iterations / t_pb / 1000.0,
+            t_json / t_pb if t_pb else 0.0,
+        ))
+
+    for label, make in (("token", _token_frame), ("chat", _chat_frame), ("ack", _ack_frame)):
+        payload = make()
+        encoded_json = json.dumps(payload).encode()
+        encoded_pb = encode_downstream(payload) or b""
+        row(
+            f"down-encode/{label}",
+            len(encoded_json),
+            len(encoded_pb),
+            _time(lambda: json.dumps(payload).encode(), iterations),
+            _time(lambda: encode_downstream(payload), iterations),
+        )
+        row(
+            f"down-decode/{label}",
+            len(encoded_json),
+            len(encoded_pb),
+            _time(lambda: json.loads(encoded_json), iterations),
+            _time(lambda: _decode_downstream_protobuf(encoded_pb), iterations),
+        )
+
+    up_json, up_pb = _upstream_pair()
+    row("up-decode/sendToGroup", len(up_json), len(up_pb), _time(lambda: json.loads(up_json), iterations), _time(lambda: decode_upstream(up_pb), iterations))
+    print_table(("path/shape", "json_bytes", "pb_bytes", "json_kops", "pb_kops", "pb_speedup"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50_000)
+    args = parser.parse_args()
+    if not protobuf_available():
+        sys.exit("protobuf runtime not installed (pip install protobuf)")
+    run(args.iterations)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
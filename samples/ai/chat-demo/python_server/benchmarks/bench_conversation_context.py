@@ -0,0 +1,78 @@
+"""AI prompt assembly: full history rebuild vs the per-room conversation context.
+
+A room grows to each of ``--history`` messages (about ``--chars`` characters
+each); then ``--prompts`` prompts are assembled, each after one more message.
+
+- rebuild: the former handler path - read every stored event of the room and
+  convert it to a chat turn, on every prompt; the prompt carries the whole room.
+- context: `ConversationContexts` - loaded once, then fed each recorded
+  message; the prompt is bounded by ``--max-tokens``.
+
+``assemble`` is the CPU per prompt, ``prompt_tokens`` the estimated tokens
+sent to the model (``estimate_tokens``).
+
+    python -m python_server.benchmarks.bench_conversation_context [--history 100 1000 10000 --max-tokens 3000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Sequence
+
+from ..chat_service.conversation import ConversationConfig, ConversationContexts, estimate_tokens, to_turn
+from ..core.room_store import EventRecord, InMemoryRoomStore
+from ._common import print_table, summarize_ms
+
+
+def _event(i: int, chars: int) -> EventRecord:
+    sender = "AI Assistant" if i % 2 else f"user{i % 7}"
+    return EventRecord.now("message", f"m{i}", sender, (f"message {i} " + "lorem ipsum " * chars)[:chars])
+
+
+async def _rebuild(store: InMemoryRoomStore) -> List[Dict[str, str]]:
+    history: List[Dict[str, str]] = []
+    for ev in await store.get_room_messages("room"):
+        turn = to_turn(ev)
+        if turn is not None:
+            history.append({"role": turn[0], "content": turn[1]})
+    return history
+
+
+async def _run(mode: str, history: int, prompts: int, chars: int, max_tokens: int) -> Sequence[object]:
+    store = InMemoryRoomStore(max_messages=history + prompts)
+    for i in range(history):
+        await store.record_room_event("room", _event(i, chars))
+    contexts = ConversationContexts(ConversationConfig(max_tokens=max_tokens))
+    if mode == "context":
+        await contexts.history("room", store)  # first prompt of the room
+    samples: List[float] = []
+    tokens = 0
+    for n in range(prompts):
+        event = _event(history + n, chars)
+        contexts.observe("room", event)
+        await store.record_room_event("room", event)
+        started = time.perf_counter()
+        prompt = await (_rebuild(store) if mode == "rebuild" else contexts.history("room", store))
+        samples.append(time.perf_counter() - started)
+        tokens = sum(estimate_tokens(m["content"]) for m in prompt)
+    return (mode, history, *summarize_ms(samples).values(), tokens)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--chars", type=int, default=200)
+    parser.add_argument("--max-tokens", type=int, default=3000)
+    args = parser.parse_args()
+    rows: List[Sequence[object]] = []
+    for history in args.history:
+        for mode in ("rebuild", "context"):
+            rows.append(asyncio.run(_run(mode, history, args.prompts, args.chars, args.max_tokens)))
+    print(f"{args.prompts} prompts per room, ~{args.chars} chars per message, context budget {args.max_tokens} tokens")
+    print_table(("history", "messages", "assemble_p50_ms", "assemble_p99_ms", "assemble_max_ms", "prompt_tokens"), rows)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
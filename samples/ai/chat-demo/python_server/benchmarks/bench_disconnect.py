@@ -0,0 +1,89 @@
+"""Disconnect storm: `_InMemoryClientManager.remove_client` at scale.
+
+Registers N clients spread across G groups (each client joins a few groups)
+and times removing all of them. With the connection->groups reverse index
+the cost per disconnect depends only on that client's memberships; the
+``--legacy`` flag replays the old scan over every group for comparison.
+
+    python -m python_server.benchmarks.bench_disconnect [--clients 10000 --groups 10000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Sequence
+
+from ..chat_service.base import ClientConnectionContext
+from ..chat_service.transports.self_host import _InMemoryClientManager
+from ._common import percentile, print_table
+
+
+class _NullSocket:
+    async def send(self, data: str) -> None:
+        return None
+
+
+async def _legacy_remove_client(mgr: _InMemoryClientManager, connection_id: str) -> None:
+    """Pre-index behavior: walk every group looking for the connection."""
+    mgr._clients.pop(connection_id, None)
+    for g in list(mgr._groups):
+        members = mgr._groups[g]
+        if connection_id in members:
+            members.discard(connection_id)
+            if not members:
+                mgr._groups.pop(g, None)
+    mgr._client_groups.pop(connection_id, None)
+
+
+async def _populate(clients: int, groups: int, per_client: int) -> _InMemoryClientManager:
+    mgr = _InMemoryClientManager()
+    rnd = random.Random(clients * 31 + groups)
+    for i in range(clients):
+        cid = f"c{i}"
+        await mgr.add_client(cid, ClientConnectionContext("/ws", cid), _NullSocket())
+        # every group gets at least one member, plus random extra memberships
+        await mgr.add_client_to_group(cid, f"g{i % groups}")
+        for _ in range(per_client - 1):
+            await mgr.add_client_to_group(cid, f"g{rnd.randrange(groups)}")
+    return mgr
+
+
+async def _storm(mgr: _InMemoryClientManager, clients: int, legacy: bool) -> List[float]:
+    samples: List[float] = []
+    for i in range(clients):
+        started = time.perf_counter()
+        if legacy:
+            await _legacy_remove_client(mgr, f"c{i}")
+        else:
+            await mgr.remove_client(f"c{i}")
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def run(clients: int, groups: int, per_client: int, legacy: bool) -> None:
+    rows: List[Sequence[object]] = []
+    modes = [("reverse-index", False), ("scan-all-groups", True)] if legacy else [("reverse-index", False)]
+    for label, use_legacy in modes:
+        mgr = await _populate(clients, groups, per_client)
+        started = time.perf_counter()
+        samples = await _storm(mgr, clients, use_legacy)
+        total = time.perf_counter() - started
+        assert not mgr._groups, "all groups should be pruned after the storm"
+        rows.append((label, clients, groups, total * 1000.0, percentile(samples, 50) * 1e6, percentile(samples, 99) * 1e6))
+    print_table(("mode", "clients", "groups", "total_ms", "p50_us", "p99_us"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--groups", type=int, default=10_000)
+    parser.add_argument("--groups-per-client", type=int, default=3)
+    parser.add_argument("--legacy", action="store_true", help="also time the old scan-every-group removal (slow)")
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.groups, args.groups_per_client, args.legacy))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,268 @@
+"""End-to-end AI latency: WebSocket clients -> self-host chat service -> model stub.
+
+Everything runs in this process on loopback: `FakeModelServer` plays the
+model (``MODEL_BASE_URL`` points the real `OpenAIChatClient` at it), the
+self-host `ChatService` with the regular chat handlers serves
+``--rooms`` rooms of ``--clients`` WebSocket clients each. In every room
+the first client asks ``--questions`` questions one after another
+(``sendToAI``, distinct prompts); all clients read the streamed answer.
+
+- ttft: from sending ``sendToAI`` until the asker receives the first chunk;
+- inter_chunk: gap between consecutive chunk frames at the asker (chunks are
+  merged per ``--batch-window-ms``, as ``STREAM_BATCH_WINDOW_MS`` does);
+- fanout: how much later a frame reaches a room member than the first member;
+- tokens_per_s: words of one answer over its first-to-last-frame time.
+
+Failed answers are counted, not timed: the room got an ``ai-status``
+error (the model failed after the SDK's retries) or the streamed text is not
+the stub's full answer (a dropped stream).
+
+    python -m python_server.benchmarks.bench_e2e_latency [--rooms 10 --clients 10 --questions 3 --tokens-per-sec 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import socket
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import websockets
+
+from ..chat_handlers import register_chat_handlers
+from ..chat_service.streaming import StreamBatchConfig
+from ..chat_service.transports.self_host import ChatService
+from ..core import chat_model_client
+from ..core.llm_scheduler import LLMScheduler, LLMSchedulerConfig
+from ..core.room_store import InMemoryRoomStore
+from ..task_manager import ConnectionTaskManager
+from ._common import percentile, print_table
+from .fake_model_server import FakeModelConfig, FakeModelServer
+
+SUBPROTOCOL = "json.webpubsub.azure.v1"
+FAILED = ""
+
+
+class _Client:
+    """One WebSocket member of a room; records when each streamed frame arrives."""
+
+    def __init__(self, ws: Any) -> None:
+        self.ws = ws
+        # messageId -> [(arrival, text)]; text is None for the end-of-stream frame
+        self.frames: Dict[str, List[Tuple[float, Optional[str]]]] = {}
+        # ended answers: a messageId, or FAILED for an ai-status error / rejection
+        self.ended: "asyncio.Queue[str]" = asyncio.Queue()
+        self.reader: Optional["asyncio.Task[None]"] = None
+
+    async def read(self) -> None:
+        async for raw in self.ws:
+            now = time.perf_counter()
+            data = json.loads(raw).get("data")
+            if not isinstance(data, dict):
+                continue
+            if data.get("type") == "ai-status" and data.get("state") in ("error", "full", "expired"):
+                self.ended.put_nowait(FAILED)
+                continue
+            if not data.get("streaming"):
+                continue
+            message_id = str(data.get("messageId"))
+            if data.get("streamingEnd"):
+                self.frames.setdefault(message_id, []).append((now, None))
+                self.ended.put_nowait(message_id)
+            else:
+                self.frames.setdefault(message_id, []).append((now, str(data.get("message", ""))))
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+@contextlib.contextmanager
+def _model_endpoint(base_url: str) -> Iterator[None]:
+    """Point the process-wide model client at *base_url* for the duration."""
+    saved = {k: os.environ.get(k) for k in ("MODEL_BASE_URL", "GITHUB_TOKEN")}
+    os.environ["MODEL_BASE_URL"] = base_url
+    os.environ["GITHUB_TOKEN"] = "fake-token"
+    chat_model_client._client_singleton = None
+    try:
+        yield
+    finally:
+        chat_model_client._client_singleton = None
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+async def _connect(uri: str, timeout: float = 5.0) -> Any:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await websockets.connect(uri, subprotocols=[SUBPROTOCOL], max_size=None)  # type: ignore[list-item]
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.02)
+
+
+async def run(
+    *,
+    rooms: int = 10,
+    clients: int = 10,
+    questions: int = 3,
+    model: Optional[FakeModelConfig] = None,
+    batch_window_ms: float = 100.0,
+    max_in_flight: int = 64,
+    answer_timeout: float = 60.0,
+) -> Dict[str, Any]:
+    """Run the load and return the raw samples (seconds) and counters."""
+    fake = FakeModelServer(model or FakeModelConfig())
+    base_url = await fake.start()
+    port = _free_port()
+    svc = ChatService(
+        host="127.0.0.1",
+        port=port,
+        room_store=InMemoryRoomStore(),
+        stream_batch=StreamBatchConfig(window=batch_window_ms / 1000),
+    )
+    loop = asyncio.get_running_loop()
+    quiet = logging.getLogger("bench_e2e_latency")
+    quiet.addHandler(logging.NullHandler())
+    quiet.propagate = False
+    register_chat_handlers(svc, quiet, ConnectionTaskManager(loop), LLMScheduler(LLMSchedulerConfig(max_in_flight=max_in_flight)))
+    server_task = loop.create_task(svc.start_chat())
+    members: Dict[str, List[_Client]] = {}
+    ttft: List[float] = []
+    inter_chunk: List[float] = []
+    fanout: List[float] = []
+    tokens_per_s: List[float] = []
+    failed = 0
+    started = time.perf_counter()
+    with _model_endpoint(base_url):
+        try:
+            for r in range(rooms):
+                room = f"bench{r}"
+                members[room] = []
+                for _ in range(clients):
+                    client = _Client(await _connect(f"ws://127.0.0.1:{port}/ws?roomId={room}"))
+                    await client.ws.recv()  # connected (the room is joined before it is sent)
+                    client.reader = loop.create_task(client.read())
+                    members[room].append(client)
+
+            async def ask(room: str) -> None:
+                nonlocal failed
+                asker = members[room][0]
+                for q in range(questions):
+                    prompt = f"question {q} from {room}"
+                    sent = time.perf_counter()
+                    await asker.ws.send(json.dumps({
+                        "type": "event",
+                        "event": "sendToAI",
+                        "data": {"message": prompt, "roomId": room},
+                    }))
+                    message_id = await asyncio.wait_for(asker.ended.get(), timeout=answer_timeout)
+                    if message_id == FAILED:
+                        failed += 1
+                        continue
+                    chunks = [(at, text) for at, text in asker.frames[message_id] if text]
+                    if "".join(text for _at, text in chunks if text) != "".join(fake.answer(prompt)):
+                        failed += 1
+                        # a cut-off answer is ended for clients, then reported as an error
+                        await asyncio.wait_for(asker.ended.get(), timeout=answer_timeout)
+                        continue
+                    ttft.append(chunks[0][0] - sent)
+                    inter_chunk.extend(b[0] - a[0] for a, b in zip(chunks, chunks[1:]))
+                    span = chunks[-1][0] - chunks[0][0]
+                    words = len("".join(text for _at, text in chunks if text).split())
+                    if span > 0:
+                        tokens_per_s.append(words / span)
+
+            await asyncio.gather(*(ask(room) for room in members))
+            await asyncio.sleep(batch_window_ms / 1000 + 0.05)  # let the last frames reach every member
+            for room_clients in members.values():
+                by_message: Dict[str, List[List[Tuple[float, Optional[str]]]]] = {}
+                for client in room_clients:
+                    for message_id, frames in client.frames.items():
+                        by_message.setdefault(message_id, []).append(frames)
+                for copies in by_message.values():
+                    for arrivals in zip(*copies):  # the k-th frame of the message at each member
+                        first = min(at for at, _text in arrivals)
+                        fanout.extend(at - first for at, _text in arrivals)
+        finally:
+            wall = time.perf_counter() - started
+            for room_clients in members.values():
+                for client in room_clients:
+                    await client.ws.close()
+                    if client.reader is not None:
+                        client.reader.cancel()
+            await svc.stop()
+            with contextlib.suppress(asyncio.CancelledError):
+                await server_task
+            with contextlib.suppress(Exception):
+                await chat_model_client.get_openai_chat_client().aclose()
+            await fake.stop()
+    return {
+        "ttft": ttft,
+        "inter_chunk": inter_chunk,
+        "fanout": fanout,
+        "tokens_per_s": tokens_per_s,
+        "answers": rooms * questions,
+        "failed": failed,
+        "wall": wall,
+        "model": fake.stats(),
+    }
+
+
+def _row(name: str, samples: Sequence[float], scale: float) -> Sequence[object]:
+    return (name, len(samples), *(percentile(samples, p) * scale for p in (50, 90, 99)), (max(samples) if samples else 0.0) * scale)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--tokens", type=int, default=FakeModelConfig.tokens)
+    parser.add_argument("--tokens-per-sec", type=float, default=FakeModelConfig.tokens_per_sec)
+    parser.add_argument("--first-token-ms", type=float, default=FakeModelConfig.first_token_ms)
+    parser.add_argument("--jitter", type=float, default=FakeModelConfig.jitter)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-window-ms", type=float, default=100.0)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    args = parser.parse_args()
+    # Injected failures are counted in the report; the client's tracebacks would only be noise.
+    logging.getLogger(chat_model_client.__name__).setLevel(logging.CRITICAL)
+    result = asyncio.run(run(
+        rooms=args.rooms,
+        clients=args.clients,
+        questions=args.questions,
+        model=FakeModelConfig(
+            tokens=args.tokens, tokens_per_sec=args.tokens_per_sec, first_token_ms=args.first_token_ms,
+            jitter=args.jitter, error_rate=args.error_rate, truncate_rate=args.truncate_rate, seed=args.seed,
+        ),
+        batch_window_ms=args.batch_window_ms,
+        max_in_flight=args.max_in_flight,
+    ))
+    print(
+        f"{args.rooms} rooms x {args.clients} clients, {result['answers']} answers ({result['failed']} failed) in {result['wall']:.2f}s; "
+        f"model: {args.tokens} tokens at {args.tokens_per_sec}/s after {args.first_token_ms}ms, stats {result['model']}"
+    )
+    print_table(("metric", "samples", "p50", "p90", "p99", "max"), [
+        _row("ttft_ms", result["ttft"], 1000.0),
+        _row("inter_chunk_ms", result["inter_chunk"], 1000.0),
+        _row("fanout_ms", result["fanout"], 1000.0),
+        _row("tokens_per_s", result["tokens_per_s"], 1.0),
+    ])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,84 @@
+"""Memory footprint of stored chat history: event dicts vs `EventRecord`.
+
+Records ``--events`` chat events spread over rooms of 200 messages into
+`InMemoryRoomStore`, once keeping each event as the dict the transports used
+to build (5 keys, ISO timestamp string, the sender string decoded per frame)
+and once as compact records (slots, interned sender, epoch-ms timestamp).
+``retained`` is what ``tracemalloc`` still sees allocated afterwards - the
+history plus message ids and texts, which both variants keep. Also reports
+the cost of rendering the latest 50 messages of a room back to JSON-ready
+dicts, which only the records pay (at the API boundary).
+
+    python -m python_server.benchmarks.bench_event_records [--events 1000000 --senders 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Sequence
+
+from ..core.room_store import InMemoryRoomStore, render_events
+from ._common import print_table
+
+
+class _DictStore(InMemoryRoomStore):
+    """History kept as the event dicts themselves (the previous representation)."""
+
+    async def record_room_event(self, room: str, event: Mapping[str, Any]) -> None:
+        self._ring(room).append(event)
+
+
+def _event(i: int, senders: int, base: datetime) -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "messageId": f"m-{i:012x}",
+        "from": "".join(("user", str(i % senders))),  # a fresh string per frame, like json.loads
+        "message": f"message number {i} with a little text",
+        "timestamp": (base + timedelta(milliseconds=i)).isoformat(),
+    }
+
+
+async def _measure(store: InMemoryRoomStore, events: int, senders: int, per_room: int, reads: int) -> Sequence[object]:
+    base = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    gc.collect()
+    tracemalloc.start()
+    for i in range(events):
+        await store.record_room_event(f"room{i // per_room}", _event(i, senders, base))
+    gc.collect()
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rooms = max(1, events // per_room)
+    started = time.perf_counter()
+    for i in range(reads):
+        render_events(await store.get_room_messages(f"room{i % rooms}", 50))
+    render = (time.perf_counter() - started) / reads if reads else 0.0
+    return retained / 1e6, retained / events, render * 1e6
+
+
+async def run(events: int, senders: int, reads: int) -> None:
+    per_room = 200
+    rows: List[Sequence[object]] = []
+    for label, store in (("dicts (previous)", _DictStore(max_messages=per_room)), ("EventRecord", InMemoryRoomStore(max_messages=per_room))):
+        rows.append((label, *await _measure(store, events, senders, per_room, reads)))
+        del store
+        gc.collect()
+    print(f"{events} events, {senders} senders, rooms of {per_room}")
+    print_table(("history", "retained_mb", "bytes_per_event", "render_50_us"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--senders", type=int, default=50, help="distinct sender ids")
+    parser.add_argument("--reads", type=int, default=20_000, help="latest-50 reads rendered to dicts")
+    args = parser.parse_args()
+    asyncio.run(run(args.events, args.senders, args.reads))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
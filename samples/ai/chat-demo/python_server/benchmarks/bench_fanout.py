@@ -0,0 +1,86 @@
+"""Broadcast latency of `_InMemoryClientManager.send_to_group`.
+
+Simulates rooms of 10, 1k and 10k members where a small fraction of the
+members are slow readers, and reports p50/p99 latency of one broadcast for
+the sequential baseline (window=1) and the concurrent fan-out.
+
+    python -m python_server.benchmarks.bench_fanout [--rounds 20]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Sequence
+
+from ..chat_service.base import ClientConnectionContext
+from ..chat_service.transports.self_host import _InMemoryClientManager
+from ._common import print_table, summarize_ms
+
+
+class _SimulatedSocket:
+    """Fake websocket whose `send` costs a fixed simulated network delay."""
+
+    def __init__(self, delay: float) -> None:
+        self._delay = delay
+
+    async def send(self, data: str) -> None:
+        await asyncio.sleep(self._delay)
+
+
+async def _build_room(members: int, *, window: int, slow_fraction: float, slow_delay: float, fast_delay: float) -> _InMemoryClientManager:
+    mgr = _InMemoryClientManager(max_concurrency=window, send_timeout=None)
+    rnd = random.Random(members)
+    for i in range(members):
+        cid = f"c{i}"
+        delay = slow_delay if rnd.random() < slow_fraction else fast_delay
+        await mgr.add_client(cid, ClientConnectionContext("/ws", cid), _SimulatedSocket(delay))
+        await mgr.add_client_to_group(cid, "room")
+    return mgr
+
+
+async def _measure(mgr: _InMemoryClientManager, rounds: int) -> List[float]:
+    samples: List[float] = []
+    payload = '{"type":"message","data":{"message":"hello"}}'
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await mgr.send_to_group("room", payload)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def run(sizes: Sequence[int], *, rounds: int, window: int, slow_fraction: float, slow_delay: float, fast_delay: float, sequential: bool) -> None:
+    rows: List[Sequence[object]] = []
+    for size in sizes:
+        modes = [("sequential", 1), ("concurrent", window)] if sequential else [("concurrent", window)]
+        for label, w in modes:
+            mgr = await _build_room(size, window=w, slow_fraction=slow_fraction, slow_delay=slow_delay, fast_delay=fast_delay)
+            stats = summarize_ms(await _measure(mgr, rounds))
+            rows.append((size, label, w, stats["p50_ms"], stats["p99_ms"]))
+    print_table(("members", "mode", "window", "p50_ms", "p99_ms"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 10_000])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--window", type=int, default=256, help="fan-out concurrency window")
+    parser.add_argument("--slow-fraction", type=float, default=0.01, help="fraction of members that are slow readers")
+    parser.add_argument("--slow-delay", type=float, default=0.01, help="seconds per send for slow readers")
+    parser.add_argument("--fast-delay", type=float, default=0.0, help="seconds per send for healthy readers")
+    parser.add_argument("--no-sequential", dest="sequential", action="store_false", help="skip the window=1 baseline")
+    args = parser.parse_args()
+    asyncio.run(run(
+        args.sizes,
+        rounds=args.rounds,
+        window=args.window,
+        slow_fraction=args.slow_fraction,
+        slow_delay=args.slow_delay,
+        fast_delay=args.fast_delay,
+        sequential=args.sequential,
+    ))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,173 @@
+"""Load test: Flask blueprint (``run_async`` bridge) vs the native ASGI app.
+
+Both serve the same request mix - a room read and the latest 50 messages
+(``GET /api/rooms/<id>`` and ``GET /api/rooms/<id>/messages?limit=50``) -
+from an in-memory store whose every call awaits ``--latency-ms`` (what a
+table round trip costs). ``--clients`` closed-loop clients each send their
+next request as soon as the previous one is answered, for ``--seconds``.
+
+- flask: the chat loop runs in its own thread, as in ``python_server.app``;
+  ``--threads`` worker threads (the WSGI server's pool) serve the clients
+  through the Flask test client, each call hopping onto the loop and back.
+- asgi: `create_chat_asgi_app` on the chat loop itself; each client is a
+  task awaiting the app.
+
+HTTP parsing and sockets are left out on both sides, so the numbers compare
+the dispatch model, not a particular server.
+
+    python -m python_server.benchmarks.bench_http_api [--clients 64 --threads 8 32 --latency-ms 2 --seconds 5]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from flask import Flask
+
+from ..core.asgi_api import create_chat_asgi_app
+from ..core.chat_api import create_chat_api_blueprint
+from ..core.room_store import EventRecord, InMemoryRoomStore
+from ..core.room_store.models import RoomMetadata
+from ._common import print_table, summarize_ms
+
+
+class _RemoteStore(InMemoryRoomStore):
+    """In-memory store that pays a fixed latency per call, like a remote table."""
+
+    def __init__(self, latency: float) -> None:
+        super().__init__()
+        self.latency = latency
+
+    async def get_room_metadata(self, user_id: str, room_id: str) -> Optional[RoomMetadata]:
+        await asyncio.sleep(self.latency)
+        return await super().get_room_metadata(user_id, room_id)
+
+    async def get_room_messages_page(self, room: str, limit: int, before: Optional[str] = None) -> Tuple[List[Mapping[str, Any]], Optional[str]]:
+        await asyncio.sleep(self.latency)
+        return await super().get_room_messages_page(room, limit, before)
+
+
+class _Service:
+    def __init__(self, store: InMemoryRoomStore) -> None:
+        self.room_store = store
+
+
+async def _seed(store: InMemoryRoomStore, rooms: int) -> None:
+    for i in range(rooms):
+        await store.create_room_metadata("bench", f"room {i}", room_id=f"room{i}")
+        for j in range(60):
+            await store.record_room_event(f"room{i}", EventRecord.now("message", f"m-{i}-{j}", "bench", f"message {j}"))
+
+
+def _paths(rooms: int, n: int) -> List[str]:
+    return [f"/api/rooms/room{n % rooms}" if n % 2 else f"/api/rooms/room{n % rooms}/messages?limit=50" for n in range(n)]
+
+
+def _flask(store: InMemoryRoomStore, clients: int, threads: int, seconds: float, rooms: int) -> Dict[str, Any]:
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, name="chat-loop", daemon=True)
+    loop_thread.start()
+    app = Flask(__name__)
+    app.register_blueprint(create_chat_api_blueprint(
+        room_store_ref=store, chat_service_ref=_Service(store), event_loop_ref=loop,
+    ))
+    samples: List[float] = []
+    errors = [0]
+    deadline = time.perf_counter() + seconds
+    paths = _paths(rooms, 1000)
+    local = threading.local()
+
+    def request(path: str) -> int:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        return int(client.get(path, headers={"X-User-Id": "bench"}).status_code)
+
+    def client_loop(c: int) -> int:
+        # One request at a time per client, like a keep-alive connection; latency includes the wait for a worker.
+        n = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status = pool.submit(request, paths[(c + n) % len(paths)]).result()
+            samples.append(time.perf_counter() - started)
+            if status != 200:
+                errors[0] += 1
+            n += 1
+        return n
+
+    with ThreadPoolExecutor(max_workers=threads) as pool, ThreadPoolExecutor(max_workers=clients) as drivers:
+        started = time.perf_counter()
+        total = sum(drivers.map(client_loop, range(clients)))
+        elapsed = time.perf_counter() - started
+    loop.call_soon_threadsafe(loop.stop)
+    loop_thread.join()
+    loop.close()
+    return {"requests_per_s": total / elapsed, **summarize_ms(samples), "errors": errors[0]}
+
+
+async def _asgi(store: InMemoryRoomStore, clients: int, seconds: float, rooms: int) -> Dict[str, Any]:
+    app = create_chat_asgi_app(room_store_ref=store, chat_service_ref=_Service(store))
+    samples: List[float] = []
+    errors = [0]
+    deadline = time.perf_counter() + seconds
+    paths = _paths(rooms, 1000)
+
+    async def request(path: str) -> None:
+        path, _, query = path.partition("?")
+        status = [0]
+
+        async def receive() -> Dict[str, Any]:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+
+        scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": [(b"x-user-id", b"bench")]}
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        samples.append(time.perf_counter() - started)
+        if status[0] != 200:
+            errors[0] += 1
+
+    async def client_loop(c: int) -> int:
+        n = 0
+        while time.perf_counter() < deadline:
+            await request(paths[(c + n) % len(paths)])
+            n += 1
+        return n
+
+    started = time.perf_counter()
+    total = sum(await asyncio.gather(*(client_loop(c) for c in range(clients))))
+    elapsed = time.perf_counter() - started
+    return {"requests_per_s": total / elapsed, **summarize_ms(samples), "errors": errors[0]}
+
+
+def run(clients: int, threads: Sequence[int], latency_ms: float, seconds: float, rooms: int) -> None:
+    store = _RemoteStore(latency_ms / 1000)
+    asyncio.run(_seed(store, rooms))
+    rows: List[Sequence[object]] = []
+    for t in threads:
+        rows.append((f"flask ({t} threads)", *_flask(store, clients, t, seconds, rooms).values()))
+    rows.append(("asgi", *asyncio.run(_asgi(store, clients, seconds, rooms)).values()))
+    print(f"{clients} clients for {seconds}s, {latency_ms}ms per store call")
+    print_table(("server", "requests_per_s", "p50_ms", "p99_ms", "max_ms", "errors"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--threads", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rooms", type=int, default=100)
+    args = parser.parse_args()
+    run(args.clients, args.threads, args.latency_ms, args.seconds, args.rooms)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
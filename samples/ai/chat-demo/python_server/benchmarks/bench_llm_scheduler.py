@@ -0,0 +1,98 @@
+"""Burst of AI requests against a rate-limited model: unbounded vs `LLMScheduler`.
+
+The fake endpoint serves ``--capacity`` streams at once; a call over
+capacity is throttled (HTTP 429) and retried after ``--retry-ms``, as the
+OpenAI SDK does. One busy room sends ``--flood`` requests at once, then
+``--quiet`` other rooms send one request each.
+
+- unbounded: every request calls the model immediately (the former path).
+- scheduler: requests hold an `LLMScheduler` slot (``--capacity`` in flight)
+  and wait in its per-room round-robin queue.
+
+``ttft`` is the time from the request until its first token; ``quiet`` rows
+only count the single-request rooms. ``throttled`` counts 429 responses.
+
+    python -m python_server.benchmarks.bench_llm_scheduler [--flood 60 --quiet 8 --capacity 8]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from ..core.llm_scheduler import LLMScheduler, LLMSchedulerConfig
+from ._common import print_table, summarize_ms
+
+
+class _ThrottledModel:
+    def __init__(self, capacity: int, tokens: int, token_s: float, retry_s: float) -> None:
+        self.capacity = capacity
+        self.tokens = tokens
+        self.token_s = token_s
+        self.retry_s = retry_s
+        self.active = 0
+        self.throttled = 0
+
+    async def stream(self) -> AsyncIterator[str]:
+        while self.active >= self.capacity:
+            self.throttled += 1
+            await asyncio.sleep(self.retry_s)
+        self.active += 1
+        try:
+            for i in range(self.tokens):
+                await asyncio.sleep(self.token_s)
+                yield f"t{i} "
+        finally:
+            self.active -= 1
+
+
+async def _run(mode: str, flood: int, quiet: int, capacity: int, tokens: int, token_s: float, retry_s: float) -> Dict[str, Sequence[object]]:
+    model = _ThrottledModel(capacity, tokens, token_s, retry_s)
+    scheduler: Optional[LLMScheduler] = None
+    if mode == "scheduler":
+        scheduler = LLMScheduler(LLMSchedulerConfig(max_in_flight=capacity, max_queue=flood + quiet, max_queued_per_user=flood, queue_timeout=600))
+    ttft: Dict[str, List[float]] = {"busy": [], "quiet": []}
+
+    async def request(room: str, user: str, kind: str) -> None:
+        started = time.perf_counter()
+        slot = scheduler.slot(room, user) if scheduler is not None else contextlib.nullcontext()
+        async with slot:
+            first = True
+            async for _token in model.stream():
+                if first:
+                    ttft[kind].append(time.perf_counter() - started)
+                    first = False
+
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(request("busy", "flooder", "busy")) for _ in range(flood)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.ensure_future(request(f"room{i}", f"user{i}", "quiet")) for i in range(quiet)]
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    return {
+        kind: (mode, kind, len(samples), wall, *summarize_ms(samples).values(), model.throttled)
+        for kind, samples in ttft.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flood", type=int, default=60)
+    parser.add_argument("--quiet", type=int, default=8)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--token-ms", type=float, default=4.0)
+    parser.add_argument("--retry-ms", type=float, default=100.0)
+    args = parser.parse_args()
+    rows: List[Sequence[object]] = []
+    for mode in ("unbounded", "scheduler"):
+        result = asyncio.run(_run(mode, args.flood, args.quiet, args.capacity, args.tokens, args.token_ms / 1000, args.retry_ms / 1000))
+        rows.extend(result.values())
+    print(f"{args.flood} requests from one room + {args.quiet} single requests, model serves {args.capacity} at once")
+    print_table(("mode", "rooms", "requests", "wall_s", "ttft_p50_ms", "ttft_p99_ms", "ttft_max_ms", "throttled"), rows)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
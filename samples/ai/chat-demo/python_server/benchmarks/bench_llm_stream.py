@@ -0,0 +1,68 @@
+"""Concurrent AI responses: native async stream vs the thread-bridged generator.
+
+``--responses`` responses of ``--tokens`` tokens each run at once on one loop;
+the model produces a token every ``--token-ms``. ``thread bridge`` is the
+former path - a blocking generator (the sync OpenAI stream) fed through
+`to_async_iterator`, one default-executor thread per response and a
+``run_coroutine_threadsafe(...).result()`` round trip per token. ``async``
+is an async generator on the loop, as `chat_stream_async` streams from
+`AsyncOpenAI`. No network: both sides sleep for the token interval.
+
+``handoff`` is how late a token reaches the consumer after the model made
+it; ``wall_s`` is the time until every response finished.
+
+    python -m python_server.benchmarks.bench_llm_stream [--responses 1 16 64 --tokens 100 --token-ms 5]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import AsyncIterator, Iterator, List, Sequence, Tuple
+
+from ..core.utils import to_async_iterator
+from ._common import print_table, summarize_ms
+
+
+def _sync_model(tokens: int, interval: float) -> Iterator[Tuple[int, float]]:
+    for i in range(tokens):
+        time.sleep(interval)
+        yield i, time.perf_counter()
+
+
+async def _async_model(tokens: int, interval: float) -> AsyncIterator[Tuple[int, float]]:
+    for i in range(tokens):
+        await asyncio.sleep(interval)
+        yield i, time.perf_counter()
+
+
+async def _run(mode: str, responses: int, tokens: int, interval: float) -> Sequence[object]:
+    handoff: List[float] = []
+
+    async def consume() -> None:
+        stream = to_async_iterator(_sync_model(tokens, interval)) if mode == "thread bridge" else _async_model(tokens, interval)
+        async for _i, made in stream:
+            handoff.append(time.perf_counter() - made)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(consume() for _ in range(responses)))
+    wall = time.perf_counter() - started
+    return (mode, responses, wall, *summarize_ms(handoff).values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    rows: List[Sequence[object]] = []
+    for n in args.responses:
+        for mode in ("thread bridge", "async"):
+            rows.append(asyncio.run(_run(mode, n, args.tokens, args.token_ms / 1000)))
+    print(f"{args.tokens} tokens per response, one every {args.token_ms}ms (ideal wall time {args.tokens * args.token_ms / 1000:.2f}s)")
+    print_table(("stream", "responses", "wall_s", "handoff_p50_ms", "handoff_p99_ms", "handoff_max_ms"), rows)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,107 @@
+"""Message history cost of `InMemoryRoomStore` at scale.
+
+Fills ``--rooms`` rooms with ``--messages`` events each (the room cap is
+``--cap``), then keeps appending ``--appends`` events round-robin to the now
+full rooms and reads the latest ``--read-limit`` messages ``--reads`` times.
+Compares the previous history (a list per room trimmed with
+``del msgs[:overflow]``, reads copying the whole list before slicing) with the
+ring buffer. Event dicts are shared from a small pool so that ``containers_mb``
+(``sys.getsizeof`` of the per-room history containers) is the store's own
+overhead, not payload.
+
+    python -m python_server.benchmarks.bench_memory_history [--rooms 100000 --messages 200 --appends 1000000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..core.room_store import InMemoryRoomStore
+from ._common import print_table
+
+
+class _PreviousStore:
+    """The former list-per-room history."""
+
+    def __init__(self, max_messages: int) -> None:
+        self._room_messages: Dict[str, List[Dict[str, Any]]] = {}
+        self._max_room_messages = max_messages
+
+    async def record_room_event(self, room: str, event: Dict[str, Any]) -> None:
+        self._room_messages.setdefault(room, []).append(event)
+        msgs = self._room_messages[room]
+        if len(msgs) > self._max_room_messages:
+            overflow = len(msgs) - self._max_room_messages
+            del msgs[:overflow]
+
+    async def get_room_messages(self, room: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        msgs = list(self._room_messages.get(room, []))
+        if limit is not None and limit >= 0:
+            return msgs[-limit:]
+        return msgs
+
+
+def _container_bytes(store: Any) -> int:
+    total = 0
+    for history in store._room_messages.values():
+        total += sys.getsizeof(history)
+        items = getattr(history, "_items", None)
+        if items is not None:
+            total += sys.getsizeof(items)
+    return total
+
+
+async def _measure(store: Any, rooms: List[str], messages: int, appends: int, reads: int, read_limit: int) -> Sequence[object]:
+    pool = [{"messageId": f"m{i}", "type": "message", "from": "u", "message": "hi"} for i in range(64)]
+    started = time.perf_counter()
+    for i in range(messages):
+        event = pool[i % len(pool)]
+        for room in rooms:
+            await store.record_room_event(room, event)
+    fill = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(appends):
+        await store.record_room_event(rooms[i % len(rooms)], pool[i % len(pool)])
+    append = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(reads):
+        await store.get_room_messages(rooms[i % len(rooms)], read_limit)
+    read = time.perf_counter() - started
+    return (
+        len(rooms) * messages / fill,
+        appends / append if appends else 0.0,
+        reads / read if reads else 0.0,
+        _container_bytes(store) / 1e6,
+    )
+
+
+async def run(rooms: int, messages: int, cap: int, appends: int, reads: int, read_limit: int) -> None:
+    names = [f"room{i}" for i in range(rooms)]
+    rows: List[Sequence[object]] = []
+    for label, factory in (("list + del (previous)", lambda: _PreviousStore(cap)), ("ring buffer", lambda: InMemoryRoomStore(max_messages=cap))):
+        store: Any = factory()
+        rows.append((label, *await _measure(store, names, messages, appends, reads, read_limit)))
+        del store
+    print(f"{rooms} rooms x {messages} messages, cap {cap}; {appends} appends to full rooms, {reads} reads of {read_limit}")
+    print_table(("history", "fill_per_s", "full_append_per_s", "reads_per_s", "containers_mb"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=200, help="events per room before measuring full rooms")
+    parser.add_argument("--cap", type=int, default=200, help="max_messages per room")
+    parser.add_argument("--appends", type=int, default=1_000_000, help="appends to full rooms")
+    parser.add_argument("--reads", type=int, default=200_000)
+    parser.add_argument("--read-limit", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.rooms, args.messages, args.cap, args.appends, args.reads, args.read_limit))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,92 @@
+"""Repeated AI prompts: a model call per request vs `ResponseCache`.
+
+``--requests`` requests arrive over ``--seconds`` (evenly spaced), each
+picking one of ``--prompts`` questions with a skewed popularity (question
+``i`` is ``1/(i+1)`` as likely as the first) - a demo room where visitors
+ask the same few things. The fake model answers with ``--tokens`` tokens,
+one every ``--token-ms``, after ``--first-token-ms``.
+
+- off: every request streams its own model response.
+- cache: `ResponseCache` with defaults; requests for a question that is
+  streaming follow that stream, later ones replay the cached answer.
+
+``model_tokens`` counts the tokens the model generated; ``ttft`` is the time
+from request to first token.
+
+    python -m python_server.benchmarks.bench_response_cache [--requests 400 --prompts 20 --seconds 4]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import AsyncIterator, List, Sequence
+
+from ..core.response_cache import ResponseCache
+from ._common import print_table, summarize_ms
+
+
+class _Model:
+    def __init__(self, tokens: int, first_token_s: float, token_s: float) -> None:
+        self.tokens = tokens
+        self.first_token_s = first_token_s
+        self.token_s = token_s
+        self.calls = 0
+        self.generated = 0
+
+    async def stream(self) -> AsyncIterator[str]:
+        self.calls += 1
+        await asyncio.sleep(self.first_token_s)
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(self.token_s)
+            self.generated += 1
+            yield f"t{i} "
+
+
+async def _run(mode: str, picks: Sequence[int], seconds: float, tokens: int, first_token_s: float, token_s: float) -> Sequence[object]:
+    model = _Model(tokens, first_token_s, token_s)
+    cache = ResponseCache()
+    ttft: List[float] = []
+
+    async def request(delay: float, prompt: int) -> None:
+        await asyncio.sleep(delay)
+        started = time.perf_counter()
+        key = cache.key(f"question {prompt}", [], "bench-model") if mode == "cache" else None
+        first = True
+        async for _chunk in cache.stream(key, model.stream):
+            if first:
+                ttft.append(time.perf_counter() - started)
+                first = False
+
+    spacing = seconds / max(1, len(picks))
+    started = time.perf_counter()
+    await asyncio.gather(*(request(n * spacing, prompt) for n, prompt in enumerate(picks)))
+    wall = time.perf_counter() - started
+    stats = cache.stats()
+    return (mode, len(picks), wall, model.calls, model.generated, *summarize_ms(ttft).values(), stats["hits"], stats["coalesced"], stats["tokensSaved"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=4.0)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    weights = [1.0 / (i + 1) for i in range(args.prompts)]
+    picks = rng.choices(range(args.prompts), weights=weights, k=args.requests)
+    rows: List[Sequence[object]] = []
+    for mode in ("off", "cache"):
+        rows.append(asyncio.run(_run(mode, picks, args.seconds, args.tokens, args.first_token_ms / 1000, args.token_ms / 1000)))
+    print(f"{args.requests} requests over {args.seconds}s, {args.prompts} distinct prompts, {args.tokens}-token answers")
+    print_table(("cache", "requests", "wall_s", "model_calls", "model_tokens", "ttft_p50_ms", "ttft_p99_ms", "ttft_max_ms", "hits", "coalesced", "tokens_saved"), rows)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,89 @@
+"""Read-through cache in front of the table store, against a fake table service.
+
+Replays a chat-like request mix over ``--rooms`` rooms (owned by ``--users``
+users, popularity skewed so a few rooms are hot) against
+`AzureTableRoomStore` on the in-process fake table service, whose every
+request costs ``--latency-ms``; once direct and once through
+`CachingRoomStore`. Per operation: a room-existence check and a metadata
+read (what the HTTP handlers do), then one of: a new message (30%), the
+history the AI prompt reads (20%), the first messages page (40%), a room
+list (10%). Reports table requests per operation, per-operation latency and
+the cache hit ratios.
+
+    python -m python_server.benchmarks.bench_room_cache [--ops 5000 --rooms 500 --latency-ms 2]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Sequence
+
+from ..core.room_store import AzureTableRoomStore, CachingRoomStore, EventRecord, RoomStore
+from ..tests.fake_tables import FakeTableServiceClient
+from ._common import print_table, summarize_ms
+
+
+async def _workload(store: RoomStore, svc: FakeTableServiceClient, ops: int, rooms: int, users: int, seed: int) -> Dict[str, Any]:
+    rnd = random.Random(seed)
+    for i in range(rooms):
+        await store.create_room_metadata(f"user{i % users}", f"room {i}", room_id=f"room{i}")
+        for j in range(20):
+            await store.record_room_event(f"room{i}", EventRecord.now("message", f"seed-{i}-{j}", "someone", "hello"))
+    await store.flush()  # type: ignore[attr-defined]
+    weights = [1 / (i + 1) for i in range(rooms)]
+    base = svc.requests
+    samples: List[float] = []
+    for n in range(ops):
+        i = rnd.choices(range(rooms), weights)[0]
+        room, user = f"room{i}", f"user{i % users}"
+        started = time.perf_counter()
+        await store.room_exists(user, room)
+        await store.get_room_metadata(user, room)
+        roll = rnd.random()
+        if roll < 0.3:
+            await store.record_room_event(room, EventRecord.now("message", f"m{n}", user, "hi"))
+        elif roll < 0.5:
+            await store.get_room_messages(room)
+        elif roll < 0.9:
+            await store.get_room_messages_page(room, 50)
+        else:
+            await store.list_user_rooms(user)
+        samples.append(time.perf_counter() - started)
+    await store.flush()  # type: ignore[attr-defined]
+    return {"requests": (svc.requests - base) / ops, **summarize_ms(samples)}
+
+
+async def run(ops: int, rooms: int, users: int, latency_ms: float, seed: int) -> None:
+    rows: List[Sequence[object]] = []
+    stats: Dict[str, Any] = {}
+    for label in ("table store", "cached"):
+        svc = FakeTableServiceClient(latency=latency_ms / 1000)
+        inner = AzureTableRoomStore(service_client=svc, table_name="msgs")
+        store: RoomStore = inner if label == "table store" else CachingRoomStore(inner)
+        result = await _workload(store, svc, ops, rooms, users, seed)
+        rows.append((label, *result.values()))
+        if isinstance(store, CachingRoomStore):
+            stats = store.cache_stats()
+        await store.close()
+    print(f"{ops} operations over {rooms} rooms / {users} users, {latency_ms}ms per table request")
+    print_table(("store", "requests_per_op", "p50_ms", "p99_ms", "max_ms"), rows)
+    print_table(("cache", "hit_ratio", "hits", "misses", "evictions", "invalidations"), [
+        (name, s["hitRatio"], s["hits"], s["misses"], s["evictions"], s["invalidations"]) for name, s in stats.items()
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args.ops, args.rooms, args.users, args.latency_ms, args.seed))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
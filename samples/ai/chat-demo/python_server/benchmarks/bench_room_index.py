@@ -0,0 +1,90 @@
+"""Indexed room listings of `InMemoryRoomStore` with many rooms.
+
+Creates ``--rooms`` rooms spread over ``--users`` owners, renames a tenth of
+them, then times the pages behind ``GET /api/rooms/recent`` and
+``GET /api/rooms/search?prefix=`` (``--limit`` rooms each) and compares them
+with what answering the same question took before the indexes: a walk over
+every owner's rooms followed by a sort. ``deep`` pages start from a cursor
+half way through the order. ``put_us`` is the cost of creating or updating
+one room, indexes included.
+
+    python -m python_server.benchmarks.bench_room_index [--rooms 1000000 --users 10000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, List, Sequence
+
+from ..core.room_store import InMemoryRoomStore
+from ._common import print_table, summarize_ms
+
+_WORDS = ["design", "standup", "support", "release", "random", "ops", "sales", "research", "infra", "books", "games", "music"]
+
+
+async def _time(fn: Callable[[], Awaitable[Any]], rounds: int) -> List[float]:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+async def run(rooms: int, users: int, limit: int, rounds: int, walk_rounds: int) -> None:
+    rnd = random.Random(1)
+    store = InMemoryRoomStore()
+    started = time.perf_counter()
+    for i in range(rooms):
+        name = f"{rnd.choice(_WORDS)} {rnd.choice(_WORDS)} {i}"
+        await store.create_room_metadata(f"user{i % users}", name, room_id=f"room_{i:08x}")
+    create = time.perf_counter() - started
+    started = time.perf_counter()
+    touched = max(1, rooms // 10)
+    for i in rnd.sample(range(rooms), touched):
+        await store.update_room_metadata(f"user{i % users}", f"room_{i:08x}", room_name=f"{rnd.choice(_WORDS)} renamed {i}")
+    update = time.perf_counter() - started
+    print(f"{rooms} rooms / {users} owners: create {create / rooms * 1e6:.1f}us per room, update {update / touched * 1e6:.1f}us per room")
+
+    _, mid_recent = await store.list_recent_rooms(rooms // 2)
+    _, mid_search = await store.search_rooms("s", rooms // 20)
+    prefixes = [w[:3] for w in _WORDS]
+
+    async def walk_recent() -> List[Any]:
+        every = [r for owned in store._user_rooms.values() for r in owned.values()]
+        return sorted(every, key=lambda r: (r.updated_at, r.room_id), reverse=True)[:limit]
+
+    async def walk_search() -> List[Any]:
+        p = rnd.choice(prefixes)
+        every = [r for owned in store._user_rooms.values() for r in owned.values() if r.room_name.casefold().startswith(p)]
+        return sorted(every, key=lambda r: (r.room_name.casefold(), r.room_id))[:limit]
+
+    cases = [
+        ("recent, first page", lambda: store.list_recent_rooms(limit)),
+        ("recent, deep page", lambda: store.list_recent_rooms(limit, mid_recent)),
+        ("prefix search", lambda: store.search_rooms(rnd.choice(prefixes), limit)),
+        ("prefix search, deep page", lambda: store.search_rooms("s", limit, mid_search)),
+    ]
+    rows: List[Sequence[object]] = []
+    for label, fn in cases:
+        rows.append((label, "index", *summarize_ms(await _time(fn, rounds)).values()))
+    rows.append(("recent, first page", "full walk (previous)", *summarize_ms(await _time(walk_recent, walk_rounds)).values()))
+    rows.append(("prefix search", "full walk (previous)", *summarize_ms(await _time(walk_search, walk_rounds)).values()))
+    print_table(("query", "via", "p50_ms", "p99_ms", "max_ms"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--walk-rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.rooms, args.users, args.limit, args.rounds, args.walk_rounds))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,88 @@
+"""Cost of `AzureTableRoomStore.list_rooms` as stored history grows.
+
+Loads ``--messages`` rows spread over ``--rooms`` partitions into the
+in-process fake table (``tests/fake_tables.py``) and compares the previous
+implementation (scan the whole message table, count per partition) with the
+room summary table read. ``rows`` is the number of entities the table handed
+out per call - with a real table that is what you pay for in latency and
+transactions. ``notify_rooms_changed`` runs this on every join and leave.
+
+    python -m python_server.benchmarks.bench_room_list [--messages 1000000 --rooms 500]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Sequence
+
+from ..core.room_store import AzureTableRoomStore
+from ..tests.fake_tables import FakeTableClient, FakeTableServiceClient
+from ._common import print_table, summarize_ms
+
+
+def _load(table: FakeTableClient, messages: int, rooms: int) -> None:
+    base_us = 1_700_000_000_000_000
+    for i in range(messages):
+        room = f"room{i % rooms}"
+        key = AzureTableRoomStore._row_key(base_us + i)
+        table._put((room, key), {"PartitionKey": room, "RowKey": key, "messageId": f"m{i}", "text": "hi"})
+
+
+def _scan_list_rooms(table: FakeTableClient) -> List[Dict[str, object]]:
+    """The former list_rooms: one pass over every message entity."""
+    counts: Dict[str, int] = {}
+    for ent in table.list_entities(results_per_page=1000):
+        pk = ent["PartitionKey"]
+        counts[pk] = counts.get(pk, 0) + 1
+    return [{"name": r, "messages": n} for r, n in sorted(counts.items())]
+
+
+async def run(messages: int, rooms: int, rounds: int, scan_rounds: int) -> None:
+    svc = FakeTableServiceClient()
+    store = AzureTableRoomStore(service_client=svc, table_name="bench")
+    table = svc.storage("bench")
+    started = time.perf_counter()
+    _load(table, messages, rooms)
+    table._sorted_keys()
+    print(f"loaded {messages} messages in {rooms} rooms ({time.perf_counter() - started:.1f}s)")
+
+    started = time.perf_counter()
+    await store.rebuild_room_summary()  # one-off backfill, same scan cost as the old per-join read
+    backfill = time.perf_counter() - started
+
+    rows: List[Sequence[object]] = []
+    samples: List[float] = []
+    for _ in range(scan_rounds):
+        table.served = 0
+        t0 = time.perf_counter()
+        expected = _scan_list_rooms(table)
+        samples.append(time.perf_counter() - t0)
+    rows.append(("full scan (previous)", table.served, *summarize_ms(samples).values()))
+
+    samples = []
+    summary = svc.storage(store._summary_table_name)
+    for _ in range(rounds):
+        summary.served = table.served = 0
+        t0 = time.perf_counter()
+        listed = await store.list_rooms()
+        samples.append(time.perf_counter() - t0)
+    assert table.served == 0
+    assert {r["name"]: r["messages"] for r in listed if r["messages"]} == {r["name"]: r["messages"] for r in expected}
+    rows.append(("summary table", summary.served, *summarize_ms(samples).values()))
+    rows.append(("backfill (once)", messages, backfill * 1000.0, backfill * 1000.0, backfill * 1000.0))
+    print_table(("list_rooms", "rows", "p50_ms", "p99_ms", "max_ms"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--scan-rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.rooms, args.rounds, args.scan_rounds))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
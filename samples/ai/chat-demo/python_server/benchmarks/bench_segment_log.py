@@ -0,0 +1,99 @@
+"""Tail reads of `SegmentLogRoomStore` with a very long room history.
+
+Appends ``--messages`` events to one room, then times ``get_room_messages``
+for the latest ``--limit`` messages: from mapped segments (``hot``), right
+after another append (the active segment is re-mapped), from a freshly
+opened store (``cold``: directory scan + torn-tail check + first mapping)
+and a page from the middle of the history via a cursor. ``full decode`` is
+the same read from a plain JSON-lines history file, which has to be read
+and decoded whole before the tail can be sliced off.
+
+    python -m python_server.benchmarks.bench_segment_log [--messages 1000000 --limit 50 --dir /tmp/chat-log-bench]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, List, Sequence
+
+from ..core.room_store import EventRecord, SegmentLogRoomStore
+from ._common import print_table, summarize_ms
+
+
+async def _time(fn: Callable[[], Awaitable[Any]], rounds: int) -> List[float]:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _event(i: int) -> EventRecord:
+    return EventRecord("message", f"m-{i:012x}", f"user{i % 50}", f"message number {i} with a little text", 1_714_521_600_000 + i)
+
+
+async def run(directory: str, messages: int, limit: int, rounds: int, full_rounds: int) -> None:
+    shutil.rmtree(directory, ignore_errors=True)
+    store = SegmentLogRoomStore(directory)
+    started = time.perf_counter()
+    for i in range(messages):
+        await store.record_room_event("big", _event(i))
+    elapsed = time.perf_counter() - started
+    on_disk = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(directory) for f in files) / 1e6
+    print(f"{messages} messages in one room: appended at {messages / elapsed:,.0f}/s, {on_disk:.0f}MB on disk")
+
+    _, middle = await store.get_room_messages_page("big", messages // 2)
+    counter = [messages]
+
+    async def append_then_read() -> Any:
+        await store.record_room_event("big", _event(counter[0]))
+        counter[0] += 1
+        return await store.get_room_messages("big", limit)
+
+    async def cold() -> Any:
+        await store.close()
+        fresh = SegmentLogRoomStore(directory)
+        return await fresh.get_room_messages("big", limit)
+
+    flat = os.path.join(directory, "flat.jsonl")
+    with open(flat, "w") as f:
+        for i in range(messages):
+            f.write(json.dumps(_event(i).to_dict()) + "\n")
+
+    async def full_decode() -> Any:
+        with open(flat, "rb") as f:
+            return [json.loads(line) for line in f][-limit:]
+
+    rows: List[Sequence[object]] = []
+    for label, fn, n in (
+        ("hot", lambda: store.get_room_messages("big", limit), rounds),
+        ("after append", append_then_read, rounds),
+        ("middle page", lambda: store.get_room_messages_page("big", limit, middle), rounds),
+        ("cold open", cold, max(1, rounds // 100)),
+        ("full decode (jsonl)", full_decode, full_rounds),
+    ):
+        rows.append((label, *summarize_ms(await _time(fn, n)).values()))
+    print_table((f"latest {limit}", "p50_ms", "p99_ms", "max_ms"), rows)
+    await store.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "chat-log-bench"))
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--full-rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.dir, args.messages, args.limit, args.rounds, args.full_rounds))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,92 @@
+"""Streaming fan-out: frames per response and time-to-first-token.
+
+Feeds a synthetic token stream (``--rate`` tokens/s) through the self-host
+``ChatService.streaming_to_group`` into a room of in-memory sockets and
+compares the old per-token send + fixed 50ms sleep, per-token sends with no
+sleep, and adaptive batching (`StreamBatchConfig`).
+
+    python -m python_server.benchmarks.bench_stream_batching [--tokens 400 --rate 200 --window-ms 100]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import AsyncIterator, List, Optional, Sequence
+
+from ..chat_service.base import ClientConnectionContext
+from ..chat_service.streaming import StreamBatchConfig
+from ..chat_service.transports.self_host import ChatService, _InMemoryClientManager
+from ._common import print_table
+
+
+class _CountingSocket:
+    def __init__(self) -> None:
+        self.frames = 0
+        self.first_at: Optional[float] = None
+
+    async def send(self, data: str) -> None:
+        if self.first_at is None:
+            self.first_at = time.perf_counter()
+        self.frames += 1
+
+
+async def _model(tokens: int, rate: float) -> AsyncIterator[str]:
+    interval = 1.0 / rate
+    started = time.perf_counter()
+    for i in range(tokens):
+        # pace against the start time so timer slack does not accumulate
+        delay = started + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        yield f" tok{i}"
+
+
+async def _legacy_sleep(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Previous behavior: sleep 50ms after every sent chunk."""
+    async for chunk in chunks:
+        yield chunk
+        await asyncio.sleep(0.05)
+
+
+async def _run_once(members: int, tokens: int, rate: float, config: StreamBatchConfig, legacy: bool) -> Sequence[float]:
+    mgr = _InMemoryClientManager(max_concurrency=members)
+    sockets = [_CountingSocket() for _ in range(members)]
+    for i, sock in enumerate(sockets):
+        await mgr.add_client(f"c{i}", ClientConnectionContext("/ws", f"c{i}"), sock)
+        await mgr.add_client_to_group(f"c{i}", "room_bench")
+    svc = ChatService(client_manager=mgr, stream_batch=config)
+    source = _model(tokens, rate)
+    started = time.perf_counter()
+    await svc.streaming_to_group("bench", _legacy_sleep(source) if legacy else source)
+    total = time.perf_counter() - started
+    first = sockets[0].first_at or started
+    return sockets[0].frames - 1, (first - started) * 1000.0, total * 1000.0
+
+
+async def run(members: int, tokens: int, rate: float, window_ms: float, max_bytes: int) -> None:
+    modes = (
+        ("per-token + 50ms sleep", StreamBatchConfig(window=0), True),
+        ("per-token", StreamBatchConfig(window=0), False),
+        (f"batched {window_ms:g}ms/{max_bytes}B", StreamBatchConfig(window=window_ms / 1000.0, max_bytes=max_bytes), False),
+    )
+    rows: List[Sequence[object]] = []
+    for label, config, legacy in modes:
+        frames, ttft_ms, total_ms = await _run_once(members, tokens, rate, config, legacy)
+        rows.append((label, tokens, frames, tokens / max(frames, 1), ttft_ms, total_ms))
+    print_table(("mode", "tokens", "frames", "tokens/frame", "ttft_ms", "stream_ms"), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--rate", type=float, default=200.0, help="model tokens per second")
+    parser.add_argument("--window-ms", type=float, default=100.0)
+    parser.add_argument("--max-bytes", type=int, default=2048)
+    args = parser.parse_args()
+    asyncio.run(run(args.members, args.tokens, args.rate, args.window_ms, args.max_bytes))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
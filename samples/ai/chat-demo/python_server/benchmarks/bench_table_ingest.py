@@ -0,0 +1,128 @@
+"""Sustained message ingest into the table store, and event-loop stalls.
+
+``--rooms`` producers each record ``--messages`` events as fast as the store
+accepts them and read the latest 50 messages every 20 events (what a
+``sendToAI`` turn does). Measured until every row is durable:
+
+- previous: one ``asyncio.to_thread`` upsert per event, history queried
+  synchronously on the event loop (the former ``AzureTableRoomStore`` I/O);
+- aio + write-behind: `AzureTableRoomStore` on the async clients, rows
+  grouped per room into transactions of up to 100.
+
+Both run against the in-process fake table with ``--latency-ms`` per request
+(each result page or transaction counts as one request). ``loop_lag`` is how
+late a 5ms ticker on the same loop woke up - what every other room's sockets
+see. Pass ``--connection-string`` (e.g. ``UseDevelopmentStorage=true`` for
+Azurite) to run the aio store against a real table service instead.
+
+    python -m python_server.benchmarks.bench_table_ingest [--rooms 20 --messages 500 --latency-ms 5]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..core.room_store import AzureTableRoomStore
+from ..tests.fake_tables import FakeTableClient, FakeTableServiceClient
+from ._common import print_table, summarize_ms
+
+
+class _PreviousStore:
+    """The former I/O pattern: thread hop per write, synchronous reads on the loop."""
+
+    def __init__(self, table: FakeTableClient, latency: float) -> None:
+        self._table = table
+        self._latency = latency
+        self._seq = itertools.count()
+        self.requests = 0
+
+    def _upsert(self, entity: Dict[str, Any]) -> None:
+        time.sleep(self._latency)
+        self._table.upsert_entity(entity)
+
+    async def record_room_event(self, room: str, event: Dict[str, Any]) -> None:
+        self.requests += 1
+        key = AzureTableRoomStore._row_key(time.time_ns() // 1000 + next(self._seq))
+        await asyncio.to_thread(self._upsert, {"PartitionKey": room, "RowKey": key, **event})
+
+    async def get_room_messages(self, room: str, limit: int) -> List[Dict[str, Any]]:
+        self.requests += 1
+        time.sleep(self._latency)  # blocking query_entities on the event loop
+        rows: List[Dict[str, Any]] = [dict(e) for e in self._table.query_entities("PartitionKey eq @room", parameters={"room": room})]
+        return rows[-limit:]
+
+    async def flush(self) -> None:
+        return None
+
+
+async def _ticker(lags: List[float], stop: asyncio.Event, interval: float = 0.005) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - t0 - interval))
+
+
+async def _producer(store: Any, room: str, messages: int) -> None:
+    for i in range(messages):
+        await store.record_room_event(room, {"messageId": f"{room}-{i}", "type": "message", "from": "u", "message": f"message {i}"})
+        if i % 20 == 19:
+            await store.get_room_messages(room, 50)
+
+
+async def _run_once(store: Any, rooms: int, messages: int) -> Sequence[float]:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(_producer(store, f"room{r}", messages) for r in range(rooms)))
+    await store.flush()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    lag = summarize_ms(lags)
+    return elapsed, lag["p99_ms"], lag["max_ms"]
+
+
+async def run(rooms: int, messages: int, latency: float, connection_string: Optional[str]) -> None:
+    total = rooms * messages
+    rows: List[Sequence[object]] = []
+
+    if connection_string is None:
+        previous = _PreviousStore(FakeTableClient("previous"), latency)
+        elapsed, lag_p99, lag_max = await _run_once(previous, rooms, messages)
+        rows.append(("previous (to_thread + sync reads)", total / elapsed, previous.requests, lag_p99, lag_max))
+
+    svc = FakeTableServiceClient(latency=latency) if connection_string is None else None
+    store = AzureTableRoomStore(
+        service_client=svc,
+        connection_string=connection_string,
+        table_name=f"bench{uuid.uuid4().hex[:8]}",
+        summary_table_name=f"benchsum{uuid.uuid4().hex[:8]}",
+    )
+    try:
+        elapsed, lag_p99, lag_max = await _run_once(store, rooms, messages)
+    finally:
+        await store.close()
+    stats = store.write_stats()
+    requests: object = svc.requests if svc is not None else "-"
+    rows.append(("aio + write-behind", total / elapsed, requests, lag_p99, lag_max))
+    print_table(("store", "msgs_per_s", "requests", "loop_lag_p99_ms", "loop_lag_max_ms"), rows)
+    print(f"write-behind: {stats}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=500, help="events per room")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated round-trip per table request")
+    parser.add_argument("--connection-string", default=None, help="run the aio store against a real table service (e.g. Azurite)")
+    args = parser.parse_args()
+    asyncio.run(run(args.rooms, args.messages, args.latency_ms / 1000.0, args.connection_string))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,104 @@
+"""Restart time and append throughput of the WAL storage mode.
+
+Restart: writes ``--events`` chat events over ``--rooms`` rooms (the room cap
+is 200, so the store keeps ``rooms * 200`` of them) through `WalRoomStore`,
+then times a cold start that replays the whole log, and - after ``close()``
+wrote a snapshot - a cold start from the snapshot alone.
+
+Append: ``--appends`` events from ``--concurrency`` concurrent writers,
+awaiting each append's commit, with fsync on and off. ``per_commit`` is how
+many log records one write + fsync covered (group commit); ``async`` does not
+wait for the commit at all.
+
+    python -m python_server.benchmarks.bench_wal [--events 10000000 --rooms 5000 --dir /tmp/chat-wal-bench]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Sequence
+
+from ..core.room_store import EventRecord, WalRoomStore
+from ._common import print_table
+
+
+def _disk_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1e6
+
+
+async def _restart(path: str, events: int, rooms: int) -> None:
+    store = WalRoomStore(path, fsync=False, sync_commit=False, snapshot_every=events + 1)
+    started = time.perf_counter()
+    for i in range(events):
+        await store.record_room_event(f"room{i % rooms}", EventRecord("message", f"m-{i:012x}", f"user{i % 50}", f"message number {i}", 1_714_521_600_000 + i))
+        if i % 100_000 == 99_999:
+            await store.flush()
+    await store.flush()
+    write = time.perf_counter() - started
+    store._log.close()
+    del store
+    print(f"{events} events over {rooms} rooms: written in {write:.1f}s ({events / write:,.0f}/s), log {_disk_mb(path):.0f}MB")
+
+    rows: List[Sequence[object]] = []
+    replayed = WalRoomStore(path, fsync=False)
+    rows.append(("log replay", replayed.load_seconds, _disk_mb(path)))
+    started = time.perf_counter()
+    await replayed.close()
+    snapshot = time.perf_counter() - started
+    del replayed
+    from_snapshot = WalRoomStore(path, fsync=False)
+    rows.append(("snapshot", from_snapshot.load_seconds, _disk_mb(path)))
+    print(f"snapshot written in {snapshot:.1f}s")
+    print_table(("restart from", "load_s", "disk_mb"), rows)
+
+
+async def _append(path: str, appends: int, concurrency: int, fsync: bool, sync_commit: bool) -> Sequence[object]:
+    shutil.rmtree(path, ignore_errors=True)
+    store = WalRoomStore(path, fsync=fsync, sync_commit=sync_commit, snapshot_every=appends + 1)
+    per_writer = appends // concurrency
+
+    async def writer(w: int) -> None:
+        for i in range(per_writer):
+            await store.record_room_event(f"room{w}", EventRecord.now("message", f"m-{w}-{i}", f"user{w}", "hello there"))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(w) for w in range(concurrency)))
+    await store.flush()
+    elapsed = time.perf_counter() - started
+    stats = store.wal_stats()
+    store._log.close()
+    mode = ("fsync" if fsync else "no fsync") + ("" if sync_commit else ", async")
+    return mode, concurrency, per_writer * concurrency / elapsed, stats["recordsPerCommit"]
+
+
+async def run(directory: str, events: int, rooms: int, appends: int, concurrency: Sequence[int]) -> None:
+    restart_dir = os.path.join(directory, "restart")
+    shutil.rmtree(restart_dir, ignore_errors=True)
+    if events:
+        await _restart(restart_dir, events, rooms)
+        shutil.rmtree(restart_dir, ignore_errors=True)
+    rows: List[Sequence[object]] = []
+    for fsync, sync_commit in ((True, True), (False, True), (False, False)):
+        for c in concurrency:
+            rows.append(await _append(os.path.join(directory, "append"), appends, c, fsync, sync_commit))
+    print_table(("commit", "writers", "appends_per_s", "per_commit"), rows)
+    shutil.rmtree(os.path.join(directory, "append"), ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "chat-wal-bench"))
+    parser.add_argument("--events", type=int, default=10_000_000, help="events written before the restart (0 skips it)")
+    parser.add_argument("--rooms", type=int, default=5_000)
+    parser.add_argument("--appends", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 256])
+    args = parser.parse_args()
+    asyncio.run(run(args.dir, args.events, args.rooms, args.appends, args.concurrency))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
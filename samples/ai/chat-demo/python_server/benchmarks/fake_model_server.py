@@ -0,0 +1,178 @@
+"""Deterministic OpenAI-compatible chat model stub (loopback only, no real model).
+
+Serves ``POST <base>/chat/completions`` - streamed as server-sent events
+when ``"stream": true``, as one completion otherwise - so `OpenAIChatClient`
+(and the whole chat service) can run against it with
+``MODEL_BASE_URL=http://127.0.0.1:<port>`` and any ``GITHUB_TOKEN``.
+
+Answers are seeded by the last user message, so the same prompt always gets
+the same words and the same timing:
+
+- ``first_token_ms``: delay before the first token;
+- ``tokens_per_sec`` with ``jitter`` (fraction, e.g. 0.2 = +/-20%) between tokens;
+- ``error_rate``: share of requests answered with HTTP 500 (drawn per
+  attempt, so the SDK's retries can succeed);
+- ``truncate_rate``: share of streams whose connection is dropped halfway.
+
+    python -m python_server.benchmarks.fake_model_server [--port 8000 --tokens-per-sec 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+_WORDS = (
+    "the", "chat", "room", "message", "stream", "token", "azure", "web", "pubsub", "client",
+    "server", "group", "event", "latency", "model", "reply", "demo", "fast", "simple", "local",
+)
+
+
+@dataclass(frozen=True)
+class FakeModelConfig:
+    tokens: int = 60
+    tokens_per_sec: float = 50.0
+    first_token_ms: float = 200.0
+    jitter: float = 0.2
+    error_rate: float = 0.0
+    truncate_rate: float = 0.0
+    seed: int = 0
+
+
+def _prompt_of(body: Dict[str, Any]) -> str:
+    for message in reversed(body.get("messages") or []):
+        if isinstance(message, dict) and message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+class FakeModelServer:
+    def __init__(self, config: Optional[FakeModelConfig] = None) -> None:
+        self.config = config or FakeModelConfig()
+        self.requests = 0
+        self.errors = 0
+        self.truncated = 0
+        self.tokens_sent = 0
+        self._attempts: Counter[str] = Counter()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    def answer(self, prompt: str) -> List[str]:
+        """Tokens (words with their leading space) the model streams for *prompt*."""
+        rng = random.Random(f"{self.config.seed}:{prompt}")
+        return [(" " if i else "") + rng.choice(_WORDS) for i in range(self.config.tokens)]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/chat/completions", self._completions)
+        app.router.add_post("/v1/chat/completions", self._completions)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "errors": self.errors, "truncated": self.truncated, "tokensSent": self.tokens_sent}
+
+    # -------- internals --------
+    async def _completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        prompt = _prompt_of(body)
+        model = str(body.get("model") or "fake-model")
+        self._attempts[prompt] += 1
+        attempt = random.Random(f"{self.config.seed}:{prompt}:{self._attempts[prompt]}")
+        if attempt.random() < self.config.error_rate:
+            self.errors += 1
+            return web.json_response({"error": {"message": "injected failure", "type": "server_error"}}, status=500)
+        truncate = attempt.random() < self.config.truncate_rate
+        tokens = self.answer(prompt)
+        timing = random.Random(f"{self.config.seed}:{prompt}:timing")
+        created = int(time.time())
+        if not body.get("stream"):
+            await asyncio.sleep(self.config.first_token_ms / 1000 + len(tokens) / max(self.config.tokens_per_sec, 1e-9))
+            self.tokens_sent += len(tokens)
+            return web.json_response({
+                "id": f"chatcmpl-{self.requests}", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens), "total_tokens": len(prompt.split()) + len(tokens)},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        interval = 1.0 / self.config.tokens_per_sec if self.config.tokens_per_sec > 0 else 0.0
+        await asyncio.sleep(self.config.first_token_ms / 1000)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(max(0.0, interval * (1 + timing.uniform(-self.config.jitter, self.config.jitter))))
+            if truncate and i == len(tokens) // 2:
+                self.truncated += 1
+                if request.transport is not None:
+                    request.transport.abort()
+                return response
+            delta: Dict[str, Any] = {"content": token}
+            if i == 0:
+                delta["role"] = "assistant"
+            await response.write(self._event(i, model, created, delta, None))
+            self.tokens_sent += 1
+        await response.write(self._event(len(tokens), model, created, {}, "stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def _event(self, n: int, model: str, created: int, delta: Dict[str, Any], finish: Optional[str]) -> bytes:
+        chunk = {
+            "id": f"chatcmpl-{self.requests}", "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--tokens", type=int, default=FakeModelConfig.tokens)
+    parser.add_argument("--tokens-per-sec", type=float, default=FakeModelConfig.tokens_per_sec)
+    parser.add_argument("--first-token-ms", type=float, default=FakeModelConfig.first_token_ms)
+    parser.add_argument("--jitter", type=float, default=FakeModelConfig.jitter)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server = FakeModelServer(FakeModelConfig(
+        tokens=args.tokens, tokens_per_sec=args.tokens_per_sec, first_token_ms=args.first_token_ms,
+        jitter=args.jitter, error_rate=args.error_rate, truncate_rate=args.truncate_rate, seed=args.seed,
+    ))
+
+    async def serve() -> None:
+        base_url = await server.start(args.host, args.port)
+        print(f"Fake model listening: MODEL_BASE_URL={base_url} (any GITHUB_TOKEN); Ctrl+C to stop")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
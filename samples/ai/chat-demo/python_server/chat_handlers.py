@@ -6,15 +6,24 @@ startup / wiring.
 """
 from __future__ import annotations
 
-from .core import to_async_iterator, get_room_id  # room store & util exports
+from .core import get_room_id  # room store & util exports
 from .config import DEFAULT_ROOM_ID
 from .chat_service.base import ClientConnectionContext, ChatServiceBase
-from .core import chat_stream
-from .core.chat_model_client import get_openai_chat_client
+from .core import chat_stream_async
+from .core.chat_model_client import get_openai_chat_client, model_signature
+from .core.llm_scheduler import LLMScheduler, SchedulerRejected
+from .core.response_cache import ResponseCache
+from .chat_service.factory import resolve_llm_scheduler_config, resolve_response_cache_config
 from .task_manager import ConnectionTaskManager
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-def register_chat_handlers(chat: ChatServiceBase, app_logger: Any, task_manager: ConnectionTaskManager) -> None:  # noqa: D401
+def register_chat_handlers(
+    chat: ChatServiceBase,
+    app_logger: Any,
+    task_manager: ConnectionTaskManager,
+    scheduler: Optional[LLMScheduler] = None,
+    response_cache: Optional[ResponseCache] = None,
+) -> None:  # noqa: D401
     """Attach all chat event handlers to the provided chat service.
 
     Parameters
@@ -28,7 +37,15 @@ def register_chat_handlers(chat: ChatServiceBase, app_logger: Any, task_manager:
         Provided for future customization (currently accessed via chat.room_store).
     task_manager: ConnectionTaskManager
         Manages scheduling and cancellation of background tasks per connectionId.
+    scheduler: LLMScheduler
+        Caps concurrent model calls and queues the rest fairly per room / user
+        (default: built from the AI_* environment).
+    response_cache: ResponseCache
+        Replays answers to repeated prompts and shares identical in-flight
+        model streams (default: built from the AI_CACHE_* environment).
     """
+    llm = scheduler or LLMScheduler(resolve_llm_scheduler_config())
+    cache = response_cache or ResponseCache(resolve_response_cache_config())
 
     # Maintain a per-connection set of background tasks for cleanup.
     def cancel_conn_tasks(conn: ClientConnectionContext) -> None:
@@ -58,31 +75,53 @@ def register_chat_handlers(chat: ChatServiceBase, app_logger: Any, task_manager:
                 # Broadcast user message first
                 await _svc.send_to_group(room_id, message, [conn.connectionId], conn.user_id)
                 try:
-                    history_events = await _svc.room_store.get_room_messages(room_id)
+                    # Kept current as messages are recorded; bounded by the context token budget
+                    conversation_history = await _svc.conversations.history(room_id, _svc.room_store)
                 except Exception:
-                    history_events = []
-                conversation_history = []
-                for ev in history_events:
-                    try:
-                        if ev.get("type") != "message":
-                            continue
-                        content = ev.get("message")
-                        if not isinstance(content, str) or not content:
-                            continue
-                        role = "assistant" if ev.get("from") in (None, "AI", "AI Assistant", "assistant") else "user"
-                        conversation_history.append({"role": role, "content": content})
-                    except Exception:  # pragma: no cover
-                        continue
+                    conversation_history = []
                 if conversation_history and conversation_history[-1]["role"] == "user" and conversation_history[-1]["content"] == message:
                     conversation_history.pop()
-                app_logger.debug("Sending to AI with history (%d items)", len(conversation_history))
+                app_logger.debug(
+                    "Sending to AI with history (%d items, ~%d tokens)",
+                    len(conversation_history), _svc.conversations.tokens(room_id),
+                )
 
-                # Build generator AFTER successful init
-                chunks = chat_stream(message, conversation_history=conversation_history)
                 app_logger.debug("Starting AI stream task to room %s (scheduled on main loop)", room_id)
-                coro = _svc.streaming_to_group(room_id, to_async_iterator(chunks))
+                coro = respond(_svc, room_id, conn.connectionId, message, conversation_history)
                 task_manager.schedule(conn.connectionId, coro)
 
+    async def respond(_svc: ChatServiceBase, room_id: str, connection_id: str, message: str, conversation_history: List[Dict[str, str]]) -> None:
+        # Connections stand in for users: the demo has no sign-in (every user is "You").
+        async def notify(state: str, **extra: Any) -> None:
+            try:
+                await _svc.send_room_notice(room_id, {"type": "ai-status", "state": state, **extra})
+            except Exception:
+                app_logger.debug("Failed to send AI status to room %s", room_id)
+
+        async def on_queued(position: int) -> None:
+            await notify("queued", position=position)
+
+        async def generate() -> AsyncIterator[str]:
+            async with llm.slot(room_id, connection_id, on_queued=on_queued) as waited:
+                if waited:
+                    await notify("started", waitedMs=round(waited * 1000))
+                # Async token stream: consumed on the chat loop, no thread per response
+                async for chunk in chat_stream_async(message, conversation_history=conversation_history):
+                    yield chunk
+
+        # Repeated prompts are replayed; identical ones in flight share one model call (and slot)
+        key = cache.key(message, conversation_history, model_signature())
+        try:
+            await _svc.streaming_to_group(room_id, cache.stream(key, generate))
+            app_logger.debug("AI response cache: %s", cache.stats())
+        except SchedulerRejected as e:
+            app_logger.info("AI request in room %s not admitted (%s): %s", room_id, e.reason, e)
+            await notify(e.reason, message="The AI assistant is busy, please try again shortly.")
+        except Exception as e:  # noqa: BLE001
+            # model or network failure: the stream was ended for clients and not recorded
+            app_logger.warning("AI response in room %s failed: %r", room_id, e)
+            await notify("error", message="The AI assistant could not answer, please try again.")
+
     @chat.on_disconnected
     async def handle_disconnected(conn: ClientConnectionContext, _svc: ChatServiceBase) -> None:  # noqa: D401
         cancel_conn_tasks(conn)
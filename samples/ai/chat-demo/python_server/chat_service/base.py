@@ -10,8 +10,10 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Any, Awaitable, Callable, Dict, List, Optional, Union, AsyncIterator
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Union, AsyncIterator
 from ..core import RoomStore, InMemoryRoomStore
+from .streaming import StreamBatchConfig
+from .conversation import ConversationContexts
 
 # Group naming
 ROOM_GROUP_PREFIX = "room_"
@@ -41,9 +43,20 @@ OnError = Callable[[ClientConnectionContext, BaseException, "ChatServiceBase"],
 
 class ChatServiceBase:
     """Manages event handler lists and defines abstract transport contract."""
-    def __init__(self, *, room_store: Optional[RoomStore] = None, logger: Optional[logging.Logger] = None) -> None:
+    def __init__(
+        self,
+        *,
+        room_store: Optional[RoomStore] = None,
+        logger: Optional[logging.Logger] = None,
+        stream_batch: Optional[StreamBatchConfig] = None,
+        conversations: Optional[ConversationContexts] = None,
+    ) -> None:
         self.log = logger or logging.getLogger("chat_service")
         self.room_store = room_store or InMemoryRoomStore()
+        # How streamed LLM chunks are merged into group messages (see streaming.py).
+        self.stream_batch = stream_batch or StreamBatchConfig()
+        # AI prompt history per room, kept current by _record_message (see conversation.py).
+        self.conversations = conversations or ConversationContexts()
         self._on_connecting: List[OnConnecting] = []
         self._on_connected: List[OnConnected] = []
         self._on_disconnected: List[OnDisconnected] = []
@@ -80,6 +93,11 @@ class ChatServiceBase:
             except Exception:  # noqa: BLE001
                 self.log.exception("Callback error in %r", h)
 
+    async def _record_message(self, room_id: str, event: Mapping[str, Any]) -> None:
+        """Persist a chat message and append it to the room's conversation context."""
+        self.conversations.observe(room_id, event)
+        await self.room_store.record_room_event(room_id, event)
+
     # Abstract transport contract
     async def start_chat(self, host: str = "0.0.0.0", port: int = 8765) -> None: raise NotImplementedError
     async def stop(self) -> None: raise NotImplementedError
@@ -88,6 +106,7 @@ class ChatServiceBase:
     async def add_to_group(self, connection_id: str, group: str) -> None: raise NotImplementedError
     async def remove_from_group(self, connection_id: str, group: str) -> None: raise NotImplementedError
     async def notify_rooms_changed(self) -> None: raise NotImplementedError
+    async def send_room_notice(self, group: str, data: Dict[str, Any]) -> None: raise NotImplementedError
 
 __all__ = [
     "ChatServiceBase",
@@ -0,0 +1,220 @@
+"""Per-room conversation context for AI prompts, bounded by a token budget.
+
+`ConversationContexts` keeps, for every room that has prompted the model,
+the turns the next prompt will carry:
+
+- a room is loaded from the `RoomStore` once, on its first prompt; after
+  that the chat service hands every recorded message to `observe`, so a
+  prompt costs no store read and no rebuild of the history;
+- token counts come from `estimate_tokens` (character based, no tokenizer)
+  and are computed once per message;
+- when the turns exceed ``max_tokens``, the oldest are dropped, or - with
+  ``ContextOverflow.SUMMARIZE`` - folded into a short digest of clipped
+  lines ("Earlier in this conversation") that itself stays under
+  ``summary_tokens`` by forgetting its oldest lines. The digest is built
+  locally; no extra model call is made.
+
+Prompt size, and the CPU to assemble it, is therefore bounded by the budget
+rather than by the age of the room. Contexts of up to ``max_rooms`` rooms are
+kept (least recently prompted evicted, and reloaded on their next prompt).
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Senders whose messages are the model's own turns.
+AI_SENDERS = (None, "AI", "AI Assistant", "assistant")
+# Role/separator framing the chat format adds to each message.
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_HEADER = "Earlier in this conversation (condensed):"
+SUMMARY_LINE_CHARS = 160
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class ContextOverflow(str, Enum):
+    DROP = "drop"
+    SUMMARIZE = "summarize"
+
+
+@dataclass(frozen=True)
+class ConversationConfig:
+    max_tokens: int = 3000
+    overflow: ContextOverflow = ContextOverflow.SUMMARIZE
+    summary_tokens: int = 300
+    max_rooms: int = 1000
+
+    @property
+    def turn_budget(self) -> int:
+        """Tokens for verbatim turns (the digest's share is reserved when summarizing)."""
+        if self.overflow is ContextOverflow.SUMMARIZE:
+            return max(1, self.max_tokens - self.summary_tokens)
+        return self.max_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Token estimate for one message: about 4 characters per token plus framing."""
+    return (len(text) + 3) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+def to_turn(event: Mapping[str, Any]) -> Optional[Tuple[str, str]]:
+    """``(role, content)`` of a stored chat event, None for events a prompt does not carry."""
+    if event.get("type") != "message":
+        return None
+    content = event.get("message")
+    if not isinstance(content, str) or not content:
+        return None
+    return ("assistant" if event.get("from") in AI_SENDERS else "user"), content
+
+
+class _Turn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str) -> None:
+        self.role = role
+        self.content = content
+        self.tokens = estimate_tokens(content)
+
+
+class _RoomContext:
+    __slots__ = ("turns", "tokens", "digest", "digest_tokens", "loading", "pending")
+
+    def __init__(self) -> None:
+        self.turns: Deque[_Turn] = deque()
+        self.tokens = 0
+        self.digest: Deque[Tuple[str, int]] = deque()
+        self.digest_tokens = 0
+        self.loading: Optional[asyncio.Future[None]] = None
+        self.pending: List[Mapping[str, Any]] = []  # observed while loading
+
+
+class ConversationContexts:
+    def __init__(self, config: Optional[ConversationConfig] = None) -> None:
+        self.config = config or ConversationConfig()
+        self._rooms: "OrderedDict[str, _RoomContext]" = OrderedDict()
+        self.loads = 0
+        self.turns_dropped = 0
+        self.turns_summarized = 0
+
+    def observe(self, room_id: str, event: Mapping[str, Any]) -> None:
+        """A message was recorded in *room_id*; rooms without a context ignore it."""
+        ctx = self._rooms.get(room_id)
+        if ctx is None:
+            return
+        if ctx.loading is not None:
+            ctx.pending.append(event)
+            return
+        self._add(ctx, event)
+
+    async def history(self, room_id: str, store: Any) -> List[Dict[str, str]]:
+        """Prompt history of *room_id* within the token budget, oldest first.
+
+        A condensed digest of older turns, if any, comes first as a system message.
+        """
+        ctx = self._rooms.get(room_id)
+        if ctx is None:
+            ctx = await self._load(room_id, store)
+        elif ctx.loading is not None:
+            await asyncio.shield(ctx.loading)
+            if self._rooms.get(room_id) is not ctx:  # that load was cancelled
+                return await self.history(room_id, store)
+        if self._rooms.get(room_id) is ctx:
+            self._rooms.move_to_end(room_id)
+        messages: List[Dict[str, str]] = []
+        if ctx.digest:
+            lines = "\n".join(line for line, _tokens in ctx.digest)
+            messages.append({"role": "system", "content": f"{SUMMARY_HEADER}\n{lines}"})
+        messages.extend({"role": turn.role, "content": turn.content} for turn in ctx.turns)
+        return messages
+
+    def forget(self, room_id: str) -> None:
+        self._rooms.pop(room_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rooms": len(self._rooms),
+            "loads": self.loads,
+            "turnsDropped": self.turns_dropped,
+            "turnsSummarized": self.turns_summarized,
+            "maxTokens": self.config.max_tokens,
+            "overflow": self.config.overflow.value,
+        }
+
+    def tokens(self, room_id: str) -> int:
+        """Estimated tokens the room's next prompt history carries (0 if not loaded)."""
+        ctx = self._rooms.get(room_id)
+        return ctx.tokens + ctx.digest_tokens if ctx is not None else 0
+
+    # -------- internals --------
+    async def _load(self, room_id: str, store: Any) -> _RoomContext:
+        ctx = self._rooms[room_id] = _RoomContext()
+        while len(self._rooms) > self.config.max_rooms:
+            self._rooms.popitem(last=False)
+        loading = ctx.loading = asyncio.get_running_loop().create_future()
+        try:
+            try:
+                events: Sequence[Mapping[str, Any]] = await store.get_room_messages(room_id)
+            except Exception:
+                events = []
+            seen = set()
+            for event in events:
+                self._add(ctx, event)
+                seen.add(event.get("messageId"))
+            for event in ctx.pending:
+                if event.get("messageId") not in seen:
+                    self._add(ctx, event)
+            self.loads += 1
+        except BaseException:
+            if self._rooms.get(room_id) is ctx:  # cancelled: let the next prompt load again
+                del self._rooms[room_id]
+            raise
+        finally:
+            ctx.pending = []
+            ctx.loading = None
+            loading.set_result(None)
+        return ctx
+
+    def _add(self, ctx: _RoomContext, event: Mapping[str, Any]) -> None:
+        turn = to_turn(event)
+        if turn is None:
+            return
+        item = _Turn(*turn)
+        ctx.turns.append(item)
+        ctx.tokens += item.tokens
+        budget = self.config.turn_budget
+        while ctx.tokens > budget and ctx.turns:
+            oldest = ctx.turns.popleft()
+            ctx.tokens -= oldest.tokens
+            if self.config.overflow is ContextOverflow.SUMMARIZE:
+                self._fold(ctx, oldest)
+            else:
+                self.turns_dropped += 1
+
+    def _fold(self, ctx: _RoomContext, turn: _Turn) -> None:
+        text = _WHITESPACE.sub(" ", turn.content).strip()
+        if len(text) > SUMMARY_LINE_CHARS:
+            text = text[:SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+        line = f"- {turn.role}: {text}"
+        tokens = estimate_tokens(line) - MESSAGE_OVERHEAD_TOKENS
+        ctx.digest.append((line, tokens))
+        ctx.digest_tokens += tokens
+        self.turns_summarized += 1
+        while ctx.digest_tokens > self.config.summary_tokens and ctx.digest:
+            _line, dropped = ctx.digest.popleft()
+            ctx.digest_tokens -= dropped
+            self.turns_dropped += 1
+
+
+__all__ = [
+    "ConversationContexts",
+    "ConversationConfig",
+    "ContextOverflow",
+    "estimate_tokens",
+    "to_turn",
+    "AI_SENDERS",
+]
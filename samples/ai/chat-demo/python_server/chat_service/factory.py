@@ -7,7 +7,12 @@ import logging
 
 from typing import Any
 from . import ChatService, ChatServiceBase
-from ..core.runtime_config import TransportMode
+from .streaming import StreamBatchConfig
+from .conversation import ContextOverflow, ConversationConfig, ConversationContexts
+from .transports.outbound import OverflowPolicy
+from ..core.llm_scheduler import LLMSchedulerConfig
+from ..core.response_cache import ResponseCacheConfig
+from ..core.runtime_config import TransportMode, env_float, env_int
 
 
 def resolve_webpubsub_config() -> Tuple[Optional[str], Optional[str], str]:
@@ -17,6 +22,76 @@ def resolve_webpubsub_config() -> Tuple[Optional[str], Optional[str], str]:
     return endpoint, conn_str, hub
 
 
+def resolve_outbound_queue_config() -> Tuple[Optional[int], OverflowPolicy]:
+    """Per-connection outbound queue settings for the self-host transport.
+
+    OUTBOUND_QUEUE_SIZE=0 disables queues (direct socket writes).
+    """
+    size = env_int("OUTBOUND_QUEUE_SIZE", 1024)
+    raw_policy = (os.getenv("OUTBOUND_OVERFLOW_POLICY") or OverflowPolicy.COALESCE.value).strip().lower()
+    if raw_policy not in {p.value for p in OverflowPolicy}:
+        raise RuntimeError(f"Invalid OUTBOUND_OVERFLOW_POLICY={raw_policy}")
+    return (size if size > 0 else None), OverflowPolicy(raw_policy)
+
+
+def resolve_stream_batch_config() -> StreamBatchConfig:
+    """Streaming chunk batching shared by both transports.
+
+    STREAM_BATCH_WINDOW_MS=0 sends one group message per chunk.
+    """
+    return StreamBatchConfig(
+        window=env_int("STREAM_BATCH_WINDOW_MS", 100) / 1000.0,
+        max_bytes=env_int("STREAM_BATCH_MAX_BYTES", 2048) or StreamBatchConfig.max_bytes,
+    )
+
+
+def resolve_stream_max_in_flight() -> int:
+    """Concurrent chunk sends per streamed response (Web PubSub transport)."""
+    return env_int("WEBPUBSUB_STREAM_MAX_IN_FLIGHT", 4, minimum=1)
+
+def resolve_conversation_config() -> ConversationConfig:
+    """Token budget of the per-room AI prompt history.
+
+    CHAT_CONTEXT_OVERFLOW=drop forgets the oldest turns; summarize (default)
+    folds them into a digest of at most CHAT_CONTEXT_SUMMARY_TOKENS.
+    """
+    max_tokens = env_int("CHAT_CONTEXT_MAX_TOKENS", 3000, minimum=1)
+    summary_tokens = env_int("CHAT_CONTEXT_SUMMARY_TOKENS", 300, minimum=1)
+    raw_overflow = (os.getenv("CHAT_CONTEXT_OVERFLOW") or ContextOverflow.SUMMARIZE.value).strip().lower()
+    if raw_overflow not in {o.value for o in ContextOverflow}:
+        raise RuntimeError(f"Invalid CHAT_CONTEXT_OVERFLOW={raw_overflow}")
+    overflow = ContextOverflow(raw_overflow)
+    if overflow is ContextOverflow.SUMMARIZE and summary_tokens >= max_tokens:
+        raise RuntimeError(f"Invalid CHAT_CONTEXT_SUMMARY_TOKENS={summary_tokens} (must be below CHAT_CONTEXT_MAX_TOKENS)")
+    return ConversationConfig(max_tokens=max_tokens, overflow=overflow, summary_tokens=summary_tokens)
+
+
+def resolve_llm_scheduler_config() -> LLMSchedulerConfig:
+    """Concurrent model calls and the fair queue in front of them.
+
+    AI_MAX_QUEUE=0 rejects every request over AI_MAX_IN_FLIGHT instead of queueing it.
+    """
+    return LLMSchedulerConfig(
+        max_in_flight=env_int("AI_MAX_IN_FLIGHT", 8, minimum=1),
+        max_queue=env_int("AI_MAX_QUEUE", 100),
+        max_queued_per_user=env_int("AI_MAX_QUEUED_PER_USER", 3, minimum=1),
+        queue_timeout=env_float("AI_QUEUE_TIMEOUT_SECONDS", 30, exclusive=True),
+    )
+
+
+def resolve_response_cache_config() -> ResponseCacheConfig:
+    """Cache of AI responses to identical prompts (identical in-flight prompts are always shared).
+
+    AI_CACHE_MAX_ENTRIES=0 stores nothing; AI_CACHE_REPLAY_TOKENS_PER_SEC=0 replays at once.
+    """
+    return ResponseCacheConfig(
+        max_entries=env_int("AI_CACHE_MAX_ENTRIES", 256),
+        ttl=env_float("AI_CACHE_TTL_SECONDS", 300, exclusive=True),
+        history_turns=env_int("AI_CACHE_HISTORY_TURNS", 6),
+        replay_rate=env_float("AI_CACHE_REPLAY_TOKENS_PER_SEC", 0),
+    )
+
+
 def build_chat_service(
     public_endpoint: Optional[str],
     host: str,
@@ -34,8 +109,20 @@ def build_chat_service(
     """
     if not isinstance(transport_mode, TransportMode):
         raise RuntimeError("transport_mode must be a TransportMode enum instance")
+    stream_batch = resolve_stream_batch_config()
+    conversations = ConversationContexts(resolve_conversation_config())
     if transport_mode is TransportMode.SELF:
-        return ChatService(public_endpoint=public_endpoint, host=host, port=port, room_store=room_store)
+        queue_size, overflow_policy = resolve_outbound_queue_config()
+        return ChatService(
+            public_endpoint=public_endpoint,
+            host=host,
+            port=port,
+            room_store=room_store,
+            outbound_queue_size=queue_size,
+            overflow_policy=overflow_policy,
+            stream_batch=stream_batch,
+            conversations=conversations,
+        )
 
     # WebPubSub path
     endpoint, conn_str, hub = resolve_webpubsub_config()
@@ -53,10 +140,19 @@ def build_chat_service(
         logger=app_logger,
         flask_app=flask_app,
         loop=loop,
+        stream_batch=stream_batch,
+        conversations=conversations,
+        stream_max_in_flight=resolve_stream_max_in_flight(),
     )
     return service
 
 __all__ = [
     "build_chat_service",
     "resolve_webpubsub_config",
+    "resolve_outbound_queue_config",
+    "resolve_stream_batch_config",
+    "resolve_conversation_config",
+    "resolve_llm_scheduler_config",
+    "resolve_response_cache_config",
+    "resolve_stream_max_in_flight",
 ]
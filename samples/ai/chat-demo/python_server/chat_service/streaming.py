@@ -0,0 +1,204 @@
+"""Adaptive batching of streamed LLM chunks before they are broadcast.
+
+`batch_chunks` wraps the token iterator handed to ``streaming_to_group``:
+
+- the first chunk is flushed immediately, so time-to-first-token is unchanged;
+- later chunks are merged until ``window`` seconds have passed since the first
+  buffered chunk or ``max_bytes`` (UTF-8) have accumulated;
+- the source keeps being read while the caller is busy sending the previous
+  batch, so a slow transport automatically gets fewer, larger frames.
+
+A window of 0 disables batching (one frame per chunk, no added delay).
+
+`PipelinedStreamSender` is the send side for transports where each chunk is
+a separate request (Web PubSub REST): it keeps several sends in flight, tags
+every chunk with a consecutive ``index`` so clients can restore order, and
+merges text while all slots are busy.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+
+@dataclass(frozen=True)
+class StreamBatchConfig:
+    window: float = 0.1
+    max_bytes: int = 2048
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+
+async def batch_chunks(chunks: AsyncIterator[str], config: Optional[StreamBatchConfig] = None) -> AsyncIterator[str]:
+    """Yield *chunks* merged per `StreamBatchConfig`. Empty chunks are skipped."""
+    config = config or StreamBatchConfig()
+    if not config.enabled:
+        async for chunk in chunks:
+            if chunk:
+                yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    source = chunks.__aiter__()
+    pending: Optional[asyncio.Future[str]] = None
+    buf: List[str] = []
+    size = 0
+    deadline = 0.0
+    first = True
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(source.__anext__())
+            if buf:
+                done, _ = await asyncio.wait((pending,), timeout=max(0.0, deadline - loop.time()))
+                if not done:
+                    yield "".join(buf)
+                    buf, size = [], 0
+                    continue
+            else:
+                await asyncio.wait((pending,))
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                break
+            pending = None
+            if not chunk:
+                continue
+            if not buf:
+                deadline = loop.time() + config.window
+            buf.append(chunk)
+            size += len(chunk.encode("utf-8"))
+            if first or size >= config.max_bytes:
+                first = False
+                yield "".join(buf)
+                buf, size = [], 0
+        if buf:
+            yield "".join(buf)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+
+@dataclass
+class StreamSendStats:
+    chunks: int = 0
+    requests: int = 0
+    aggregated: int = 0
+    failed: int = 0
+    max_in_flight: int = 0
+    duration: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies)
+
+        def pct(q: float) -> float:
+            return lat[min(len(lat) - 1, int(q * len(lat)))] * 1000.0 if lat else 0.0
+
+        return {
+            "chunks": self.chunks,
+            "requests": self.requests,
+            "aggregated": self.aggregated,
+            "failed": self.failed,
+            "maxInFlight": self.max_in_flight,
+            "durationMs": round(self.duration * 1000.0, 1),
+            "latencyP50Ms": round(pct(0.5), 1),
+            "latencyP95Ms": round(pct(0.95), 1),
+            "latencyMaxMs": round(lat[-1] * 1000.0, 1) if lat else 0.0,
+        }
+
+
+class PipelinedStreamSender:
+    """Ordered, pipelined sends for one streamed response.
+
+    ``send(index, text)`` is called with consecutive indexes starting at 0;
+    up to ``max_in_flight`` calls run concurrently. Text pushed while every
+    slot is busy is merged into the next send. Single event loop only.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[int, str], Awaitable[None]],
+        *,
+        max_in_flight: int = 4,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        self._send = send
+        self.max_in_flight = max_in_flight
+        self.stats = StreamSendStats()
+        self._log = logger or logging.getLogger("chat_service.streaming")
+        self._buffer: List[str] = []
+        self._in_flight: Set[asyncio.Task[None]] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._started = time.perf_counter()
+
+    @property
+    def next_index(self) -> int:
+        return self.stats.requests
+
+    def push(self, text: str) -> None:
+        if not text:
+            return
+        self.stats.chunks += 1
+        if self._buffer:
+            self.stats.aggregated += 1
+        self._buffer.append(text)
+        self._pump()
+
+    def _pump(self) -> None:
+        while self._buffer and len(self._in_flight) < self.max_in_flight:
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            index = self.stats.requests
+            self.stats.requests += 1
+            task = asyncio.ensure_future(self._run(index, text))
+            self._in_flight.add(task)
+            self._idle.clear()
+            self.stats.max_in_flight = max(self.stats.max_in_flight, len(self._in_flight))
+            task.add_done_callback(self._done)
+
+    async def _run(self, index: int, text: str) -> None:
+        started = time.perf_counter()
+        try:
+            await self._send(index, text)
+        except Exception as e:  # noqa: BLE001
+            self.stats.failed += 1
+            self._log.debug("Streaming chunk %d failed: %r", index, e)
+        finally:
+            self.stats.latencies.append(time.perf_counter() - started)
+
+    def _done(self, task: asyncio.Task[None]) -> None:
+        self._in_flight.discard(task)
+        self._pump()
+        if not self._in_flight and not self._buffer:
+            self._idle.set()
+
+    async def close(self) -> StreamSendStats:
+        """Flush buffered text and wait until every send has completed."""
+        self._pump()
+        while self._in_flight or self._buffer:
+            await self._idle.wait()
+        self.stats.duration = time.perf_counter() - self._started
+        return self.stats
+
+    def cancel(self) -> None:
+        self._buffer.clear()
+        for task in list(self._in_flight):
+            task.cancel()
+
+
+__all__ = [
+    "StreamBatchConfig",
+    "StreamSendStats",
+    "PipelinedStreamSender",
+    "batch_chunks",
+]
@@ -0,0 +1,188 @@
+"""Encode-once broadcast frames for the self-host transport.
+
+A `PreparedFrame` wraps one outbound JSON payload and lazily caches its
+serialized text, UTF-8 bytes and the complete unmasked WebSocket text frame.
+Group sends build a single `PreparedFrame` per broadcast and `write_frame`
+writes the same wire bytes to every recipient, instead of letting the
+websockets library re-encode and re-frame the message per socket.
+
+Reliable connections need a per-connection ``sequenceId`` on every message.
+`SequencedFrame` splices ``{"sequenceId":N,`` in front of the shared encoded
+body, so only the short prefix and the frame header are built per socket.
+
+Connections that negotiated ``protobuf.webpubsub.azure.v1`` are stored as a
+`ProtobufConnection`; for them the frame's ``DownstreamMessage`` encoding is
+cached the same way and written as a binary frame.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Optional, Union
+
+from websockets.legacy.protocol import WebSocketCommonProtocol
+from websockets.protocol import State
+
+from .protobuf_codec import ProtobufConnection, encode_downstream
+
+
+_OP_TEXT = 0x81
+_OP_BINARY = 0x82
+
+
+def _frame_header(length: int, first: int = _OP_TEXT) -> bytes:
+    """Header of an unmasked, final frame carrying *length* payload bytes."""
+    if length < 126:
+        return bytes((first, length))
+    if length < 65536:
+        return bytes((first, 126)) + length.to_bytes(2, "big")
+    return bytes((first, 127)) + length.to_bytes(8, "big")
+
+
+class PreparedFrame:
+    __slots__ = ("payload", "_text", "_data", "_wire", "_body", "_protobuf", "_protobuf_wire")
+
+    def __init__(self, payload: Dict[str, Any], *, text: Optional[str] = None) -> None:
+        # Shared by every recipient: treat as read-only once prepared.
+        self.payload = payload
+        self._text = text
+        self._data: Optional[bytes] = None
+        self._wire: Optional[bytes] = None
+        self._body: Optional[bytes] = None
+        self._protobuf: Optional[bytes] = None
+        self._protobuf_wire: Optional[bytes] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.payload)
+        return self._text
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data = self.text.encode("utf-8")
+        return self._data
+
+    @property
+    def wire(self) -> bytes:
+        """Complete server-to-client (unmasked, FIN) text frame."""
+        if self._wire is None:
+            self._wire = _frame_header(len(self.data)) + self.data
+        return self._wire
+
+    @property
+    def body(self) -> bytes:
+        """Encoded members after the opening brace, shared by sequenced copies."""
+        if self._body is None:
+            data = self.data
+            self._body = data[1:] if data != b"{}" else b""
+        return self._body
+
+    @property
+    def protobuf(self) -> bytes:
+        """Serialized ``DownstreamMessage``; empty when the schema cannot carry it."""
+        if self._protobuf is None:
+            self._protobuf = encode_downstream(self.payload) or b""
+        return self._protobuf
+
+    @property
+    def protobuf_wire(self) -> bytes:
+        """Complete server-to-client binary frame of `protobuf` (empty if none)."""
+        if self._protobuf_wire is None:
+            body = self.protobuf
+            self._protobuf_wire = _frame_header(len(body), _OP_BINARY) + body if body else b""
+        return self._protobuf_wire
+
+    @property
+    def message_type(self) -> Any:
+        return self.payload.get("type")
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"PreparedFrame({self.text[:64]!r})"
+
+
+class SequencedFrame:
+    """A `PreparedFrame` stamped with one connection's ``sequenceId``."""
+
+    __slots__ = ("frame", "sequence_id")
+
+    def __init__(self, frame: PreparedFrame, sequence_id: int) -> None:
+        self.frame = frame
+        self.sequence_id = sequence_id
+
+    def _prefix(self) -> bytes:
+        sep = b"," if self.frame.body else b"}"
+        return b'{"sequenceId":' + str(self.sequence_id).encode("ascii") + sep
+
+    @property
+    def text(self) -> str:
+        return (self._prefix() + self.frame.body).decode("utf-8")
+
+    @property
+    def wire(self) -> bytes:
+        prefix = self._prefix()
+        body = self.frame.body
+        return _frame_header(len(prefix) + len(body)) + prefix + body
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"SequencedFrame({self.sequence_id}, {self.frame!r})"
+
+
+Outbound = Union[str, PreparedFrame, SequencedFrame]
+
+
+def frame_text(data: Outbound) -> str:
+    return data if isinstance(data, str) else data.text
+
+
+def _raw_writable(ws: Any) -> bool:
+    return (
+        isinstance(ws, WebSocketCommonProtocol)
+        and not ws.extensions
+        and ws.state is State.OPEN
+        and not ws.transfer_data_task.done()
+    )
+
+
+async def _write_protobuf(conn: ProtobufConnection, data: Outbound) -> None:
+    if isinstance(data, str):
+        await conn.send(data)
+        return
+    frame = data.frame if isinstance(data, SequencedFrame) else data
+    if not frame.protobuf:
+        return  # no DownstreamMessage for this payload type
+    ws = conn.ws
+    if _raw_writable(ws):
+        ws.transport.write(frame.protobuf_wire)
+        await ws.drain()
+        return
+    await ws.send(frame.protobuf)
+
+
+async def write_frame(ws: Any, data: Outbound) -> None:
+    """Send *data* to *ws*, reusing pre-framed bytes when the socket allows it.
+
+    The raw write path is only taken for legacy websockets protocol instances
+    with no negotiated extensions (permessage-deflate would make the bytes
+    per-connection); anything else falls back to ``ws.send(text)``.
+    """
+    if isinstance(ws, ProtobufConnection):
+        await _write_protobuf(ws, data)
+        return
+    if isinstance(data, str):
+        await ws.send(data)
+        return
+    if _raw_writable(ws):
+        ws.transport.write(data.wire)
+        await ws.drain()
+        return
+    await ws.send(data.text)
+
+
+__all__ = [
+    "PreparedFrame",
+    "SequencedFrame",
+    "Outbound",
+    "frame_text",
+    "write_frame",
+]
@@ -0,0 +1,243 @@
+"""Per-connection bounded outbound queues for the self-host transport.
+
+Each connection gets an `OutboundQueue` with its own writer task. Producers
+(broadcasts, acks, system messages) only enqueue; the writer drains the queue
+to the socket in order. When a reader stalls and the queue fills up, the
+configured `OverflowPolicy` decides what gets dropped.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass, asdict
+from enum import Enum
+from typing import Any, Deque, Dict, List, Optional
+
+from .frames import Outbound, PreparedFrame, write_frame
+from .reliable import ReliableSession
+
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = "drop-oldest"
+    DROP_NEWEST = "drop-newest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+@dataclass
+class OutboundStats:
+    depth: int = 0
+    max_depth: int = 0
+    sent: int = 0
+    dropped: int = 0
+    coalesced: int = 0
+    failed: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class QueueClosedError(RuntimeError):
+    """Raised when enqueuing to a connection whose writer has stopped."""
+
+
+def _streaming_chunk(data: Outbound) -> Optional[tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Return (envelope, data) when *data* is a mergeable streaming chunk frame."""
+    if isinstance(data, PreparedFrame):
+        frame: Any = data.payload
+    elif not isinstance(data, str):
+        return None  # already sequenced (replay): never merged
+    else:
+        try:
+            frame = json.loads(data)
+        except ValueError:
+            return None
+    inner = frame.get("data") if isinstance(frame, dict) else None
+    if not isinstance(inner, dict) or not inner.get("streaming") or inner.get("streamingEnd"):
+        return None
+    if not isinstance(inner.get("message"), str) or not inner.get("messageId"):
+        return None
+    return frame, inner
+
+
+class OutboundQueue:
+    """Bounded FIFO of outbound frames drained to one socket by a writer task.
+
+    Single event loop only. `offer` never blocks; it returns False when the
+    frame was rejected (drop-newest, disconnect, or queue already closed).
+    """
+
+    def __init__(
+        self,
+        connection_id: str,
+        transport: Any,
+        *,
+        max_size: int = 1024,
+        policy: OverflowPolicy = OverflowPolicy.COALESCE,
+        send_timeout: float | None = 5.0,
+        logger: logging.Logger | None = None,
+        session: ReliableSession | None = None,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self.connection_id = connection_id
+        self.transport = transport
+        self.max_size = max_size
+        self.policy = OverflowPolicy(policy)
+        self.stats = OutboundStats()
+        # Reliable connections get their sequenceId at write time, so frames
+        # dropped by the overflow policy never consume one.
+        self.session = session
+        self._send_timeout = send_timeout
+        self._log = logger or logging.getLogger("chat_service.outbound")
+        self._items: Deque[Outbound] = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._warned = False
+        self._writer: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._run(), name=f"outbound-{self.connection_id}")
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def offer(self, data: Outbound) -> bool:
+        if self._closed:
+            raise QueueClosedError(f"outbound queue for {self.connection_id} is closed")
+        if len(self._items) >= self.max_size and not self._handle_overflow(data):
+            return False
+        self._items.append(data)
+        self._update_depth()
+        self._ready.set()
+        return True
+
+    def _handle_overflow(self, data: Outbound) -> bool:
+        """Apply the overflow policy. Returns True if *data* should still be appended."""
+        if not self._warned:
+            self._warned = True
+            self._log.warning("Slow consumer %s: outbound queue full (size=%d policy=%s)", self.connection_id, self.max_size, self.policy.value)
+        if self.policy is OverflowPolicy.DROP_NEWEST:
+            self.stats.dropped += 1
+            return False
+        if self.policy is OverflowPolicy.DISCONNECT:
+            if self.session is None:
+                self.stats.dropped += 1 + len(self._items)
+            else:
+                self._items.append(data)  # sequenced for replay by _abort
+            self._abort("outbound queue overflow")
+            return False
+        if self.policy is OverflowPolicy.COALESCE and self._coalesce(data):
+            return False
+        self._items.popleft()
+        self.stats.dropped += 1
+        return True
+
+    def _coalesce(self, data: Outbound) -> bool:
+        """Merge a streaming chunk into the newest queued chunk of the same message.
+
+        Prepared frames are shared with other recipients, so the merged frame
+        is always a fresh copy rather than an in-place edit.
+        """
+        incoming = _streaming_chunk(data)
+        if incoming is None:
+            return False
+        _frame, inner = incoming
+        for idx in range(len(self._items) - 1, -1, -1):
+            queued = _streaming_chunk(self._items[idx])
+            if queued is None:
+                continue
+            q_frame, q_inner = queued
+            if q_inner.get("messageId") != inner.get("messageId"):
+                continue
+            merged = {**q_frame, "data": {**q_inner, "message": q_inner["message"] + inner["message"]}}
+            self._items[idx] = PreparedFrame(merged)
+            self.stats.coalesced += 1
+            return True
+        return False
+
+    def _update_depth(self) -> None:
+        depth = len(self._items)
+        self.stats.depth = depth
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+
+    async def _run(self) -> None:
+        while not self._closed:
+            if not self._items:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            data = self._items.popleft()
+            self._update_depth()
+            if self.session is not None:
+                data = self.session.stamp(data)
+            try:
+                if self._send_timeout is None:
+                    await write_frame(self.transport, data)
+                else:
+                    await asyncio.wait_for(write_frame(self.transport, data), self._send_timeout)
+                self.stats.sent += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                self.stats.failed += 1
+                self._log.info("Outbound writer for %s stopped: %r", self.connection_id, e)
+                self._abort("outbound write failed")
+
+    def _abort(self, reason: str) -> None:
+        """Stop accepting frames and close the socket (policy disconnect / write failure).
+
+        A reliable connection keeps its backlog: the queued frames are
+        sequenced into the replay buffer, in order, for the resumed socket.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self.session is not None:
+            for data in self._items:
+                self.session.stamp(data)
+        self._items.clear()
+        self._update_depth()
+        self._ready.set()
+        close = getattr(self.transport, "close", None)
+        if close is not None:
+            try:
+                res = close(code=1008, reason=reason)
+                if asyncio.iscoroutine(res):
+                    asyncio.get_running_loop().create_task(res)
+            except Exception:  # noqa: BLE001
+                pass
+
+    def take_pending(self) -> List[Outbound]:
+        """Remove and return frames not yet handed to the writer."""
+        items = list(self._items)
+        self._items.clear()
+        self._update_depth()
+        return items
+
+    async def close(self) -> None:
+        """Stop the writer; queued frames are discarded (the socket is going away)."""
+        self._closed = True
+        self._items.clear()
+        self._update_depth()
+        self._ready.set()
+        writer, self._writer = self._writer, None
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+            try:
+                await writer
+            except (asyncio.CancelledError, Exception):  # noqa: BLE001
+                pass
+
+
+__all__ = [
+    "OverflowPolicy",
+    "OutboundStats",
+    "OutboundQueue",
+    "QueueClosedError",
+]
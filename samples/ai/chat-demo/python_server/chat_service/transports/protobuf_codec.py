@@ -0,0 +1,174 @@
+"""`protobuf.webpubsub.azure.v1` codec for the self-host transport.
+
+The handler and client manager keep speaking the JSON protocol shapes
+internally; this module translates at the socket edge:
+
+- `decode_upstream` turns a binary ``UpstreamMessage`` into the dict the JSON
+  subprotocol would have produced (``sendToGroup`` / ``event`` / ``joinGroup``
+  / ``leaveGroup``);
+- `encode_downstream` turns an outbound JSON payload (``message`` / ``ack`` /
+  ``system``) into serialized ``DownstreamMessage`` bytes. Room-list updates
+  are ``message`` frames to the ``sys_rooms`` group (data ``rooms-changed``),
+  so protobuf clients that join it get them as ``DataMessage``; ``system``
+  events other than ``connected`` / ``disconnected`` have no protobuf message
+  and are not sent.
+
+``MessageData.text_data`` that holds a JSON object is surfaced as
+``dataType: "json"`` so protobuf clients can send the same chat payloads as
+browser clients. The ``google.protobuf`` runtime is optional: without it the
+protobuf subprotocol is simply not offered.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, Dict, Optional, Tuple
+
+_pb: Any
+try:  # optional dependency
+    from google.protobuf.message import DecodeError as _DecodeError
+    from . import pubsub_pb2 as _pb
+except ImportError:  # pragma: no cover - exercised only without protobuf installed
+    _pb = None
+    _DecodeError = Exception
+
+PROTOBUF_PROTOCOL_NAMES = frozenset({"protobuf.webpubsub.azure.v1"}) if _pb is not None else frozenset()
+
+
+class ProtobufDecodeError(ValueError):
+    """Raised when an inbound frame is not a valid ``UpstreamMessage``."""
+
+
+def protobuf_available() -> bool:
+    return _pb is not None
+
+
+def _read_message_data(md: Any) -> Tuple[str, Any]:
+    kind = md.WhichOneof("data")
+    if kind == "text_data":
+        text = md.text_data
+        if text.startswith("{"):
+            try:
+                value = json.loads(text)
+            except ValueError:
+                value = None
+            if isinstance(value, dict):
+                return "json", value
+        return "text", text
+    if kind == "binary_data":
+        return "binary", base64.b64encode(md.binary_data).decode("ascii")
+    if kind == "protobuf_data":
+        return "binary", base64.b64encode(md.protobuf_data.SerializeToString()).decode("ascii")
+    return "text", ""
+
+
+def _write_message_data(md: Any, data_type: Any, data: Any) -> None:
+    if data_type == "binary" and isinstance(data, str):
+        md.binary_data = base64.b64decode(data)
+    elif data_type == "text" and isinstance(data, str):
+        md.text_data = data
+    else:
+        md.text_data = json.dumps(data, separators=(",", ":"))
+
+
+def decode_upstream(raw: bytes | str) -> Dict[str, Any]:
+    """Decode one binary ``UpstreamMessage`` frame into its JSON-protocol dict."""
+    if _pb is None:
+        raise ProtobufDecodeError("protobuf runtime is not installed")
+    if isinstance(raw, str):
+        raise ProtobufDecodeError("protobuf subprotocol expects binary frames")
+    try:
+        msg = _pb.UpstreamMessage.FromString(raw)
+    except _DecodeError as e:
+        raise ProtobufDecodeError(str(e)) from e
+    kind = msg.WhichOneof("message")
+    out: Dict[str, Any]
+    if kind == "send_to_group_message":
+        m = msg.send_to_group_message
+        data_type, data = _read_message_data(m.data)
+        out = {"type": "sendToGroup", "group": m.group, "dataType": data_type, "data": data}
+    elif kind == "event_message":
+        m = msg.event_message
+        data_type, data = _read_message_data(m.data)
+        return {"type": "event", "event": m.event, "dataType": data_type, "data": data}
+    elif kind == "join_group_message":
+        m = msg.join_group_message
+        out = {"type": "joinGroup", "group": m.group}
+    elif kind == "leave_group_message":
+        m = msg.leave_group_message
+        out = {"type": "leaveGroup", "group": m.group}
+    else:
+        raise ProtobufDecodeError("empty UpstreamMessage")
+    if m.HasField("ack_id"):
+        out["ackId"] = m.ack_id
+    return out
+
+
+def encode_downstream(payload: Dict[str, Any]) -> Optional[bytes]:
+    """Serialize a JSON-protocol downstream payload as a ``DownstreamMessage``.
+
+    Returns None for payloads the protobuf schema has no message for (any
+    ``system`` event but ``connected`` / ``disconnected``).
+    """
+    if _pb is None:
+        return None
+    msg = _pb.DownstreamMessage()
+    kind = payload.get("type")
+    if kind == "message":
+        dm = msg.data_message
+        setattr(dm, "from", str(payload.get("from") or "server"))
+        if payload.get("group") is not None:
+            dm.group = str(payload["group"])
+        _write_message_data(dm.data, payload.get("dataType"), payload.get("data"))
+    elif kind == "ack":
+        am = msg.ack_message
+        am.ack_id = int(payload.get("ackId") or 0)
+        am.success = bool(payload.get("success"))
+        error = payload.get("error")
+        if isinstance(error, dict):
+            am.error.name = str(error.get("name") or "")
+            am.error.message = str(error.get("message") or "")
+        elif error:
+            am.error.name = "Error"
+            am.error.message = str(error)
+    elif kind == "system" and payload.get("event") == "connected":
+        cm = msg.system_message.connected_message
+        cm.connection_id = str(payload.get("connectionId") or "")
+        cm.user_id = str(payload.get("userId") or "")
+    elif kind == "system" and payload.get("event") == "disconnected":
+        msg.system_message.disconnected_message.reason = str(payload.get("message") or "")
+    else:
+        return None
+    data: bytes = msg.SerializeToString()
+    return data
+
+
+class ProtobufConnection:
+    """A socket that negotiated ``protobuf.webpubsub.azure.v1``.
+
+    Stored in the client manager in place of the raw socket; `write_frame`
+    recognizes it and emits binary ``DownstreamMessage`` frames instead of text.
+    """
+
+    __slots__ = ("ws",)
+
+    def __init__(self, ws: Any) -> None:
+        self.ws = ws
+
+    async def send(self, data: str) -> None:
+        encoded = encode_downstream(json.loads(data))
+        if encoded is not None:
+            await self.ws.send(encoded)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        await self.ws.close(code=code, reason=reason)
+
+
+__all__ = [
+    "PROTOBUF_PROTOCOL_NAMES",
+    "ProtobufConnection",
+    "ProtobufDecodeError",
+    "decode_upstream",
+    "encode_downstream",
+    "protobuf_available",
+]
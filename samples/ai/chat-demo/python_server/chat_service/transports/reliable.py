@@ -0,0 +1,115 @@
+"""Reliable subprotocol state (`json.reliable.webpubsub.azure.v1`) for self-host.
+
+A `ReliableSession` follows one logical connection across socket drops:
+
+- every outbound ``"type": "message"`` frame is stamped with the next
+  connection-scoped ``sequenceId`` and kept in a bounded replay buffer;
+- ``sequenceAck`` from the client trims the buffer up to the acked id;
+- after a drop the client reconnects with ``awps_connection_id`` and
+  ``awps_reconnection_token`` and only the unacked frames are replayed.
+
+See ``protocols/client/client-spec.md`` (1.4 Connection recovery, 3.2 SequenceId).
+"""
+from __future__ import annotations
+
+import hmac
+import json
+import secrets
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+from .frames import Outbound, PreparedFrame, SequencedFrame
+
+RELIABLE_PROTOCOL_NAMES = frozenset({"json.reliable.webpubsub.azure.v1"})
+
+RECOVERY_CONNECTION_ID_PARAM = "awps_connection_id"
+RECOVERY_TOKEN_PARAM = "awps_reconnection_token"
+
+
+class ReliableSession:
+    """Sequence numbering + replay ring buffer for one reliable connection.
+
+    Single event loop only.
+    """
+
+    def __init__(self, connection_id: str, *, buffer_size: int = 1000) -> None:
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be >= 1")
+        self.connection_id = connection_id
+        self.reconnection_token = secrets.token_urlsafe(24)
+        self.buffer_size = buffer_size
+        self.last_sequence_id = 0
+        self.acked_sequence_id = 0
+        # Highest sequenceId evicted before being acked; replay has a gap
+        # until the client acks past it.
+        self._evicted_through = 0
+        self.detached_at: Optional[float] = None
+        self._buffer: Deque[SequencedFrame] = deque()
+
+    @property
+    def detached(self) -> bool:
+        return self.detached_at is not None
+
+    @property
+    def resumable(self) -> bool:
+        return self.acked_sequence_id >= self._evicted_through
+
+    def detach(self) -> None:
+        self.detached_at = time.monotonic()
+
+    def attach(self) -> None:
+        self.detached_at = None
+
+    def verify(self, token: Optional[str]) -> bool:
+        return bool(token) and hmac.compare_digest(str(token), self.reconnection_token)
+
+    def stamp(self, data: Outbound) -> Outbound:
+        """Assign the next sequenceId to a message frame and buffer it for replay.
+
+        Non-message frames (acks, system events) are returned unchanged; already
+        sequenced frames (replays) pass through untouched.
+        """
+        if isinstance(data, SequencedFrame):
+            return data
+        if isinstance(data, str):
+            try:
+                payload = json.loads(data)
+            except ValueError:
+                return data
+            if not isinstance(payload, dict) or payload.get("type") != "message":
+                return data
+            frame = PreparedFrame(payload, text=data)
+        else:
+            if data.message_type != "message":
+                return data
+            frame = data
+        self.last_sequence_id += 1
+        sequenced = SequencedFrame(frame, self.last_sequence_id)
+        if len(self._buffer) >= self.buffer_size:
+            self._evicted_through = self._buffer.popleft().sequence_id
+        self._buffer.append(sequenced)
+        return sequenced
+
+    def ack(self, sequence_id: int) -> None:
+        if sequence_id <= self.acked_sequence_id:
+            return
+        self.acked_sequence_id = min(sequence_id, self.last_sequence_id)
+        buf = self._buffer
+        while buf and buf[0].sequence_id <= self.acked_sequence_id:
+            buf.popleft()
+
+    def unacked(self) -> List[SequencedFrame]:
+        return list(self._buffer)
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+
+__all__ = [
+    "RELIABLE_PROTOCOL_NAMES",
+    "RECOVERY_CONNECTION_ID_PARAM",
+    "RECOVERY_TOKEN_PARAM",
+    "ReliableSession",
+]
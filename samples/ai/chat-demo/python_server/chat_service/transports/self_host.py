@@ -3,14 +3,24 @@ from __future__ import annotations
 
 import asyncio
 import json
-from datetime import datetime, timezone
 from typing import Any, Optional, List, AsyncIterator
 import logging
 import websockets.exceptions as ws_exc
 from websockets.server import WebSocketServerProtocol, serve as ws_serve, Subprotocol
 
-from ...core.utils import generate_id
-from ...core.room_store import RoomStore
+from ...core.utils import generate_id, get_query_value
+from .frames import Outbound, PreparedFrame, write_frame
+from .outbound import OutboundQueue, OverflowPolicy, QueueClosedError
+from .protobuf_codec import PROTOBUF_PROTOCOL_NAMES, ProtobufConnection, ProtobufDecodeError, decode_upstream
+from .reliable import (
+    RELIABLE_PROTOCOL_NAMES,
+    RECOVERY_CONNECTION_ID_PARAM,
+    RECOVERY_TOKEN_PARAM,
+    ReliableSession,
+)
+from ...core.room_store import EventRecord, RoomStore
+from ..streaming import StreamBatchConfig, batch_chunks
+from ..conversation import ConversationContexts
 from ..base import (
     ChatServiceBase,
     ClientConnectionContext,
@@ -22,7 +32,7 @@ from ..base import (
 supported_protocol_names = (
     'json.reliable.webpubsub.azure.v1',
     'json.webpubsub.azure.v1',
-)
+) + tuple(sorted(PROTOBUF_PROTOCOL_NAMES))
 
 supported_protocols: tuple[Subprotocol, ...] = tuple(
     Subprotocol(name) for name in supported_protocol_names
@@ -41,57 +51,260 @@ class _InMemoryClientManager:
     """In-process client + group registry used by the self-host transport.
 
     Thread-safety: Designed for single asyncio event loop usage. No locks.
+
+    Group sends fan out to all members concurrently. At most
+    ``max_concurrency`` socket writes are in flight per broadcast and each
+    write is bounded by ``send_timeout`` seconds, so one stalled reader can
+    no longer hold up the rest of the room.
+
+    When ``outbound_queue_size`` is set, every client gets a bounded
+    `OutboundQueue` drained by its own writer task; sends only enqueue and
+    ``overflow_policy`` decides what to do with a slow consumer.
+
+    Clients added with ``reliable=True`` get a `ReliableSession`: message
+    frames are stamped with a sequenceId and kept for replay until acked,
+    and `detach_client` keeps the connection's groups so it can be resumed.
     """
-    def __init__(self, *, logger: logging.Logger | None = None) -> None:  # noqa: D401
+    def __init__(
+        self,
+        *,
+        logger: logging.Logger | None = None,
+        max_concurrency: int = 256,
+        send_timeout: float | None = 5.0,
+        outbound_queue_size: int | None = None,
+        overflow_policy: OverflowPolicy | str = OverflowPolicy.COALESCE,
+        replay_buffer_size: int = 1000,
+    ) -> None:  # noqa: D401
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
         self._clients: Dict[str, tuple[ClientConnectionContext, Any]] = {}
         self._groups: Dict[str, Set[str]] = {}
+        # Reverse index (connection -> groups) so disconnect cost only
+        # depends on the connection's own memberships.
+        self._client_groups: Dict[str, Set[str]] = {}
+        self._queues: Dict[str, OutboundQueue] = {}
+        self._sessions: Dict[str, ReliableSession] = {}
+        self._replay_buffer_size = replay_buffer_size
         self._logger = logger
+        self._max_concurrency = max_concurrency
+        self._send_timeout = send_timeout
+        self._outbound_queue_size = outbound_queue_size
+        self._overflow_policy = OverflowPolicy(overflow_policy)
 
-    async def add_client(self, connection_id: str, context: ClientConnectionContext, transport: Any) -> None:
+    async def add_client(self, connection_id: str, context: ClientConnectionContext, transport: Any, *, reliable: bool = False) -> None:
         self._clients[connection_id] = (context, transport)
+        session = None
+        if reliable:
+            session = ReliableSession(connection_id, buffer_size=self._replay_buffer_size)
+            self._sessions[connection_id] = session
+        self._attach_queue(connection_id, transport, session)
+
+    def _attach_queue(self, connection_id: str, transport: Any, session: ReliableSession | None) -> None:
+        if not self._outbound_queue_size:
+            return
+        queue = OutboundQueue(
+            connection_id,
+            transport,
+            max_size=self._outbound_queue_size,
+            policy=self._overflow_policy,
+            send_timeout=self._send_timeout,
+            logger=self._logger,
+            session=session,
+        )
+        self._queues[connection_id] = queue
+        queue.start()
 
     async def remove_client(self, connection_id: str) -> None:
         self._clients.pop(connection_id, None)
-        # Drop from all groups + prune empties
-        for g in list(self._groups):
-            members = self._groups[g]
-            if connection_id in members:
-                members.discard(connection_id)
-                if not members:
-                    self._groups.pop(g, None)
+        self._sessions.pop(connection_id, None)
+        queue = self._queues.pop(connection_id, None)
+        if queue is not None:
+            await queue.close()
+        # Drop from the groups it joined + prune empties
+        for g in self._client_groups.pop(connection_id, ()):
+            self._discard_member(g, connection_id)
+
+    def session(self, connection_id: str) -> Optional[ReliableSession]:
+        return self._sessions.get(connection_id)
+
+    async def detach_client(self, connection_id: str) -> bool:
+        """Park a reliable connection after its socket dropped.
+
+        Group memberships and the replay buffer are kept; frames queued but
+        not yet written are sequenced into the buffer. Returns False (and
+        does nothing) for non-reliable or unknown connections.
+        """
+        session = self._sessions.get(connection_id)
+        ctx_ws = self._clients.get(connection_id)
+        if session is None or ctx_ws is None:
+            return False
+        queue = self._queues.pop(connection_id, None)
+        if queue is not None:
+            pending = queue.take_pending()
+            await queue.close()
+            for data in pending:
+                session.stamp(data)
+        self._clients[connection_id] = (ctx_ws[0], None)
+        session.detach()
+        return True
+
+    async def resume_client(self, connection_id: str, token: Optional[str], transport: Any) -> Optional[ClientConnectionContext]:
+        """Re-attach a detached reliable connection to a new socket.
+
+        Returns the original context, or None when the id/token do not match
+        a detached session or its replay buffer has a gap.
+        """
+        session = self._sessions.get(connection_id)
+        ctx_ws = self._clients.get(connection_id)
+        if session is None or ctx_ws is None or not session.detached:
+            return None
+        if not session.verify(token) or not session.resumable:
+            return None
+        session.attach()
+        self._clients[connection_id] = (ctx_ws[0], transport)
+        self._attach_queue(connection_id, transport, session)
+        return ctx_ws[0]
+
+    async def replay_unacked(self, connection_id: str) -> int:
+        """Re-send every buffered frame the client has not acked, in order."""
+        session = self._sessions.get(connection_id)
+        if session is None:
+            return 0
+        frames = session.unacked()
+        for frame in frames:
+            await self.send_to_connection(connection_id, frame)
+        return len(frames)
+
+    def ack(self, connection_id: str, sequence_id: int) -> None:
+        session = self._sessions.get(connection_id)
+        if session is not None:
+            session.ack(sequence_id)
 
     async def add_client_to_group(self, connection_id: str, group: str) -> None:
         self._groups.setdefault(group, set()).add(connection_id)
+        self._client_groups.setdefault(connection_id, set()).add(group)
 
     async def remove_client_from_group(self, connection_id: str, group: str) -> None:
+        self._discard_member(group, connection_id)
+        joined = self._client_groups.get(connection_id)
+        if joined is not None:
+            joined.discard(group)
+            if not joined:
+                self._client_groups.pop(connection_id, None)
+
+    def _discard_member(self, group: str, connection_id: str) -> None:
         members = self._groups.get(group)
         if members:
             members.discard(connection_id)
             if not members:
                 self._groups.pop(group, None)
 
-    async def send_to_group(self, group: str, data: str, exclude_ids: Opt[Iterable[str]] = None) -> TList[SendResult]:
-        results: TList[SendResult] = []
-        members = self._groups.get(group, set())
+    async def send_to_group(self, group: str, data: Outbound, exclude_ids: Opt[Iterable[str]] = None) -> TList[SendResult]:
+        members = self._groups.get(group)
+        if not members:
+            return []
+        excluded = set(exclude_ids) if exclude_ids else None
+        queued: TList[SendResult] = []
+        targets: TList[tuple[str, Any]] = []
         for cid in list(members):  # iterate over snapshot
-            if exclude_ids and cid in exclude_ids:
+            if excluded and cid in excluded:
+                continue
+            queue = self._queues.get(cid)
+            if queue is not None:
+                queued.append(self._enqueue(queue, data))
                 continue
             ctx_ws = self._clients.get(cid)
             if not ctx_ws:
                 continue
-            _ctx, ws = ctx_ws
-            try:
-                await ws.send(data)
-                results.append(SendResult(cid, True))
-            except Exception as e:  # noqa: BLE001
-                results.append(SendResult(cid, False, str(e)))
-        return results
+            if ctx_ws[1] is None:
+                session = self._sessions.get(cid)
+                if session is not None:  # detached: buffer for replay on resume
+                    session.stamp(data)
+                    queued.append(SendResult(cid, True))
+                continue
+            targets.append((cid, ctx_ws[1]))
+        if not targets:
+            return queued
+        return queued + await self._fan_out(targets, data)
+
+    async def send_to_connection(self, connection_id: str, data: Outbound) -> SendResult:
+        """Send to a single connection, through its outbound queue when it has one."""
+        queue = self._queues.get(connection_id)
+        if queue is not None:
+            return self._enqueue(queue, data)
+        ctx_ws = self._clients.get(connection_id)
+        if not ctx_ws:
+            return SendResult(connection_id, False, "unknown connection")
+        if ctx_ws[1] is None:
+            return SendResult(connection_id, False, "connection detached")
+        return await self._send_one(connection_id, ctx_ws[1], data)
+
+    def _enqueue(self, queue: OutboundQueue, data: Outbound) -> SendResult:
+        cid = queue.connection_id
+        try:
+            if queue.offer(data):
+                return SendResult(cid, True)
+            if queue.closed and queue.session is not None:
+                return SendResult(cid, True)  # disconnected on overflow: the frame went to the replay buffer
+            return SendResult(cid, False, f"dropped ({queue.policy.value})")
+        except QueueClosedError as e:
+            # The writer stopped but the socket is not detached yet: a reliable
+            # connection still buffers for replay, as a detached one does.
+            session = self._sessions.get(cid)
+            if session is not None:
+                session.stamp(data)
+                return SendResult(cid, True)
+            return SendResult(cid, False, str(e))
+
+    async def _send_one(self, connection_id: str, ws: Any, data: Outbound) -> SendResult:
+        session = self._sessions.get(connection_id)
+        if session is not None:
+            data = session.stamp(data)
+        try:
+            if self._send_timeout is None:
+                await write_frame(ws, data)
+            else:
+                await asyncio.wait_for(write_frame(ws, data), self._send_timeout)
+            return SendResult(connection_id, True)
+        except asyncio.TimeoutError:
+            return SendResult(connection_id, False, f"send timed out after {self._send_timeout}s")
+        except Exception as e:  # noqa: BLE001
+            return SendResult(connection_id, False, str(e))
+
+    async def _fan_out(self, targets: TList[tuple[str, Any]], data: Outbound) -> TList[SendResult]:
+        """Write *data* to every target with a bounded window of concurrent sends.
+
+        A fixed pool of workers (at most ``max_concurrency``) drains the target
+        list so a 10k-member room does not create 10k tasks per broadcast.
+        Results keep the order of *targets*.
+        """
+        if not targets:
+            return []
+        if len(targets) == 1:
+            cid, ws = targets[0]
+            return [await self._send_one(cid, ws, data)]
+        results: TList[SendResult | None] = [None] * len(targets)
+        cursor = iter(range(len(targets)))
+
+        async def worker() -> None:
+            for i in cursor:
+                cid, ws = targets[i]
+                results[i] = await self._send_one(cid, ws, data)
+
+        workers = min(self._max_concurrency, len(targets))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return [r for r in results if r is not None]
 
     # Introspection helpers (not part of external contract, but useful for tests)
     def group_members(self, group: str) -> Set[str]:
         return set(self._groups.get(group, set()))
     def client_ids(self) -> Set[str]:
         return set(self._clients.keys())
+    def client_groups(self, connection_id: str) -> Set[str]:
+        return set(self._client_groups.get(connection_id, set()))
+    def outbound_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-connection queue depth / drop counters (empty when queues are disabled)."""
+        return {cid: q.stats.to_dict() for cid, q in self._queues.items()}
 
 class ChatService(ChatServiceBase):
     def __init__(
@@ -104,10 +317,29 @@ class ChatService(ChatServiceBase):
         host: str = "0.0.0.0",
         port: int = 8765,
         public_endpoint: str | None = None,
+        outbound_queue_size: int | None = 1024,
+        overflow_policy: OverflowPolicy | str = OverflowPolicy.COALESCE,
+        compression: Optional[str] = None,
+        resume_window: float = 30.0,
+        replay_buffer_size: int = 1000,
+        stream_batch: Optional[StreamBatchConfig] = None,
+        conversations: Optional[ConversationContexts] = None,
     ) -> None:
-        super().__init__(room_store=room_store, logger=logger)
-        self.client_manager = client_manager or _InMemoryClientManager(logger=self.log)
+        super().__init__(room_store=room_store, logger=logger, stream_batch=stream_batch, conversations=conversations)
+        self.client_manager = client_manager or _InMemoryClientManager(
+            logger=self.log,
+            outbound_queue_size=outbound_queue_size,
+            overflow_policy=overflow_policy,
+            replay_buffer_size=replay_buffer_size,
+        )
         self.max_message_size = max_message_size
+        # permessage-deflate is per-connection state, which defeats encode-once
+        # broadcast frames; keep it off unless explicitly requested.
+        self.compression = compression
+        # How long a dropped reliable connection is kept for recovery before
+        # it is treated as disconnected.
+        self.resume_window = resume_window
+        self._expiry_handles: Dict[str, asyncio.TimerHandle] = {}
         from typing import Any as _Any
         self._server: _Any | None = None
         self._host = host
@@ -128,22 +360,42 @@ class ChatService(ChatServiceBase):
             if selected_subprotocol not in supported_protocol_names:
                 await ws.close()
                 return
-            connection_id = generate_id('conn-')
-            client = ClientConnectionContext(path, connection_id)
+            reliable = selected_subprotocol in RELIABLE_PROTOCOL_NAMES
+            protobuf = selected_subprotocol in PROTOBUF_PROTOCOL_NAMES
+            resume_id = get_query_value(path, RECOVERY_CONNECTION_ID_PARAM) if reliable else None
+            resumed: Optional[ClientConnectionContext] = None
+            if resume_id:
+                resumed = await self.client_manager.resume_client(resume_id, get_query_value(path, RECOVERY_TOKEN_PARAM), ws)
+                if resumed is None:
+                    self.log.info("Recovery rejected for %s (remote=%s)", resume_id, remote)
+                    await ws.close(code=1008, reason="Connection recovery failed")
+                    return
+                self._cancel_expiry(resume_id)
+            connection_id = resume_id if resumed is not None and resume_id else generate_id('conn-')
+            client = resumed or ClientConnectionContext(path, connection_id)
             try:
-                await self._emit(self._on_connecting, client)
-                await self.client_manager.add_client(connection_id, client, ws)
-                await self._emit(self._on_connected, client)
-                await ws.send(json.dumps({
+                if resumed is None:
+                    await self._emit(self._on_connecting, client)
+                    transport: Any = ProtobufConnection(ws) if protobuf else ws
+                    await self.client_manager.add_client(connection_id, client, transport, reliable=reliable)
+                    await self._emit(self._on_connected, client)
+                connected_message: Dict[str, Any] = {
                     "type": "system",
                     "event": "connected",
                     "connectionId": connection_id,
                     "userId": client.user_id,
                     "subprotocol": selected_subprotocol
-                }))
+                }
+                session = self.client_manager.session(connection_id)
+                if session is not None:
+                    connected_message["reconnectionToken"] = session.reconnection_token
+                await self.client_manager.send_to_connection(connection_id, json.dumps(connected_message))
+                if resumed is not None:
+                    replayed = await self.client_manager.replay_unacked(connection_id)
+                    self.log.info("Recovered %s; replayed %d unacked message(s)", connection_id, replayed)
                 async for message in ws:
                     try:
-                        data = json.loads(message)
+                        data: Any = decode_upstream(message) if protobuf else json.loads(message)
                         if data.get('type') == 'event':
                             message_data = data.get('data', {})
                             user_message = message_data.get('message', '') if isinstance(message_data, dict) else str(message_data)
@@ -155,24 +407,18 @@ class ChatService(ChatServiceBase):
                             message_data = data.get('data', {})
                             user_message = message_data.get('message', '') if isinstance(message_data, dict) else str(message_data)
                             user_name = message_data.get('from')
-                            group_name = message_data.get('group')
+                            group_name = message_data.get('group') or data.get('group')
                             no_echo = message_data.get('noEcho', False)
                             if not user_message.strip():
                                 continue
                             room_id = try_room_id_from_group(group_name)
                             if room_id:
                                 try:
-                                    await self.room_store.record_room_event(room_id, {
-                                        "type": "message",
-                                        "messageId": generate_id("m-"),
-                                        "from": user_name,
-                                        "message": user_message,
-                                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                                    })
+                                    await self._record_message(room_id, EventRecord.now("message", generate_id("m-"), user_name, user_message))
                                     message_data["roomId"] = room_id
                                 except Exception:
                                     pass
-                            await self.client_manager.send_to_group(group_name, json.dumps({
+                            await self.client_manager.send_to_group(group_name, PreparedFrame({
                                 "type": "message",
                                 "from": "group",
                                 "group": group_name,
@@ -194,7 +440,7 @@ class ChatService(ChatServiceBase):
                                         pass
                                 ack_message = {"type": "ack", "ackId": data.get('ackId', 1), "success": True}
                                 await self.notify_rooms_changed()
-                            await ws.send(json.dumps(ack_message))
+                            await self.client_manager.send_to_connection(connection_id, json.dumps(ack_message))
                         elif data.get('type') == 'leaveGroup':
                             group_name = data.get('group')
                             if group_name is None:
@@ -209,13 +455,17 @@ class ChatService(ChatServiceBase):
                                     pass
                                 ack_message = {"type": "ack", "ackId": data.get('ackId', 1), "success": True}
                                 await self.notify_rooms_changed()
-                            await ws.send(json.dumps(ack_message))
+                            await self.client_manager.send_to_connection(connection_id, json.dumps(ack_message))
                         elif data.get('type') == 'sequenceAck':
-                            continue
+                            seq = data.get('sequenceId')
+                            if isinstance(seq, int):
+                                self.client_manager.ack(connection_id, seq)
                         else:
                             self.log.warning("Unknown message type: %s", message)
                     except json.JSONDecodeError:
                         self.log.warning("Invalid JSON received")
+                    except ProtobufDecodeError as e:
+                        self.log.warning("Invalid protobuf frame received: %s", e)
                     except Exception as e:
                         self.log.error("Error handling message: %s", e)
             except ws_exc.ConnectionClosed as e:
@@ -230,8 +480,13 @@ class ChatService(ChatServiceBase):
                 reason = getattr(ws, "close_reason", None)
                 closed = getattr(ws, "closed", None)
                 self.log.info("WS finalized remote=%s closed=%s code=%s reason=%r", remote, closed, code, reason)
-                await self.client_manager.remove_client(connection_id)
-                await self._emit(self._on_disconnected, client)
+                # A normal client-initiated close ends the session; any other
+                # drop keeps a reliable connection around for recovery.
+                if code != 1000 and self.resume_window > 0 and await self.client_manager.detach_client(connection_id):
+                    self._schedule_expiry(connection_id, client)
+                else:
+                    await self.client_manager.remove_client(connection_id)
+                    await self._emit(self._on_disconnected, client)
         
         self.log.info("Starting WebSocket server on %s:%s", host, port)
         self._server = await ws_serve(
@@ -242,6 +497,7 @@ class ChatService(ChatServiceBase):
             ping_interval=None,
             ping_timeout=None,
             max_size=self.max_message_size,
+            compression=self.compression,
         )
         self.log.info("WebSocket server started successfully on %s:%s", host, port)
         try:
@@ -249,11 +505,37 @@ class ChatService(ChatServiceBase):
         finally:
             self.log.info("ChatService stopped")
 
+    def _schedule_expiry(self, connection_id: str, client: ClientConnectionContext) -> None:
+        async def expire() -> None:
+            self._expiry_handles.pop(connection_id, None)
+            session = self.client_manager.session(connection_id)
+            if session is None or not session.detached:
+                return
+            self.log.info("Recovery window elapsed for %s", connection_id)
+            await self.client_manager.remove_client(connection_id)
+            await self._emit(self._on_disconnected, client)
+
+        self._cancel_expiry(connection_id)
+        loop = asyncio.get_running_loop()
+        self._expiry_handles[connection_id] = loop.call_later(self.resume_window, lambda: loop.create_task(expire()))
+
+    def _cancel_expiry(self, connection_id: str) -> None:
+        handle = self._expiry_handles.pop(connection_id, None)
+        if handle is not None:
+            handle.cancel()
+
     async def stop(self) -> None:
+        for handle in self._expiry_handles.values():
+            handle.cancel()
+        self._expiry_handles.clear()
         if self._server is not None:
             self._server.close()
             await self._server.wait_closed()
             self._server = None
+        try:
+            await self.room_store.close()
+        except Exception:  # noqa: BLE001
+            self.log.debug("Failed to close room store")
 
     async def send_to_group(self, group: str, message: str, exclude_ids: Optional[List[str]] = None, from_user_id: Optional[str] = None) -> List[SendResult]:
         room_id = group
@@ -273,40 +555,16 @@ class ChatService(ChatServiceBase):
             "fromUserId": from_user_id
         }
         try:
-            await self.room_store.record_room_event(room_id, {
-                "type": "message",
-                "messageId": message_id,
-                "from": from_user_id,
-                "message": message,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            })
+            await self._record_message(room_id, EventRecord.now("message", message_id, from_user_id, message))
         except Exception:
             self.log.debug("Failed to record room event for room %r", room_id)
-        return await self.client_manager.send_to_group(group_name, json.dumps(payload), exclude_ids)
+        return await self.client_manager.send_to_group(group_name, PreparedFrame(payload), exclude_ids)
 
     async def streaming_to_group(self, group: str, chunks: AsyncIterator[str], exclude_ids: Optional[List[str]] = None, from_user_id: Optional[str] = None) -> str:
         room_id = group
         group_name = as_room_group(room_id)
         full_response = ""
         message_id = generate_id("m-")
-        async for chunk in chunks:
-            full_response += chunk
-            group_data = {
-                "type": "message",
-                "from": "group",
-                "group": group_name,
-                "dataType": "json",
-                "data": {
-                    "messageId": message_id,
-                    "message": chunk,
-                    "from": from_user_id,
-                    "streaming": True,
-                    "roomId": room_id
-                },
-                "fromUserId": from_user_id
-            }
-            await self.client_manager.send_to_group(group_name, json.dumps(group_data), exclude_ids)
-            await asyncio.sleep(0.05)
         eos = {
             "type": "message",
             "from": "group",
@@ -321,15 +579,32 @@ class ChatService(ChatServiceBase):
             },
             "fromUserId": from_user_id
         }
-        await self.client_manager.send_to_group(group_name, json.dumps(eos), exclude_ids)
         try:
-            await self.room_store.record_room_event(room_id, {
+            async for chunk in batch_chunks(chunks, self.stream_batch):
+                full_response += chunk
+                group_data = {
                 "type": "message",
-                "messageId": message_id,
-                "message": full_response,
-                "from": from_user_id,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            })
+                "from": "group",
+                "group": group_name,
+                "dataType": "json",
+                    "data": {
+                        "messageId": message_id,
+                        "message": chunk,
+                        "from": from_user_id,
+                        "streaming": True,
+                        "roomId": room_id
+                    },
+                    "fromUserId": from_user_id
+                }
+                await self.client_manager.send_to_group(group_name, PreparedFrame(group_data), exclude_ids)
+        except Exception:
+            # the answer failed midway: end what clients have shown, keep it out of history
+            if full_response:
+                await self.client_manager.send_to_group(group_name, PreparedFrame(eos), exclude_ids)
+            raise
+        await self.client_manager.send_to_group(group_name, PreparedFrame(eos), exclude_ids)
+        try:
+            await self._record_message(room_id, EventRecord.now("message", message_id, from_user_id, full_response))
         except Exception:
             self.log.debug("Failed to record stream end for room %r", room_id)
         return full_response
@@ -347,6 +622,28 @@ class ChatService(ChatServiceBase):
     async def remove_from_group(self, connection_id: str, group: str) -> None:
         await self.client_manager.remove_client_from_group(connection_id, group)
 
+    def outbound_stats(self) -> Dict[str, Any]:
+        """Snapshot of outbound queue depth and drop counters for slow-consumer monitoring."""
+        per_connection = self.client_manager.outbound_stats()
+        totals = {"connections": len(per_connection), "depth": 0, "dropped": 0, "coalesced": 0, "failed": 0}
+        for stats in per_connection.values():
+            for key in ("depth", "dropped", "coalesced", "failed"):
+                totals[key] += stats[key]
+        return {"totals": totals, "connections": per_connection}
+
+    async def send_room_notice(self, group: str, data: Dict[str, Any]) -> None:
+        """Send a transient system payload (not recorded) to everyone in the room."""
+        room_id = group
+        group_name = as_room_group(room_id)
+        payload = {
+            "type": "message",
+            "from": "group",
+            "group": group_name,
+            "dataType": "json",
+            "data": {**data, "roomId": room_id},
+        }
+        await self.client_manager.send_to_group(group_name, PreparedFrame(payload))
+
     async def notify_rooms_changed(self) -> None:
         try:
             rooms = await self.room_store.list_rooms()
@@ -357,6 +654,6 @@ class ChatService(ChatServiceBase):
                 "dataType": "json",
                 "data": {"type": "rooms-changed", "rooms": rooms},
             }
-            await self.client_manager.send_to_group(SYS_ROOMS_GROUP, json.dumps(payload))
+            await self.client_manager.send_to_group(SYS_ROOMS_GROUP, PreparedFrame(payload))
         except Exception:
             self.log.debug("Failed to notify rooms-changed")
@@ -7,28 +7,52 @@ Azure Web PubSub service. Import path:
 It implements `WebPubSubChatService` (subclass of `ChatServiceBase`),
 handles negotiation and CloudEvents integration, and confines any
 Azure SDK dependencies to this file.
+
+REST calls go through the async service client
+(`azure.messaging.webpubsubservice.aio`) over one pooled aiohttp session.
+The session belongs to the chat event loop: calls made from other loops
+(e.g. Flask CloudEvents requests) are handed over to it, so no request ever
+blocks a loop and every room shares the same keep-alive connections.
 """
 from __future__ import annotations
 
 import asyncio
 import json
 import logging
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional, List, AsyncIterator, Union, Tuple
+from collections import deque
+from typing import Any, Callable, Coroutine, Deque, Dict, Mapping, Optional, List, AsyncIterator, Tuple, TypeVar
 
-from ...core.utils import generate_id
-from ...core.room_store import RoomStore
+from ...core.utils import generate_id, json_body
+from ...core.room_store import EventRecord, RoomStore
 from ..base import ChatServiceBase, ClientConnectionContext, as_room_group, SYS_ROOMS_GROUP
+from ..streaming import PipelinedStreamSender, StreamBatchConfig, batch_chunks
+from ..conversation import ConversationContexts
 
 DefaultAzureCredential = None  # sentinel if import missing
 WebPubSubServiceClient = None  # sentinel if import missing
+AioHttpTransport = None  # sentinel if import missing
+aiohttp = None  # sentinel if import missing
 try:  # noqa: SIM105
-    from azure.identity import DefaultAzureCredential as _DefaultAzureCredential  # pragma: no cover
-    from azure.messaging.webpubsubservice import WebPubSubServiceClient as _WebPubSubServiceClient  # pragma: no cover
-    DefaultAzureCredential = _DefaultAzureCredential
+    from azure.messaging.webpubsubservice.aio import WebPubSubServiceClient as _WebPubSubServiceClient  # pragma: no cover
     WebPubSubServiceClient = _WebPubSubServiceClient
 except Exception:  # noqa: BLE001
     pass
+try:  # noqa: SIM105
+    from azure.identity.aio import DefaultAzureCredential as _DefaultAzureCredential  # pragma: no cover
+    DefaultAzureCredential = _DefaultAzureCredential
+except Exception:  # noqa: BLE001
+    pass
+try:  # noqa: SIM105
+    import aiohttp as _aiohttp  # pragma: no cover
+    from azure.core.pipeline.transport import AioHttpTransport as _AioHttpTransport  # pragma: no cover
+    aiohttp = _aiohttp
+    AioHttpTransport = _AioHttpTransport
+except Exception:  # noqa: BLE001
+    pass
+
+T = TypeVar("T")
+
+_CLIENT_ROLES = ["webpubsub.joinLeaveGroup", "webpubsub.sendToGroup"]
 
 
 class WebPubSubChatService(ChatServiceBase):
@@ -44,23 +68,37 @@ class WebPubSubChatService(ChatServiceBase):
         flask_app: Any | None = None,
         loop: asyncio.AbstractEventLoop | None = None,
         auto_attach_path: str = '/eventhandler',
+        stream_batch: Optional[StreamBatchConfig] = None,
+        conversations: Optional[ConversationContexts] = None,
+        max_connections: int = 100,
+        stream_max_in_flight: int = 4,
     ) -> None:
-        super().__init__(room_store=room_store, logger=logger)
+        super().__init__(room_store=room_store, logger=logger, stream_batch=stream_batch, conversations=conversations)
         if WebPubSubServiceClient is None:
             raise RuntimeError("azure-messaging-webpubsubservice is not installed. Please `pip install azure-messaging-webpubsubservice`.")
+        if aiohttp is None or AioHttpTransport is None:
+            raise RuntimeError("aiohttp is not installed. Please `pip install aiohttp`.")
+        # only a credential created here is ours to close; a caller's may be shared
+        self._owns_credential = False
         if endpoint:
             if credential is None:
                 if DefaultAzureCredential is None:
                     raise RuntimeError("azure-identity is not installed. Please `pip install azure-identity` or pass a credential.")
                 credential = DefaultAzureCredential()
-            self._svc = WebPubSubServiceClient(endpoint=endpoint, hub=hub, credential=credential)
-        elif connection_string:
-            try:
-                self._svc = WebPubSubServiceClient.from_connection_string(connection_string, hub=hub)  # type: ignore[attr-defined]
-            except AttributeError:
-                self._svc = WebPubSubServiceClient.from_connection_string(connection_string)  # type: ignore[attr-defined]
-        else:
+                self._owns_credential = True
+        elif not connection_string:
             raise RuntimeError("WebPubSubChatService requires either endpoint (+ Azure credential) or connection_string")
+        self._hub = hub
+        self._endpoint = endpoint
+        self._connection_string: Any = connection_string
+        self._credential: Any = credential
+        self._max_connections = max_connections
+        self.stream_max_in_flight = stream_max_in_flight
+        self._stream_stats: Deque[Dict[str, Any]] = deque(maxlen=100)
+        # Loop that owns the pooled session; bound on first use when not given.
+        self._loop = loop
+        self._svc: Any | None = None
+        self._session: Any | None = None
         self._http_clients: Dict[str, ClientConnectionContext] = {}
 
         class _SimpleClientManager:
@@ -90,34 +128,109 @@ class WebPubSubChatService(ChatServiceBase):
         return self.get_client_access_url()
 
     async def start_chat(self, host: str = "0.0.0.0", port: int = 0) -> None:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
         self.log.info("WebPubSubChatService ready (service mode)")
 
     async def stop(self) -> None:
-        return
+        try:
+            await self.room_store.close()
+        except Exception:  # noqa: BLE001
+            self.log.debug("Failed to close room store")
+        await self._call(self._close_client)
+
+    def stream_stats(self) -> List[Dict[str, Any]]:
+        """Send statistics (request count, aggregation, latency percentiles) of recent streams."""
+        return list(self._stream_stats)
+
+    # ----------------- Async service client -----------------
+    def _new_client(self, **kwargs: Any) -> Any:
+        assert WebPubSubServiceClient is not None
+        if self._endpoint:
+            return WebPubSubServiceClient(endpoint=self._endpoint, hub=self._hub, credential=self._credential, **kwargs)
+        return WebPubSubServiceClient.from_connection_string(self._connection_string, hub=self._hub, **kwargs)
+
+    async def _client(self) -> Any:
+        """The shared client; created on the service loop with a pooled session."""
+        if self._svc is None:
+            assert aiohttp is not None and AioHttpTransport is not None
+            connector = aiohttp.TCPConnector(limit=self._max_connections, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, auto_decompress=False)
+            self._svc = self._new_client(transport=AioHttpTransport(session=self._session, session_owner=False))
+        return self._svc
+
+    async def _close_client(self) -> None:
+        svc, self._svc = self._svc, None
+        session, self._session = self._session, None
+        try:
+            if svc is not None:
+                await svc.close()
+            if session is not None:
+                await session.close()
+            close_credential = getattr(self._credential, "close", None) if self._owns_credential else None
+            if close_credential is not None and asyncio.iscoroutinefunction(close_credential):
+                await close_credential()
+        except Exception:  # noqa: BLE001
+            self.log.debug("Failed to close Web PubSub client")
+
+    async def _call(self, fn: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """Run *fn* on the service loop, awaiting it from whichever loop we are on."""
+        running = asyncio.get_running_loop()
+        if self._loop is None or self._loop.is_closed():
+            self._loop = running
+        if self._loop is running:
+            return await fn()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(fn(), self._loop))
+
+    async def _send_to_group(self, group_name: str, payload: Any, excluded: Optional[List[str]] = None) -> None:
+        async def send() -> None:
+            svc = await self._client()
+            await svc.send_to_group(group_name, payload, content_type="application/json", excluded=excluded)
+        await self._call(send)
 
     def get_client_access_url(self, *, user_id: Optional[str] = None) -> str:
-        token = self._svc.get_client_access_token(user_id=user_id, roles=["webpubsub.joinLeaveGroup", "webpubsub.sendToGroup"])
-        url_val: Any = token.get('url') if isinstance(token, dict) else getattr(token, 'url', None)
-        if not isinstance(url_val, str):
-            raise RuntimeError("Failed to obtain client access URL from Web PubSub service client")
-        return url_val
+        """Blocking: call from a thread without a running event loop (e.g. Flask); on a loop use `negotiate_async`."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            # waiting here would block the loop (and deadlock if it is the service loop)
+            raise RuntimeError("get_client_access_url() blocks; call `await negotiate_async()` from an event loop")
+
+        async def fetch() -> Any:
+            svc = await self._client()
+            return await svc.get_client_access_token(user_id=user_id, roles=_CLIENT_ROLES)
+
+        async def fetch_once() -> Any:
+            # No service loop to borrow: use a short-lived client.
+            async with self._new_client() as svc:
+                return await svc.get_client_access_token(user_id=user_id, roles=_CLIENT_ROLES)
+
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            token = asyncio.run_coroutine_threadsafe(fetch(), loop).result(timeout=30)
+        else:
+            token = asyncio.run(fetch_once())
+        return _access_url(token)
+
+    async def negotiate_async(self, *, user_id: Optional[str] = None) -> str:
+        """`negotiate` for callers on an event loop (the ASGI app): awaits the token instead of blocking."""
+        async def fetch() -> Any:
+            svc = await self._client()
+            return await svc.get_client_access_token(user_id=user_id, roles=_CLIENT_ROLES)
+        return _access_url(await self._call(fetch))
 
     async def send_to_group(self, group: str, message: str, exclude_ids: Optional[List[str]] = None, from_user_id: Optional[str] = None) -> List[Any]:
         room_id = group
         group_name = as_room_group(room_id)
         payload = {"messageId": generate_id("m-"), "message": message, "from": from_user_id, "roomId": room_id}
         try:
-            self._svc.send_to_group(group_name, payload, content_type="application/json", excluded=exclude_ids)  # type: ignore[arg-type]
+            await self._send_to_group(group_name, payload, exclude_ids)
         except Exception:
             self.log.debug("Failed to send to group (service)")
         try:
-            await self.room_store.record_room_event(room_id, {
-                "type": "message",
-                "messageId": payload["messageId"],
-                "message": message,
-                "from": from_user_id,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            })
+            await self._record_message(room_id, EventRecord.now("message", payload["messageId"], from_user_id, message))
         except Exception:
             self.log.debug("Failed to record room event for room %r", room_id)
         return []
@@ -127,104 +240,146 @@ class WebPubSubChatService(ChatServiceBase):
         group_name = as_room_group(room_id)
         full_response = ""
         message_id = generate_id("m-")
-        async for chunk in chunks:
-            full_response += chunk
-            payload = {"messageId": message_id, "message": chunk, "from": from_user_id, "streaming": True, "roomId": room_id}
+
+        async def send_chunk(index: int, text: str) -> None:
+            payload = {"messageId": message_id, "message": text, "index": index, "from": from_user_id, "streaming": True, "roomId": room_id}
+            await self._send_to_group(group_name, payload, exclude_ids)
+
+        # Chunks are separate REST calls: keep several in flight and let
+        # clients reorder by `index`; the end marker carries the chunk count.
+        sender = PipelinedStreamSender(send_chunk, max_in_flight=self.stream_max_in_flight, logger=self.log)
+
+        async def send_eos(count: int) -> None:
+            eos = {"messageId": message_id, "streaming": True, "streamingEnd": True, "index": count, "from": from_user_id, "roomId": room_id}
             try:
-                self._svc.send_to_group(group_name, payload, content_type="application/json", excluded=exclude_ids)  # type: ignore[arg-type]
+                await self._send_to_group(group_name, eos, exclude_ids)
             except Exception:
-                self.log.debug("Failed to send streaming chunk (group=%s)", group_name)
-            await asyncio.sleep(0.05)
-        eos = {"messageId": message_id, "streaming": True, "streamingEnd": True, "from": from_user_id, "roomId": room_id}
+                self.log.debug("Failed to send streaming end (group=%s)", group_name)
+
         try:
-            self._svc.send_to_group(group_name, eos, content_type="application/json", excluded=exclude_ids)  # type: ignore[arg-type]
+            async for chunk in batch_chunks(chunks, self.stream_batch):
+                full_response += chunk
+                sender.push(chunk)
+            stats = await sender.close()
         except Exception:
-            self.log.debug("Failed to send streaming end (group=%s)", group_name)
+            # the answer failed midway: end what clients have shown, keep it out of history
+            if full_response:
+                await send_eos((await sender.close()).requests)
+            else:
+                sender.cancel()
+            raise
+        except BaseException:
+            sender.cancel()
+            raise
+        self._stream_stats.append({"messageId": message_id, "group": group_name, **stats.to_dict()})
+        self.log.info("Stream %s to %s sent: %s", message_id, group_name, stats.to_dict())
+        await send_eos(stats.requests)
         try:
-            await self.room_store.record_room_event(room_id, {
-                "type": "message",
-                "messageId": message_id,
-                "message": full_response,
-                "from": from_user_id,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-            })
+            await self._record_message(room_id, EventRecord.now("message", message_id, from_user_id, full_response))
         except Exception:
             self.log.debug("Failed to record stream end for room %r", room_id)
         return full_response
 
     async def add_to_group(self, connection_id: str, group: str) -> None:
+        async def add() -> None:
+            svc = await self._client()
+            await svc.add_connection_to_group(as_room_group(group), connection_id)
         try:
-            self._svc.add_connection_to_group(as_room_group(group), connection_id)
+            await self._call(add)
         except Exception:
             pass
 
     async def remove_from_group(self, connection_id: str, group: str) -> None:
+        async def remove() -> None:
+            svc = await self._client()
+            await svc.remove_connection_from_group(as_room_group(group), connection_id)
         try:
-            self._svc.remove_connection_from_group(as_room_group(group), connection_id)
+            await self._call(remove)
         except Exception:
             pass
 
+    async def send_room_notice(self, group: str, data: Dict[str, Any]) -> None:
+        """Send a transient system payload (not recorded) to everyone in the room."""
+        await self._send_to_group(as_room_group(group), {**data, "roomId": group})
+
     async def notify_rooms_changed(self) -> None:
         try:
             rooms = await self.room_store.list_rooms()
             payload = {"type": "rooms-changed", "rooms": rooms}
-            self._svc.send_to_group(SYS_ROOMS_GROUP, payload, content_type="application/json")  # type: ignore[arg-type]
+            await self._send_to_group(SYS_ROOMS_GROUP, payload)
         except Exception:
             self.log.debug("Failed to notify rooms-changed (service)")
 
     # ----------------- CloudEvents (single endpoint) -----------------
+    async def handle_cloudevent(self, method: str, headers: Mapping[str, str], body: bytes) -> Tuple[str, int, Dict[str, str]]:
+        """Answer one CloudEvents request: ``(body, status, headers)``.
+
+        *headers* must have lower-case names. Shared by the Flask route and
+        the ASGI app, which awaits it on the chat loop itself.
+        """
+        try:
+            if method == 'OPTIONS':
+                if headers.get('webhook-request-origin'):
+                    return ('', 200, {'WebHook-Allowed-Origin': '*'})
+                return ('', 400, {})
+            ce_type = headers.get('ce-type', '')
+            user_id = headers.get('ce-userid')
+            connection_id = headers.get('ce-connectionid')
+            if not connection_id or not ce_type:
+                return ('Bad Request', 400, {})
+            self.log.debug("CloudEvent received: type=%s userId=%s connectionId=%s", ce_type, user_id, connection_id)
+            if ce_type == 'azure.webpubsub.sys.connect':
+                query = json_body(headers.get('content-type'), body)
+                qs = query.get('query', {}) if isinstance(query, dict) else {}
+                client = ClientConnectionContext(qs, connection_id)
+                await self._emit(self._on_connecting, client)
+                await self.client_manager.add_client(connection_id, client, None)
+                if user_id == client.user_id:
+                    return ('', 204, {})
+                else:
+                    return (json.dumps({"userId": client.user_id}), 200, {'Content-Type': 'application/json'})
+            if ce_type == 'azure.webpubsub.sys.connected':
+                client_opt = await self.client_manager.get_client(connection_id)
+                if client_opt is None:
+                    return ('Connection not found', 404, {})
+                await self._emit(self._on_connected, client_opt)
+                return ('', 204, {})
+            if ce_type == 'azure.webpubsub.sys.disconnected':
+                client_opt = await self.client_manager.get_client(connection_id)
+                if client_opt is None:
+                    return ('Connection not found', 404, {})
+                await self._emit(self._on_disconnected, client_opt)
+                return ('', 204, {})
+            if ce_type.startswith('azure.webpubsub.user.'):
+                client_opt = await self.client_manager.get_client(connection_id)
+                if client_opt is None:
+                    return ('Connection not found', 404, {})
+                payload = json_body(headers.get('content-type'), body) or {}
+                derived_event = ce_type[len('azure.webpubsub.user.'):]
+                header_event = headers.get('ce-eventname')
+                event_name = header_event or derived_event
+                self.log.debug("User event received: event=%s connectionId=%s payload=%s", event_name, connection_id, payload)
+                await self._emit(self._on_event_message, client_opt, event_name, payload)
+                return ('', 204, {'Content-Type': 'application/json'})
+            return ('', 204, {})
+        except Exception as e:  # noqa: BLE001
+            self.log.warning('CloudEvents handler error: %s', e)
+            return ('', 500, {})
+
     def attach_flask_cloudevents(self, flask_app: Any, loop: asyncio.AbstractEventLoop, path: str = '/eventhandler') -> None:
-        from flask import request, Response
+        from flask import request
 
         @flask_app.route(path, methods=['POST', 'OPTIONS'])
-        async def _wps_cloudevents() -> Union[Tuple[str, int], Tuple[str, int, Dict[str, str]]]:
-            try:
-                if request.method == 'OPTIONS':
-                    if request.headers.get('WebHook-Request-Origin'):
-                        return ('', 200, {'WebHook-Allowed-Origin': '*'})
-                    return ('', 400)
-                ce_type = request.headers.get('ce-type', '')
-                user_id = request.headers.get('ce-userid')
-                connection_id = request.headers.get('ce-connectionid')
-                if not connection_id or not ce_type:
-                    return ('Bad Request', 400)
-                self.log.debug("CloudEvent received: type=%s userId=%s connectionId=%s", ce_type, user_id, connection_id)
-                if ce_type == 'azure.webpubsub.sys.connect':
-                    query = request.get_json(silent=True) or {}
-                    qs = query.get('query', {}) if isinstance(query, dict) else {}
-                    client = ClientConnectionContext(qs, connection_id)
-                    await self._emit(self._on_connecting, client)
-                    await self.client_manager.add_client(connection_id, client, None)
-                    if user_id == client.user_id:
-                        return ('', 204)
-                    else:
-                        return (json.dumps({"userId": client.user_id}), 200, {'Content-Type': 'application/json'})
-                if ce_type == 'azure.webpubsub.sys.connected':
-                    client_opt = await self.client_manager.get_client(connection_id)
-                    if client_opt is None:
-                        return ('Connection not found', 404)
-                    await self._emit(self._on_connected, client_opt)
-                    return ('', 204)
-                if ce_type == 'azure.webpubsub.sys.disconnected':
-                    client_opt = await self.client_manager.get_client(connection_id)
-                    if client_opt is None:
-                        return ('Connection not found', 404)
-                    await self._emit(self._on_disconnected, client_opt)
-                    return ('', 204)
-                if ce_type.startswith('azure.webpubsub.user.'):
-                    client_opt = await self.client_manager.get_client(connection_id)
-                    if client_opt is None:
-                        return ('Connection not found', 404)
-                    payload = request.get_json(silent=True) or {}
-                    derived_event = ce_type[len('azure.webpubsub.user.'):]
-                    header_event = request.headers.get('ce-eventName')
-                    event_name = header_event or derived_event
-                    self.log.debug("User event received: event=%s connectionId=%s payload=%s", event_name, connection_id, payload)
-                    await self._emit(self._on_event_message, client_opt, event_name, payload)
-                    return ('', 204, {'Content-Type': 'application/json'})
-                return ('', 204)
-            except Exception as e:  # noqa: BLE001
-                self.log.warning('CloudEvents handler error: %s', e)
-                return ('', 500)
+        async def _wps_cloudevents() -> Tuple[str, int, Dict[str, str]]:
+            headers = {k.lower(): v for k, v in request.headers.items()}
+            return await self.handle_cloudevent(request.method, headers, request.get_data())
+
+
+def _access_url(token: Any) -> str:
+    url_val: Any = token.get('url') if isinstance(token, dict) else getattr(token, 'url', None)
+    if not isinstance(url_val, str):
+        raise RuntimeError("Failed to obtain client access URL from Web PubSub service client")
+    return url_val
+
 
 __all__ = ["WebPubSubChatService"]
@@ -7,7 +7,7 @@ from .room_store import (
     build_room_store,
 )
 from .utils import generate_id, to_async_iterator, get_room_id
-from .chat_model_client import chat_stream
+from .chat_model_client import chat_stream, chat_stream_async
 
 __all__ = [
     "RoomStore",
@@ -18,4 +18,5 @@ __all__ = [
     "to_async_iterator",
     "get_room_id",
     "chat_stream",
+    "chat_stream_async",
 ]
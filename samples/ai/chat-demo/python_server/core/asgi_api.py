@@ -0,0 +1,292 @@
+"""Chat API as a native ASGI application.
+
+Same routes and responses as the Flask blueprint in `chat_api` (room CRUD,
+the indexed listings, message history, negotiate) plus the Web PubSub
+CloudEvents endpoint; both are thin adapters over the shared handlers there. The blueprint parks a WSGI worker thread in
+``run_async`` for every store call while the chat loop does the work, so
+throughput is capped by the thread count and each call costs two thread
+hops. Here the ASGI server's loop *is* the chat loop (the chat service is
+started from the lifespan hook), and handlers simply await the store.
+
+No web framework is involved: `ChatAsgiApp` is a small router over the raw
+ASGI protocol (``http`` and ``lifespan`` scopes), so any ASGI server can
+host it, e.g. ``uvicorn python_server.asgi:app``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import mimetypes
+import re
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple, Union
+from urllib.parse import parse_qs
+
+from . import chat_api
+from .chat_api import ApiResult
+from .utils import json_body
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES: int = 1 << 20
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class Request:
+    """One HTTP request with its body already read."""
+
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, path: str, query: Dict[str, List[str]], headers: Dict[str, str], body: bytes) -> None:
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers  # lower-case names
+        self.body = body
+
+    @classmethod
+    def from_scope(cls, scope: Scope, body: bytes) -> "Request":
+        headers: Dict[str, str] = {}
+        for name, value in scope.get("headers") or ():
+            headers[name.decode("latin-1").lower()] = value.decode("latin-1")
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        return cls(scope["method"], scope["path"], query, headers, body)
+
+    def arg(self, name: str) -> Optional[str]:
+        values = self.query.get(name)
+        return values[0] if values else None
+
+    def json(self) -> Any:
+        return json_body(self.headers.get("content-type"), self.body)
+
+
+class Response:
+    __slots__ = ("status", "body", "headers")
+
+    def __init__(self, body: Union[bytes, str] = b"", status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        self.status = status
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.headers = headers or {}
+
+
+def json_ok(payload: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(json.dumps(payload), status, {"Content-Type": "application/json", **(headers or {})})
+
+
+def json_error(message: str, status: int) -> Response:
+    return json_ok({"error": message}, status)
+
+
+Handler = Callable[..., Awaitable[Response]]
+
+
+class ChatAsgiApp:
+    """ASGI callable: routes registered with `route`, optional static files, lifespan hooks."""
+
+    def __init__(
+        self,
+        *,
+        static_dir: Optional[Union[str, Path]] = None,
+        on_startup: Sequence[Callable[[], Awaitable[None]]] = (),
+        on_shutdown: Sequence[Callable[[], Awaitable[None]]] = (),
+    ) -> None:
+        self.static_dir = Path(static_dir).resolve() if static_dir is not None else None
+        self.on_startup = list(on_startup)
+        self.on_shutdown = list(on_shutdown)
+        self._routes: List[Tuple[Pattern[str], Dict[str, Handler]]] = []
+        self._by_pattern: Dict[str, Dict[str, Handler]] = {}
+
+    def route(self, path: str, methods: Iterable[str] = ("GET",)) -> Callable[[Handler], Handler]:
+        """Register ``handler(request, **params)``; ``<name>`` in *path* matches one path segment."""
+        def decorator(handler: Handler) -> Handler:
+            handlers = self._by_pattern.get(path)
+            if handlers is None:
+                regex = re.compile("^" + re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", path) + "$")
+                handlers = self._by_pattern[path] = {}
+                self._routes.append((regex, handlers))
+            for method in methods:
+                handlers[method.upper()] = handler
+            return handler
+        return decorator
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    for hook in self.on_startup:
+                        await hook()
+                except Exception as e:  # noqa: BLE001
+                    logger.exception("ASGI startup failed: %s", e)
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for hook in self.on_shutdown:
+                    try:
+                        await hook()
+                    except Exception as e:  # noqa: BLE001
+                        logger.warning("ASGI shutdown hook failed: %s", e)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        chunks: List[bytes] = []
+        size = 0
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                await _send(send, json_error("Request body too large", 413))
+                return
+            chunks.append(chunk)
+            more = message.get("more_body", False)
+        request = Request.from_scope(scope, b"".join(chunks))
+        try:
+            response = await self.dispatch(request)
+        except Exception as e:  # noqa: BLE001
+            logger.exception("Unhandled error for %s %s: %s", request.method, request.path, e)
+            response = json_error("Internal server error", 500)
+        if request.method == "HEAD":
+            response.body = b""
+        await _send(send, response)
+
+    async def dispatch(self, request: Request) -> Response:
+        method = "GET" if request.method == "HEAD" else request.method
+        allowed = False
+        for regex, handlers in self._routes:
+            match = regex.match(request.path)
+            if match is None:
+                continue
+            handler = handlers.get(method)
+            if handler is not None:
+                return await handler(request, **match.groupdict())
+            allowed = True
+        if allowed:
+            return json_error("Method not allowed", 405)
+        if method == "GET" and self.static_dir is not None:
+            return await self._static(request.path)
+        return json_error("Not found", 404)
+
+    async def _static(self, path: str) -> Response:
+        assert self.static_dir is not None
+        relative = path.lstrip("/") or "index.html"
+        target = (self.static_dir / relative).resolve()
+        if not target.is_relative_to(self.static_dir) or not target.is_file():
+            return Response("Not Found", 404, {"Content-Type": "text/plain"})
+        body = await asyncio.to_thread(target.read_bytes)
+        content_type = mimetypes.guess_type(target.name)[0] or "application/octet-stream"
+        return Response(body, 200, {"Content-Type": content_type})
+
+
+async def _send(send: Send, response: Response) -> None:
+    headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()]
+    headers.append((b"content-length", str(len(response.body)).encode()))
+    await send({"type": "http.response.start", "status": response.status, "headers": headers})
+    await send({"type": "http.response.body", "body": response.body})
+
+
+def create_chat_asgi_app(
+    room_store_ref: Optional[Callable[[], Any]] | Any = None,
+    *,
+    chat_service_ref: Optional[Callable[[], Any]] | Any = None,
+    static_dir: Optional[Union[str, Path]] = None,
+    on_startup: Sequence[Callable[[], Awaitable[None]]] = (),
+    on_shutdown: Sequence[Callable[[], Awaitable[None]]] = (),
+    cloudevents_path: str = '/eventhandler',
+) -> ChatAsgiApp:
+    """Factory for the chat API ASGI app (counterpart of `create_chat_api_blueprint`).
+
+    room_store_ref / chat_service_ref: callable returning the object or the object itself
+    static_dir: directory served for unmatched GETs (the built client), optional
+    on_startup / on_shutdown: lifespan hooks, run on the server loop (start / stop the chat service there)
+    """
+    app = ChatAsgiApp(static_dir=static_dir, on_startup=on_startup, on_shutdown=on_shutdown)
+
+    def _get_user_id(request: Request) -> str:
+        return request.headers.get('x-user-id', '').strip() or 'anonymous'
+
+    def _get_chat_service() -> Any:
+        return chat_service_ref() if callable(chat_service_ref) else chat_service_ref
+
+    def _get_room_store() -> Any:
+        return room_store_ref() if callable(room_store_ref) else room_store_ref
+
+    def _respond(result: ApiResult) -> Response:
+        return json_ok(result.body, result.status, dict(result.headers))
+
+    # -------- Room metadata endpoints --------
+    @app.route('/api/rooms', methods=['GET'])
+    async def list_rooms(request: Request) -> Response:
+        return _respond(await chat_api.list_rooms(_get_room_store(), _get_user_id(request)))
+
+    @app.route('/api/rooms/recent', methods=['GET'])
+    async def list_recent_rooms(request: Request) -> Response:
+        return _respond(await chat_api.list_recent_rooms(_get_room_store(), request.arg('limit'), request.arg('cursor')))
+
+    @app.route('/api/rooms/search', methods=['GET'])
+    async def search_rooms(request: Request) -> Response:
+        return _respond(await chat_api.search_rooms(_get_room_store(), request.arg('prefix'), request.arg('limit'), request.arg('cursor')))
+
+    @app.route('/api/rooms', methods=['POST'])
+    async def create_room(request: Request) -> Response:
+        return _respond(await chat_api.create_room(_get_room_store(), _get_user_id(request), request.json()))
+
+    @app.route('/api/rooms/<room_id>', methods=['GET'])
+    async def get_room(request: Request, room_id: str) -> Response:
+        return _respond(await chat_api.get_room(_get_room_store(), _get_user_id(request), room_id))
+
+    @app.route('/api/rooms/<room_id>', methods=['PUT'])
+    async def update_room(request: Request, room_id: str) -> Response:
+        return _respond(await chat_api.update_room(_get_room_store(), _get_user_id(request), room_id, request.json()))
+
+    @app.route('/api/rooms/<room_id>', methods=['DELETE'])
+    async def delete_room(request: Request, room_id: str) -> Response:
+        return _respond(await chat_api.delete_room(_get_room_store(), _get_user_id(request), room_id))
+
+    # -------- Conversation / messages endpoint --------
+    @app.route('/api/rooms/<room_id>/messages', methods=['GET'])
+    async def get_room_messages(request: Request, room_id: str) -> Response:
+        return _respond(await chat_api.get_room_messages(_get_chat_service(), room_id, request.arg('limit'), request.arg('before')))
+
+    # -------- Negotiate endpoint --------
+    @app.route('/api/negotiate', methods=['GET'])
+    async def negotiate(request: Request) -> Response:
+        return _respond(await chat_api.negotiate(_get_chat_service()))
+
+    # -------- Web PubSub CloudEvents --------
+    @app.route(cloudevents_path, methods=['POST', 'OPTIONS'])
+    async def cloudevents(request: Request) -> Response:
+        svc = _get_chat_service()
+        handle = getattr(svc, 'handle_cloudevent', None)
+        if handle is None:  # self-hosted transport (or not started yet)
+            return json_error('Not found', 404)
+        body, status, headers = await handle(request.method, request.headers, request.body)
+        return Response(body, status, headers)
+
+    return app
+
+
+__all__ = [
+    "ChatAsgiApp",
+    "Request",
+    "Response",
+    "create_chat_asgi_app",
+    "json_ok",
+    "json_error",
+    "MAX_BODY_BYTES",
+]
@@ -1,22 +1,255 @@
 """Unified chat API blueprint: room metadata CRUD + message history.
 
-This consolidates previous room_api + server inline message routes.
+This consolidates previous room_api + server inline message routes. The
+route logic is kept in transport-neutral coroutines (`list_rooms`,
+`create_room`, `get_room_messages`, ...) shared with the ASGI app in
+`asgi_api`; the blueprint only marshals them onto the chat loop.
 """
 from __future__ import annotations
 
 from flask import Blueprint, request, jsonify, url_for
-from typing import Optional, Any, Callable, Awaitable, TypeVar, Coroutine
+from typing import Optional, Any, Callable, Coroutine, Dict, Mapping, NamedTuple, TypeVar
+from urllib.parse import quote
 import asyncio
 import logging
 
+from .room_store.models import render_events
+
 logger = logging.getLogger(__name__)
 
 # Reasonable defaults for async marshalling and paging
 DEFAULT_TIMEOUT_SEC: float = 5.0
 MAX_MESSAGES_LIMIT: int = 500
+MAX_ROOMS_LIMIT: int = 100
 
 T = TypeVar("T")
 
+# Field normalization extracted so routes stay lean (shared with the ASGI app).
+def normalize_room_name(raw: Any) -> Optional[str]:
+    if raw is None:
+        return None
+    s = str(raw).strip()
+    return s or None
+
+def normalize_description(payload: dict[str, Any]) -> Optional[str]:
+    if 'description' not in payload:
+        return None  # no change
+    raw = payload.get('description')
+    if raw == '':
+        return ''  # explicit clear
+    if raw is None:
+        return None
+    s = str(raw).strip()
+    return s or None  # whitespace-only -> no change
+
+def parse_int(value: Optional[str], default: int) -> int:
+    try:
+        return int(value) if value is not None else default
+    except Exception:
+        return default
+
+
+# ---------------- Transport-neutral handlers ----------------
+# Each route's logic (validation, limit clamping, store calls, error mapping)
+# lives here once; the Flask blueprint and the ASGI app only read the request
+# and turn the returned `ApiResult` into their own response type.
+
+class ApiResult(NamedTuple):
+    body: Dict[str, Any]
+    status: int = 200
+    headers: Mapping[str, str] = {}
+
+
+def api_error(message: str, status: int) -> ApiResult:
+    return ApiResult({'error': message}, status)
+
+
+STORE_UNAVAILABLE = api_error('Store unavailable', 503)
+SERVICE_UNAVAILABLE = api_error('Service unavailable', 503)
+
+
+async def bounded(coro: Coroutine[Any, Any, T], timeout: Optional[float] = DEFAULT_TIMEOUT_SEC) -> T:
+    """Await *coro* for at most *timeout* seconds; the call itself keeps running past the timeout."""
+    if not timeout:
+        return await coro
+    return await asyncio.wait_for(asyncio.shield(coro), timeout)
+
+
+async def list_rooms(store: Any, user_id: str) -> ApiResult:
+    if store is None:
+        return STORE_UNAVAILABLE
+    try:
+        rooms = await bounded(store.list_user_rooms(user_id))
+        return ApiResult({'rooms': [r.to_dict() for r in rooms], 'user_id': user_id})
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error getting rooms: %s", e)
+        return api_error('Failed to get rooms', 500)
+
+
+async def _room_page(fetch: Callable[[int, Optional[str]], Coroutine[Any, Any, Any]], limit: Optional[str], cursor: Optional[str]) -> ApiResult:
+    """Shared paging for the indexed room listings: ``?limit=&cursor=``."""
+    size = parse_int(limit, 20)
+    if size <= 0:
+        size = 20
+    size = min(size, MAX_ROOMS_LIMIT)
+    try:
+        rooms, next_cursor = await bounded(fetch(size, cursor or None), timeout=2)
+    except ValueError:
+        return api_error('Invalid cursor', 400)
+    except NotImplementedError:
+        return api_error('Not supported by this room store', 501)
+    return ApiResult({'rooms': [r.to_dict() for r in rooms], 'nextCursor': next_cursor})
+
+
+async def list_recent_rooms(store: Any, limit: Optional[str] = None, cursor: Optional[str] = None) -> ApiResult:
+    """Rooms of all users, most recently updated first (paged via ``nextCursor``)."""
+    if store is None:
+        return STORE_UNAVAILABLE
+    try:
+        return await _room_page(store.list_recent_rooms, limit, cursor)
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error listing recent rooms: %s", e)
+        return api_error('Failed to list rooms', 500)
+
+
+async def search_rooms(store: Any, prefix: Optional[str], limit: Optional[str] = None, cursor: Optional[str] = None) -> ApiResult:
+    """Rooms of all users whose name starts with *prefix* (case-insensitive), by name."""
+    prefix = (prefix or '').strip()
+    if not prefix:
+        return api_error('prefix is required', 400)
+    if store is None:
+        return STORE_UNAVAILABLE
+    try:
+        return await _room_page(lambda size, after: store.search_rooms(prefix, size, after), limit, cursor)
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error searching rooms: %s", e)
+        return api_error('Failed to search rooms', 500)
+
+
+async def create_room(store: Any, user_id: str, data: Any) -> ApiResult:
+    """Create a room from a ``{"roomName", "description"?}`` body; 201 with a Location header."""
+    if not data or not isinstance(data, dict):
+        return api_error('Request body required', 400)
+    room_name = (data.get('roomName') or '').strip()
+    if not room_name:
+        return api_error('roomName is required', 400)
+    # Explicit roomId creation is no longer allowed; always auto-generate
+    if data.get('roomId'):
+        return api_error('Explicit roomId not allowed; omit roomId to create', 400)
+    description = (data.get('description') or '').strip() or None
+    if store is None:
+        return STORE_UNAVAILABLE
+    try:
+        room = await bounded(store.create_room_metadata(user_id, room_name, room_id=None, description=description))
+    except ValueError as e:  # fallback validation
+        logger.warning("Invalid room creation request: %s", e)
+        return api_error('Invalid room parameters', 400)
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error creating room: %s", e)
+        return api_error('Failed to create room', 500)
+    return ApiResult(room.to_dict(), 201, {'Location': f"/api/rooms/{quote(room.room_id, safe='')}"})
+
+
+async def get_room(store: Any, user_id: str, room_id: str) -> ApiResult:
+    if store is None:
+        return STORE_UNAVAILABLE
+    try:
+        room = await bounded(store.get_room_metadata(user_id, room_id))
+        if room is None:
+            return api_error('Room not found', 404)
+        return ApiResult(room.to_dict())
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error getting room %s: %s", room_id, e)
+        return api_error('Failed to get room', 500)
+
+
+async def update_room(store: Any, user_id: str, room_id: str, data: Any) -> ApiResult:
+    """Rename / re-describe a room; see `normalize_room_name` and `normalize_description`."""
+    if store is None:
+        return STORE_UNAVAILABLE
+    try:
+        existing = await bounded(store.get_room_metadata(user_id, room_id))
+        if existing is None:
+            return api_error('Room not found', 404)
+        if room_id == 'public':
+            return api_error('Cannot update system room', 403)
+        if not data or not isinstance(data, dict):
+            return api_error('Request body required', 400)
+        updated = await bounded(store.update_room_metadata(
+            user_id,
+            room_id,
+            room_name=normalize_room_name(data.get('roomName')),
+            description=normalize_description(data),
+        ))
+        return ApiResult(updated.to_dict())
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error updating room %s: %s", room_id, e)
+        return api_error('Failed to update room', 500)
+
+
+async def delete_room(store: Any, user_id: str, room_id: str) -> ApiResult:
+    if room_id == 'public':
+        return api_error('Cannot delete system room', 403)
+    if store is None:
+        return STORE_UNAVAILABLE
+    try:
+        # Idempotent delete: attempt removal; success response even if not present
+        await bounded(store.delete_room_metadata(user_id, room_id))
+        return ApiResult({'message': 'Room deleted (idempotent)'})
+    except Exception as e:  # noqa: BLE001
+        logger.error("Error deleting room %s: %s", room_id, e)
+        return api_error('Failed to delete room', 500)
+
+
+async def get_room_messages(svc: Any, room_id: str, limit: Optional[str] = None, before: Optional[str] = None) -> ApiResult:
+    """Recent messages of a room (via the chat service's room store).
+
+    ``before`` pages back through history; the result carries ``nextCursor``
+    (null once the oldest message was returned).
+    """
+    if svc is None:
+        return SERVICE_UNAVAILABLE
+    size = parse_int(limit, 200)
+    # Clamp to a safe maximum to avoid excessive loads; an empty page would
+    # hand back the same cursor and clients paging with it would never stop
+    if size <= 0:
+        size = 200
+    size = min(size, MAX_MESSAGES_LIMIT)
+    try:
+        store = svc.room_store
+        if hasattr(store, 'get_room_messages_page'):
+            messages, next_cursor = await bounded(store.get_room_messages_page(room_id, size, before or None), timeout=2)
+        else:  # duck-typed stores without cursor support
+            messages, next_cursor = await bounded(store.get_room_messages(room_id, size), timeout=2), None
+        return ApiResult({'messages': render_events(messages), 'nextCursor': next_cursor})
+    except ValueError:
+        return api_error('Invalid cursor', 400)
+    except asyncio.TimeoutError:
+        logger.warning("Timeout retrieving messages for room %s", room_id)
+        return api_error('Message retrieval timed out', 504)
+    except Exception as e:  # noqa: BLE001
+        logger.exception("Error retrieving messages for room %s: %s", room_id, e)
+        return api_error('Failed to retrieve messages', 500)
+
+
+async def negotiate(svc: Any) -> ApiResult:
+    """Client connection URL as ``{"url": string}``.
+
+    Self-host mode: ws://.../ws
+    Web PubSub mode: signed client access URL
+    """
+    if svc is None:
+        return SERVICE_UNAVAILABLE
+    try:
+        # Web PubSub fetches a token over the network: await it rather than block the loop
+        negotiate_async = getattr(svc, 'negotiate_async', None)
+        url = await negotiate_async() if negotiate_async is not None else svc.negotiate()
+        return ApiResult({"url": url})
+    except Exception as e:  # noqa: BLE001
+        logger.exception('Negotiation failed: %s', e)
+        return api_error('Negotiation failed', 500)
+
+
 def create_chat_api_blueprint(
     room_store_ref: Optional[Callable[[], Any]] | Any = None,
     *,
@@ -70,187 +303,83 @@ def create_chat_api_blueprint(
             logger.warning("run_async error (timeout=%s): %s", timeout, e)
             raise
 
-    # Field normalization extracted so routes stay lean.
-    def normalize_room_name(raw: Any) -> Optional[str]:
-        if raw is None:
-            return None
-        s = str(raw).strip()
-        return s or None
-
-    def normalize_description(payload: dict[str, Any]) -> Optional[str]:
-        if 'description' not in payload:
-            return None  # no change
-        raw = payload.get('description')
-        if raw == '':
-            return ''  # explicit clear
-        if raw is None:
-            return None
-        s = str(raw).strip()
-        return s or None  # whitespace-only -> no change
-
-    def parse_int(value: Optional[str], default: int) -> int:
+    def call(handler: Coroutine[Any, Any, ApiResult]) -> ApiResult:
+        """Run a shared handler on the chat loop."""
         try:
-            return int(value) if value is not None else default
-        except Exception:
-            return default
-
-    # Response helpers for consistency
-    def json_ok(payload: dict[str, Any], status: int = 200) -> Any:
-        return jsonify(payload), status
+            # Each store call inside the handler is bounded already; allow a few of them.
+            return run_async(handler, timeout=DEFAULT_TIMEOUT_SEC * 2)
+        except Exception as e:  # noqa: BLE001
+            logger.error("Error handling %s %s: %s", request.method, request.path, e)
+            return api_error('Internal server error', 500)
 
-    def json_error(message: str, status: int) -> Any:
-        return jsonify({'error': message}), status
+    def respond(handler: Coroutine[Any, Any, ApiResult]) -> Any:
+        result = call(handler)
+        return jsonify(result.body), result.status, dict(result.headers)
 
     # -------- Room metadata endpoints (async via unified store) --------
     @bp.route('/api/rooms', methods=['GET'])
-    def list_rooms() -> Any:
-        try:
-            user_id = _get_user_id()
-            store = _get_room_store()
-            if store is None:
-                return json_error('Store unavailable', 503)
-            rooms = run_async(store.list_user_rooms(user_id))
-            return json_ok({'rooms': [r.to_dict() for r in rooms], 'user_id': user_id})
-        except Exception as e:  # noqa: BLE001
-            logger.error("Error getting rooms: %s", e)
-            return json_error('Failed to get rooms', 500)
+    def list_rooms_route() -> Any:
+        return respond(list_rooms(_get_room_store(), _get_user_id()))
+
+    @bp.route('/api/rooms/recent', methods=['GET'])
+    def list_recent_rooms_route() -> Any:
+        return respond(list_recent_rooms(_get_room_store(), request.args.get('limit'), request.args.get('cursor')))
+
+    @bp.route('/api/rooms/search', methods=['GET'])
+    def search_rooms_route() -> Any:
+        return respond(search_rooms(_get_room_store(), request.args.get('prefix'), request.args.get('limit'), request.args.get('cursor')))
 
     @bp.route('/api/rooms', methods=['POST'])
-    def create_room() -> Any:
-        try:
-            user_id = _get_user_id()
-            data = request.get_json(silent=True)
-            if not data:
-                return json_error('Request body required', 400)
-            room_name = (data.get('roomName') or '').strip()
-            if not room_name:
-                return json_error('roomName is required', 400)
-            # Explicit roomId creation is no longer allowed; always auto-generate
-            if 'roomId' in data and data.get('roomId'):
-                return json_error('Explicit roomId not allowed; omit roomId to create', 400)
-            room_id = None
-            description = (data.get('description') or '').strip() or None
-            store = _get_room_store()
-            if store is None:
-                return json_error('Store unavailable', 503)
-            room = run_async(store.create_room_metadata(user_id, room_name, room_id=room_id, description=description))
-            body = room.to_dict()
-            try:
-                location = url_for('chat_api.get_room', room_id=room.room_id, _external=False)
-                return jsonify(body), 201, {"Location": location}
-            except Exception:
-                return jsonify(body), 201
-        except ValueError as e:  # fallback validation
-            logger.warning("Invalid room creation request: %s", e)
-            return json_error('Invalid room parameters', 400)
-        except Exception as e:  # noqa: BLE001
-            logger.error("Error creating room: %s", e)
-            return json_error('Failed to create room', 500)
+    def create_room_route() -> Any:
+        result = call(create_room(_get_room_store(), _get_user_id(), request.get_json(silent=True)))
+        headers = dict(result.headers)
+        if result.status == 201:
+            # url_for honours the mount point (SCRIPT_NAME), which the shared handler cannot see
+            headers['Location'] = url_for('chat_api.get_room_route', room_id=result.body['roomId'], _external=False)
+        return jsonify(result.body), result.status, headers
 
     @bp.route('/api/rooms/<room_id>', methods=['GET'])
-    def get_room(room_id: str) -> Any:
-        try:
-            user_id = _get_user_id()
-            store = _get_room_store()
-            if store is None:
-                return json_error('Store unavailable', 503)
-            room = run_async(store.get_room_metadata(user_id, room_id))
-            if room is None:
-                return json_error('Room not found', 404)
-            return json_ok(room.to_dict())
-        except Exception as e:  # noqa: BLE001
-            logger.error("Error getting room %s: %s", room_id, e)
-            return json_error('Failed to get room', 500)
+    def get_room_route(room_id: str) -> Any:
+        return respond(get_room(_get_room_store(), _get_user_id(), room_id))
 
     @bp.route('/api/rooms/<room_id>', methods=['PUT'])
-    def update_room(room_id: str) -> Any:
-        try:
-            user_id = _get_user_id()
-            store = _get_room_store()
-            if store is None:
-                return json_error('Store unavailable', 503)
-            existing = run_async(store.get_room_metadata(user_id, room_id))
-            if existing is None:
-                return json_error('Room not found', 404)
-            if room_id == 'public':
-                return json_error('Cannot update system room', 403)
-            data = request.get_json(silent=True)
-            if not data:
-                return json_error('Request body required', 400)
-            room_name = normalize_room_name(data.get('roomName'))
-            description = normalize_description(data)
-            updated = run_async(store.update_room_metadata(
-                user_id,
-                room_id,
-                room_name=room_name,
-                description=description,
-            ))
-            return json_ok(updated.to_dict())
-        except Exception as e:  # noqa: BLE001
-            logger.error("Error updating room %s: %s", room_id, e)
-            return json_error('Failed to update room', 500)
+    def update_room_route(room_id: str) -> Any:
+        return respond(update_room(_get_room_store(), _get_user_id(), room_id, request.get_json(silent=True)))
 
     @bp.route('/api/rooms/<room_id>', methods=['DELETE'])
-    def delete_room(room_id: str) -> Any:
-        try:
-            user_id = _get_user_id()
-            if room_id == 'public':
-                return jsonify({'error': 'Cannot delete system room'}), 403
-            store = _get_room_store()
-            if store is None:
-                return json_error('Store unavailable', 503)
-            # Idempotent delete: attempt removal; success response even if not present
-            run_async(store.delete_room_metadata(user_id, room_id))
-            return json_ok({'message': 'Room deleted (idempotent)'})
-        except Exception as e:  # noqa: BLE001
-            logger.error("Error deleting room %s: %s", room_id, e)
-            return json_error('Failed to delete room', 500)
+    def delete_room_route(room_id: str) -> Any:
+        return respond(delete_room(_get_room_store(), _get_user_id(), room_id))
 
     # -------- Conversation / messages endpoint --------
     @bp.route('/api/rooms/<room_id>/messages', methods=['GET'])
-    def get_room_messages(room_id: str) -> Any:
-        """Return recent messages for a room (uses async room_store via chat_service)."""
-        svc = _get_chat_service()
-        if svc is None:
-            return json_error('Service unavailable', 503)
-        try:
-            limit = parse_int(request.args.get('limit'), 200)
-            # Clamp to a safe maximum to avoid excessive loads
-            if limit is None or limit < 0:
-                limit = 200
-            limit = min(limit, MAX_MESSAGES_LIMIT)
-            from concurrent.futures import TimeoutError as FuturesTimeoutError
-            try:
-                messages = run_async(svc.room_store.get_room_messages(room_id, limit), timeout=2)
-                return json_ok({'messages': messages})
-            except FuturesTimeoutError:
-                logger.warning("Timeout retrieving messages for room %s", room_id)
-                return json_error('Message retrieval timed out', 504)
-            except Exception as e:  # noqa: BLE001
-                logger.exception("Error retrieving messages for room %s: %s", room_id, e)
-                return json_error('Failed to retrieve messages', 500)
-        except Exception as e:  # noqa: BLE001
-            logger.exception("Unexpected error fetching messages for %s: %s", room_id, e)
-            return json_error('Failed to retrieve messages', 500)
+    def get_room_messages_route(room_id: str) -> Any:
+        """Recent messages for a room; ``?before=<cursor>`` pages back (see `get_room_messages`)."""
+        return respond(get_room_messages(_get_chat_service(), room_id, request.args.get('limit'), request.args.get('before')))
 
     # -------- Negotiate endpoint --------
     @bp.route('/api/negotiate', methods=['GET'])
-    def negotiate() -> Any:
-        """Return a client connection URL as JSON: {"url": string}.
-
-        Self-host mode: ws://.../ws
-        Web PubSub mode: signed client access URL
-        """
-        svc = _get_chat_service()
-        if svc is None:
-            return json_error('Service unavailable', 503)
-        try:
-            url = svc.negotiate()
-            return jsonify({"url": url})
-        except Exception as e:  # noqa: BLE001
-            logger.exception('Negotiation failed: %s', e)
-            return json_error('Negotiation failed', 500)
+    def negotiate_route() -> Any:
+        return respond(negotiate(_get_chat_service()))
 
     return bp
 
-__all__ = ["create_chat_api_blueprint"]
+__all__ = [
+    "ApiResult",
+    "api_error",
+    "bounded",
+    "create_chat_api_blueprint",
+    "create_room",
+    "delete_room",
+    "get_room",
+    "get_room_messages",
+    "list_recent_rooms",
+    "list_rooms",
+    "negotiate",
+    "search_rooms",
+    "update_room",
+    "normalize_room_name",
+    "normalize_description",
+    "parse_int",
+    "MAX_MESSAGES_LIMIT",
+    "MAX_ROOMS_LIMIT",
+]
@@ -1,17 +1,46 @@
 from __future__ import annotations
 
 """OpenAI chat model client abstraction.
+
+`chat_stream_async` is what the chat loop consumes: it streams through
+`AsyncOpenAI` over one pooled HTTP client, so an AI response costs no thread
+and each token is handed over by a plain ``await``. Where the SDK has no
+async client, the blocking stream is bridged through `to_async_iterator`
+(one executor thread per response) as a fallback.
+
+Failures differ by entry point: `chat_stream_async` raises them (a failed
+request, a connection lost mid-stream, or an answer cut off before its
+``finish_reason``), so the chat loop can tell a partial answer from a
+finished one. The blocking `chat_stream` / `chat` helpers keep their
+original contract: the failure is logged and the stream just ends.
 """
+import asyncio
+import concurrent.futures
 import logging
-from typing import Iterator, Optional, List, Dict, Any, Tuple
+from typing import AsyncIterator, Iterator, Optional, List, Dict, Any, Tuple
 import os
 import inspect
+import json
 from openai import OpenAI
 from .model_config import resolve_model_config
+from .utils import to_async_iterator
+
+AsyncOpenAI: Any = None  # sentinel if the installed SDK has no async client
+DefaultAsyncHttpxClient: Any = None
+try:  # noqa: SIM105
+    from openai import AsyncOpenAI as _AsyncOpenAI, DefaultAsyncHttpxClient as _DefaultAsyncHttpxClient
+    AsyncOpenAI = _AsyncOpenAI
+    DefaultAsyncHttpxClient = _DefaultAsyncHttpxClient
+except Exception:  # noqa: BLE001  # pragma: no cover
+    pass
 
 _LOG = logging.getLogger(__name__ + ".token")
 
 
+class IncompleteModelResponse(RuntimeError):
+    """The model stream ended without a ``finish_reason``: the answer was cut off."""
+
+
 class OpenAIChatClient:
     def __init__(
         self,
@@ -30,11 +59,17 @@ class OpenAIChatClient:
         self.model_name = model_name
         # Raw model parameters from config (may include a special 'system_prompt').
         self.model_parameters = dict(model_parameters) if isinstance(model_parameters, dict) else {}
+        self.base_url = base_url
         self.client = OpenAI(
             base_url=base_url,
             api_key=api_key,
             default_query={"api-version": api_version} if api_version else None,
         )
+        # Async client (and its connection pool) is created on first use, on the loop that streams.
+        self._async_client: Any | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        # pending closes of stale async clients (tasks here, futures on their own loop)
+        self._closing: "set[asyncio.Future[None] | concurrent.futures.Future[None]]" = set()
 
         # Introspect allowed parameter names once (avoid per-call overhead).
         try:
@@ -73,12 +108,55 @@ class OpenAIChatClient:
             return "system", raw_prompt.strip()
         return "system", None
 
-    def chat_stream(
-        self,
-        text_input: str,
-        conversation_history: Optional[List[Dict[str, Any]]] = None,
-    ) -> Iterator[str]:
-        """Stream assistant response tokens.
+    @property
+    def supports_async(self) -> bool:
+        return AsyncOpenAI is not None
+
+    def async_client(self) -> Any:
+        """The shared `AsyncOpenAI` client: one pooled HTTP client for every concurrent stream.
+
+        Connections belong to the loop that opened them; used from another loop
+        (a second ``asyncio.run``), a fresh client is built for that loop and
+        the old one is closed.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            if self._async_client is not None:
+                self._close_stale(self._async_client, self._async_loop)
+            self._async_client = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                default_query={"api-version": self.api_version} if self.api_version else None,
+                http_client=DefaultAsyncHttpxClient(),
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    async def aclose(self) -> None:
+        client, self._async_client, self._async_loop = self._async_client, None, None
+        if client is not None:
+            await client.close()
+
+    def _close_stale(self, client: Any, owner: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Close *client*, built on *owner*: there if that loop still runs, else here."""
+        closing: "asyncio.Future[None] | concurrent.futures.Future[None]"
+        if owner is not None and owner.is_running() and not owner.is_closed():
+            closing = asyncio.run_coroutine_threadsafe(client.close(), owner)
+        else:
+            closing = asyncio.get_running_loop().create_task(client.close())
+        self._closing.add(closing)
+        closing.add_done_callback(self._stale_closed)
+
+    def _stale_closed(self, closing: "asyncio.Future[None] | concurrent.futures.Future[None]") -> None:
+        self._closing.discard(closing)
+        if closing.cancelled():
+            self.logger.warning("Closing a stale AsyncOpenAI client was cancelled (its loop stopped)")
+        elif closing.exception() is not None:
+            # e.g. its connections died with their loop; the pool is dropped either way
+            self.logger.warning("Failed to close a stale AsyncOpenAI client", exc_info=closing.exception())
+
+    def _request(self, text_input: str, conversation_history: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Keyword arguments for ``chat.completions.create`` (streaming).
 
         Accepts a relaxed conversation_history of simplified dicts and coerces it into
         the minimal shape accepted by the SDK (role + content strings). Unknown keys ignored.
@@ -96,30 +174,113 @@ class OpenAIChatClient:
             messages.insert(0, {"role": self.system_prompt_role, "content": self.system_prompt_content})
 
         messages.append({"role": "user", "content": text_input})
+        # Build request kwargs, passing only configured parameters if present.
+        req_kwargs: Dict[str, Any] = {
+            "messages": messages,
+            "model": self.model_name,
+            "stream": True,
+        }
+        if self.sanitized_parameters:
+            req_kwargs.update(self.sanitized_parameters)
+        return req_kwargs
+
+    def signature(self) -> str:
+        """What besides the messages decides the reply: model, system prompt, parameters."""
+        return json.dumps(
+            [self.model_name, self.system_prompt_role, self.system_prompt_content, self.sanitized_parameters],
+            sort_keys=True,
+            default=str,
+        )
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> Optional[str]:
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            return None
+        delta = getattr(choices[0], "delta", None)
+        content = getattr(delta, "content", None)
+        return content or None
+
+    @staticmethod
+    def _finished(chunk: Any) -> bool:
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            return False
+        return getattr(choices[0], "finish_reason", None) is not None
+
+    def chat_stream(
+        self,
+        text_input: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+    ) -> Iterator[str]:
+        """Stream assistant response tokens (blocking); errors are logged and end the stream."""
         try:
-            # Build request kwargs, passing only configured parameters if present.
-            req_kwargs: Dict[str, Any] = {
-                "messages": messages,  # type: ignore[arg-type]
-                "model": self.model_name,
-                "stream": True,
-            }
-            if self.sanitized_parameters:
-                req_kwargs.update(self.sanitized_parameters)
+            yield from self._chat_stream(text_input, conversation_history)
+        except Exception:  # noqa: BLE001  # logged by _chat_stream
+            return
 
-            response = self.client.chat.completions.create(**req_kwargs)
+    def _chat_stream(
+        self,
+        text_input: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+    ) -> Iterator[str]:
+        """`chat_stream` that raises errors (after logging them), like `chat_stream_async`."""
+        try:
+            response = self.client.chat.completions.create(**self._request(text_input, conversation_history))
+            finished = False
             for chunk in response:  # chunk is expected ChatCompletionChunk
                 try:
-                    choices = getattr(chunk, "choices", None)
-                    if not choices:
-                        continue
-                    delta = getattr(choices[0], "delta", None)
-                    content = getattr(delta, "content", None)
+                    finished = finished or self._finished(chunk)
+                    content = self._chunk_text(chunk)
                     if content:
                         yield content
                 except Exception:
                     continue
-        except Exception:  # pragma: no cover
+            if not finished:
+                raise IncompleteModelResponse("model stream ended without a finish_reason")
+        except Exception:
             self.logger.exception("chat_stream failed for input: %r", text_input)
+            raise
+
+    async def chat_stream_async(
+        self,
+        text_input: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+    ) -> AsyncIterator[str]:
+        """Stream assistant response tokens on the running loop.
+
+        Same request as `chat_stream`, but a failed request or a stream cut
+        off midway (no ``finish_reason`` by the end: a closed connection or a
+        missing ``[DONE]``) is logged and raised, so callers such as the
+        response cache can tell it from a finished answer. Closing the
+        iterator early (the consumer was cancelled) closes the HTTP response,
+        so the connection goes back to the pool instead of draining the
+        completion.
+        """
+        response: Any = None
+        try:
+            response = await self.async_client().chat.completions.create(**self._request(text_input, conversation_history))
+            finished = False
+            async for chunk in response:
+                try:
+                    finished = finished or self._finished(chunk)
+                    content = self._chunk_text(chunk)
+                except Exception:
+                    continue
+                if content:
+                    yield content
+            if not finished:
+                raise IncompleteModelResponse("model stream ended without a finish_reason")
+        except Exception:
+            self.logger.exception("chat_stream_async failed for input: %r", text_input)
+            raise
+        finally:
+            close = getattr(response, "close", None)
+            if close is not None:
+                try:
+                    await close()
+                except Exception:  # noqa: BLE001
+                    pass
 
 
 _client_singleton: OpenAIChatClient | None = None
@@ -143,14 +304,41 @@ def get_openai_chat_client() -> OpenAIChatClient:
             api_version=api_version,
             model_parameters=model_parameters,
             system_prompt=system_prompt,
+            base_url=os.environ.get("MODEL_BASE_URL") or "https://models.github.ai/inference",
         )
     return _client_singleton
 
 
+async def aclose_chat_client() -> None:
+    """Close the shared client's async HTTP connections (app shutdown, on the chat loop)."""
+    client = _client_singleton
+    if client is not None:
+        await client.aclose()
+
+
 def chat_stream(text_input: str, **kwargs: Any) -> Iterator[str]:
     client = get_openai_chat_client()
     yield from client.chat_stream(text_input, **kwargs)
 
 
+async def chat_stream_async(text_input: str, **kwargs: Any) -> AsyncIterator[str]:
+    """Token stream for the chat loop: native async, or the thread bridge as a fallback."""
+    client = get_openai_chat_client()
+    if client.supports_async:
+        stream = client.chat_stream_async(text_input, **kwargs)
+    else:  # SDK without AsyncOpenAI; raises like the native stream
+        stream = to_async_iterator(client._chat_stream(text_input, **kwargs))
+    async for chunk in stream:
+        yield chunk
+
+
+def model_signature() -> Optional[str]:
+    """`OpenAIChatClient.signature` of the configured client; None if it cannot be built."""
+    try:
+        return get_openai_chat_client().signature()
+    except Exception:  # noqa: BLE001
+        return None
+
+
 def chat(text_input: str, **kwargs: Any) -> str:
     return "".join(chat_stream(text_input, **kwargs))
@@ -18,6 +18,13 @@ except Exception:  # noqa: BLE001
     DefaultAzureCredential = None  # type: ignore
     ManagedIdentityCredential = None  # type: ignore
 
+try:  # async variants for the aio SDK clients
+    from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
+    from azure.identity.aio import ManagedIdentityCredential as AsyncManagedIdentityCredential
+except Exception:  # noqa: BLE001
+    AsyncDefaultAzureCredential = None  # type: ignore
+    AsyncManagedIdentityCredential = None  # type: ignore
+
 _LOG = logging.getLogger("azure_credentials")
 
 @runtime_checkable
@@ -52,4 +59,22 @@ def get_azure_credential() -> CredentialType:
     _LOG.info("Using DefaultAzureCredential")
     return DefaultAzureCredential()
 
-__all__ = ["get_azure_credential", "CredentialType"]
+def get_async_azure_credential() -> CredentialType:
+    """Async counterpart of `get_azure_credential` for ``*.aio`` clients (same preference order)."""
+    if AsyncDefaultAzureCredential is None:
+        raise RuntimeError("azure-identity not installed; cannot construct credential")
+
+    use_mi_flag = os.getenv("USE_MANAGED_IDENTITY", "false").lower() in {"1", "true", "yes", "on"}
+
+    if use_mi_flag and AsyncManagedIdentityCredential is not None:
+        try:
+            cred = AsyncManagedIdentityCredential()
+            _LOG.info("Using ManagedIdentityCredential (async)")
+            return cred
+        except Exception as e:  # noqa: BLE001
+            _LOG.warning("ManagedIdentityCredential failed (%s); falling back to DefaultAzureCredential", e)
+
+    _LOG.info("Using DefaultAzureCredential (async)")
+    return AsyncDefaultAzureCredential()
+
+__all__ = ["get_azure_credential", "get_async_azure_credential", "CredentialType"]
@@ -0,0 +1,228 @@
+"""Admission control for model calls: a global in-flight cap with fair queues.
+
+Every AI response holds one `LLMScheduler.slot` while it streams, so at most
+``max_in_flight`` requests reach the model endpoint at once. Requests over
+the cap wait in a two-level round-robin queue - rooms take turns, and
+within a room its users take turns - so one busy room or one chatty user
+cannot starve the others. A request fails with:
+
+- `QueueFull` when ``max_queue`` requests already wait, or its user already
+  has ``max_queued_per_user`` waiting in the room (back-pressure; the caller
+  tells the client to retry later);
+- `QueueTimeout` when no slot frees up within ``queue_timeout`` seconds
+  (the answer would arrive too late to be useful).
+
+A freed slot is handed straight to the next live waiter; waiters cancelled
+while queued are skipped. Queue positions are the 1-based order in which
+waiters would be admitted.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+OnQueued = Callable[[int], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class LLMSchedulerConfig:
+    max_in_flight: int = 8
+    max_queue: int = 100
+    max_queued_per_user: int = 3
+    queue_timeout: float = 30.0
+
+
+class SchedulerRejected(Exception):
+    """The request was not admitted; ``reason`` is ``"full"`` or ``"expired"``."""
+
+    reason = "rejected"
+
+
+class QueueFull(SchedulerRejected):
+    reason = "full"
+
+
+class QueueTimeout(SchedulerRejected):
+    reason = "expired"
+
+
+class _Ticket:
+    __slots__ = ("room_id", "user_id", "future", "enqueued")
+
+    def __init__(self, room_id: str, user_id: str, future: "asyncio.Future[float]") -> None:
+        self.room_id = room_id
+        self.user_id = user_id
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class LLMScheduler:
+    def __init__(self, config: Optional[LLMSchedulerConfig] = None) -> None:
+        self.config = config or LLMSchedulerConfig()
+        self._in_flight = 0
+        self._queued = 0
+        # room -> user -> waiting tickets; both levels rotate as they are served
+        self._rooms: "OrderedDict[str, OrderedDict[str, Deque[_Ticket]]]" = OrderedDict()
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+        self.expired = 0
+        self.max_wait = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @contextlib.asynccontextmanager
+    async def slot(self, room_id: str, user_id: str, *, on_queued: Optional[OnQueued] = None) -> AsyncIterator[float]:
+        """Hold one model slot for the body; yields the seconds spent queued.
+
+        *on_queued* is awaited with the queue position when the request has to wait.
+        """
+        waited = await self._acquire(room_id, user_id, on_queued)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def position(self, room_id: str, user_id: str) -> int:
+        """Queue position of the user's oldest waiting request in *room_id* (0 if none)."""
+        users = self._rooms.get(room_id)
+        tickets = users.get(user_id) if users is not None else None
+        return self._position(tickets[0]) if tickets else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inFlight": self._in_flight,
+            "queued": self._queued,
+            "maxInFlight": self.config.max_in_flight,
+            "admitted": self.admitted,
+            "queuedTotal": self.queued_total,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "maxWaitMs": round(self.max_wait * 1000.0, 1),
+        }
+
+    # -------- internals --------
+    async def _acquire(self, room_id: str, user_id: str, on_queued: Optional[OnQueued]) -> float:
+        if self._in_flight < self.config.max_in_flight and not self._queued:
+            self._in_flight += 1
+            self.admitted += 1
+            return 0.0
+        users = self._rooms.get(room_id)
+        waiting = users.get(user_id) if users is not None else None
+        if self._queued >= self.config.max_queue or (waiting is not None and len(waiting) >= self.config.max_queued_per_user):
+            self.rejected += 1
+            raise QueueFull(f"{self._queued} model requests already waiting")
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(room_id, user_id, loop.create_future())
+        self._rooms.setdefault(room_id, OrderedDict()).setdefault(user_id, deque()).append(ticket)
+        self._queued += 1
+        self.queued_total += 1
+        timer = loop.call_later(self.config.queue_timeout, self._expire, ticket)
+        try:
+            if on_queued is not None:
+                try:
+                    await on_queued(self._position(ticket))
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    pass
+            return await ticket.future
+        except asyncio.CancelledError:
+            future = ticket.future
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()  # admitted just as the caller went away
+            else:
+                # the future may have been cancelled while the ticket still waits in the
+                # queue (task cancelled before it resumed); take it out either way
+                self._discard(ticket)
+            raise
+        finally:
+            timer.cancel()
+
+    def _release(self) -> None:
+        ticket = self._next()
+        if ticket is None:
+            self._in_flight -= 1
+            return
+        waited = time.monotonic() - ticket.enqueued
+        self.max_wait = max(self.max_wait, waited)
+        self.admitted += 1
+        ticket.future.set_result(waited)  # the slot passes straight to the waiter
+
+    def _next(self) -> Optional[_Ticket]:
+        """Pop the next live waiter in round-robin order, dropping cancelled ones."""
+        while self._rooms:
+            ticket = self._pop()
+            if not ticket.future.done():
+                return ticket
+        return None
+
+    def _pop(self) -> _Ticket:
+        room_id, users = next(iter(self._rooms.items()))
+        user_id, tickets = next(iter(users.items()))
+        ticket = tickets.popleft()
+        if tickets:
+            users.move_to_end(user_id)
+        else:
+            del users[user_id]
+        if users:
+            self._rooms.move_to_end(room_id)
+        else:
+            del self._rooms[room_id]
+        self._queued -= 1
+        return ticket
+
+    def _discard(self, ticket: _Ticket) -> bool:
+        users = self._rooms.get(ticket.room_id)
+        if users is None:
+            return False
+        tickets = users.get(ticket.user_id)
+        if tickets is None or ticket not in tickets:
+            return False
+        tickets.remove(ticket)
+        if not tickets:
+            del users[ticket.user_id]
+            if not users:
+                del self._rooms[ticket.room_id]
+        self._queued -= 1
+        return True
+
+    def _expire(self, ticket: _Ticket) -> None:
+        if self._discard(ticket) and not ticket.future.done():
+            self.expired += 1
+            ticket.future.set_exception(QueueTimeout(f"no model slot within {self.config.queue_timeout:g}s"))
+
+    def _position(self, ticket: _Ticket) -> int:
+        # Replays the round-robin order on a copy of the queue.
+        rooms = deque(deque(deque(tickets) for tickets in users.values()) for users in self._rooms.values())
+        n = 0
+        while rooms:
+            users = rooms.popleft()
+            tickets = users.popleft()
+            n += 1
+            if tickets.popleft() is ticket:
+                return n
+            if tickets:
+                users.append(tickets)
+            if users:
+                rooms.append(users)
+        return 0
+
+
+__all__ = [
+    "LLMScheduler",
+    "LLMSchedulerConfig",
+    "SchedulerRejected",
+    "QueueFull",
+    "QueueTimeout",
+]
@@ -0,0 +1,193 @@
+"""Response cache and in-flight coalescing for identical AI prompts.
+
+Requests are keyed by `ResponseCache.key`: the model configuration (model,
+system prompt, parameters), the last ``history_turns`` turns of history and
+the prompt, with whitespace and case normalized. `ResponseCache.stream`
+then answers a request in one of three ways:
+
+- hit: a completed response for the key is cached (up to ``max_entries``,
+  least recently used evicted, each kept for ``ttl`` seconds); its chunks
+  are replayed at ``replay_rate`` chunks per second (0 = at once);
+- coalesced: the same request is already streaming; the caller follows
+  that stream - first the chunks produced so far, then live ones;
+- miss: the caller's producer is started as a shared task, which others
+  can follow until it completes; a complete, non-empty response is cached.
+
+The producer runs apart from its callers, so the first caller going away
+does not cut the stream off for followers; it is cancelled once no caller
+is left. A producer error is raised to every caller and nothing is cached.
+``tokensSaved`` counts the streamed chunks (about one token each) callers
+received without a model call of their own.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class ResponseCacheConfig:
+    max_entries: int = 256
+    ttl: float = 300.0
+    history_turns: int = 6
+    replay_rate: float = 0.0
+
+
+def _normalize(text: Any) -> str:
+    return _WHITESPACE.sub(" ", str(text or "")).strip().casefold()
+
+
+class _Flight:
+    __slots__ = ("key", "chunks", "done", "error", "changed", "consumers", "task")
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.consumers = 0
+        self.task: Optional["asyncio.Task[None]"] = None
+
+    def notify(self) -> None:
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class ResponseCache:
+    def __init__(self, config: Optional[ResponseCacheConfig] = None) -> None:
+        self.config = config or ResponseCacheConfig()
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[str, ...]]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.tokens_saved = 0
+        self.evictions = 0
+
+    def key(self, prompt: str, history: Sequence[Mapping[str, Any]], model: Optional[str]) -> Optional[str]:
+        """Cache key of a request; None (not cacheable) without a model identity."""
+        if model is None:
+            return None
+        turns = self.config.history_turns
+        tail = list(history[-turns:]) if turns > 0 else []
+        payload = [model, [[str(h.get("role")), _normalize(h.get("content"))] for h in tail], _normalize(prompt)]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def stream(self, key: Optional[str], produce: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Chunks of the response for *key*; *produce* is only called on a miss."""
+        if key is None:
+            return produce()
+        cached = self._get(key)
+        if cached is not None:
+            self.hits += 1
+            self.tokens_saved += len(cached)
+            return self._replay(cached)
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            self.tokens_saved += len(flight.chunks)  # the rest is counted as it arrives
+            return self._follow(flight, saved=True)
+        self.misses += 1
+        flight = self._flights[key] = _Flight(key)
+        flight.task = asyncio.get_running_loop().create_task(self._produce(flight, produce()))
+        return self._follow(flight, saved=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._entries),
+            "inFlight": len(self._flights),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hitRate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            "tokensSaved": self.tokens_saved,
+            "evictions": self.evictions,
+        }
+
+    # -------- internals --------
+    def _get(self, key: str) -> Optional[Tuple[str, ...]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, chunks = entry
+        if time.monotonic() - stored_at > self.config.ttl:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return chunks
+
+    def _put(self, key: str, chunks: Tuple[str, ...]) -> None:
+        if self.config.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic(), chunks)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _produce(self, flight: _Flight, chunks: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    flight.chunks.append(chunk)
+                    flight.notify()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+        except Exception as e:  # noqa: BLE001
+            flight.error = e
+        finally:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            flight.done = True
+            flight.notify()
+        if flight.error is None and flight.chunks:
+            self._put(flight.key, tuple(flight.chunks))
+
+    async def _follow(self, flight: _Flight, *, saved: bool) -> AsyncIterator[str]:
+        flight.consumers += 1
+        sent = 0
+        try:
+            while True:
+                while sent < len(flight.chunks):
+                    chunk = flight.chunks[sent]
+                    sent += 1
+                    yield chunk
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                changed = flight.changed
+                await changed.wait()
+                if saved:
+                    self.tokens_saved += len(flight.chunks) - sent
+        finally:
+            flight.consumers -= 1
+            if flight.consumers == 0 and not flight.done and flight.task is not None:
+                # nobody left to stream to: stop the model call
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+                flight.task.cancel()
+
+    async def _replay(self, chunks: Sequence[str]) -> AsyncIterator[str]:
+        interval = 1.0 / self.config.replay_rate if self.config.replay_rate > 0 else 0.0
+        for i, chunk in enumerate(chunks):
+            if interval and i:
+                await asyncio.sleep(interval)
+            yield chunk
+
+
+__all__ = [
+    "ResponseCache",
+    "ResponseCacheConfig",
+]
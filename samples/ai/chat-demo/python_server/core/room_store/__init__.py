@@ -1,13 +1,21 @@
-from .models import RoomMetadata
+from .models import EventRecord, RoomMetadata, render_events
 from .base import RoomStore
 from .memory import InMemoryRoomStore
 from .azure_table import AzureTableRoomStore
+from .wal import WalRoomStore
+from .segment_log import SegmentLogRoomStore
+from .caching import CachingRoomStore
 from .builder import build_room_store
 
 __all__ = [
     "RoomMetadata",
+    "EventRecord",
+    "render_events",
     "RoomStore",
     "InMemoryRoomStore",
     "AzureTableRoomStore",
+    "WalRoomStore",
+    "SegmentLogRoomStore",
+    "CachingRoomStore",
     "build_room_store",
 ]
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import os
 import random
 import string
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Coroutine, Dict, List, Mapping, Optional, Tuple, TypeVar
 
 from .base import RoomStore
+from .metadata_index import RoomMetadataIndex, decode_cursor, encode_cursor
 from .models import RoomMetadata
+from .retention import RetentionWorker
+from .write_batcher import RoomWriteBatcher, json_size
 from ...config import DEFAULT_ROOM_ID
 
 # Optional azure-data-tables import (lazy, best-effort)
@@ -17,120 +22,519 @@ import importlib
 _tables_client_cls: Any | None = None
 _update_mode_enum: Any | None = None
 _resource_not_found_exc: Any = Exception
+_resource_exists_exc: Any = Exception
+_resource_modified_exc: Any = Exception
+_if_not_modified: Any = None
+_aiohttp: Any | None = None
+_aiohttp_transport_cls: Any | None = None
 _HAS_TABLES = False
 try:  # pragma: no cover
     _tables_mod = importlib.import_module("azure.data.tables")
+    _tables_aio_mod = importlib.import_module("azure.data.tables.aio")
     _core_exc_mod = importlib.import_module("azure.core.exceptions")
-    _tables_client_cls = getattr(_tables_mod, "TableServiceClient", None)
+    _tables_client_cls = getattr(_tables_aio_mod, "TableServiceClient", None)
     _update_mode_enum = getattr(_tables_mod, "UpdateMode", None)
     _resource_not_found_exc = getattr(_core_exc_mod, "ResourceNotFoundError", Exception)
+    _resource_exists_exc = getattr(_core_exc_mod, "ResourceExistsError", Exception)
+    _resource_modified_exc = getattr(_core_exc_mod, "ResourceModifiedError", Exception)
+    _if_not_modified = getattr(getattr(importlib.import_module("azure.core"), "MatchConditions", None), "IfNotModified", None)
     _HAS_TABLES = _tables_client_cls is not None
 except Exception:  # noqa: BLE001
     pass
+try:  # pragma: no cover
+    _aiohttp = importlib.import_module("aiohttp")
+    _aiohttp_transport_cls = getattr(importlib.import_module("azure.core.pipeline.transport"), "AioHttpTransport", None)
+except Exception:  # noqa: BLE001
+    pass
 
 try:  # optional dependency
-    from ..credentials import get_azure_credential
+    from ..credentials import get_async_azure_credential
 except Exception:  # noqa: BLE001
-    def get_azure_credential() -> Any:  # type: ignore[override]
+    def get_async_azure_credential() -> Any:  # type: ignore[misc]
         raise RuntimeError("Azure credential initialization failed.")
 
 
+_LOG = logging.getLogger(__name__)
+T = TypeVar("T")
+
+_ROW_KEY_PREFIX = "r"
+_ROW_KEY_END = "s"  # exclusive upper bound of the reverse-keyed range
+_REVERSE_TS_MAX = 10**16 - 1  # epoch microseconds fit 16 digits until year 2286
+_SUMMARY_PARTITION = "rooms"
+_SUMMARY_RETRIES = 5
+# Service limits: a string property holds 64 KiB of UTF-16, an entity-group
+# transaction carries at most 4 MiB (each operation also adds its own
+# multipart headers, hence the per-row overhead in the size estimate).
+_MAX_STRING_BYTES = 64 * 1024
+_MAX_TRANSACTION_BYTES = 4 * 1024 * 1024
+_TRANSACTION_ROW_OVERHEAD = 1024
+
+
 class AzureTableRoomStore(RoomStore):
     """Room store backed by Azure Table Storage for scalable history.
 
     Table schema:
       - Table name: CHAT_TABLE_NAME (default chatmessages)
       - PartitionKey: room id
-      - RowKey: ISO8601 timestamp + '_' + random suffix (lexicographically sortable)
+      - RowKey: 'r' + reverse epoch microseconds (16 digits) + '_' + random suffix,
+        so a partition lists newest -> oldest and "latest N" / "older than
+        cursor" are bounded range queries (rows written before this scheme
+        keep their ISO8601 RowKeys, which sort below 'r' and are read last)
       - Properties: messageId, type, fromUser, text, ts, meta (optional JSON string)
+
+    Room summary table (ROOM_SUMMARY_TABLE_NAME, default roomsummary): one row
+    per room (PartitionKey 'rooms', RowKey room id) with a ``messages`` counter
+    bumped on every recorded event, so ``list_rooms`` is a single query whose
+    size depends on the number of rooms, not on the stored history.
+
+    I/O uses the ``azure.data.tables.aio`` clients, which share one pooled
+    aiohttp session. They are created on first use and belong to that event
+    loop; calls from other loops (e.g. Flask CloudEvents requests) are handed
+    over to it. Message rows are written behind by a `RoomWriteBatcher`: one
+    entity-group transaction (up to ``write_batch_size`` rows and 4 MiB) per
+    room and round-trip. History reads of a room first wait for its queued
+    writes; ``flush`` / ``close`` raise `WriteBatchError` for rows that could
+    not be written. Messages over the 64 KiB string property limit are
+    rejected with ValueError instead of being queued.
+
+    Retention: a room is trimmed back to ``max_messages_per_room`` once it
+    exceeds the cap by ``retention_slack`` rows, and/or rows older than
+    ``message_ttl`` seconds are removed. A throttled `RetentionWorker` does
+    this in the background with batched deletes (<= 100 per transaction).
+    A cap <= 0 and no TTL disables it.
     """
 
-    def __init__(self, *, connection_string: Optional[str] = None, account_name: Optional[str] = None, table_name: Optional[str] = None, max_messages_per_room: int = 200, metadata_table_name: Optional[str] = None) -> None:
-        if _tables_client_cls is None:
-            raise RuntimeError("azure-data-tables not installed. Please install azure-data-tables to use AzureTableRoomStore.")
+    def __init__(
+        self,
+        *,
+        connection_string: Optional[str] = None,
+        account_name: Optional[str] = None,
+        table_name: Optional[str] = None,
+        max_messages_per_room: int = 200,
+        metadata_table_name: Optional[str] = None,
+        summary_table_name: Optional[str] = None,
+        service_client: Any = None,
+        max_connections: int = 50,
+        write_batch_size: int = 100,
+        max_pending_writes: int = 2000,
+        message_ttl: Optional[float] = None,
+        retention_slack: Optional[int] = None,
+        retention_interval: float = 30.0,
+        retention_deletes_per_sec: float = 200.0,
+    ) -> None:
+        if service_client is None:
+            if _tables_client_cls is None:
+                raise RuntimeError("azure-data-tables not installed. Please install azure-data-tables to use AzureTableRoomStore.")
+            if _aiohttp is None or _aiohttp_transport_cls is None:
+                raise RuntimeError("aiohttp is not installed. Please `pip install aiohttp` to use AzureTableRoomStore.")
         self._table_name = (table_name or os.getenv("CHAT_TABLE_NAME") or "chatmessages").strip().lower()
         self._conn_str = connection_string or os.getenv("AZURE_STORAGE_CONNECTION_STRING")
         self._account_name = (account_name or os.getenv("AZURE_STORAGE_ACCOUNT") or "").strip()
         self._max_messages = max_messages_per_room
         # Metadata table name
         self._metadata_table_name = (metadata_table_name or os.getenv("ROOM_METADATA_TABLE_NAME") or "roommetadata").strip().lower()
+        self._summary_table_name = (summary_table_name or os.getenv("ROOM_SUMMARY_TABLE_NAME") or "roomsummary").strip().lower()
         # Lazy cache for list_rooms
         self._known_rooms: set[str] = set([DEFAULT_ROOM_ID])
-        if self._conn_str:
-            self._svc = _tables_client_cls.from_connection_string(self._conn_str)
-        elif self._account_name:
-            cred = get_azure_credential()
-            table_url = f"https://{self._account_name}.table.core.windows.net"
-            self._svc = _tables_client_cls(endpoint=table_url, credential=cred)
-        else:
+        # room -> (message count, summary ETag) as last written by this process
+        self._room_counts: Dict[str, Tuple[int, Optional[str]]] = {}
+        self._summary_checked = False
+        # last RowKey timestamp; kept strictly increasing so same-microsecond writes keep order
+        self._last_row_us = 0
+        if service_client is None and not (self._conn_str or self._account_name):
             raise RuntimeError("Provide AZURE_STORAGE_CONNECTION_STRING or AZURE_STORAGE_ACCOUNT for AzureTableRoomStore")
-        self._table_client = self._svc.create_table_if_not_exists(self._table_name)
-        self._metadata_client = self._svc.create_table_if_not_exists(self._metadata_table_name)
+        self._service_override = service_client
+        self._max_connections = max_connections
+        # Loop owning the clients; bound on first use.
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._init_lock: asyncio.Lock | None = None
+        self._svc: Any = None
+        self._session: Any = None
+        self._credential: Any = None
+        self._table_client: Any = None
+        self._metadata_client: Any = None
+        self._summary_client: Any = None
+        self._writer = RoomWriteBatcher(
+            self._submit_batch,
+            max_batch=min(write_batch_size, 100),
+            max_batch_bytes=_MAX_TRANSACTION_BYTES,
+            entity_size=lambda ent: json_size(ent) + _TRANSACTION_ROW_OVERHEAD,
+            max_pending=max_pending_writes,
+            logger=_LOG,
+        )
+        self._message_ttl = message_ttl if message_ttl and message_ttl > 0 else None
+        self._retention_slack = retention_slack if retention_slack is not None else max(1, max_messages_per_room // 4)
+        self._retention = RetentionWorker(
+            self._compact_room,
+            interval=retention_interval,
+            deletes_per_sec=retention_deletes_per_sec,
+            backlog=self._writer.backlog,
+            max_backlog=self._writer.max_batch,
+            logger=_LOG,
+        )
+
+    # --------------- clients ---------------
+    def _new_service_client(self) -> Any:
+        assert _tables_client_cls is not None and _aiohttp is not None and _aiohttp_transport_cls is not None
+        connector = _aiohttp.TCPConnector(limit=self._max_connections, ttl_dns_cache=300)
+        self._session = _aiohttp.ClientSession(connector=connector)
+        transport = _aiohttp_transport_cls(session=self._session, session_owner=False)
+        if self._conn_str:
+            return _tables_client_cls.from_connection_string(self._conn_str, transport=transport)
+        self._credential = get_async_azure_credential()
+        table_url = f"https://{self._account_name}.table.core.windows.net"
+        return _tables_client_cls(endpoint=table_url, credential=self._credential, transport=transport)
+
+    async def _tables(self) -> Any:
+        """The message table client; creates the shared clients (and tables) once."""
+        if self._table_client is None:
+            if self._init_lock is None:
+                self._init_lock = asyncio.Lock()
+            async with self._init_lock:
+                if self._table_client is None:
+                    svc = self._svc or self._service_override or self._new_service_client()
+                    self._svc = svc
+                    self._metadata_client = await svc.create_table_if_not_exists(self._metadata_table_name)
+                    self._summary_client = await svc.create_table_if_not_exists(self._summary_table_name)
+                    self._table_client = await svc.create_table_if_not_exists(self._table_name)
+        return self._table_client
+
+    async def _close_clients(self) -> None:
+        svc, self._svc = self._svc, None
+        session, self._session = self._session, None
+        credential, self._credential = self._credential, None
+        self._table_client = self._metadata_client = self._summary_client = None
+        try:
+            if svc is not None:
+                await svc.close()
+            if session is not None:
+                await session.close()
+            if credential is not None:
+                await credential.close()
+        except Exception:  # noqa: BLE001
+            _LOG.debug("Failed to close table clients", exc_info=True)
+
+    async def _call(self, fn: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """Run *fn* on the loop owning the clients, awaiting it from whichever loop we are on."""
+        running = asyncio.get_running_loop()
+        if self._loop is None or self._loop.is_closed() or (self._loop is not running and not self._loop.is_running()):
+            if self._loop is not None:
+                # the owning loop is gone: its session and queued writes cannot be used any more
+                dropped = self._writer.discard()
+                if dropped:
+                    _LOG.warning("Dropped %d unwritten messages of a stopped event loop", dropped)
+                self._svc = self._session = self._credential = None
+                self._table_client = self._metadata_client = self._summary_client = None
+                self._init_lock = None
+                self._retention.reset()
+            self._loop = running
+        if self._loop is running:
+            return await fn()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(fn(), self._loop))
+
+    async def flush(self) -> None:
+        """Wait until every queued message row is written; `WriteBatchError` if some were dropped."""
+        await self._call(self._writer.flush)
+
+    async def close(self) -> None:
+        async def close() -> None:
+            await self._retention.stop()
+            try:
+                await self._writer.flush()
+            finally:
+                await self._close_clients()
+        await self._call(close)
+
+    def write_stats(self) -> Dict[str, Any]:
+        """Write-behind counters: transactions, rows, retries, failed rows, batch sizes."""
+        return self._writer.stats.to_dict()
+
+    def retention_stats(self) -> Dict[str, Any]:
+        """Retention counters: rows reclaimed, rooms pending, compaction lag, throttling."""
+        return self._retention.to_dict()
+
+    @property
+    def _retention_enabled(self) -> bool:
+        return self._max_messages > 0 or self._message_ttl is not None
 
     # --------------- helpers ---------------
     @staticmethod
-    def _row_key() -> str:
-        ts = datetime.now(timezone.utc).isoformat()
+    def _row_key(now_us: Optional[int] = None) -> str:
+        if now_us is None:
+            now_us = time.time_ns() // 1000
         rand = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
-        return f"{ts}_{rand}"
+        return f"{_ROW_KEY_PREFIX}{_REVERSE_TS_MAX - now_us:016d}_{rand}"
+
+    def _next_row_key(self) -> str:
+        self._last_row_us = max(time.time_ns() // 1000, self._last_row_us + 1)
+        return self._row_key(self._last_row_us)
+
+    @staticmethod
+    def _message_from_entity(ent: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "messageId": ent.get("messageId"),
+            "type": ent.get("type"),
+            "from": ent.get("fromUser"),
+            "message": ent.get("text"),
+            "timestamp": ent.get("ts"),
+        }
+
+    async def _query_newest(self, room: str, count: int, before: Optional[str]) -> List[Dict[str, Any]]:
+        """Up to *count* entities older than RowKey *before*, newest first."""
+        table = await self._tables()
+        ents: List[Dict[str, Any]] = []
+        if before is None or before.startswith(_ROW_KEY_PREFIX):
+            async for ent in table.query_entities(
+                "PartitionKey eq @room and RowKey gt @after and RowKey lt @end",
+                parameters={"room": room, "after": before or _ROW_KEY_PREFIX, "end": _ROW_KEY_END},
+                results_per_page=count,
+            ):
+                ents.append(ent)
+                if len(ents) >= count:
+                    break
+        if len(ents) < count:
+            # pre-upgrade rows (ISO8601 RowKeys) ascend in time; only read once the
+            # reverse-keyed range is exhausted
+            legacy_end = before if before is not None and not before.startswith(_ROW_KEY_PREFIX) else _ROW_KEY_PREFIX
+            legacy = [ent async for ent in table.query_entities(
+                "PartitionKey eq @room and RowKey lt @end",
+                parameters={"room": room, "end": legacy_end},
+            )]
+            legacy.sort(key=lambda e: e["RowKey"], reverse=True)
+            ents.extend(legacy[:count - len(ents)])
+        return ents
+
+    async def _submit_batch(self, room: str, entities: List[Dict[str, Any]]) -> None:
+        """Write one batch of *room* message rows (called by the write batcher)."""
+        table = await self._tables()
+        merge_mode = getattr(_update_mode_enum, "MERGE", "merge")
+        if len(entities) == 1:
+            await table.upsert_entity(entities[0], mode=merge_mode)
+        else:
+            await table.submit_transaction([("upsert", ent, {"mode": merge_mode}) for ent in entities])
+        try:
+            await self._bump_room_summary(room, len(entities), entities[-1].get("ts"))
+        except Exception:  # noqa: BLE001
+            _LOG.debug("Failed to update room summary for %s", room, exc_info=True)
+        self._note_retention(room)
+
+    # --------------- retention ---------------
+    def _note_retention(self, room: str) -> None:
+        """Mark *room* for compaction when it is over its cap (or may hold expired rows)."""
+        if not self._retention_enabled:
+            return
+        count = self._room_counts.get(room, (0, None))[0]
+        if self._message_ttl is not None or count > self._max_messages + self._retention_slack:
+            self._retention.mark(room)
+            self._retention.start()
+
+    async def _doomed_row_keys(self, room: str) -> List[str]:
+        """RowKeys of *room* beyond the cap or older than the TTL, newest first."""
+        table = await self._tables()
+        keep = self._max_messages if self._max_messages > 0 else None
+        cutoff_key = cutoff_iso = None
+        if self._message_ttl is not None:
+            cutoff_us = time.time_ns() // 1000 - int(self._message_ttl * 1_000_000)
+            cutoff_key = f"{_ROW_KEY_PREFIX}{_REVERSE_TS_MAX - cutoff_us:016d}"
+            cutoff_iso = datetime.fromtimestamp(cutoff_us / 1_000_000, timezone.utc).isoformat()
+        doomed: List[str] = []
+        kept = 0
+        # without a cap only expired rows matter, and they are one key range (older = larger)
+        after = cutoff_key if keep is None and cutoff_key is not None else _ROW_KEY_PREFIX
+        async for ent in table.query_entities(
+            "PartitionKey eq @room and RowKey gt @after and RowKey lt @end",
+            parameters={"room": room, "after": after, "end": _ROW_KEY_END},
+            select=["RowKey"],
+        ):
+            key = ent["RowKey"]
+            if (keep is not None and kept >= keep) or (cutoff_key is not None and key > cutoff_key):
+                doomed.append(key)
+            else:
+                kept += 1
+        legacy = [ent["RowKey"] async for ent in table.query_entities(
+            "PartitionKey eq @room and RowKey lt @end", parameters={"room": room, "end": _ROW_KEY_PREFIX}, select=["RowKey"],
+        )]
+        legacy.sort(reverse=True)
+        for key in legacy:
+            if (keep is not None and kept >= keep) or (cutoff_iso is not None and key < cutoff_iso):
+                doomed.append(key)
+            else:
+                kept += 1
+        return doomed
+
+    async def _compact_room(self, room: str) -> int:
+        """Delete *room* rows beyond the cap / TTL in throttled transactions; returns rows deleted."""
+        await self._writer.wait(room)
+        table = await self._tables()
+        doomed = await self._doomed_row_keys(room)
+        deleted = 0
+        for i in range(0, len(doomed), 100):
+            chunk = doomed[i:i + 100]
+            await self._retention.throttle(len(chunk))
+            try:
+                await table.submit_transaction([("delete", {"PartitionKey": room, "RowKey": key}) for key in chunk])
+                deleted += len(chunk)
+            except Exception:  # noqa: BLE001
+                # e.g. another instance already removed some rows: fall back to single deletes
+                for key in chunk:
+                    try:
+                        await table.delete_entity(partition_key=room, row_key=key)
+                        deleted += 1
+                    except _resource_not_found_exc:
+                        continue
+        if deleted:
+            try:
+                await self._bump_room_summary(room, -deleted, None)
+            except Exception:  # noqa: BLE001
+                _LOG.debug("Failed to update room summary for %s", room, exc_info=True)
+        if self._message_ttl is not None and self._room_counts.get(room, (0, None))[0] > 0:
+            self._retention.mark(room)  # remaining rows expire later, even if the room goes quiet
+        return deleted
+
+    async def compact(self) -> int:
+        """Run one retention pass now (also enqueues rooms over their cap); returns rows reclaimed."""
+        async def run() -> int:
+            if self._retention_enabled:
+                for room, count in (await self._read_room_summary()).items():
+                    if self._message_ttl is not None or count > self._max_messages:
+                        self._retention.mark(room)
+            return await self._retention.run_pass()
+        return await self._call(run)
+
+    async def _bump_room_summary(self, room: str, added: int, ts: Any) -> None:
+        """Add *added* to the room's message counter; optimistic concurrency on the row ETag."""
+        await self._tables()
+        summary = self._summary_client
+        for _ in range(_SUMMARY_RETRIES):
+            cached = self._room_counts.get(room)
+            if cached is None:
+                try:
+                    ent = await summary.get_entity(partition_key=_SUMMARY_PARTITION, row_key=room)
+                    cached = (int(ent.get("messages") or 0), getattr(ent, "metadata", {}).get("etag"))
+                except _resource_not_found_exc:
+                    cached = (0, None)
+            count, etag = cached
+            entity: Dict[str, Any] = {"PartitionKey": _SUMMARY_PARTITION, "RowKey": room, "messages": max(0, count + added)}
+            if ts:
+                entity["lastMessageAt"] = ts
+            try:
+                if etag is None:
+                    meta = await summary.create_entity(entity)
+                else:
+                    meta = await summary.update_entity(entity, etag=etag, match_condition=_if_not_modified)
+            except (_resource_exists_exc, _resource_modified_exc):
+                # another writer (instance) got there first: re-read and retry
+                self._room_counts.pop(room, None)
+                continue
+            self._room_counts[room] = (max(0, count + added), (meta or {}).get("etag"))
+            return
+
+    async def _read_room_summary(self) -> Dict[str, int]:
+        table = await self._tables()
+        counts = {
+            ent["RowKey"]: int(ent.get("messages") or 0)
+            async for ent in self._summary_client.query_entities("PartitionKey eq @pk", parameters={"pk": _SUMMARY_PARTITION})
+        }
+        if not self._summary_checked:
+            if not counts:
+                async for _ent in table.list_entities(results_per_page=1):
+                    # history written before the summary table existed: backfill once
+                    counts = await self._rebuild_room_summary()
+                    break
+            # rooms left over cap (or with expiring rows) by an earlier run
+            for room, count in counts.items():
+                if self._retention_enabled and (self._message_ttl is not None or count > self._max_messages + self._retention_slack):
+                    self._retention.mark(room)
+                    self._retention.start()
+        self._summary_checked = True
+        return counts
+
+    async def _rebuild_room_summary(self) -> Dict[str, int]:
+        table = await self._tables()
+        counts: Dict[str, int] = {}
+        async for ent in table.list_entities(results_per_page=1000, select=["PartitionKey"]):
+            pk = ent.get("PartitionKey")
+            if isinstance(pk, str):
+                counts[pk] = counts.get(pk, 0) + 1
+        for room, count in counts.items():
+            await self._summary_client.upsert_entity({"PartitionKey": _SUMMARY_PARTITION, "RowKey": room, "messages": count})
+            self._room_counts.pop(room, None)
+        return counts
+
+    async def rebuild_room_summary(self) -> Dict[str, int]:
+        """Recount every room from the message table (full scan; for repair/backfill)."""
+        async def rebuild() -> Dict[str, int]:
+            await self._writer.wait()
+            return await self._rebuild_room_summary()
+        return await self._call(rebuild)
 
     async def register_room(self, room: str) -> None:  # pragma: no cover (no-op)
         self._known_rooms.add(room)
 
-    async def record_room_event(self, room: str, event: Dict[str, Any]) -> None:
+    async def record_room_event(self, room: str, event: Mapping[str, Any]) -> None:
+        await self.record_room_event_keyed(room, event)
+
+    async def record_room_event_keyed(self, room: str, event: Mapping[str, Any]) -> str:
+        """Queue *event* and return its RowKey (the cursor that pages to older messages)."""
         await self.register_room(room)
+        row_key = self._next_row_key()
         entity = {
             "PartitionKey": room,
-            "RowKey": self._row_key(),
+            "RowKey": row_key,
             "messageId": event.get("messageId"),
             "type": event.get("type"),
             "fromUser": event.get("from"),
             "text": event.get("message"),
             "ts": event.get("timestamp"),
         }
+        for name, value in entity.items():
+            if isinstance(value, str) and len(value.encode("utf-16-le")) > _MAX_STRING_BYTES:
+                raise ValueError(f"Room {room!r} event field {name!r} exceeds the {_MAX_STRING_BYTES} byte table property limit")
         try:
-            merge_mode = getattr(_update_mode_enum, "MERGE", None)
-            if merge_mode is None:
-                await asyncio.to_thread(self._table_client.upsert_entity, entity)
-            else:
-                await asyncio.to_thread(self._table_client.upsert_entity, entity, mode=merge_mode)
+            await self._call(lambda: self._writer.add(room, entity))
         except Exception:
             pass
+        return row_key
 
-    async def append_message(self, room: str, event: Dict[str, Any]) -> None:
+    async def append_message(self, room: str, event: Mapping[str, Any]) -> None:
         await self.record_room_event(room, event)
 
     async def get_room_messages(self, room: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        if limit is None or limit < 0:
+            limit = self._max_messages if self._max_messages > 0 else 200
+        msgs, _cursor = await self.get_room_messages_page(room, limit)
+        return msgs
+
+    async def get_room_messages_page(self, room: str, limit: int, before: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        keyed, cursor = await self.get_room_messages_keyed(room, limit, before)
+        return [msg for _key, msg in keyed], cursor
+
+    async def get_room_messages_keyed(self, room: str, limit: int, before: Optional[str] = None) -> Tuple[List[Tuple[str, Dict[str, Any]]], Optional[str]]:
+        """Like `get_room_messages_page`, with each message paired with its RowKey."""
+        if limit <= 0:
+            return [], None
+
+        async def query() -> List[Dict[str, Any]]:
+            await self._writer.wait(room)  # read your own queued writes
+            # one extra row tells whether an older page exists
+            return await self._query_newest(room, limit + 1, before)
+
         try:
-            entities = list(self._table_client.query_entities(f"PartitionKey eq '{room}'"))
-            entities.sort(key=lambda e: e["RowKey"])  # oldest -> newest
-            if limit is not None and limit >= 0:
-                entities = entities[-limit:]
-            msgs: List[Dict[str, Any]] = []
-            for ent in entities:
-                msgs.append({
-                    "messageId": ent.get("messageId"),
-                    "type": ent.get("type"),
-                    "from": ent.get("fromUser"),
-                    "message": ent.get("text"),
-                    "timestamp": ent.get("ts"),
-                })
-            return msgs
+            entities = await self._call(query)
         except Exception:
-            return []
+            return [], None
+        page = entities[:limit]
+        cursor = page[-1]["RowKey"] if len(entities) > limit else None
+        return [(ent["RowKey"], self._message_from_entity(ent)) for ent in reversed(page)], cursor
 
     async def list_rooms(self) -> List[Dict[str, Any]]:
         try:
-            rooms = set(self._known_rooms)
-            count_by_room: Dict[str, int] = {r: 0 for r in rooms}
-            for ent in self._table_client.list_entities(results_per_page=1000):
-                pk = ent.get("PartitionKey")
-                if isinstance(pk, str):
-                    rooms.add(pk)
-                    count_by_room[pk] = count_by_room.get(pk, 0) + 1
-            return [{"name": r, "messages": count_by_room.get(r, 0)} for r in sorted(rooms)]
+            count_by_room = await self._call(self._read_room_summary)
         except Exception:
             return [{"name": r, "messages": 0} for r in sorted(self._known_rooms)]
+        rooms = self._known_rooms.union(count_by_room)
+        # queued rows are not in the summary yet
+        return [{"name": r, "messages": count_by_room.get(r, 0) + self._writer.unsaved(r)} for r in sorted(rooms)]
 
     async def remove_room_if_empty(self, room: str) -> None:  # pragma: no cover
         return
@@ -156,6 +560,10 @@ class AzureTableRoomStore(RoomStore):
             updated_at=ent.get("updatedAt"),
         )
 
+    async def _metadata(self) -> Any:
+        await self._tables()
+        return self._metadata_client
+
     async def create_room_metadata(self, user_id: str, room_name: str, *, room_id: Optional[str] = None, description: Optional[str] = None) -> RoomMetadata:
         import uuid
 
@@ -163,8 +571,12 @@ class AzureTableRoomStore(RoomStore):
             room_id = f"room_{uuid.uuid4().hex[:8]}"
         room = RoomMetadata(room_id=room_id, room_name=room_name, user_id=user_id, description=description)
         entity = self._metadata_to_entity(room)
+
+        async def create() -> None:
+            await (await self._metadata()).create_entity(entity)
+
         try:
-            await asyncio.to_thread(self._metadata_client.create_entity, entity)
+            await self._call(create)
             return room
         except Exception as e:  # noqa: BLE001
             raise ValueError(f"Failed to create room metadata: {e}")
@@ -172,11 +584,16 @@ class AzureTableRoomStore(RoomStore):
     async def get_room_metadata(self, user_id: str, room_id: str) -> Optional[RoomMetadata]:
         if room_id == DEFAULT_ROOM_ID:
             return RoomMetadata(room_id=DEFAULT_ROOM_ID, room_name="Public Chat", user_id="system", description="Default public room")
+
+        async def get() -> Any:
+            return await (await self._metadata()).get_entity(partition_key=user_id, row_key=room_id)
+
         try:
-            ent = await asyncio.to_thread(self._metadata_client.get_entity, partition_key=user_id, row_key=room_id)
-            return self._metadata_from_entity(ent)
-        except Exception:
+            entity = await self._call(get)
+        except _resource_not_found_exc:
             return None
+        # any other failure is raised: callers (and the metadata cache) must not take it for "no such room"
+        return self._metadata_from_entity(entity)
 
     async def update_room_metadata(self, user_id: str, room_id: str, *, room_name: Optional[str] = None, description: Optional[str] = None) -> RoomMetadata:
         room = await self.get_room_metadata(user_id, room_id)
@@ -188,12 +605,12 @@ class AzureTableRoomStore(RoomStore):
             room.description = description or ""
         room.updated_at = datetime.now(timezone.utc).isoformat()
         entity = self._metadata_to_entity(room)
+
+        async def update() -> None:
+            await (await self._metadata()).update_entity(entity, mode=getattr(_update_mode_enum, "REPLACE", "replace"))
+
         try:
-            replace_mode = getattr(_update_mode_enum, "REPLACE", None)
-            if replace_mode is None:
-                await asyncio.to_thread(self._metadata_client.update_entity, entity)
-            else:
-                await asyncio.to_thread(self._metadata_client.update_entity, entity, mode=replace_mode)
+            await self._call(update)
             return room
         except Exception as e:  # noqa: BLE001
             raise ValueError(f"Failed to update room metadata: {e}")
@@ -201,17 +618,25 @@ class AzureTableRoomStore(RoomStore):
     async def delete_room_metadata(self, user_id: str, room_id: str) -> bool:
         if room_id == DEFAULT_ROOM_ID:
             return False
+
+        async def delete() -> None:
+            await (await self._metadata()).delete_entity(partition_key=user_id, row_key=room_id)
+
         try:
-            await asyncio.to_thread(self._metadata_client.delete_entity, partition_key=user_id, row_key=room_id)
+            await self._call(delete)
             return True
         except Exception:
             return False
 
     async def list_user_rooms(self, user_id: str) -> List[RoomMetadata]:
         rooms: List[RoomMetadata] = [RoomMetadata(room_id=DEFAULT_ROOM_ID, room_name="Public Chat", user_id="system", description="Default public room")]
+
+        async def query() -> List[Any]:
+            client = await self._metadata()
+            return [ent async for ent in client.query_entities("PartitionKey eq @user", parameters={"user": user_id})]
+
         try:
-            ents = self._metadata_client.query_entities(f"PartitionKey eq '{user_id}'")
-            for ent in ents:
+            for ent in await self._call(query):
                 rooms.append(self._metadata_from_entity(ent))
         except Exception:
             pass
@@ -223,5 +648,31 @@ class AzureTableRoomStore(RoomStore):
         room = await self.get_room_metadata(user_id, room_id)
         return room is not None
 
+    async def _metadata_index(self) -> RoomMetadataIndex:
+        """Index of every owner's rooms, built from a full scan of the metadata table.
+
+        The table is keyed by owner, so the cross-owner listings have no
+        server-side order to page through; each call scans and sorts instead
+        (fine for the room counts of this sample, unlike message history).
+        """
+        async def scan() -> List[Any]:
+            client = await self._metadata()
+            return [ent async for ent in client.list_entities(results_per_page=1000)]
+
+        index = RoomMetadataIndex()
+        for ent in await self._call(scan):
+            index.put(self._metadata_from_entity(ent))
+        return index
+
+    async def list_recent_rooms(self, limit: int, before: Optional[str] = None) -> Tuple[List[RoomMetadata], Optional[str]]:
+        key = decode_cursor(before)
+        rooms, last = (await self._metadata_index()).recent(max(limit, 0), key)
+        return rooms, encode_cursor(last)
+
+    async def search_rooms(self, prefix: str, limit: int, after: Optional[str] = None) -> Tuple[List[RoomMetadata], Optional[str]]:
+        key = decode_cursor(after)
+        rooms, last = (await self._metadata_index()).search(prefix, max(limit, 0), key)
+        return rooms, encode_cursor(last)
+
 
 __all__ = ["AzureTableRoomStore"]
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .models import RoomMetadata
 
 
 class RoomStore(ABC):
@@ -10,13 +13,27 @@ class RoomStore(ABC):
     async def register_room(self, room: str) -> None: ...
 
     @abstractmethod
-    async def record_room_event(self, room: str, event: Dict[str, Any]) -> None: ...
+    async def record_room_event(self, room: str, event: Mapping[str, Any]) -> None: ...
 
     @abstractmethod
-    async def append_message(self, room: str, event: Dict[str, Any]) -> None: ...
+    async def append_message(self, room: str, event: Mapping[str, Any]) -> None: ...
 
     @abstractmethod
-    async def get_room_messages(self, room: str, limit: Optional[int] = None) -> List[Dict[str, Any]]: ...
+    async def get_room_messages(self, room: str, limit: Optional[int] = None) -> Sequence[Mapping[str, Any]]: ...
+
+    async def get_room_messages_page(self, room: str, limit: int, before: Optional[str] = None) -> Tuple[Sequence[Mapping[str, Any]], Optional[str]]:
+        """Return up to *limit* messages older than cursor *before* (oldest -> newest)
+        plus the cursor for the next older page, or None when history is exhausted.
+
+        Messages are event dicts or `EventRecord`s (read-only mappings of the same
+        keys); `render_events` turns either into JSON-ready dicts.
+
+        Cursors are opaque strings produced by the same store. This default has no
+        cursor support and only serves the latest page.
+        """
+        if before is not None:
+            return [], None
+        return await self.get_room_messages(room, limit), None
 
     @abstractmethod
     async def list_rooms(self) -> List[Dict[str, Any]]: ...
@@ -24,6 +41,10 @@ class RoomStore(ABC):
     @abstractmethod
     async def remove_room_if_empty(self, room: str) -> None: ...
 
+    async def close(self) -> None:
+        """Flush buffered writes and release clients. The store stays usable (clients reopen lazily)."""
+        return None
+
     # -------- metadata API (new, merged) --------
     @abstractmethod
     async def create_room_metadata(self, user_id: str, room_name: str, *, room_id: Optional[str] = None, description: Optional[str] = None) -> "RoomMetadata": ...
@@ -43,6 +64,19 @@ class RoomStore(ABC):
     @abstractmethod
     async def room_exists(self, user_id: str, room_id: str) -> bool: ...
 
+    async def list_recent_rooms(self, limit: int, before: Optional[str] = None) -> Tuple[List["RoomMetadata"], Optional[str]]:
+        """Rooms of all owners, most recently updated first, paged like message history.
+
+        Returns up to *limit* rooms updated before cursor *before* plus the cursor
+        of the next page (None at the end). Stores without a global index raise
+        NotImplementedError.
+        """
+        raise NotImplementedError
+
+    async def search_rooms(self, prefix: str, limit: int, after: Optional[str] = None) -> Tuple[List["RoomMetadata"], Optional[str]]:
+        """Rooms of all owners whose name starts with *prefix* (case-insensitive), ordered by name."""
+        raise NotImplementedError
+
 
 __all__ = ["RoomStore"]
 
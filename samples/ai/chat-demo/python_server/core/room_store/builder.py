@@ -2,15 +2,57 @@ from __future__ import annotations
 
 import logging
 from os import getenv
+from typing import Any, Dict
 
 from .base import RoomStore
+from .caching import CachingRoomStore
 from .memory import InMemoryRoomStore
+from .segment_log import SegmentLogRoomStore
+from .wal import WalRoomStore
 try:
     from .azure_table import AzureTableRoomStore
 except Exception:  # pragma: no cover
     AzureTableRoomStore = None  # type: ignore
 
-from ..runtime_config import StorageMode
+from ..runtime_config import TRUTHY, StorageMode, env_float, env_int
+
+FALSY = {"0", "false", "no", "off"}
+
+
+def _retention_settings() -> Dict[str, Any]:
+    """Table-store retention from env: message cap, optional TTL and delete rate.
+
+    CHAT_MAX_MESSAGES_PER_ROOM=0 keeps every message; CHAT_MESSAGE_TTL_SECONDS
+    unset or 0 disables expiry.
+    """
+    return {
+        "max_messages_per_room": env_int("CHAT_MAX_MESSAGES_PER_ROOM", 200),
+        "message_ttl": env_float("CHAT_MESSAGE_TTL_SECONDS", 0) or None,
+        "retention_deletes_per_sec": env_float("CHAT_RETENTION_DELETES_PER_SEC", 200, exclusive=True),
+    }
+
+
+def _wal_settings() -> Dict[str, Any]:
+    """WAL-mode settings from env: log directory, fsync, commit and snapshot policy.
+
+    CHAT_WAL_FSYNC=false leaves durability to the OS page cache;
+    CHAT_WAL_SYNC_COMMIT=false acknowledges a message before its log line is
+    written (group commit still happens in the background).
+    """
+    settings: Dict[str, Any] = {"data_dir": (getenv("CHAT_WAL_DIR") or "").strip() or "./chat-wal"}
+    for env, key in (("CHAT_WAL_FSYNC", "fsync"), ("CHAT_WAL_SYNC_COMMIT", "sync_commit")):
+        raw = (getenv(env) or "true").strip().lower()
+        if raw not in TRUTHY | FALSY:
+            raise RuntimeError(f"Invalid {env}={raw}")
+        settings[key] = raw in TRUTHY
+    settings["snapshot_every"] = env_int("CHAT_WAL_SNAPSHOT_EVERY", 100000, minimum=1)
+    settings["max_messages"] = env_int("CHAT_MAX_MESSAGES_PER_ROOM", 200, minimum=1)
+    return settings
+
+
+def _cache_settings() -> Dict[str, float]:
+    """Read-through cache in front of the table store: TTL (0 disables the cache) and rooms with cached tails."""
+    return {"ttl": env_float("CHAT_CACHE_TTL_SECONDS", 30), "tail_rooms": env_int("CHAT_CACHE_TAIL_ROOMS", 1000)}
 
 
 def build_room_store(app_logger: logging.Logger, *, storage_mode: StorageMode = StorageMode.MEMORY) -> RoomStore:
@@ -21,6 +63,17 @@ def build_room_store(app_logger: logging.Logger, *, storage_mode: StorageMode =
     if storage_mode is StorageMode.MEMORY:
         return InMemoryRoomStore()
 
+    if storage_mode is StorageMode.WAL:
+        settings = _wal_settings()
+        wal_store = WalRoomStore(**settings)
+        app_logger.info("RoomStore: WAL (%s, fsync=%s)", settings["data_dir"], settings["fsync"])
+        return wal_store
+
+    if storage_mode is StorageMode.LOG:
+        log_dir = (getenv("CHAT_LOG_DIR") or "").strip() or "./chat-log"
+        app_logger.info("RoomStore: LOG (%s)", log_dir)
+        return SegmentLogRoomStore(log_dir)
+
     # Table mode
     az_conn = getenv("AZURE_STORAGE_CONNECTION_STRING")
     acct = getenv("AZURE_STORAGE_ACCOUNT")
@@ -28,9 +81,17 @@ def build_room_store(app_logger: logging.Logger, *, storage_mode: StorageMode =
         raise RuntimeError("STORAGE_MODE=table but azure-data-tables dependency not installed")
     if not (az_conn or acct):
         raise RuntimeError("STORAGE_MODE=table requires AZURE_STORAGE_CONNECTION_STRING or AZURE_STORAGE_ACCOUNT")
-    store = AzureTableRoomStore(connection_string=az_conn) if az_conn else AzureTableRoomStore(account_name=acct)
+    retention = _retention_settings()
+    cache = _cache_settings()
+    if az_conn:
+        store = AzureTableRoomStore(connection_string=az_conn, **retention)
+    else:
+        store = AzureTableRoomStore(account_name=acct, **retention)
     app_logger.info("RoomStore: TABLE (%s)", "conn_str" if az_conn else "account")
-    return store
+    if not cache["ttl"]:
+        return store
+    tail_size = retention["max_messages_per_room"] or 200  # what get_room_messages(room) returns
+    return CachingRoomStore(store, ttl=cache["ttl"], tail_rooms=int(cache["tail_rooms"]), tail_size=tail_size)
 
 
 __all__ = ["build_room_store"]
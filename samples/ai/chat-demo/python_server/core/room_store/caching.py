@@ -0,0 +1,307 @@
+"""Read-through caching in front of a remote `RoomStore`.
+
+`CachingRoomStore` wraps a store (in practice `AzureTableRoomStore`) and
+answers the hot reads from memory:
+
+- metadata: ``get_room_metadata`` / ``room_exists`` (misses are cached too;
+  a failed lookup raises and is not cached) and ``list_user_rooms``, in one
+  LRU with a TTL. Create, update and delete go to the store first and then
+  refresh or drop the affected entries.
+- history tails: the newest ``tail_size`` messages of up to ``tail_rooms``
+  rooms (LRU, same TTL), loaded on the first read and kept current by
+  ``record_room_event``. ``get_room_messages`` with ``limit <= tail_size`` is
+  served from the tail; so is the first ``get_room_messages_page`` when the
+  store hands out per-message cursors (``get_room_messages_keyed`` /
+  ``record_room_event_keyed``), because the page cursor is then known.
+  Older pages always go to the store.
+
+The TTL bounds how stale an entry can get when another process writes the
+same tables. Within this process an entry is never stale: a write that
+races a load or another write of the same room tail or metadata key drops
+the entry instead of guessing the order. `cache_stats()` reports hits,
+misses, evictions, expirations and invalidations per cache.
+"""
+from __future__ import annotations
+
+import contextlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, Hashable, Iterator, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+from .base import RoomStore
+from .models import EventRecord, RoomMetadata
+from .ring_buffer import RingBuffer
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    def to_dict(self, size: int) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class LruTtlCache(Generic[K, V]):
+    """Bounded mapping; least recently used entries are evicted, entries expire after *ttl* seconds."""
+
+    def __init__(self, capacity: int, ttl: float, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._items: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: K) -> Tuple[bool, Optional[V]]:
+        """``(True, value)`` on a hit, ``(False, None)`` on a miss (counted)."""
+        value = self.peek(key)
+        if key in self._items:
+            self.stats.hits += 1
+            self._items.move_to_end(key)
+            return True, value
+        self.stats.misses += 1
+        return False, None
+
+    def peek(self, key: K) -> Optional[V]:
+        """Value without counting a lookup or refreshing recency (None if absent)."""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[0] <= self._clock():
+            del self._items[key]
+            self.stats.expirations += 1
+            return None
+        return item[1]
+
+    def put(self, key: K, value: V) -> None:
+        self._items[key] = (self._clock() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+            self.stats.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        if self._items.pop(key, None) is not None:
+            self.stats.invalidations += 1
+
+
+class _Tail:
+    __slots__ = ("ring", "complete")
+
+    def __init__(self, capacity: int, items: Sequence[Tuple[Optional[str], Mapping[str, Any]]], complete: bool) -> None:
+        # (cursor of the message - None if the store has no per-message cursors -, message)
+        self.ring: RingBuffer[Tuple[Optional[str], Mapping[str, Any]]] = RingBuffer(capacity)
+        for item in items:
+            self.ring.append(item)
+        self.complete = complete  # no older messages than the ring holds
+
+
+class CachingRoomStore(RoomStore):
+    def __init__(
+        self,
+        inner: RoomStore,
+        *,
+        ttl: float = 30.0,
+        metadata_capacity: int = 10_000,
+        tail_rooms: int = 1_000,
+        tail_size: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.inner = inner
+        self.tail_size = tail_size
+        self._metadata: LruTtlCache[Tuple[str, ...], Any] = LruTtlCache(metadata_capacity, ttl, clock=clock)
+        self._tails: LruTtlCache[str, _Tail] = LruTtlCache(tail_rooms, ttl, clock=clock)
+        self._keyed = hasattr(inner, "get_room_messages_keyed") and hasattr(inner, "record_room_event_keyed")
+        # write ordering per room / metadata key: sequence number of the last write start/finish, writes in flight
+        self._seq = 0
+        self._last_write: Dict[Hashable, int] = {}
+        self._inflight: Dict[Hashable, int] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        # store-specific extras (flush, write_stats, compact, ...) pass through
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {"metadata": self._metadata.stats.to_dict(len(self._metadata)), "tails": self._tails.stats.to_dict(len(self._tails))}
+
+    # -------- history --------
+    async def register_room(self, room: str) -> None:
+        await self.inner.register_room(room)
+
+    async def record_room_event(self, room: str, event: Mapping[str, Any]) -> None:
+        self._seq += 1
+        mark = self._last_write[room] = self._seq
+        self._inflight[room] = self._inflight.get(room, 0) + 1
+        before = self._tails.peek(room)
+        key: Optional[str] = None
+        try:
+            if self._keyed:
+                key = await self.inner.record_room_event_keyed(room, event)  # type: ignore[attr-defined]
+            else:
+                await self.inner.record_room_event(room, event)
+        finally:
+            left = self._inflight.pop(room) - 1
+            if left:
+                self._inflight[room] = left
+            raced = left > 0 or self._last_write[room] != mark
+            self._seq += 1
+            self._last_write[room] = self._seq
+        tail = self._tails.peek(room)
+        if tail is None:
+            return
+        if tail is before and not raced:
+            tail.ring.append((key, event if isinstance(event, EventRecord) else dict(event)))
+            if tail.ring.appended > tail.ring.capacity:
+                tail.complete = False  # the oldest cached message was just dropped
+        else:
+            self._tails.invalidate(room)
+
+    async def append_message(self, room: str, event: Mapping[str, Any]) -> None:
+        await self.record_room_event(room, event)
+
+    async def _tail(self, room: str, need: int) -> _Tail:
+        """Cached tail holding at least *need* messages (or all of them), loading it on a miss."""
+        _hit, tail = self._tails.get(room)
+        if tail is not None and (tail.complete or len(tail.ring) >= need):
+            return tail
+        started = self._seq
+        if self._keyed:
+            items, cursor = await self.inner.get_room_messages_keyed(room, self.tail_size)  # type: ignore[attr-defined]
+            complete = cursor is None
+        else:
+            messages = await self.inner.get_room_messages(room, self.tail_size)
+            items, complete = [(None, m) for m in messages], len(messages) < self.tail_size
+        tail = _Tail(self.tail_size, items, complete)
+        if room in self._inflight or self._last_write.get(room, 0) > started:
+            return tail  # a write raced the load: answer from it, do not keep it
+        self._tails.put(room, tail)
+        return tail
+
+    async def get_room_messages(self, room: str, limit: Optional[int] = None) -> Sequence[Mapping[str, Any]]:
+        n = self.tail_size if limit is None or limit < 0 else limit
+        if n > self.tail_size:
+            return await self.inner.get_room_messages(room, limit)
+        tail = await self._tail(room, n)
+        return [msg for _key, msg in tail.ring.newest(n)]
+
+    async def get_room_messages_page(self, room: str, limit: int, before: Optional[str] = None) -> Tuple[Sequence[Mapping[str, Any]], Optional[str]]:
+        if before is not None or not self._keyed or not 0 < limit <= self.tail_size:
+            return await self.inner.get_room_messages_page(room, limit, before)
+        tail = await self._tail(room, limit)
+        page = tail.ring.newest(limit)
+        older = len(tail.ring) > len(page) or not tail.complete
+        return [msg for _key, msg in page], (page[0][0] if page and older else None)
+
+    async def list_rooms(self) -> List[Dict[str, Any]]:
+        return await self.inner.list_rooms()
+
+    async def remove_room_if_empty(self, room: str) -> None:
+        await self.inner.remove_room_if_empty(room)
+        self._tails.invalidate(room)
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+    # -------- metadata --------
+    @contextlib.contextmanager
+    def _writing(self, *keys: Tuple[str, ...]) -> Iterator[None]:
+        """Mark a metadata write of *keys* (start and finish), so loads it races are not kept."""
+        self._seq += 1
+        for key in keys:
+            self._last_write[key] = self._seq
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            self._seq += 1
+            for key in keys:
+                left = self._inflight.pop(key) - 1
+                if left:
+                    self._inflight[key] = left
+                self._last_write[key] = self._seq
+
+    def _fill(self, key: Tuple[str, ...], value: Any, started: int) -> None:
+        """Cache what a load that began at *started* returned, unless a write of *key* raced it."""
+        if key in self._inflight or self._last_write.get(key, 0) > started:
+            return
+        self._metadata.put(key, value)
+
+    async def create_room_metadata(self, user_id: str, room_name: str, *, room_id: Optional[str] = None, description: Optional[str] = None) -> RoomMetadata:
+        keys = (("room", user_id, room_id), ("user", user_id)) if room_id else (("user", user_id),)
+        with self._writing(*keys):
+            room = await self.inner.create_room_metadata(user_id, room_name, room_id=room_id, description=description)
+        self._metadata.put(("room", user_id, room.room_id), room)
+        self._metadata.invalidate(("user", user_id))
+        return room
+
+    async def get_room_metadata(self, user_id: str, room_id: str) -> Optional[RoomMetadata]:
+        key = ("room", user_id, room_id)
+        hit, room = self._metadata.get(key)
+        if hit:
+            return room
+        started = self._seq
+        room = await self.inner.get_room_metadata(user_id, room_id)  # a failure raises: nothing cached
+        self._fill(key, room, started)
+        return room
+
+    async def update_room_metadata(self, user_id: str, room_id: str, *, room_name: Optional[str] = None, description: Optional[str] = None) -> RoomMetadata:
+        key = ("room", user_id, room_id)
+        try:
+            with self._writing(key, ("user", user_id)):
+                room = await self.inner.update_room_metadata(user_id, room_id, room_name=room_name, description=description)
+        except Exception:
+            self._metadata.invalidate(key)
+            raise
+        self._metadata.put(key, room)
+        self._metadata.invalidate(("user", user_id))
+        return room
+
+    async def delete_room_metadata(self, user_id: str, room_id: str) -> bool:
+        with self._writing(("room", user_id, room_id), ("user", user_id)):
+            deleted = await self.inner.delete_room_metadata(user_id, room_id)
+        self._metadata.invalidate(("room", user_id, room_id))
+        self._metadata.invalidate(("user", user_id))
+        return deleted
+
+    async def list_user_rooms(self, user_id: str) -> List[RoomMetadata]:
+        key = ("user", user_id)
+        hit, cached = self._metadata.get(key)
+        if hit:
+            return list(cached or ())
+        started = self._seq
+        rooms = await self.inner.list_user_rooms(user_id)
+        self._fill(key, rooms, started)
+        return list(rooms)
+
+    async def room_exists(self, user_id: str, room_id: str) -> bool:
+        return await self.get_room_metadata(user_id, room_id) is not None
+
+    async def list_recent_rooms(self, limit: int, before: Optional[str] = None) -> Tuple[List[RoomMetadata], Optional[str]]:
+        return await self.inner.list_recent_rooms(limit, before)
+
+    async def search_rooms(self, prefix: str, limit: int, after: Optional[str] = None) -> Tuple[List[RoomMetadata], Optional[str]]:
+        return await self.inner.search_rooms(prefix, limit, after)
+
+
+__all__ = ["CachingRoomStore", "LruTtlCache", "CacheStats"]
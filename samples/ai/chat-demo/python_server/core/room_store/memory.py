@@ -1,18 +1,22 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 from .base import RoomStore
-from .models import RoomMetadata
+from .metadata_index import RoomMetadataIndex, decode_cursor, encode_cursor
+from .models import EventRecord, RoomMetadata
+from .ring_buffer import RingBuffer, RingView
 from ...config import DEFAULT_ROOM_ID
 
 
 class InMemoryRoomStore(RoomStore):
     def __init__(self, *, max_messages: int = 200) -> None:
-        # message history
-        self._room_messages: Dict[str, List[Dict[str, Any]]] = {}
+        # message history: one fixed-capacity ring per room; positions are
+        # absolute (events ever appended), which is what cursors hand out.
+        # Standard events are kept as compact EventRecords, anything else as given.
+        self._room_messages: Dict[str, RingBuffer[Mapping[str, Any]]] = {}
         self._max_room_messages = max_messages
-        self._room_messages.setdefault(DEFAULT_ROOM_ID, [])
+        self._room_messages.setdefault(DEFAULT_ROOM_ID, RingBuffer(max_messages))
         # metadata storage: { user_id: { room_id: RoomMetadata } }
         self._user_rooms: Dict[str, Dict[str, RoomMetadata]] = {}
         self._default_room = RoomMetadata(
@@ -21,37 +25,60 @@ class InMemoryRoomStore(RoomStore):
             user_id="system",
             description="Default public room",
         )
+        # global views over all owners: room_id -> owner, by updated_at, by name
+        self._index = RoomMetadataIndex()
+        self._index.put(self._default_room)
+
+    def _ring(self, room: str) -> RingBuffer[Mapping[str, Any]]:
+        ring = self._room_messages.get(room)
+        if ring is None:
+            ring = self._room_messages[room] = RingBuffer(self._max_room_messages)
+        return ring
 
     # -------- history API --------
     async def register_room(self, room: str) -> None:
         # backwards compat: ensure room appears in list_rooms even without messages
-        self._room_messages.setdefault(room, [])
+        self._ring(room)
 
-    async def record_room_event(self, room: str, event: Dict[str, Any]) -> None:
-        self._room_messages.setdefault(room, []).append(event)
-        msgs = self._room_messages[room]
-        if len(msgs) > self._max_room_messages:
-            overflow = len(msgs) - self._max_room_messages
-            del msgs[:overflow]
+    async def record_room_event(self, room: str, event: Mapping[str, Any]) -> None:
+        self._ring(room).append(EventRecord.from_event(event) or event)
 
-    async def append_message(self, room: str, event: Dict[str, Any]) -> None:
+    async def append_message(self, room: str, event: Mapping[str, Any]) -> None:
         await self.record_room_event(room, event)
 
-    async def get_room_messages(self, room: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        msgs = list(self._room_messages.get(room, []))
-        if limit is not None and limit >= 0:
-            return msgs[-limit:]
-        return msgs
+    def messages_view(self, room: str, limit: Optional[int] = None) -> RingView[Mapping[str, Any]]:
+        """Zero-copy view of the newest *limit* messages (all retained if None), oldest first."""
+        ring = self._room_messages.get(room) or RingBuffer(0)
+        return ring.tail(limit if limit is not None and limit >= 0 else len(ring))
+
+    async def get_room_messages(self, room: str, limit: Optional[int] = None) -> List[Mapping[str, Any]]:
+        ring = self._room_messages.get(room)
+        if ring is None:
+            return []
+        return ring.newest(len(ring) if limit is None or limit < 0 else limit)
+
+    async def get_room_messages_page(self, room: str, limit: int, before: Optional[str] = None) -> Tuple[List[Mapping[str, Any]], Optional[str]]:
+        ring = self._room_messages.get(room) or RingBuffer(0)
+        end = ring.appended
+        if before is not None:
+            try:
+                end = int(before)
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {before!r}") from None
+        if limit <= 0:
+            return [], None  # an empty page never points at an older one
+        page = ring.view(end - limit, end)
+        cursor = str(page.start) if page.start > ring.first else None
+        return page.to_list(), cursor
 
     async def list_rooms(self) -> List[Dict[str, Any]]:
-        names = [name for name in self._room_messages.keys()]
-        return [{"name": name, "messages": len(self._room_messages.get(name, []))} for name in names]
+        return [{"name": name, "messages": len(ring)} for name, ring in self._room_messages.items()]
 
     async def remove_room_if_empty(self, room: str) -> None:
         if room == DEFAULT_ROOM_ID:
             return
-        msgs = self._room_messages.get(room)
-        if msgs is not None and len(msgs) == 0:
+        ring = self._room_messages.get(room)
+        if ring is not None and len(ring) == 0:
             self._room_messages.pop(room, None)
 
     # -------- metadata API --------
@@ -62,12 +89,18 @@ class InMemoryRoomStore(RoomStore):
             self._user_rooms[user_id] = {}
         if not room_id:
             room_id = f"room_{uuid.uuid4().hex[:8]}"
+            while self._index.owner_of(room_id) is not None:
+                room_id = f"room_{uuid.uuid4().hex[:8]}"
         # Idempotent: return existing
         existing = self._user_rooms[user_id].get(room_id)
         if existing:
             return existing
+        # room ids are global (history, groups, the index): one owner each
+        if self._index.owner_of(room_id) is not None:
+            raise ValueError(f"Room {room_id} already exists")
         room = RoomMetadata(room_id=room_id, room_name=room_name, user_id=user_id, description=description)
         self._user_rooms[user_id][room_id] = room
+        self._index.put(room)
         return room
 
     async def get_room_metadata(self, user_id: str, room_id: str) -> Optional[RoomMetadata]:
@@ -86,6 +119,7 @@ class InMemoryRoomStore(RoomStore):
         from datetime import datetime, timezone
 
         room.updated_at = datetime.now(timezone.utc).isoformat()
+        self._index.put(room)
         return room
 
     async def delete_room_metadata(self, user_id: str, room_id: str) -> bool:
@@ -94,6 +128,7 @@ class InMemoryRoomStore(RoomStore):
         rooms = self._user_rooms.get(user_id)
         if rooms and room_id in rooms:
             rooms.pop(room_id, None)
+            self._index.discard(room_id, user_id)
             return True
         return False
 
@@ -108,5 +143,21 @@ class InMemoryRoomStore(RoomStore):
             return True
         return room_id in self._user_rooms.get(user_id, {})
 
+    # -------- indexed lookups across owners --------
+    async def find_room(self, room_id: str) -> Optional[RoomMetadata]:
+        """Room metadata by id, whoever owns it."""
+        return self._index.get(room_id)
+
+    async def get_room_owner(self, room_id: str) -> Optional[str]:
+        return self._index.owner_of(room_id)
+
+    async def list_recent_rooms(self, limit: int, before: Optional[str] = None) -> Tuple[List[RoomMetadata], Optional[str]]:
+        rooms, last = self._index.recent(max(limit, 0), decode_cursor(before))
+        return rooms, encode_cursor(last)
+
+    async def search_rooms(self, prefix: str, limit: int, after: Optional[str] = None) -> Tuple[List[RoomMetadata], Optional[str]]:
+        rooms, last = self._index.search(prefix, max(limit, 0), decode_cursor(after))
+        return rooms, encode_cursor(last)
+
 
 __all__ = ["InMemoryRoomStore"]
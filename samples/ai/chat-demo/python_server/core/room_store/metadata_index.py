@@ -0,0 +1,178 @@
+"""Secondary indexes over room metadata for `InMemoryRoomStore`.
+
+Metadata is stored per owner (``user_id -> {room_id -> RoomMetadata}``);
+`RoomMetadataIndex` adds the global views that layout cannot answer without
+a full walk. Room ids are global, so the index holds one room per id: the
+store refuses an id another owner already has.
+
+- ``room_id -> owner``;
+- rooms ordered by ``updated_at`` (ISO strings sort chronologically), for
+  paged "recently updated" listings;
+- rooms ordered by case-folded name, for prefix search.
+
+Both orders are `SortedKeys`: sorted blocks of at most ``2 * load`` keys, so an
+insert or removal moves a block's worth of references rather than a
+million-entry list, and a page read is a bisect plus a walk over the page.
+"""
+from __future__ import annotations
+
+import bisect
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .models import RoomMetadata
+
+Key = Tuple[str, str]
+
+
+class SortedKeys:
+    """Sorted multiset of ``(sort value, room_id)`` keys stored in blocks."""
+
+    __slots__ = ("_load", "_blocks", "_maxes", "_len")
+
+    def __init__(self, load: int = 512) -> None:
+        self._load = load
+        self._blocks: List[List[Key]] = []
+        self._maxes: List[Key] = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, key: Key) -> None:
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._len = 1
+            return
+        b = min(bisect.bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[b]
+        bisect.insort(block, key)
+        self._maxes[b] = block[-1]
+        self._len += 1
+        if len(block) > 2 * self._load:
+            self._blocks[b:b + 1] = [block[:self._load], block[self._load:]]
+            self._maxes[b:b + 1] = [block[self._load - 1], block[-1]]
+
+    def remove(self, key: Key) -> bool:
+        b = bisect.bisect_left(self._maxes, key)
+        if b == len(self._blocks):
+            return False
+        block = self._blocks[b]
+        i = bisect.bisect_left(block, key)
+        if i == len(block) or block[i] != key:
+            return False
+        del block[i]
+        self._len -= 1
+        if block:
+            self._maxes[b] = block[-1]
+        else:
+            del self._blocks[b]
+            del self._maxes[b]
+        return True
+
+    def iter_from(self, key: Optional[Key] = None, *, reverse: bool = False) -> Iterator[Key]:
+        """Keys > *key* ascending, or keys < *key* descending (all when *key* is None)."""
+        blocks = self._blocks
+        if not reverse:
+            b = 0 if key is None else bisect.bisect_right(self._maxes, key)
+            if b == len(blocks):
+                return
+            i = 0 if key is None else bisect.bisect_right(blocks[b], key)
+            for block in blocks[b:]:
+                yield from block[i:]
+                i = 0
+        else:
+            b = len(blocks) - 1 if key is None else min(bisect.bisect_left(self._maxes, key), len(blocks) - 1)
+            if b < 0:
+                return
+            i = len(blocks[b]) if key is None else bisect.bisect_left(blocks[b], key)
+            while b >= 0:
+                block = blocks[b]
+                for j in range(i - 1, -1, -1):
+                    yield block[j]
+                b -= 1
+                i = len(blocks[b]) if b >= 0 else 0
+
+
+def name_key(name: str) -> str:
+    return name.casefold()
+
+
+class RoomMetadataIndex:
+    def __init__(self) -> None:
+        self._rooms: Dict[str, RoomMetadata] = {}
+        self._keys: Dict[str, Tuple[Key, Key]] = {}  # room_id -> (updated key, name key)
+        self.by_updated = SortedKeys()
+        self.by_name = SortedKeys()
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def get(self, room_id: str) -> Optional[RoomMetadata]:
+        return self._rooms.get(room_id)
+
+    def owner_of(self, room_id: str) -> Optional[str]:
+        room = self._rooms.get(room_id)
+        return room.user_id if room is not None else None
+
+    def put(self, room: RoomMetadata) -> None:
+        """Index *room*, replacing the entries of its previous state."""
+        self.discard(room.room_id)
+        keys = ((room.updated_at, room.room_id), (name_key(room.room_name), room.room_id))
+        self._rooms[room.room_id] = room
+        self._keys[room.room_id] = keys
+        self.by_updated.add(keys[0])
+        self.by_name.add(keys[1])
+
+    def discard(self, room_id: str, user_id: Optional[str] = None) -> None:
+        """Drop *room_id*; with *user_id*, only if that user owns the indexed room."""
+        if user_id is not None and self.owner_of(room_id) != user_id:
+            return
+        keys = self._keys.pop(room_id, None)
+        if keys is not None:
+            self._rooms.pop(room_id, None)
+            self.by_updated.remove(keys[0])
+            self.by_name.remove(keys[1])
+
+    def recent(self, limit: int, before: Optional[Key] = None) -> Tuple[List[RoomMetadata], Optional[Key]]:
+        """Up to *limit* rooms updated before key *before*, newest first, and the next-page key."""
+        out: List[RoomMetadata] = []
+        last: Optional[Key] = None
+        for key in self.by_updated.iter_from(before, reverse=True):
+            if len(out) >= limit:
+                return out, last
+            out.append(self._rooms[key[1]])
+            last = key
+        return out, None
+
+    def search(self, prefix: str, limit: int, after: Optional[Key] = None) -> Tuple[List[RoomMetadata], Optional[Key]]:
+        """Up to *limit* rooms whose name starts with *prefix* (case-insensitive), by name."""
+        folded = name_key(prefix)
+        start: Key = after if after is not None and after[0] >= folded else (folded, "")
+        out: List[RoomMetadata] = []
+        last: Optional[Key] = None
+        for key in self.by_name.iter_from(start):
+            if not key[0].startswith(folded):
+                break
+            if len(out) >= limit:
+                return out, last
+            out.append(self._rooms[key[1]])
+            last = key
+        return out, None
+
+
+def encode_cursor(key: Optional[Tuple[str, str]]) -> Optional[str]:
+    # room ids never contain "|", the sort value (timestamp or name) may
+    return f"{key[1]}|{key[0]}" if key is not None else None
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    if cursor is None:
+        return None
+    room_id, sep, value = cursor.partition("|")
+    if not sep or not room_id:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return value, room_id
+
+
+__all__ = ["RoomMetadataIndex", "SortedKeys", "decode_cursor", "encode_cursor", "name_key"]
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
 
 
 class RoomMetadata:
@@ -47,5 +50,105 @@ class RoomMetadata:
         )
 
 
-__all__ = ["RoomMetadata"]
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MS = timedelta(milliseconds=1)
+_EVENT_FIELDS = {"type": "type", "messageId": "message_id", "from": "sender", "message": "message"}
+_EVENT_KEYS = ("type", "messageId", "from", "message", "timestamp")
+
+
+class EventRecord(Mapping[str, Any]):
+    """Compact stored chat event.
+
+    Holds the usual ``{type, messageId, from, message, timestamp}`` event in
+    five slots instead of a dict: ``type`` and the sender id are interned (a
+    room repeats a handful of senders), and the timestamp is an int of epoch
+    milliseconds. It reads like the event dict (``ev["from"]``,
+    ``ev.get("message")``); the ISO timestamp string is only built when asked
+    for, and `to_dict` renders the JSON shape at API boundaries.
+    """
+
+    __slots__ = ("type", "message_id", "sender", "message", "ts_ms")
+
+    def __init__(self, type: Optional[str], message_id: Optional[str], sender: Optional[str], message: Any, ts_ms: Optional[int]) -> None:
+        self.type = sys.intern(type) if isinstance(type, str) else type
+        self.message_id = message_id
+        self.sender = sys.intern(sender) if isinstance(sender, str) else sender
+        self.message = message
+        self.ts_ms = ts_ms
+
+    @classmethod
+    def now(cls, type: str, message_id: Optional[str], sender: Optional[str], message: Any) -> "EventRecord":
+        return cls(type, message_id, sender, message, time.time_ns() // 1_000_000)
+
+    @classmethod
+    def from_event(cls, event: Mapping[str, Any]) -> Optional["EventRecord"]:
+        """Compact *event* if it has only the standard keys; None if it must stay a dict."""
+        if isinstance(event, EventRecord):
+            return event
+        if not event.keys() <= _EVENT_FIELDS.keys() | {"timestamp"}:
+            return None
+        ts = event.get("timestamp")
+        ts_ms: Optional[int] = None
+        if ts is not None:
+            if not isinstance(ts, str):
+                return None
+            try:
+                dt = datetime.fromisoformat(ts)
+            except ValueError:
+                return None
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            ts_ms = (dt - _EPOCH) // _MS
+        sender, message_id, type_ = event.get("from"), event.get("messageId"), event.get("type")
+        if not all(v is None or isinstance(v, str) for v in (sender, message_id, type_)):
+            return None
+        return cls(type_, message_id, sender, event.get("message"), ts_ms)
+
+    @property
+    def timestamp(self) -> Optional[str]:
+        if self.ts_ms is None:
+            return None
+        return (_EPOCH + self.ts_ms * _MS).isoformat(timespec="milliseconds")
+
+    def __getitem__(self, key: str) -> Any:
+        attr = _EVENT_FIELDS.get(key)
+        if attr is not None:
+            return getattr(self, attr)
+        if key == "timestamp":
+            return self.timestamp
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        attr = _EVENT_FIELDS.get(key)
+        if attr is not None:
+            return getattr(self, attr)
+        if key == "timestamp":
+            return self.timestamp
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_EVENT_KEYS)
+
+    def __len__(self) -> int:
+        return len(_EVENT_KEYS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": self.type,
+            "messageId": self.message_id,
+            "from": self.sender,
+            "message": self.message,
+            "timestamp": self.timestamp,
+        }
+
+    def __repr__(self) -> str:
+        return f"EventRecord({self.to_dict()!r})"
+
+
+def render_events(events: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """JSON-ready dicts for stored events (records are rendered, dicts pass through)."""
+    return [ev.to_dict() if isinstance(ev, EventRecord) else dict(ev) for ev in events]
+
+
+__all__ = ["RoomMetadata", "EventRecord", "render_events"]
 
@@ -0,0 +1,155 @@
+"""Background retention for room history (message cap and/or TTL).
+
+`RetentionWorker` owns the schedule: the store marks rooms as due (over their
+cap, or holding rows that may have expired) and one background task compacts
+due rooms every ``interval`` seconds, oldest mark first, through the store's
+``compact(room)`` callback, which returns the number of rows it deleted.
+
+Compaction must not compete with live traffic, so every delete goes through
+`RetentionWorker.throttle`: a token bucket of ``deletes_per_sec`` rows, and a
+pause while the foreground write backlog exceeds ``max_backlog`` rows.
+Compaction lag is the age of the oldest room still waiting to be trimmed.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+@dataclass
+class RetentionStats:
+    passes: int = 0
+    rooms_compacted: int = 0
+    rows_reclaimed: int = 0
+    failures: int = 0
+    throttled: float = 0.0
+    max_lag: float = 0.0
+    last_pass: float = 0.0
+
+
+class RetentionWorker:
+    def __init__(
+        self,
+        compact: Callable[[str], Awaitable[int]],
+        *,
+        interval: float = 30.0,
+        deletes_per_sec: float = 200.0,
+        backlog: Optional[Callable[[], int]] = None,
+        max_backlog: int = 100,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        if deletes_per_sec <= 0:
+            raise ValueError("deletes_per_sec must be > 0")
+        self._compact = compact
+        self.interval = interval
+        self.deletes_per_sec = deletes_per_sec
+        self._backlog = backlog or (lambda: 0)
+        self.max_backlog = max_backlog
+        self.stats = RetentionStats()
+        self._log = logger or logging.getLogger("room_store.retention")
+        self._due: Dict[str, float] = {}
+        self._tokens = deletes_per_sec
+        self._refilled = time.monotonic()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    # ---- scheduling ----
+    def mark(self, room: str) -> None:
+        """Schedule *room* for compaction (keeps the earliest mark time)."""
+        self._due.setdefault(room, time.monotonic())
+
+    def lag(self) -> float:
+        """Seconds the longest-waiting due room has been waiting."""
+        return time.monotonic() - min(self._due.values()) if self._due else 0.0
+
+    def pending(self) -> int:
+        return len(self._due)
+
+    def start(self) -> None:
+        """Start the background task on the running loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def reset(self) -> None:
+        """Forget the task of an event loop that no longer runs."""
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_pass()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001
+                self._log.debug("Retention pass failed", exc_info=True)
+
+    async def run_pass(self) -> int:
+        """Compact every room due now; returns the rows reclaimed."""
+        started = time.monotonic()
+        reclaimed = 0
+        for room, since in sorted(self._due.items(), key=lambda kv: kv[1]):
+            if self._due.get(room) != since:
+                continue
+            del self._due[room]
+            try:
+                rows = await self._compact(room)
+            except Exception as e:  # noqa: BLE001
+                self.stats.failures += 1
+                self._due.setdefault(room, since)
+                self._log.debug("Compaction of room %s failed: %r", room, e)
+                continue
+            self.stats.max_lag = max(self.stats.max_lag, time.monotonic() - since)
+            if rows:
+                self.stats.rooms_compacted += 1
+                reclaimed += rows
+        self.stats.passes += 1
+        self.stats.rows_reclaimed += reclaimed
+        self.stats.last_pass = time.monotonic() - started
+        if reclaimed:
+            self._log.info("Retention reclaimed %d rows in %.2fs", reclaimed, self.stats.last_pass)
+        return reclaimed
+
+    # ---- throttling ----
+    async def throttle(self, rows: int) -> None:
+        """Wait until *rows* deletes may be issued without crowding out foreground writes."""
+        started = time.monotonic()
+        while self._backlog() > self.max_backlog:
+            await asyncio.sleep(0.05)
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.deletes_per_sec, self._tokens + (now - self._refilled) * self.deletes_per_sec)
+            self._refilled = now
+            need = min(rows, self.deletes_per_sec)
+            if self._tokens >= need:
+                self._tokens -= need
+                break
+            await asyncio.sleep((need - self._tokens) / self.deletes_per_sec)
+        self.stats.throttled += time.monotonic() - started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "passes": self.stats.passes,
+            "roomsCompacted": self.stats.rooms_compacted,
+            "rowsReclaimed": self.stats.rows_reclaimed,
+            "failures": self.stats.failures,
+            "roomsPending": len(self._due),
+            "compactionLagSeconds": round(self.lag(), 3),
+            "maxCompactionLagSeconds": round(self.stats.max_lag, 3),
+            "throttledSeconds": round(self.stats.throttled, 3),
+            "lastPassSeconds": round(self.stats.last_pass, 3),
+        }
+
+
+__all__ = ["RetentionWorker", "RetentionStats"]
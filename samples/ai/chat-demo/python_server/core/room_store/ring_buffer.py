@@ -0,0 +1,155 @@
+"""Fixed-capacity message history for `InMemoryRoomStore`.
+
+`RingBuffer` keeps the newest ``capacity`` items of a room. Appends are O(1):
+the backing list grows until it is full, then the oldest slot is overwritten
+in place (no ``del msgs[:n]`` shift). Items are addressed by absolute
+position - the number of items appended before them - which is what history
+cursors hand out.
+
+`RingBuffer.view` returns a `RingView`, a read-only sequence over a position
+range that reads the buffer in place instead of copying it. A view does not
+pin its items: once an item is overwritten, reading it raises ``IndexError``.
+`RingBuffer.copy` returns the same range as a list built from at most two
+slices, i.e. it copies only the references asked for.
+"""
+from __future__ import annotations
+
+import itertools
+from typing import Generic, Iterator, List, Sequence, Tuple, TypeVar, overload
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    __slots__ = ("capacity", "appended", "_items")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(0, capacity)
+        self.appended = 0  # items ever appended; absolute position of the next one
+        self._items: List[T] = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def first(self) -> int:
+        """Absolute position of the oldest retained item."""
+        return self.appended - len(self._items)
+
+    def append(self, item: T) -> None:
+        if len(self._items) < self.capacity:
+            self._items.append(item)
+        elif self.capacity:
+            self._items[self.appended % self.capacity] = item
+        self.appended += 1
+
+    @classmethod
+    def restore(cls, capacity: int, items: Sequence[T], appended: int) -> "RingBuffer[T]":
+        """Rebuild a ring holding *items* (oldest first) as the newest of *appended* appends.
+
+        Positions survive only while the history still fills the buffer; a
+        partial history (e.g. after raising the capacity) restarts at 0.
+        """
+        ring: RingBuffer[T] = cls(capacity)
+        kept = list(items[max(0, len(items) - ring.capacity):]) if ring.capacity else []
+        if len(kept) < ring.capacity or appended < len(kept):
+            ring._items = kept
+            ring.appended = len(kept)
+            return ring
+        shift = ring.capacity - (appended - len(kept)) % ring.capacity
+        ring._items = kept[shift:] + kept[:shift]
+        ring.appended = appended
+        return ring
+
+    def at(self, pos: int) -> T:
+        """Item at absolute position *pos*."""
+        if not self.appended - len(self._items) <= pos < self.appended:
+            raise IndexError(f"position {pos} is not retained")
+        return self._items[pos % self.capacity]
+
+    def _clamp(self, start: int, end: int) -> Tuple[int, int]:
+        first = self.appended - len(self._items)
+        end = first if end < first else min(end, self.appended)
+        return (first if start < first else min(start, end)), end
+
+    def _slots(self, start: int, end: int) -> Tuple[int, int]:
+        """Backing-list indexes [lo, hi) of a retained range; lo >= hi means it wraps."""
+        if start == end:
+            return 0, 0
+        return start % self.capacity, (end - 1) % self.capacity + 1
+
+    def view(self, start: int, end: int) -> "RingView[T]":
+        """Items at absolute positions [start, end), clamped to what is retained."""
+        return RingView(self, *self._clamp(start, end))
+
+    def tail(self, n: int) -> "RingView[T]":
+        """The newest *n* items, oldest first."""
+        return self.view(self.appended - max(n, 0), self.appended)
+
+    def copy(self, start: int, end: int) -> List[T]:
+        """List of the items at absolute positions [start, end), clamped to what is retained."""
+        lo, hi = self._slots(*self._clamp(start, end))
+        if lo < hi or lo == hi == 0:
+            return self._items[lo:hi]
+        return self._items[lo:] + self._items[:hi]
+
+    def newest(self, n: int) -> List[T]:
+        """List of the newest *n* items, oldest first (the hot path of history reads)."""
+        items = self._items
+        size = len(items)
+        n = size if n > size else max(n, 0)
+        if size < self.capacity:  # not wrapped yet
+            return items[size - n:]
+        start = (self.appended - n) % size
+        if start + n <= size:
+            return items[start:start + n]
+        return items[start:] + items[:start + n - size]
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.tail(len(self._items)))
+
+
+class RingView(Sequence[T]):
+    __slots__ = ("_ring", "start", "end")
+
+    def __init__(self, ring: RingBuffer[T], start: int, end: int) -> None:
+        self._ring = ring
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[T]: ...
+
+    def __getitem__(self, index: int | slice) -> T | List[T]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("view index out of range")
+        return self._ring.at(self.start + index)
+
+    def _check(self) -> None:
+        if self.start < self._ring.first:
+            raise IndexError(f"position {self.start} is not retained")
+
+    def __iter__(self) -> Iterator[T]:
+        self._check()
+        items = self._ring._items
+        lo, hi = self._ring._slots(self.start, self.end)
+        if lo < hi or lo == hi == 0:
+            return map(items.__getitem__, range(lo, hi))
+        return map(items.__getitem__, itertools.chain(range(lo, len(items)), range(hi)))
+
+    def to_list(self) -> List[T]:
+        self._check()
+        return self._ring.copy(self.start, self.end)
+
+
+__all__ = ["RingBuffer", "RingView"]
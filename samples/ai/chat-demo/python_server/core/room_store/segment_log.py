@@ -0,0 +1,401 @@
+"""On-disk message log per room, read through memory maps.
+
+`SegmentLogRoomStore` keeps every message of a room (``STORAGE_MODE=log``)
+without holding it in memory, and serves "latest N" and cursor pages by
+decoding only the N records asked for.
+
+Layout under ``data_dir/rooms/<room dir>/``: segments of up to
+``segment_records`` records, named by the absolute position of their first
+record. ``<base>.log`` holds the records back to back (one JSON value each:
+a ``[type, messageId, from, message, ts_ms]`` list for `EventRecord`s, the
+event object otherwise); ``<base>.idx`` holds one fixed-width ``(offset,
+length)`` entry per record, so record *i* is found with arithmetic rather
+than a scan. Reads map both files (re-mapping a segment only after it
+grew) and slice the records out of the mapping. The room dir is the hex
+room name; names too long for that (over 127 bytes) use ``h-`` plus a
+sha256 prefix, with the name itself in the dir's ``room`` file.
+
+Appends are two ``write`` calls (record, then index entry), left to the OS
+page cache: they survive a process crash, not a power loss. A record whose
+index entry is missing or points past the data (torn write) is cut off when
+the room is opened. At most ``max_open_rooms`` rooms keep file handles and
+mappings open (least recently used are closed).
+
+All file access (appends, mapped reads that may page-fault, metadata
+appends) runs on the store's own I/O thread, one call at a time in the
+order they were made: the event loop never waits on the disk, and a read
+sees every append made before it. Appends queued in the same loop iteration
+go to the thread together, as one call.
+
+Room metadata stays in memory (`InMemoryRoomStore`) and is persisted as an
+append-only ``rooms.jsonl``, rewritten compactly on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, TypeVar
+
+from .memory import InMemoryRoomStore
+from .models import EventRecord, RoomMetadata
+from ...config import DEFAULT_ROOM_ID
+
+_LOG = logging.getLogger(__name__)
+_INDEX = struct.Struct("<QI")  # record offset in the data file, record length
+_METADATA = "rooms.jsonl"
+_MAX_HEX_NAME = 127  # bytes: the hex name stays within the usual 255-byte file-name limit
+_NAME_FILE = "room"
+
+T = TypeVar("T")
+
+
+def _room_dir(room: str) -> str:
+    raw = room.encode()
+    if len(raw) <= _MAX_HEX_NAME:
+        return raw.hex()
+    return "h-" + hashlib.sha256(raw).hexdigest()[:40]
+
+
+def _encode(event: Mapping[str, Any]) -> bytes:
+    if isinstance(event, EventRecord):
+        value: Any = [event.type, event.message_id, event.sender, event.message, event.ts_ms]
+    else:
+        value = dict(event)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+def _decode(records: List[bytes]) -> List[Mapping[str, Any]]:
+    if not records:
+        return []
+    values = json.loads(b"[" + b",".join(records) + b"]")  # one decode for the whole page
+    return [EventRecord(*v) if isinstance(v, list) else v for v in values]
+
+
+class _Segment:
+    __slots__ = ("base", "path", "count", "size", "_index", "_data", "_mapped")
+
+    def __init__(self, directory: str, base: int) -> None:
+        self.base = base
+        self.path = os.path.join(directory, f"{base:016d}")
+        self.count = 0
+        self.size = 0
+        self._index: Optional[mmap.mmap] = None
+        self._data: Optional[mmap.mmap] = None
+        self._mapped = 0  # records covered by the current mappings
+
+    def scan(self, *, repair: bool) -> None:
+        """Read count and size from the files; *repair* cuts a torn tail (last segment only)."""
+        idx_size = os.path.getsize(self.path + ".idx") if os.path.exists(self.path + ".idx") else 0
+        data_size = os.path.getsize(self.path + ".log") if os.path.exists(self.path + ".log") else 0
+        count = idx_size // _INDEX.size
+        if not repair:
+            self.count, self.size = count, data_size
+            return
+        end = 0
+        with open(self.path + ".idx", "ab+") as idx:
+            while count:
+                idx.seek((count - 1) * _INDEX.size)
+                offset, length = _INDEX.unpack(idx.read(_INDEX.size))
+                if offset + length <= data_size:
+                    end = offset + length
+                    break
+                count -= 1
+            if count * _INDEX.size != idx_size:
+                _LOG.warning("Truncating torn index tail of %s", self.path)
+                idx.truncate(count * _INDEX.size)
+        if data_size != end:
+            with open(self.path + ".log", "ab") as data:
+                data.truncate(end)
+        self.count, self.size = count, end
+
+    def read(self, lo: int, hi: int) -> List[bytes]:
+        """Raw records lo..hi-1 (segment-relative)."""
+        if hi <= lo:
+            return []
+        if self._mapped < hi:
+            self.unmap()
+            with open(self.path + ".idx", "rb") as idx, open(self.path + ".log", "rb") as log:
+                self._index = mmap.mmap(idx.fileno(), 0, access=mmap.ACCESS_READ)
+                self._data = mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = self.count
+        assert self._index is not None and self._data is not None
+        data = self._data
+        return [data[off:off + n] for off, n in _INDEX.iter_unpack(self._index[lo * _INDEX.size:hi * _INDEX.size])]
+
+    def unmap(self) -> None:
+        for m in (self._index, self._data):
+            if m is not None:
+                m.close()
+        self._index = self._data = None
+        self._mapped = 0
+
+
+class _RoomLog:
+    __slots__ = ("directory", "segments", "_bases", "_fds")
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        bases = sorted({int(name.split(".")[0]) for name in os.listdir(directory) if name.endswith((".idx", ".log"))})
+        self.segments = [_Segment(directory, b) for b in bases]
+        for i, seg in enumerate(self.segments):
+            seg.scan(repair=i == len(self.segments) - 1)
+        self._bases = bases
+        self._fds: Optional[Tuple[int, int]] = None  # (data, index) of the last segment
+
+    @property
+    def appended(self) -> int:
+        return self.segments[-1].base + self.segments[-1].count if self.segments else 0
+
+    @property
+    def first(self) -> int:
+        return self.segments[0].base if self.segments else 0
+
+    def append(self, record: bytes, segment_records: int) -> None:
+        if not self.segments or self.segments[-1].count >= segment_records:
+            self._close_fds()
+            seg = _Segment(self.directory, self.appended)
+            self.segments.append(seg)
+            self._bases.append(seg.base)
+        seg = self.segments[-1]
+        if self._fds is None:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+            self._fds = (os.open(seg.path + ".log", flags, 0o644), os.open(seg.path + ".idx", flags, 0o644))
+        os.write(self._fds[0], record)
+        os.write(self._fds[1], _INDEX.pack(seg.size, len(record)))
+        seg.size += len(record)
+        seg.count += 1
+
+    def read(self, start: int, end: int) -> List[bytes]:
+        """Raw records at absolute positions [start, end), clamped to the log."""
+        start, end = max(start, self.first), min(end, self.appended)
+        out: List[bytes] = []
+        i = max(0, bisect.bisect_right(self._bases, start) - 1)
+        while start < end:
+            seg = self.segments[i]
+            upto = min(end, seg.base + seg.count)
+            out.extend(seg.read(start - seg.base, upto - seg.base))
+            start, i = upto, i + 1
+        return out
+
+    def _close_fds(self) -> None:
+        if self._fds is not None:
+            for fd in self._fds:
+                os.close(fd)
+            self._fds = None
+
+    def close(self) -> None:
+        self._close_fds()
+        for seg in self.segments:
+            seg.unmap()
+
+
+class SegmentLogRoomStore(InMemoryRoomStore):
+    def __init__(
+        self,
+        data_dir: str,
+        *,
+        segment_records: int = 65_536,
+        max_open_rooms: int = 256,
+        default_limit: int = 200,
+    ) -> None:
+        super().__init__(max_messages=0)  # history lives in the logs, not in rings
+        self.data_dir = data_dir
+        self.segment_records = segment_records
+        self.max_open_rooms = max_open_rooms
+        self.default_limit = default_limit
+        self._rooms_dir = os.path.join(data_dir, "rooms")
+        os.makedirs(self._rooms_dir, exist_ok=True)
+        # every room on disk; logs are scanned on first use
+        self._logs: Dict[str, Optional[_RoomLog]] = {}
+        for name in os.listdir(self._rooms_dir):
+            room = self._room_name(name)
+            if room is not None:
+                self._logs[room] = None
+        self._open: "OrderedDict[str, _RoomLog]" = OrderedDict()  # rooms holding handles/mappings, LRU order
+        self._log(DEFAULT_ROOM_ID)
+        self._load_metadata()
+        # the only thread that touches the files (and _logs/_open) from here on
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment-log")
+        self._batch: Optional[List[Tuple[str, bytes]]] = None  # appends not handed to the thread yet
+        self._batch_written: Optional["asyncio.Task[None]"] = None
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run *fn* on the I/O thread, after every call submitted before it."""
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+
+    # -------- room logs --------
+    def _room_name(self, name: str) -> Optional[str]:
+        if not name.startswith("h-"):
+            return bytes.fromhex(name).decode()
+        try:
+            with open(os.path.join(self._rooms_dir, name, _NAME_FILE), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            _LOG.warning("Ignoring room directory %s without a name file", name)
+            return None
+
+    def _scan(self, room: str) -> _RoomLog:
+        log = self._logs.get(room)
+        if log is None:
+            name = _room_dir(room)
+            directory = os.path.join(self._rooms_dir, name)
+            if name.startswith("h-") and not os.path.exists(os.path.join(directory, _NAME_FILE)):
+                os.makedirs(directory, exist_ok=True)
+                with open(os.path.join(directory, _NAME_FILE), "w", encoding="utf-8") as f:
+                    f.write(room)
+            log = self._logs[room] = _RoomLog(directory)
+        return log
+
+    def _log(self, room: str) -> _RoomLog:
+        """Log of *room*, counted as in use (may hold handles until evicted)."""
+        log = self._open[room] = self._scan(room)
+        self._open.move_to_end(room)
+        if len(self._open) > self.max_open_rooms:
+            _, idle = self._open.popitem(last=False)
+            idle.close()
+        return log
+
+    def _append(self, batch: List[Tuple[str, bytes]]) -> None:
+        for room, record in batch:
+            self._log(room).append(record, self.segment_records)
+
+    async def _write_batch(self, batch: List[Tuple[str, bytes]]) -> None:
+        self._batch = None  # appends from now on start the next batch
+        await self._run(self._append, batch)
+
+    def _tail(self, room: str, n: int) -> List[Mapping[str, Any]]:
+        if room not in self._logs:
+            return []
+        log = self._log(room)
+        return _decode(log.read(log.appended - n, log.appended))
+
+    def _page(self, room: str, limit: int, end: Optional[int]) -> Tuple[List[Mapping[str, Any]], Optional[str]]:
+        if room not in self._logs or limit <= 0:
+            return [], None
+        log = self._log(room)
+        end = log.appended if end is None else max(log.first, min(end, log.appended))
+        start = max(log.first, end - limit)
+        cursor = str(start) if start > log.first else None
+        return _decode(log.read(start, end)), cursor
+
+    def _room_counts(self) -> List[Dict[str, Any]]:
+        return [{"name": name, "messages": log.appended - log.first} for name, log in ((n, self._scan(n)) for n in list(self._logs))]
+
+    def _remove_if_empty(self, room: str) -> None:
+        if room == DEFAULT_ROOM_ID or room not in self._logs:
+            return
+        log = self._log(room)
+        if log.appended == log.first:
+            log.close()
+            self._open.pop(room, None)
+            self._logs.pop(room, None)
+            shutil.rmtree(log.directory, ignore_errors=True)
+
+    def _close_logs(self) -> None:
+        for log in self._open.values():
+            log.close()
+        self._open.clear()
+
+    # -------- history API --------
+    async def register_room(self, room: str) -> None:
+        await self._run(self._log, room)
+
+    async def record_room_event(self, room: str, event: Mapping[str, Any]) -> None:
+        batch = self._batch
+        if batch is None:
+            batch = self._batch = []
+            self._batch_written = asyncio.get_running_loop().create_task(self._write_batch(batch))
+        batch.append((room, _encode(EventRecord.from_event(event) or event)))
+        assert self._batch_written is not None
+        # the write outlives cancelled callers; an error is raised to everyone in the batch
+        await asyncio.shield(self._batch_written)
+
+    async def get_room_messages(self, room: str, limit: Optional[int] = None) -> List[Mapping[str, Any]]:
+        return await self._run(self._tail, room, self.default_limit if limit is None or limit < 0 else limit)
+
+    async def get_room_messages_page(self, room: str, limit: int, before: Optional[str] = None) -> Tuple[List[Mapping[str, Any]], Optional[str]]:
+        end: Optional[int] = None
+        if before is not None:
+            try:
+                end = int(before)
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {before!r}") from None
+        return await self._run(self._page, room, limit, end)
+
+    async def list_rooms(self) -> List[Dict[str, Any]]:
+        return await self._run(self._room_counts)
+
+    async def remove_room_if_empty(self, room: str) -> None:
+        await self._run(self._remove_if_empty, room)
+
+    async def close(self) -> None:
+        """Close file handles and mappings (reopened on next use)."""
+        await self._run(self._close_logs)
+
+    # -------- metadata persistence --------
+    def _load_metadata(self) -> None:
+        path = os.path.join(self.data_dir, _METADATA)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn last line
+                    if entry[0] == "m":
+                        room = RoomMetadata.from_dict(entry[1])
+                        self._user_rooms.setdefault(room.user_id, {})[room.room_id] = room
+                        self._index.put(room)
+                    elif entry[0] == "md":
+                        self._user_rooms.get(entry[1], {}).pop(entry[2], None)
+                        self._index.discard(entry[2], entry[1])
+        # rewrite without superseded lines, then append to it
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            for owned in self._user_rooms.values():
+                for room in owned.values():
+                    f.write(self._metadata_line(["m", room.to_dict()]))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _metadata_line(entry: List[Any]) -> bytes:
+        return json.dumps(entry, separators=(",", ":"), ensure_ascii=False).encode() + b"\n"
+
+    def _append_metadata(self, line: bytes) -> None:
+        with open(os.path.join(self.data_dir, _METADATA), "ab") as f:
+            f.write(line)
+
+    async def _persist_metadata(self, entry: List[Any]) -> None:
+        await self._run(self._append_metadata, self._metadata_line(entry))
+
+    async def create_room_metadata(self, user_id: str, room_name: str, *, room_id: Optional[str] = None, description: Optional[str] = None) -> RoomMetadata:
+        existing = self._user_rooms.get(user_id, {}).get(room_id) if room_id else None
+        room = await super().create_room_metadata(user_id, room_name, room_id=room_id, description=description)
+        if room is not existing:
+            await self._persist_metadata(["m", room.to_dict()])
+        return room
+
+    async def update_room_metadata(self, user_id: str, room_id: str, *, room_name: Optional[str] = None, description: Optional[str] = None) -> RoomMetadata:
+        room = await super().update_room_metadata(user_id, room_id, room_name=room_name, description=description)
+        if room.room_id != DEFAULT_ROOM_ID:
+            await self._persist_metadata(["m", room.to_dict()])
+        return room
+
+    async def delete_room_metadata(self, user_id: str, room_id: str) -> bool:
+        deleted = await super().delete_room_metadata(user_id, room_id)
+        if deleted:
+            await self._persist_metadata(["md", user_id, room_id])
+        return deleted
+
+
+__all__ = ["SegmentLogRoomStore"]
@@ -0,0 +1,195 @@
+"""Write-behind batching of per-room inserts.
+
+`RoomWriteBatcher.add` queues an entity and returns immediately. Each room
+has at most one flush in flight; entities queued meanwhile are submitted
+together, up to ``max_batch`` entities and ``max_batch_bytes`` of encoded
+entities per call (Azure Table entity-group transactions take at most 100
+operations on one PartitionKey and a 4 MiB payload). So a quiet room writes
+each event right away, and a busy room turns N round-trips into N / 100.
+Order within a room is preserved.
+
+A room with ``max_pending`` unsaved entities makes ``add`` wait for its flush
+(backpressure instead of unbounded memory). Failed batches are retried with
+backoff, then dropped and counted; the next `flush` covering that room
+raises `WriteBatchError` so the loss is not silent.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+
+class WriteBatchError(RuntimeError):
+    """Queued rows were dropped after every retry failed; raised by `RoomWriteBatcher.flush`."""
+
+    def __init__(self, failed: Dict[str, int], cause: BaseException) -> None:
+        rows = sum(failed.values())
+        super().__init__(f"{rows} queued writes failed for {len(failed)} room(s): {cause!r}")
+        self.failed = failed
+
+
+def json_size(entity: Dict[str, Any]) -> int:
+    """Encoded size of *entity* as a JSON request body."""
+    return len(json.dumps(entity, default=str).encode("utf-8"))
+
+
+@dataclass
+class WriteBatchStats:
+    transactions: int = 0
+    rows: int = 0
+    retries: int = 0
+    failed_rows: int = 0
+    max_batch: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "transactions": self.transactions,
+            "rows": self.rows,
+            "retries": self.retries,
+            "failedRows": self.failed_rows,
+            "maxBatch": self.max_batch,
+            "rowsPerTransaction": round(self.rows / self.transactions, 2) if self.transactions else 0.0,
+        }
+
+
+class RoomWriteBatcher:
+    """Per-room write-behind queue; ``submit(room, entities)`` persists one batch."""
+
+    def __init__(
+        self,
+        submit: Callable[[str, List[Dict[str, Any]]], Awaitable[None]],
+        *,
+        max_batch: int = 100,
+        max_batch_bytes: Optional[int] = None,
+        entity_size: Callable[[Dict[str, Any]], int] = json_size,
+        max_pending: int = 2000,
+        retries: int = 2,
+        retry_backoff: float = 0.2,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self._submit = submit
+        self.max_batch = max_batch
+        self.max_batch_bytes = max_batch_bytes
+        self._entity_size = entity_size
+        self.max_pending = max(max_pending, max_batch)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.stats = WriteBatchStats()
+        self._log = logger or logging.getLogger("room_store.write_batcher")
+        self._pending: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._tasks: Dict[str, asyncio.Task[None]] = {}
+        # room -> rows dropped since the last flush that reported them, and the last error
+        self._failed: Dict[str, int] = {}
+        self._error: Optional[BaseException] = None
+
+    def unsaved(self, room: str) -> int:
+        """Entities of *room* queued or in flight (not yet acknowledged by the store)."""
+        return len(self._pending.get(room, ())) + self._in_flight.get(room, 0)
+
+    def backlog(self) -> int:
+        """Entities queued or in flight across all rooms."""
+        return sum(len(q) for q in self._pending.values()) + sum(self._in_flight.values())
+
+    async def add(self, room: str, entity: Dict[str, Any]) -> None:
+        self._pending.setdefault(room, deque()).append(entity)
+        task = self._tasks.get(room)
+        if task is None:
+            task = asyncio.ensure_future(self._drain(room))
+            self._tasks[room] = task
+        if self.unsaved(room) > self.max_pending:
+            await asyncio.shield(task)
+
+    async def _drain(self, room: str) -> None:
+        queue = self._pending[room]
+        try:
+            while queue:
+                batch = self._next_batch(queue)
+                self._in_flight[room] = len(batch)
+                await self._submit_with_retry(room, batch)
+                self._in_flight.pop(room, None)
+        finally:
+            self._in_flight.pop(room, None)
+            self._tasks.pop(room, None)
+            if not queue:
+                self._pending.pop(room, None)
+
+    def _next_batch(self, queue: Deque[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Take the oldest entities that fit one call (always at least one)."""
+        batch = [queue.popleft()]
+        if self.max_batch_bytes is None:
+            while queue and len(batch) < self.max_batch:
+                batch.append(queue.popleft())
+            return batch
+        size = self._entity_size(batch[0])
+        while queue and len(batch) < self.max_batch:
+            size += self._entity_size(queue[0])
+            if size > self.max_batch_bytes:
+                break
+            batch.append(queue.popleft())
+        return batch
+
+    async def _submit_with_retry(self, room: str, batch: List[Dict[str, Any]]) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                await self._submit(room, batch)
+            except Exception as e:  # noqa: BLE001
+                if attempt < self.retries:
+                    self.stats.retries += 1
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                    continue
+                self.stats.failed_rows += len(batch)
+                self._failed[room] = self._failed.get(room, 0) + len(batch)
+                self._error = e
+                self._log.warning("Dropping %d queued writes for room %s: %r", len(batch), room, e)
+                return
+            self.stats.transactions += 1
+            self.stats.rows += len(batch)
+            self.stats.max_batch = max(self.stats.max_batch, len(batch))
+            return
+
+    async def flush(self, room: Optional[str] = None) -> None:
+        """Wait until everything queued for *room* (or every room) is written.
+
+        Raises `WriteBatchError` (once) if rows of those rooms were dropped
+        since the last flush that reported them.
+        """
+        await self.wait(room)
+        failed = {name: rows for name, rows in self._failed.items() if room is None or name == room}
+        if not failed:
+            return
+        for name in failed:
+            del self._failed[name]
+        assert self._error is not None
+        raise WriteBatchError(failed, self._error) from self._error
+
+    async def wait(self, room: Optional[str] = None) -> None:
+        """Like `flush` without reporting failed rows (reads that only need queued rows settled)."""
+        while True:
+            if room is None:
+                tasks = list(self._tasks.values())
+            else:
+                task = self._tasks.get(room)
+                tasks = [task] if task is not None else []
+            if not tasks:
+                return
+            await asyncio.gather(*(asyncio.shield(t) for t in tasks), return_exceptions=True)
+
+    def discard(self) -> int:
+        """Cancel all flushes and forget queued entities; returns how many were dropped."""
+        dropped = sum(self.unsaved(room) for room in set(self._pending) | set(self._in_flight))
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._pending.clear()
+        self._in_flight.clear()
+        return dropped
+
+
+__all__ = ["RoomWriteBatcher", "WriteBatchError", "WriteBatchStats", "json_size"]
@@ -12,6 +12,12 @@ class TransportMode(str, Enum):
 class StorageMode(str, Enum):
     MEMORY = "memory"
     TABLE = "table"
+    WAL = "wal"  # in-memory + local write-ahead log and snapshots
+    LOG = "log"  # full history in per-room segment files on local disk
+
+class HttpServer(str, Enum):
+    FLASK = "flask"  # WSGI threads, store calls marshalled onto the chat loop
+    ASGI = "asgi"  # python_server.asgi under uvicorn, API on the chat loop
 
 @dataclass
 class RuntimeConfig:
@@ -26,6 +32,34 @@ def _get_env(name: str) -> str | None:
     return v.strip() if isinstance(v, str) and v.strip() else None
 
 
+def env_int(name: str, default: int, minimum: int = 0) -> int:
+    """Integer setting *name* (unset or blank -> *default*); RuntimeError if not an int or below *minimum*."""
+    raw = _get_env(name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise RuntimeError(f"Invalid {name}={raw}")
+    if value < minimum:
+        raise RuntimeError(f"Invalid {name}={raw}")
+    return value
+
+
+def env_float(name: str, default: float, minimum: float = 0.0, *, exclusive: bool = False) -> float:
+    """Like `env_int` for a float; *exclusive* also rejects *minimum* itself (e.g. rates that must be > 0)."""
+    raw = _get_env(name)
+    if raw is None:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        raise RuntimeError(f"Invalid {name}={raw}")
+    if value < minimum or (exclusive and value == minimum):
+        raise RuntimeError(f"Invalid {name}={raw}")
+    return value
+
+
 def resolve_runtime_config() -> RuntimeConfig:
     # Transport resolution
     raw_transport = (_get_env("TRANSPORT_MODE") or "self").lower()
@@ -48,9 +82,20 @@ def resolve_runtime_config() -> RuntimeConfig:
             raise RuntimeError("STORAGE_MODE=table requires AZURE_STORAGE_CONNECTION_STRING or AZURE_STORAGE_ACCOUNT")
     return RuntimeConfig(transport=transport, storage=storage)
 
+def resolve_http_server() -> HttpServer:
+    """HTTP server `python -m python_server.main` runs (HTTP_SERVER, default flask)."""
+    raw = (_get_env("HTTP_SERVER") or "flask").lower()
+    if raw not in {h.value for h in HttpServer}:
+        raise RuntimeError(f"Invalid HTTP_SERVER={raw}")
+    return HttpServer(raw)
+
 __all__ = [
     "TransportMode",
     "StorageMode",
+    "HttpServer",
     "RuntimeConfig",
     "resolve_runtime_config",
+    "resolve_http_server",
+    "env_int",
+    "env_float",
 ]
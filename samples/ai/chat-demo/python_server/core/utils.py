@@ -3,6 +3,7 @@ Shared utility functions for the chat-demo python server.
 """
 import uuid
 import asyncio
+import json
 import threading
 from typing import AsyncIterator, Iterable, Optional, TypeVar, Any
 
@@ -89,10 +90,25 @@ async def to_async_iterator(sync_iterable: Iterable[T]) -> AsyncIterator[T]:
                 pass
             await producer_future
 
+def json_body(content_type: Optional[str], body: bytes) -> Any:
+    """Decode a JSON request body; None unless the content type is JSON or the body is invalid.
+
+    Same rules as Flask's ``request.get_json(silent=True)``, for handlers that
+    see the raw request (ASGI, CloudEvents).
+    """
+    mimetype = (content_type or '').split(';', 1)[0].strip().lower()
+    if not (mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))):
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
 __all__ = [
     "generate_id",
     "get_query_value",
     "get_room_id",
     "to_async_iterator",
+    "json_body",
 ]
 
@@ -1,10 +1,22 @@
 from __future__ import annotations
 
 import asyncio
+import os
 import threading
 from typing import Any
 
-from .app import app, host, port, event_loop, chat_service, wait_until_ready
+from .core.chat_model_client import aclose_chat_client
+from .core.runtime_config import HttpServer, resolve_http_server
+
+
+def run_asgi() -> None:
+    """Serve python_server.asgi with uvicorn (HTTP_SERVER=asgi)."""
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("HTTP_SERVER=asgi requires uvicorn. Please `pip install uvicorn`.")
+    from .asgi import app, host, port
+    uvicorn.run(app, host=host, port=port, log_level=os.getenv("LOG_LEVEL", "info").lower(), lifespan="on")
 
 
 async def main() -> None:
@@ -13,6 +25,7 @@ async def main() -> None:
     Starts the Flask HTTP server; chat service is bootstrapped lazily via
     the import side effects in python_server.app.
     """
+    from .app import app, host, port, event_loop, chat_service, wait_until_ready
     app.logger.info("Flask HTTP server binding on %s:%s", host, port)
     app.logger.info("Subprotocol: json.reliable.webpubsub.azure.v1")
     app.logger.info("Make sure to build the React client first with: npm run build")
@@ -35,14 +48,22 @@ async def main() -> None:
     finally:
         # Best-effort graceful shutdown if loop still alive
         if event_loop and event_loop.is_running() and chat_service:
+            async def stop() -> None:
+                await chat_service.stop()
+                await aclose_chat_client()
+
             try:
-                fut = asyncio.run_coroutine_threadsafe(chat_service.stop(), event_loop)
+                fut = asyncio.run_coroutine_threadsafe(stop(), event_loop)
                 fut.result(timeout=5)
             except Exception:
                 pass
 
 
 if __name__ == '__main__':  # pragma: no cover
+    if resolve_http_server() is HttpServer.ASGI:
+        run_asgi()
+        raise SystemExit(0)
+    from .app import app
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
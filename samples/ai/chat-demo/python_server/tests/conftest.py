@@ -15,7 +15,14 @@ def clear_env(monkeypatch):
     for var in [
         'TRANSPORT_MODE','STORAGE_MODE','WEBPUBSUB_ENDPOINT','WEB_PUBSUB_ENDPOINT',
         'WEBPUBSUB_CONNECTION_STRING','WEB_PUBSUB_CONNECTION_STRING',
-        'AZURE_STORAGE_CONNECTION_STRING','AZURE_STORAGE_ACCOUNT','CHAT_TABLE_NAME'
+        'AZURE_STORAGE_CONNECTION_STRING','AZURE_STORAGE_ACCOUNT','CHAT_TABLE_NAME',
+        'CHAT_MAX_MESSAGES_PER_ROOM','CHAT_MESSAGE_TTL_SECONDS','CHAT_RETENTION_DELETES_PER_SEC',
+        'CHAT_WAL_DIR','CHAT_WAL_FSYNC','CHAT_WAL_SYNC_COMMIT','CHAT_WAL_SNAPSHOT_EVERY','CHAT_LOG_DIR',
+        'CHAT_CACHE_TTL_SECONDS','CHAT_CACHE_TAIL_ROOMS','HTTP_SERVER',
+        'CHAT_CONTEXT_MAX_TOKENS','CHAT_CONTEXT_OVERFLOW','CHAT_CONTEXT_SUMMARY_TOKENS',
+        'AI_MAX_IN_FLIGHT','AI_MAX_QUEUE','AI_MAX_QUEUED_PER_USER','AI_QUEUE_TIMEOUT_SECONDS',
+        'AI_CACHE_MAX_ENTRIES','AI_CACHE_TTL_SECONDS','AI_CACHE_HISTORY_TURNS','AI_CACHE_REPLAY_TOKENS_PER_SEC',
+        'MODEL_BASE_URL'
     ]:
         monkeypatch.delenv(var, raising=False)
     # Default modes
@@ -0,0 +1,248 @@
+"""In-process stand-in for the azure-data-tables async service/table clients.
+
+`FakeTableClient` is the (synchronous) storage; `FakeTableServiceClient` and
+`FakeAsyncTableClient` expose it through the ``azure.data.tables.aio`` API
+with optional per-request latency. Supports the subset the room stores use:
+entity CRUD with ETags, entity-group transactions (create/upsert/delete, at
+most 100 operations and 4 MiB), plus
+``query_entities`` with ``and``-joined ``<Property> <eq|ne|gt|ge|lt|le> @param``
+filters, results in (PartitionKey, RowKey) order. Like the service, a
+``PartitionKey eq`` / ``RowKey`` range filter only touches the matching key
+range. Results are produced lazily and ``served`` counts the entities handed
+out, so tests and benchmarks can check how much of a table a read pulled.
+"""
+
+import asyncio
+import bisect
+import itertools
+import json
+import re
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import TableEntity
+
+_OPS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+_CLAUSE = re.compile(r"^\s*(\w+)\s+(eq|ne|gt|ge|lt|le)\s+(@\w+|'(?:[^']|'')*')\s*$")
+_MAX = "\U0010ffff"
+
+
+def _parse(query_filter: str, parameters: Optional[Dict[str, Any]]) -> List[Tuple[str, str, Any]]:
+    clauses = []
+    for part in re.split(r"\s+and\s+", query_filter.strip()):
+        m = _CLAUSE.match(part)
+        if not m:
+            raise ValueError(f"unsupported filter clause: {part!r}")
+        name, op, raw = m.groups()
+        value = (parameters or {})[raw[1:]] if raw.startswith("@") else raw[1:-1].replace("''", "'")
+        clauses.append((name, op, value))
+    return clauses
+
+
+class FakeTableClient:
+    def __init__(self, name: str):
+        self.table_name = name
+        self._rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._etags: Dict[Tuple[str, str], int] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._dirty = False
+        self._version = itertools.count(1)
+        self.served = 0
+        self.queries: List[str] = []
+
+    def _put(self, key: Tuple[str, str], entity: Dict[str, Any]) -> Dict[str, Any]:
+        if key not in self._rows:
+            self._keys.append(key)
+            self._dirty = True
+        self._rows[key] = entity
+        self._etags[key] = next(self._version)
+        return {"etag": f'W/"{self._etags[key]}"'}
+
+    def _sorted_keys(self) -> List[Tuple[str, str]]:
+        if self._dirty:
+            self._keys.sort()
+            self._dirty = False
+        return self._keys
+
+    def _entity(self, key: Tuple[str, str]) -> TableEntity:
+        ent = TableEntity(self._rows[key])
+        ent._metadata = {"etag": f'W/"{self._etags[key]}"', "timestamp": None}
+        return ent
+
+    def _iter(self, lo: Tuple[str, str], hi: Tuple[str, str], clauses: List[Tuple[str, str, Any]]) -> Iterator[TableEntity]:
+        keys = self._sorted_keys()
+        i = bisect.bisect_left(keys, lo)
+        while i < len(keys) and keys[i] <= hi:
+            key = keys[i]
+            i += 1
+            row = self._rows[key]
+            if all(name in row and _OPS[op](row[name], value) for name, op, value in clauses):
+                self.served += 1
+                yield self._entity(key)
+
+    # ---- entity operations ----
+    def create_entity(self, entity: Dict[str, Any]) -> Dict[str, Any]:
+        key = (entity["PartitionKey"], entity["RowKey"])
+        if key in self._rows:
+            raise ResourceExistsError("EntityAlreadyExists")
+        return self._put(key, dict(entity))
+
+    def upsert_entity(self, entity: Dict[str, Any], mode: Any = None) -> Dict[str, Any]:
+        key = (entity["PartitionKey"], entity["RowKey"])
+        merged = dict(self._rows.get(key, {})) if str(mode).upper().endswith("MERGE") else {}
+        merged.update(entity)
+        return self._put(key, merged)
+
+    def update_entity(self, entity: Dict[str, Any], mode: Any = None, *, etag: Optional[str] = None, match_condition: Any = None) -> Dict[str, Any]:
+        key = (entity["PartitionKey"], entity["RowKey"])
+        if key not in self._rows:
+            raise ResourceNotFoundError(entity["RowKey"])
+        if match_condition == MatchConditions.IfNotModified and etag != f'W/"{self._etags[key]}"':
+            raise ResourceModifiedError("UpdateConditionNotSatisfied")
+        return self.upsert_entity(entity, mode=mode)
+
+    def get_entity(self, partition_key: str, row_key: str) -> TableEntity:
+        if (partition_key, row_key) not in self._rows:
+            raise ResourceNotFoundError(row_key)
+        return self._entity((partition_key, row_key))
+
+    def delete_entity(self, partition_key: str, row_key: str) -> None:
+        key = (partition_key, row_key)
+        if self._rows.pop(key, None) is not None:
+            self._etags.pop(key, None)
+            self._keys.remove(key)
+
+    # ---- queries ----
+    def query_entities(self, query_filter: str, *, parameters: Optional[Dict[str, Any]] = None, results_per_page: Optional[int] = None, **_kwargs: Any) -> Iterator[TableEntity]:
+        clauses = _parse(query_filter, parameters)
+        self.queries.append(query_filter)
+        lo, hi = ("", ""), (_MAX, _MAX)
+        pk = next((v for n, op, v in clauses if n == "PartitionKey" and op == "eq"), None)
+        if pk is not None:
+            row_lo = max((v for n, op, v in clauses if n == "RowKey" and op in ("gt", "ge", "eq")), default="")
+            row_hi = min((v for n, op, v in clauses if n == "RowKey" and op in ("lt", "le", "eq")), default=_MAX)
+            lo, hi = (pk, row_lo), (pk, row_hi)
+        return self._iter(lo, hi, clauses)
+
+    def list_entities(self, *, results_per_page: Optional[int] = None, **_kwargs: Any) -> Iterator[TableEntity]:
+        return self._iter(("", ""), (_MAX, _MAX), [])
+
+
+class FakeAsyncTableClient:
+    """``azure.data.tables.aio.TableClient`` facade over a `FakeTableClient`.
+
+    Every request (and every result page) costs ``service.latency`` seconds;
+    ``service.requests`` / ``in_flight`` / ``max_in_flight`` record the traffic.
+    """
+
+    def __init__(self, table: FakeTableClient, service: "FakeTableServiceClient"):
+        self.table = table
+        self._service = service
+
+    async def _request(self) -> None:
+        svc = self._service
+        svc.requests += 1
+        svc.in_flight += 1
+        svc.max_in_flight = max(svc.max_in_flight, svc.in_flight)
+        try:
+            await asyncio.sleep(svc.latency)
+        finally:
+            svc.in_flight -= 1
+
+    async def create_entity(self, entity: Dict[str, Any], **_kwargs: Any) -> Dict[str, Any]:
+        await self._request()
+        return self.table.create_entity(entity)
+
+    async def upsert_entity(self, entity: Dict[str, Any], mode: Any = None, **_kwargs: Any) -> Dict[str, Any]:
+        await self._request()
+        return self.table.upsert_entity(entity, mode=mode)
+
+    async def update_entity(self, entity: Dict[str, Any], mode: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        await self._request()
+        return self.table.update_entity(entity, mode=mode, **kwargs)
+
+    async def get_entity(self, partition_key: str, row_key: str, **_kwargs: Any) -> TableEntity:
+        await self._request()
+        return self.table.get_entity(partition_key, row_key)
+
+    async def delete_entity(self, partition_key: str, row_key: str, **_kwargs: Any) -> None:
+        await self._request()
+        self.table.delete_entity(partition_key, row_key)
+
+    async def submit_transaction(self, operations: Iterable[Tuple[Any, ...]], **_kwargs: Any) -> List[Dict[str, Any]]:
+        ops = list(operations)
+        await self._request()
+        self._service.transactions += 1
+        if not 0 < len(ops) <= 100:
+            raise ValueError("a transaction takes 1..100 operations")
+        if sum(len(json.dumps(op[1], default=str)) for op in ops) > 4 * 1024 * 1024:
+            raise ValueError("a transaction payload is limited to 4 MiB")
+        if len({op[1]["PartitionKey"] for op in ops}) != 1:
+            raise ValueError("all transaction operations must share one PartitionKey")
+        if len({op[1]["RowKey"] for op in ops}) != len(ops):
+            raise ValueError("a transaction may touch each entity once")
+        kinds = [str(op[0]).lower().rsplit(".", 1)[-1] for op in ops]
+        for kind, op in zip(kinds, ops):
+            # the batch is atomic: reject it before touching any row
+            if kind == "delete" and (op[1]["PartitionKey"], op[1]["RowKey"]) not in self.table._rows:
+                raise ResourceNotFoundError(op[1]["RowKey"])
+        results = []
+        for kind, op in zip(kinds, ops):
+            entity = op[1]
+            if kind == "delete":
+                self.table.delete_entity(entity["PartitionKey"], entity["RowKey"])
+                results.append({})
+            elif kind == "create":
+                results.append(self.table.create_entity(entity))
+            elif kind == "upsert":
+                results.append(self.table.upsert_entity(entity, mode=(op[2] if len(op) > 2 else {}).get("mode")))
+            else:
+                raise ValueError(f"unsupported transaction operation {op[0]!r}")
+        return results
+
+    async def _paged(self, rows: Iterator[TableEntity], results_per_page: Optional[int]) -> AsyncIterator[TableEntity]:
+        size = results_per_page or 1000
+        await self._request()
+        for n, ent in enumerate(rows, 1):
+            yield ent
+            if n % size == 0:
+                await self._request()
+
+    def query_entities(self, query_filter: str, *, results_per_page: Optional[int] = None, **kwargs: Any) -> AsyncIterator[TableEntity]:
+        return self._paged(self.table.query_entities(query_filter, **kwargs), results_per_page)
+
+    def list_entities(self, *, results_per_page: Optional[int] = None, **_kwargs: Any) -> AsyncIterator[TableEntity]:
+        return self._paged(self.table.list_entities(), results_per_page)
+
+
+class FakeTableServiceClient:
+    """``azure.data.tables.aio.TableServiceClient`` stand-in; ``tables`` holds the storage."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.tables: Dict[str, FakeTableClient] = {}
+        self.requests = 0
+        self.transactions = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = False
+
+    def storage(self, table_name: str) -> FakeTableClient:
+        return self.tables.setdefault(table_name, FakeTableClient(table_name))
+
+    def get_table_client(self, table_name: str) -> FakeAsyncTableClient:
+        return FakeAsyncTableClient(self.storage(table_name), self)
+
+    async def create_table_if_not_exists(self, table_name: str) -> FakeAsyncTableClient:
+        return self.get_table_client(table_name)
+
+    async def close(self) -> None:
+        self.closed = True
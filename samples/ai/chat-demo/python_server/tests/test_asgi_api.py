@@ -0,0 +1,226 @@
+"""
+ASGI chat API tests (driven through the raw ASGI protocol, no server):
+- Rooms CRUD, indexed listings and messages answer like the Flask blueprint
+- Handlers await the store on the calling loop (no thread hop)
+- Negotiate prefers the service's awaitable variant
+- CloudEvents are handed to the service; 404 without a Web PubSub transport
+- Routing: 404 / 405, static files without path traversal, body size limit
+- Lifespan hooks run on startup / shutdown
+"""
+
+import json
+import asyncio
+import threading
+import pytest
+
+from ..core.asgi_api import create_chat_asgi_app, MAX_BODY_BYTES
+from ..core.room_store import InMemoryRoomStore, EventRecord
+
+
+async def call(app, method, path, *, body=None, headers=None, chunks=None):
+    """Send one request through *app*; returns (status, headers, decoded body)."""
+    path, _, query = path.partition('?')
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+        raw_headers.append((b'content-type', b'application/json'))
+    pending = list(chunks) if chunks is not None else [body or b'']
+    sent = []
+
+    async def receive():
+        chunk = pending.pop(0)
+        return {'type': 'http.request', 'body': chunk, 'more_body': bool(pending)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(), 'headers': raw_headers}
+    await app(scope, receive, send)
+    start, payload = sent[0], sent[1]['body']
+    response_headers = {k.decode(): v.decode() for k, v in start['headers']}
+    if payload and response_headers.get('content-type') == 'application/json':
+        payload = json.loads(payload)
+    return start['status'], response_headers, payload
+
+
+class _Service:
+    def __init__(self, store):
+        self.room_store = store
+        self.cloudevents = []
+
+    def negotiate(self):
+        return 'ws://localhost:5001/ws'
+
+
+@pytest.fixture
+def store():
+    return InMemoryRoomStore()
+
+
+@pytest.fixture
+def app(store):
+    return create_chat_asgi_app(room_store_ref=lambda: store, chat_service_ref=_Service(store))
+
+
+USER = {'X-User-Id': 'test-user'}
+
+
+class TestRooms:
+    async def test_list_rooms_default_user(self, app):
+        status, _h, data = await call(app, 'GET', '/api/rooms')
+        assert status == 200
+        assert data['user_id'] == 'anonymous'
+        assert [r['roomId'] for r in data['rooms']] == ['public']
+
+    async def test_crud_roundtrip(self, app):
+        status, headers, created = await call(app, 'POST', '/api/rooms', body={'roomName': ' Test Room ', 'description': 'A test room'}, headers=USER)
+        assert status == 201
+        assert created['roomName'] == 'Test Room' and created['userId'] == 'test-user'
+        room_id = created['roomId']
+        assert headers['location'] == f'/api/rooms/{room_id}'
+
+        status, _h, data = await call(app, 'GET', f'/api/rooms/{room_id}', headers=USER)
+        assert status == 200 and data['description'] == 'A test room'
+
+        status, _h, data = await call(app, 'PUT', f'/api/rooms/{room_id}', body={'roomName': 'Renamed', 'description': ''}, headers=USER)
+        assert status == 200
+        assert data['roomName'] == 'Renamed' and data.get('description') in (None, '')
+
+        status, _h, _d = await call(app, 'DELETE', f'/api/rooms/{room_id}', headers=USER)
+        assert status == 200
+        status, _h, data = await call(app, 'GET', f'/api/rooms/{room_id}', headers=USER)
+        assert (status, data['error']) == (404, 'Room not found')
+
+    async def test_create_validation(self, app):
+        assert (await call(app, 'POST', '/api/rooms', headers=USER))[0] == 400
+        assert (await call(app, 'POST', '/api/rooms', body=b'{"roomName": "x"}', headers=USER))[0] == 400  # not sent as JSON
+        status, _h, data = await call(app, 'POST', '/api/rooms', body={'roomName': '  '}, headers=USER)
+        assert (status, data['error']) == (400, 'roomName is required')
+        status, _h, data = await call(app, 'POST', '/api/rooms', body={'roomName': 'x', 'roomId': 'mine'}, headers=USER)
+        assert status == 400 and 'Explicit roomId not allowed' in data['error']
+
+    async def test_public_room_is_protected(self, app):
+        assert (await call(app, 'PUT', '/api/rooms/public', body={'roomName': 'x'}, headers=USER))[0] == 403
+        assert (await call(app, 'DELETE', '/api/rooms/public', headers=USER))[0] == 403
+
+    async def test_indexed_listings_page_with_cursor(self, app, store):
+        for i in range(5):
+            await store.create_room_metadata(f'u{i}', f'Alpha {i}')
+        await store.create_room_metadata('u9', 'Beta')
+        status, _h, first = await call(app, 'GET', '/api/rooms/search?prefix=alp&limit=3')
+        assert status == 200 and len(first['rooms']) == 3 and first['nextCursor']
+        _s, _h, rest = await call(app, 'GET', f"/api/rooms/search?prefix=alp&limit=3&cursor={first['nextCursor']}")
+        assert len(rest['rooms']) == 2 and rest['nextCursor'] is None
+        _s, _h, recent = await call(app, 'GET', '/api/rooms/recent?limit=2')
+        assert [r['roomName'] for r in recent['rooms']] == ['Beta', 'Alpha 4']
+        assert (await call(app, 'GET', '/api/rooms/search'))[0] == 400
+        assert (await call(app, 'GET', '/api/rooms/recent?cursor=bogus'))[0] == 400
+
+
+class TestMessages:
+    async def test_messages_page_and_limit_clamp(self, app, store):
+        for i in range(5):
+            await store.record_room_event('r1', EventRecord('message', f'm{i}', 'u', f'hello {i}', 1_714_521_600_000 + i))
+        status, _h, data = await call(app, 'GET', '/api/rooms/r1/messages?limit=2')
+        assert status == 200
+        assert [m['message'] for m in data['messages']] == ['hello 3', 'hello 4']
+        assert data['nextCursor']
+        _s, _h, older = await call(app, 'GET', f"/api/rooms/r1/messages?limit=10&before={data['nextCursor']}")
+        assert [m['message'] for m in older['messages']] == ['hello 0', 'hello 1', 'hello 2']
+        _s, _h, clamped = await call(app, 'GET', '/api/rooms/r1/messages?limit=-5')
+        assert len(clamped['messages']) == 5
+        _s, _h, zero = await call(app, 'GET', f"/api/rooms/r1/messages?limit=0&before={data['nextCursor']}")
+        assert len(zero['messages']) == 3 and zero['nextCursor'] is None
+
+    async def test_service_unavailable(self, store):
+        app = create_chat_asgi_app(room_store_ref=lambda: store, chat_service_ref=lambda: None)
+        assert (await call(app, 'GET', '/api/rooms/r1/messages'))[0] == 503
+        assert (await call(app, 'GET', '/api/negotiate'))[0] == 503
+
+    async def test_store_is_awaited_on_the_calling_loop(self, store):
+        seen = []
+
+        class Recording(InMemoryRoomStore):
+            async def list_user_rooms(self, user_id):
+                seen.append((asyncio.get_running_loop(), threading.get_ident()))
+                return await super().list_user_rooms(user_id)
+
+        app = create_chat_asgi_app(room_store_ref=Recording(), chat_service_ref=None)
+        await call(app, 'GET', '/api/rooms')
+        assert seen == [(asyncio.get_running_loop(), threading.get_ident())]
+
+
+class TestNegotiateAndCloudEvents:
+    async def test_negotiate_sync_and_async(self, app, store):
+        status, _h, data = await call(app, 'GET', '/api/negotiate')
+        assert (status, data) == (200, {'url': 'ws://localhost:5001/ws'})
+
+        class AsyncService(_Service):
+            def negotiate(self):  # pragma: no cover - must not be used
+                raise AssertionError('blocking negotiate called on the loop')
+
+            async def negotiate_async(self):
+                return 'wss://example/client'
+
+        app = create_chat_asgi_app(room_store_ref=store, chat_service_ref=AsyncService(store))
+        assert (await call(app, 'GET', '/api/negotiate'))[2] == {'url': 'wss://example/client'}
+
+    async def test_cloudevents_are_handed_to_the_service(self, store):
+        class WpsService(_Service):
+            async def handle_cloudevent(self, method, headers, body):
+                self.cloudevents.append((method, headers.get('ce-type'), body))
+                return json.dumps({'userId': 'u1'}), 200, {'Content-Type': 'application/json'}
+
+        svc = WpsService(store)
+        app = create_chat_asgi_app(room_store_ref=store, chat_service_ref=svc)
+        status, _h, data = await call(app, 'POST', '/eventhandler', body={'query': {}}, headers={'ce-type': 'azure.webpubsub.sys.connect'})
+        assert (status, data) == (200, {'userId': 'u1'})
+        assert svc.cloudevents == [('POST', 'azure.webpubsub.sys.connect', b'{"query": {}}')]
+
+    async def test_cloudevents_not_found_for_self_host(self, app):
+        assert (await call(app, 'POST', '/eventhandler', body={}))[0] == 404
+
+
+class TestRouting:
+    async def test_unknown_route_and_method(self, app):
+        assert (await call(app, 'GET', '/api/nope'))[0] == 404
+        assert (await call(app, 'PATCH', '/api/rooms'))[0] == 405
+
+    async def test_static_files(self, store, tmp_path):
+        (tmp_path / 'index.html').write_text('<html>chat</html>')
+        (tmp_path / 'app.js').write_text('console.log(1)')
+        (tmp_path.parent / 'secret.txt').write_text('nope')
+        app = create_chat_asgi_app(room_store_ref=store, chat_service_ref=_Service(store), static_dir=tmp_path)
+        status, headers, body = await call(app, 'GET', '/')
+        assert (status, body) == (200, b'<html>chat</html>') and headers['content-type'] == 'text/html'
+        assert (await call(app, 'GET', '/app.js'))[0] == 200
+        assert (await call(app, 'GET', '/../secret.txt'))[0] == 404
+        assert (await call(app, 'GET', '/api/rooms'))[0] == 200  # API routes win over static files
+
+    async def test_body_limit(self, app):
+        status, _h, data = await call(app, 'POST', '/api/rooms', chunks=[b'x' * MAX_BODY_BYTES, b'x'])
+        assert status == 413
+
+
+async def test_lifespan_hooks(store):
+    calls = []
+
+    async def startup():
+        calls.append('startup')
+
+    async def shutdown():
+        calls.append('shutdown')
+
+    app = create_chat_asgi_app(room_store_ref=store, on_startup=[startup], on_shutdown=[shutdown])
+    inbox = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return inbox.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    await app({'type': 'lifespan'}, receive, send)
+    assert calls == ['startup', 'shutdown']
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
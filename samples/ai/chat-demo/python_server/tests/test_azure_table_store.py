@@ -0,0 +1,355 @@
+"""
+AzureTableRoomStore history reads against an in-process fake table:
+- Reverse-time RowKeys sort newest first
+- "Latest N" reads one bounded page instead of the whole partition
+- Cursor paging walks back through history, including pre-upgrade ISO RowKeys
+- /api/rooms/<id>/messages exposes the cursor
+- list_rooms reads the room summary table, never the message table
+- Summary counters stay exact with several writers; pre-summary history is backfilled once
+- Writes are batched per room into transactions of <= 100 rows and <= 4 MiB, reads see queued writes
+- Oversized messages are rejected up front; rows that keep failing are raised from flush / close
+- Calls from a foreign event loop run on the loop owning the async clients
+- Retention trims rooms to the cap / TTL in delete transactions and fixes the summary count
+- Retention deletes are rate limited and wait while foreground writes are backed up
+- Recently updated rooms and name-prefix search work across owners (metadata table scan)
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from flask import Flask
+
+from ..core.chat_api import create_chat_api_blueprint
+from ..core.room_store import AzureTableRoomStore, InMemoryRoomStore
+from ..core.room_store.retention import RetentionWorker
+from ..core.room_store.write_batcher import WriteBatchError
+from .fake_tables import FakeTableServiceClient
+
+
+def _store(svc=None, **kwargs):
+    svc = svc or FakeTableServiceClient()
+    return AzureTableRoomStore(service_client=svc, table_name="msgs", **kwargs), svc.storage("msgs")
+
+
+async def _fill(store, room, n):
+    for i in range(n):
+        await store.append_message(room, {"messageId": f"m{i}", "type": "message", "from": "u", "message": f"text {i}", "timestamp": str(i)})
+    if hasattr(store, "flush"):
+        await store.flush()
+
+
+def test_row_keys_sort_newest_first():
+    older = AzureTableRoomStore._row_key(1_700_000_000_000_000)
+    newer = AzureTableRoomStore._row_key(1_700_000_000_000_001)
+    assert newer < older and newer.startswith("r") and len(newer) == len(older)
+
+
+@pytest.mark.asyncio
+async def test_latest_page_is_bounded():
+    store, table = _store()
+    await _fill(store, "busy", 300)
+    await _fill(store, "other", 5)
+    table.served = 0
+    msgs, cursor = await store.get_room_messages_page("busy", 50)
+    assert [m["messageId"] for m in msgs] == [f"m{i}" for i in range(250, 300)]
+    assert cursor is not None
+    assert table.served == 51  # one page of limit + 1, not the 300-row partition
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_back_to_the_start():
+    store, table = _store()
+    await _fill(store, "r", 23)
+    seen, cursor, pages = [], None, 0
+    while True:
+        msgs, cursor = await store.get_room_messages_page("r", 10, cursor)
+        seen[:0] = [m["messageId"] for m in msgs]
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 3
+    assert seen == [f"m{i}" for i in range(23)]
+    assert [m["messageId"] for m in await store.get_room_messages("r", 3)] == ["m20", "m21", "m22"]
+
+
+@pytest.mark.asyncio
+async def test_pre_upgrade_rows_follow_reverse_keyed_rows():
+    store, table = _store()
+    for i in range(3):  # rows written with the former ISO8601 RowKey scheme
+        table.create_entity({"PartitionKey": "r", "RowKey": f"2024-01-0{i + 1}T00:00:00+00:00_abc123", "messageId": f"old{i}", "text": "x"})
+    await _fill(store, "r", 4)
+    newest, cursor = await store.get_room_messages_page("r", 5)
+    assert [m["messageId"] for m in newest] == ["old2", "m0", "m1", "m2", "m3"]
+    older, cursor = await store.get_room_messages_page("r", 5, cursor)
+    assert [m["messageId"] for m in older] == ["old0", "old1"] and cursor is None
+
+
+@pytest.mark.asyncio
+async def test_list_rooms_reads_summary_not_history():
+    svc = FakeTableServiceClient()
+    store, table = _store(svc)
+    await store.register_room("empty")
+    await _fill(store, "a", 30)
+    await _fill(store, "b", 7)
+    table.served = 0
+    rooms = await store.list_rooms()
+    assert {r["name"]: r["messages"] for r in rooms} == {"public": 0, "empty": 0, "a": 30, "b": 7}
+    assert table.served == 0 and not table.queries
+    summary = svc.storage("roomsummary")
+    assert summary.served == 2 and summary.queries[-1] == "PartitionKey eq @pk"
+
+
+@pytest.mark.asyncio
+async def test_summary_counts_survive_concurrent_writers():
+    svc = FakeTableServiceClient()
+    (s1, _t), (s2, _t2) = _store(svc), _store(svc)
+    await asyncio.gather(_fill(s1, "shared", 20), _fill(s2, "shared", 15))
+    await s1.append_message("shared", {"messageId": "late"})  # s1's cached ETag is stale by now
+    await s1.flush()
+    assert {r["name"]: r["messages"] for r in await s2.list_rooms()}["shared"] == 36
+
+
+@pytest.mark.asyncio
+async def test_pre_summary_history_is_backfilled_once():
+    svc = FakeTableServiceClient()
+    table = svc.storage("msgs")
+    for i in range(5):
+        table.create_entity({"PartitionKey": "old" if i < 3 else "older", "RowKey": f"2024-01-0{i + 1}T00:00:00+00:00_x", "text": "x"})
+    store, _ = _store(svc)
+    assert {r["name"]: r["messages"] for r in await store.list_rooms()} == {"public": 0, "old": 3, "older": 2}
+    await store.append_message("old", {"messageId": "new"})
+    await store.flush()
+    table.served = 0
+    assert {r["name"]: r["messages"] for r in await store.list_rooms()}["old"] == 4
+    assert table.served == 0
+
+
+@pytest.mark.asyncio
+async def test_busy_room_writes_are_batched_into_transactions():
+    svc = FakeTableServiceClient(latency=0.02)
+    store, table = _store(svc)
+    started = time.monotonic()
+    for i in range(250):
+        await store.append_message("busy", {"messageId": f"m{i}", "type": "message"})
+    enqueue = time.monotonic() - started
+    await store.append_message("quiet", {"messageId": "q0"})
+    await store.flush()
+    stats = store.write_stats()
+    assert enqueue < 0.2  # write-behind: appends do not wait for a round-trip each
+    assert stats["rows"] == 251 and stats["failedRows"] == 0 and stats["maxBatch"] == 100
+    assert stats["transactions"] <= 6  # 1 + 100 + 100 + 49 for "busy", 1 for "quiet"
+    assert svc.transactions >= 3
+    msgs = await store.get_room_messages("busy", 250)
+    assert [m["messageId"] for m in msgs] == [f"m{i}" for i in range(250)]
+    assert {r["name"]: r["messages"] for r in await store.list_rooms()}["busy"] == 250
+
+
+@pytest.mark.asyncio
+async def test_reads_and_room_list_include_queued_writes():
+    svc = FakeTableServiceClient(latency=0.02)
+    store, _table = _store(svc)
+    await store.append_message("r", {"messageId": "first"})
+    await store.append_message("r", {"messageId": "second"})
+    assert {r["name"]: r["messages"] for r in await store.list_rooms()}["r"] == 2
+    assert [m["messageId"] for m in await store.get_room_messages("r")] == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_failed_transaction_is_retried():
+    svc = FakeTableServiceClient()
+    store, table = _store(svc)
+    store._writer.retry_backoff = 0.001
+    real_submit, failures = store._submit_batch, []
+
+    async def flaky(room, entities):
+        if not failures:
+            failures.append(len(entities))
+            raise RuntimeError("503 server busy")
+        await real_submit(room, entities)
+
+    store._writer._submit = flaky
+    await _fill(store, "r", 3)
+    assert failures and store.write_stats()["retries"] == 1
+    assert [m["messageId"] for m in await store.get_room_messages("r")] == ["m0", "m1", "m2"]
+
+
+@pytest.mark.asyncio
+async def test_large_rows_are_split_by_transaction_size():
+    svc = FakeTableServiceClient(latency=0.01)
+    store, _table = _store(svc)
+    text = "\u00e9" * 30_000  # 60 KB as UTF-16 (just under the property limit), 180 KB as escaped JSON
+    for i in range(300):
+        await store.append_message("big", {"messageId": f"m{i}", "type": "message", "message": text})
+    await store.flush()
+    stats = store.write_stats()
+    assert stats["rows"] == 300 and stats["failedRows"] == 0
+    assert stats["maxBatch"] < 25  # 4 MiB / 180 KB per row, not 100 rows of 18 MB
+    assert [m["messageId"] for m in await store.get_room_messages("big", 300)] == [f"m{i}" for i in range(300)]
+
+
+@pytest.mark.asyncio
+async def test_oversized_message_is_rejected_before_queueing():
+    store, _table = _store()
+    with pytest.raises(ValueError, match="'text'"):
+        await store.append_message("r", {"messageId": "huge", "type": "message", "message": "x" * 40_000})
+    assert store._writer.backlog() == 0
+    await store.append_message("r", {"messageId": "ok", "type": "message", "message": "x" * 32_768})
+    assert [m["messageId"] for m in await store.get_room_messages("r")] == ["ok"]
+
+
+@pytest.mark.asyncio
+async def test_persistently_failing_writes_are_raised_from_flush_and_close():
+    store, _table = _store()
+    store._writer.retry_backoff = 0.001
+
+    async def down(room, entities):
+        raise RuntimeError("403 forbidden")
+
+    store._writer._submit = down
+    for i in range(3):
+        await store.append_message("r", {"messageId": f"m{i}", "type": "message"})
+    with pytest.raises(WriteBatchError, match="3 queued writes") as err:
+        await store.flush()
+    assert err.value.failed == {"r": 3} and store.write_stats()["failedRows"] == 3
+    await store.flush()  # reported once
+    await store.append_message("r", {"messageId": "late"})
+    with pytest.raises(WriteBatchError):
+        await store.close()
+
+
+@pytest.mark.asyncio
+async def test_calls_from_other_loops_use_the_owning_loop():
+    svc = FakeTableServiceClient(latency=0.005)
+    store, _table = _store(svc)
+    await _fill(store, "r", 2)  # binds the clients to this loop
+    owner = asyncio.get_running_loop()
+    seen, errors = [], []
+    real_tables = store._tables
+
+    async def tables():
+        seen.append(asyncio.get_running_loop())
+        return await real_tables()
+
+    store._tables = tables
+
+    def other_thread():
+        async def work():
+            await store.append_message("r", {"messageId": "from-thread"})
+            return await store.get_room_messages("r")
+        try:
+            seen.append(asyncio.run(work()))
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    t = threading.Thread(target=other_thread)
+    t.start()
+    while t.is_alive():
+        await asyncio.sleep(0.01)
+    assert not errors
+    *loops, msgs = seen
+    assert loops and all(loop is owner for loop in loops)
+    assert [m["messageId"] for m in msgs] == ["m0", "m1", "from-thread"]
+
+
+@pytest.mark.asyncio
+async def test_retention_trims_rooms_to_the_cap():
+    svc = FakeTableServiceClient()
+    store, table = _store(svc, max_messages_per_room=20, retention_slack=5)
+    await _fill(store, "big", 260)
+    await _fill(store, "small", 10)
+    stats = store.retention_stats()
+    assert stats["roomsPending"] == 1 and stats["compactionLagSeconds"] >= 0
+    txns = svc.transactions
+    assert await store.compact() == 240
+    assert svc.transactions - txns == 3  # 100 + 100 + 40 deletes, plus the summary update
+    assert [m["messageId"] for m in await store.get_room_messages("big", 100)] == [f"m{i}" for i in range(240, 260)]
+    assert len([k for k in table._rows if k[0] == "big"]) == 20
+    assert {r["name"]: r["messages"] for r in await store.list_rooms()}["big"] == 20
+    stats = store.retention_stats()
+    assert stats["rowsReclaimed"] == 240 and stats["roomsPending"] == 0 and stats["compactionLagSeconds"] == 0
+    assert await store.compact() == 0
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_retention_expires_old_rows():
+    store, table = _store(max_messages_per_room=0, message_ttl=60)
+    old_us = time.time_ns() // 1000 - 3_600_000_000
+    for i in range(5):
+        table.create_entity({"PartitionKey": "r", "RowKey": AzureTableRoomStore._row_key(old_us + i), "messageId": f"old{i}"})
+    table.create_entity({"PartitionKey": "r", "RowKey": "2024-01-01T00:00:00+00:00_abc123", "messageId": "legacy"})
+    assert {r["name"]: r["messages"] for r in await store.list_rooms()}["r"] == 6  # backfilled, room marked
+    await _fill(store, "r", 3)
+    assert await store.compact() == 6
+    assert {r["name"]: r["messages"] for r in await store.list_rooms()}["r"] == 3
+    assert [m["messageId"] for m in await store.get_room_messages("r")] == ["m0", "m1", "m2"]
+    assert store.retention_stats()["roomsPending"] == 1  # still holds rows that expire later
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_retention_throttle_limits_rate_and_yields_to_writes():
+    backlog = [500]
+    worker = RetentionWorker(lambda room: asyncio.sleep(0, 0), deletes_per_sec=1000, backlog=lambda: backlog[0], max_backlog=100)
+    waiter = asyncio.ensure_future(worker.throttle(100))
+    await asyncio.sleep(0.12)
+    assert not waiter.done()  # foreground writes are backed up
+    backlog[0] = 0
+    await asyncio.wait_for(waiter, 1)
+    started = time.monotonic()
+    for _ in range(15):
+        await worker.throttle(100)  # bucket holds 1000 tokens: 500 more deletes need ~0.5s
+    assert 0.4 <= time.monotonic() - started < 1.5
+    assert worker.to_dict()["throttledSeconds"] >= 0.5
+
+
+def _client(store):
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    loop = asyncio.new_event_loop()
+    app.register_blueprint(create_chat_api_blueprint(
+        room_store_ref=lambda: store,
+        chat_service_ref=lambda: type("Svc", (), {"room_store": store})(),
+        event_loop_ref=lambda: loop,
+    ))
+    return app.test_client()
+
+
+@pytest.mark.asyncio
+async def test_room_listings_span_owners():
+    store, _table = _store()
+    alpha = await store.create_room_metadata("u1", "Alpha")
+    for owner, name in (("u2", "alpine"), ("u2", "Beta")):
+        await asyncio.sleep(0.002)  # distinct updatedAt stamps
+        await store.create_room_metadata(owner, name)
+    await asyncio.sleep(0.002)
+    await store.update_room_metadata("u1", alpha.room_id, description="bumped")
+    rooms, cursor = await store.list_recent_rooms(2)
+    assert [r.room_name for r in rooms] == ["Alpha", "Beta"] and cursor
+    rooms, cursor = await store.list_recent_rooms(2, cursor)
+    assert [r.room_name for r in rooms] == ["alpine"] and cursor is None
+    rooms, cursor = await store.search_rooms("AL", 1)
+    assert [r.room_name for r in rooms] == ["Alpha"]
+    rooms, cursor = await store.search_rooms("AL", 1, cursor)
+    assert [(r.room_name, r.user_id) for r in rooms] == [("alpine", "u2")] and cursor is None
+    with pytest.raises(ValueError):
+        await store.list_recent_rooms(2, "bogus")
+
+
+@pytest.mark.parametrize("make_store", [lambda: _store()[0], lambda: InMemoryRoomStore(max_messages=500)])
+def test_messages_endpoint_exposes_cursor(make_store):
+    store = make_store()
+    asyncio.run(_fill(store, "room_a", 12))
+    client = _client(store)
+    first = client.get("/api/rooms/room_a/messages?limit=5").get_json()
+    assert [m["messageId"] for m in first["messages"]] == [f"m{i}" for i in range(7, 12)]
+    second = client.get(f"/api/rooms/room_a/messages?limit=5&before={first['nextCursor']}").get_json()
+    assert [m["messageId"] for m in second["messages"]] == [f"m{i}" for i in range(2, 7)]
+    last = client.get(f"/api/rooms/room_a/messages?limit=5&before={second['nextCursor']}").get_json()
+    assert [m["messageId"] for m in last["messages"]] == ["m0", "m1"] and last["nextCursor"] is None
+
+
+def test_messages_endpoint_rejects_bad_memory_cursor():
+    resp = _client(InMemoryRoomStore()).get("/api/rooms/public/messages?before=nope")
+    assert resp.status_code == 400
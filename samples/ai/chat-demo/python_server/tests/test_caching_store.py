@@ -0,0 +1,189 @@
+"""
+CachingRoomStore in front of AzureTableRoomStore (fake table service):
+- Metadata reads, existence checks and room lists are served from cache; CRUD keeps them current
+- History tails: first read loads, later reads and the first messages page cost no table requests
+- Appends keep the tail current, cursors continue into the table, overflowing a tail marks it incomplete
+- Racing writes/loads drop the tail instead of caching a wrong order
+- A metadata load racing a delete/update is not cached; a failed lookup is raised, not cached as missing
+- LRU eviction, TTL expiry and hit/miss counters
+"""
+
+import asyncio
+
+import pytest
+from ..core.room_store import AzureTableRoomStore, CachingRoomStore, EventRecord, InMemoryRoomStore, RoomMetadata
+from ..core.room_store.caching import LruTtlCache
+from .fake_tables import FakeAsyncTableClient, FakeTableServiceClient
+
+
+def _stores(**kwargs):
+    svc = FakeTableServiceClient()
+    inner = AzureTableRoomStore(service_client=svc, table_name="msgs", write_batch_size=1)
+    return CachingRoomStore(inner, **kwargs), svc
+
+
+def _event(i):
+    return EventRecord("message", f"m{i}", "u", f"text {i}", 1_700_000_000_000 + i)
+
+
+@pytest.mark.asyncio
+async def test_metadata_is_cached_and_kept_current():
+    store, svc = _stores()
+    await store.create_room_metadata("u1", "Design", room_id="room_a")
+    base = svc.requests
+    for _ in range(5):
+        assert (await store.get_room_metadata("u1", "room_a")).room_name == "Design"
+        assert await store.room_exists("u1", "room_a")
+        assert not await store.room_exists("u1", "nope")
+    assert [r.room_id for r in await store.list_user_rooms("u1")][1:] == ["room_a"]
+    assert [r.room_id for r in await store.list_user_rooms("u1")][1:] == ["room_a"]
+    assert svc.requests - base == 2  # the miss for "nope" and the first room list
+
+    await store.update_room_metadata("u1", "room_a", room_name="Design review")
+    assert (await store.get_room_metadata("u1", "room_a")).room_name == "Design review"
+    assert [r.room_name for r in await store.list_user_rooms("u1")][1:] == ["Design review"]
+    await store.create_room_metadata("u1", "Ops", room_id="nope")
+    assert await store.room_exists("u1", "nope")
+    assert await store.delete_room_metadata("u1", "room_a")
+    assert not await store.room_exists("u1", "room_a")
+    assert [r.room_id for r in await store.list_user_rooms("u1")][1:] == ["nope"]
+    stats = store.cache_stats()["metadata"]
+    assert stats["hits"] >= 14 and stats["invalidations"] >= 3 and 0 < stats["hitRatio"] < 1
+
+
+@pytest.mark.asyncio
+async def test_tail_reads_and_first_page_skip_the_table():
+    store, svc = _stores(tail_size=5)
+    for i in range(8):
+        await store.record_room_event("r", _event(i))
+    assert [m["messageId"] for m in await store.get_room_messages("r", 3)] == ["m5", "m6", "m7"]  # loads the tail
+    base = svc.requests
+    assert [m["messageId"] for m in await store.get_room_messages("r")] == [f"m{i}" for i in range(3, 8)]
+    page, cursor = await store.get_room_messages_page("r", 2)
+    assert [m["messageId"] for m in page] == ["m6", "m7"]
+    assert svc.requests == base
+
+    await store.record_room_event("r", _event(8))
+    base = svc.requests
+    page, cursor = await store.get_room_messages_page("r", 5)
+    assert [m["messageId"] for m in page] == [f"m{i}" for i in range(4, 9)]
+    assert svc.requests == base
+    older, cursor = await store.get_room_messages_page("r", 5, cursor)  # from the table
+    assert [m["messageId"] for m in older] == [f"m{i}" for i in range(0, 4)] and cursor is None
+    assert await store.get_room_messages("r", 50) and len(await store.get_room_messages("r", 50)) == 9  # beyond the tail: table
+
+
+@pytest.mark.asyncio
+async def test_small_room_tail_is_complete_until_it_overflows():
+    store, _svc = _stores(tail_size=3)
+    await store.record_room_event("r", _event(0))
+    page, cursor = await store.get_room_messages_page("r", 3)
+    assert [m["messageId"] for m in page] == ["m0"] and cursor is None
+    for i in range(1, 4):
+        await store.record_room_event("r", _event(i))
+    page, cursor = await store.get_room_messages_page("r", 3)
+    assert [m["messageId"] for m in page] == ["m1", "m2", "m3"] and cursor is not None
+    older, cursor = await store.get_room_messages_page("r", 3, cursor)
+    assert [m["messageId"] for m in older] == ["m0"] and cursor is None
+
+
+class _SlowStore(InMemoryRoomStore):
+    """Writes land in the order they finish, which is not the order they started."""
+
+    async def record_room_event(self, room, event):
+        await asyncio.sleep(0.01 if event["messageId"] in ("m1", "m3") else 0)
+        await super().record_room_event(room, event)
+
+    async def get_room_messages(self, room, limit=None):
+        messages = await super().get_room_messages(room, limit)
+        await asyncio.sleep(0.01)
+        return messages
+
+
+@pytest.mark.asyncio
+async def test_racing_writes_drop_the_tail():
+    inner = _SlowStore()
+    store = CachingRoomStore(inner, tail_size=50)
+    await store.record_room_event("r", _event(0))
+    await store.get_room_messages("r", 5)
+    await asyncio.gather(*(store.record_room_event("r", _event(i)) for i in range(1, 6)))
+    assert store.cache_stats()["tails"]["invalidations"] >= 1
+    assert await store.get_room_messages("r", 50) == await inner.get_room_messages("r", 50)
+
+    store._tails.invalidate("r")
+    load = asyncio.ensure_future(store.get_room_messages("r", 5))
+    await asyncio.sleep(0)
+    await store.record_room_event("r", _event(6))  # lands while the tail is being loaded
+    assert "m6" not in [m["messageId"] for m in await load]  # read before the write: must not be kept
+    assert await store.get_room_messages("r", 50) == await inner.get_room_messages("r", 50)
+
+
+class _SlowMetadataStore(InMemoryRoomStore):
+    """Metadata reads take their snapshot first and answer later."""
+
+    async def get_room_metadata(self, user_id, room_id):
+        room = await super().get_room_metadata(user_id, room_id)
+        room = room and RoomMetadata(**vars(room))  # a snapshot, like a remote read
+        await asyncio.sleep(0.01)
+        return room
+
+    async def list_user_rooms(self, user_id):
+        rooms = await super().list_user_rooms(user_id)
+        await asyncio.sleep(0.01)
+        return rooms
+
+
+@pytest.mark.asyncio
+async def test_metadata_load_racing_a_write_is_not_kept():
+    inner = _SlowMetadataStore()
+    store = CachingRoomStore(inner)
+    await inner.create_room_metadata("u1", "Design", room_id="room_a")
+    load = asyncio.ensure_future(store.room_exists("u1", "room_a"))
+    rooms = asyncio.ensure_future(store.list_user_rooms("u1"))
+    await asyncio.sleep(0)
+    assert await store.delete_room_metadata("u1", "room_a")  # lands while both are loading
+    assert await load  # read before the delete: must not be kept
+    assert "room_a" in [r.room_id for r in await rooms]
+    assert not await store.room_exists("u1", "room_a")
+    assert "room_a" not in [r.room_id for r in await store.list_user_rooms("u1")]
+
+    await inner.create_room_metadata("u1", "Ops", room_id="room_b")
+    load = asyncio.ensure_future(store.get_room_metadata("u1", "room_b"))
+    await asyncio.sleep(0)
+    await store.update_room_metadata("u1", "room_b", room_name="Ops review")
+    assert (await load).room_name == "Ops"
+    assert (await store.get_room_metadata("u1", "room_b")).room_name == "Ops review"
+
+
+@pytest.mark.asyncio
+async def test_failed_metadata_lookup_is_not_cached_as_missing(monkeypatch):
+    store, _svc = _stores()
+    await store.create_room_metadata("u1", "Design", room_id="room_a")
+    store._metadata.invalidate(("room", "u1", "room_a"))
+    real_get = FakeAsyncTableClient.get_entity
+
+    async def flaky_get(self, partition_key, row_key, **kwargs):
+        monkeypatch.setattr(FakeAsyncTableClient, "get_entity", real_get)
+        raise RuntimeError("503 server busy")
+
+    monkeypatch.setattr(FakeAsyncTableClient, "get_entity", flaky_get)
+    with pytest.raises(RuntimeError):
+        await store.room_exists("u1", "room_a")
+    assert await store.room_exists("u1", "room_a")
+    assert await store.get_room_metadata("u1", "nope") is None  # a real miss is still cached
+    assert store._metadata.get(("room", "u1", "nope")) == (True, None)
+
+
+def test_lru_ttl_cache_evicts_and_expires():
+    now = [0.0]
+    cache = LruTtlCache(2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.put("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") == (False, None)
+    now[0] = 11
+    assert cache.get("a") == (False, None)
+    assert cache.stats.to_dict(len(cache)) == {
+        "size": 1, "hits": 1, "misses": 2, "hitRatio": 0.3333, "evictions": 1, "expirations": 1, "invalidations": 0,
+    }
@@ -1,8 +1,9 @@
 """
 Chat API feature tests consolidated:
 - Rooms CRUD: list/get/create/update/delete + validations
-- Messages endpoint: limit clamping + service-unavailable path
+- Messages endpoint: limit clamping + service-unavailable path + JSON shape of stored events
 - Location header on create
+- Indexed listings: recently updated rooms and name-prefix search, paged with nextCursor
 """
 
 import json
@@ -175,6 +176,34 @@ class TestRoomsCrud:
         assert isinstance(loc, str) and loc.endswith(f'/api/rooms/{rid}')
 
 
+class TestIndexedRoomListings:
+    def test_recent_rooms_are_paged_across_users(self, client):
+        ids = [client.post('/api/rooms', json={'roomName': f'Room {i}'}, headers={'X-User-Id': f'u{i}'}).get_json()['roomId'] for i in range(3)]
+        client.put(f'/api/rooms/{ids[0]}', json={'roomName': 'Touched'}, headers={'X-User-Id': 'u0'})
+        first = client.get('/api/rooms/recent?limit=2').get_json()
+        assert [r['roomId'] for r in first['rooms']] == [ids[0], ids[2]] and first['nextCursor']
+        second = client.get(f"/api/rooms/recent?limit=2&cursor={first['nextCursor']}").get_json()
+        assert [r['roomId'] for r in second['rooms']] == [ids[1], 'public'] and second['nextCursor'] is None
+        assert client.get('/api/rooms/recent?cursor=bogus').status_code == 400
+
+    def test_prefix_search(self, client, auth_headers):
+        for name in ('Design review', 'design sync', 'Standup'):
+            client.post('/api/rooms', json={'roomName': name}, headers=auth_headers)
+        data = client.get('/api/rooms/search?prefix=DES').get_json()
+        assert [r['roomName'] for r in data['rooms']] == ['Design review', 'design sync'] and data['nextCursor'] is None
+        assert client.get('/api/rooms/search').status_code == 400
+
+    def test_store_without_indexes_reports_not_supported(self, app):
+        class _PlainStore:
+            async def list_recent_rooms(self, limit, before=None):
+                raise NotImplementedError
+
+        loop = app._test_loop  # type: ignore[attr-defined]
+        isolated = Flask(__name__)
+        isolated.register_blueprint(create_chat_api_blueprint(room_store_ref=lambda: _PlainStore(), chat_service_ref=lambda: None, event_loop_ref=lambda: loop))
+        assert isolated.test_client().get('/api/rooms/recent').status_code == 501
+
+
 class TestMessagesEndpoint:
     def test_messages_limit_is_clamped(self):
         class _FakeStore:
@@ -201,6 +230,19 @@ class TestMessagesEndpoint:
         assert resp.status_code in (200, 503, 504, 500)
         assert store.last_limit is not None and store.last_limit <= 500
 
+    def test_messages_endpoint_renders_stored_events(self):
+        store = InMemoryRoomStore()
+        event = {'type': 'message', 'messageId': 'm-1', 'from': 'bob', 'message': 'hello', 'timestamp': '2024-05-01T10:20:30.500000+00:00'}
+        asyncio.run(store.record_room_event('r', event))
+        app = Flask(__name__)
+        app.config['TESTING'] = True
+        loop = asyncio.new_event_loop()
+        svc = type('Svc', (), {'room_store': store})()
+        app.register_blueprint(create_chat_api_blueprint(room_store_ref=lambda: store, chat_service_ref=lambda: svc, event_loop_ref=lambda: loop))
+        resp = app.test_client().get('/api/rooms/r/messages')
+        assert resp.status_code == 200
+        assert resp.get_json()['messages'] == [{**event, 'timestamp': '2024-05-01T10:20:30.500+00:00'}]
+
     def test_messages_endpoint_service_unavailable(self):
         app = Flask(__name__)
         app.config['TESTING'] = True
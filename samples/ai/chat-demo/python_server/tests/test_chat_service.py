@@ -2,6 +2,13 @@
 Chat service tests consolidated:
 - Builder behavior for SELF/WEBPUBSUB
 - In-memory client manager group operations
+- Outbound queue overflow policies
+- Encode-once broadcast frames
+- Reliable subprotocol sequencing, ack trimming and connection recovery
+- Reliable frames queued when a socket write fails are replayed without a gap
+- protobuf.webpubsub.azure.v1 codec and mixed JSON/protobuf rooms (room-list updates included)
+- Adaptive batching of streamed chunks
+- A stream whose source fails is ended for clients, raised and not recorded
 - ConnectionTaskManager scheduling/cancel
 - Self-host websocket transport emits connected system event
 - Server negotiate endpoint smoke test
@@ -22,7 +29,14 @@ from ..core.room_store import InMemoryRoomStore
 from ..core.runtime_config import TransportMode
 from ..task_manager import ConnectionTaskManager
 from ..chat_service.transports.self_host import _InMemoryClientManager, SendResult, ChatService as SelfChatService
-from ..chat_service.base import ClientConnectionContext
+from ..chat_service.transports.outbound import OverflowPolicy
+from ..chat_service.transports.frames import PreparedFrame, SequencedFrame
+from ..chat_service.transports.reliable import ReliableSession
+from ..chat_service.transports.protobuf_codec import decode_upstream, encode_downstream, protobuf_available
+
+needs_protobuf = pytest.mark.skipif(not protobuf_available(), reason="protobuf runtime not installed")
+from ..chat_service.base import SYS_ROOMS_GROUP, ClientConnectionContext
+from ..chat_service.streaming import StreamBatchConfig, batch_chunks
 
 
 class DummyLogger:
@@ -80,6 +94,297 @@ async def test_client_manager_remove_and_membership():
     assert mgr.group_members("g") == {"c1"}
 
 
+@pytest.mark.asyncio
+async def test_client_manager_reverse_index_tracks_memberships():
+    mgr, _ws1, _ws2 = await _prep_group()
+    await mgr.add_client_to_group("c1", "h")
+    assert mgr.client_groups("c1") == {"g", "h"}
+    await mgr.remove_client_from_group("c1", "g")
+    assert mgr.client_groups("c1") == {"h"}
+    await mgr.remove_client("c1")
+    assert mgr.client_groups("c1") == set()
+    assert mgr.group_members("h") == set() and "h" not in mgr._groups
+    assert mgr.group_members("g") == {"c2"}
+
+
+@pytest.mark.asyncio
+async def test_client_manager_fan_out_is_concurrent_and_bounded_by_timeout():
+    mgr = _InMemoryClientManager(max_concurrency=8, send_timeout=0.2)
+    class SlowWS:
+        async def send(self, data: str): await asyncio.sleep(5)
+    class FastWS:
+        def __init__(self): self.sent = []
+        async def send(self, data: str): await asyncio.sleep(0.05); self.sent.append(data)
+    fast = [FastWS() for _ in range(6)]
+    await mgr.add_client("slow", ClientConnectionContext("/ws", "slow"), SlowWS())
+    await mgr.add_client_to_group("slow", "g")
+    for i, ws in enumerate(fast):
+        await mgr.add_client(f"f{i}", ClientConnectionContext("/ws", f"f{i}"), ws)
+        await mgr.add_client_to_group(f"f{i}", "g")
+    started = time.perf_counter()
+    results = await mgr.send_to_group("g", "{}")
+    elapsed = time.perf_counter() - started
+    # Sequential sends would take >= 6 * 0.05s plus the slow client's timeout
+    assert elapsed < 0.5
+    by_id = {r.connection_id: r for r in results}
+    assert len(by_id) == 7
+    assert not by_id["slow"].ok and "timed out" in (by_id["slow"].error or "")
+    assert all(by_id[f"f{i}"].ok for i in range(6))
+    assert all(ws.sent == ["{}"] for ws in fast)
+
+
+class _GatedWS:
+    """Socket whose writes block until the test opens the gate."""
+    def __init__(self):
+        self.sent = []
+        self.gate = asyncio.Event()
+        self.closed_with = None
+    async def send(self, data: str):
+        await self.gate.wait()
+        self.sent.append(data)
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = (code, reason)
+
+
+async def _queued_client(policy, size=2):
+    mgr = _InMemoryClientManager(outbound_queue_size=size, overflow_policy=policy)
+    ws = _GatedWS()
+    await mgr.add_client("c1", ClientConnectionContext("/ws", "c1"), ws)
+    await mgr.add_client_to_group("c1", "g")
+    await asyncio.sleep(0)
+    return mgr, ws
+
+
+def _chunk(mid, text):
+    return json.dumps({"type": "message", "data": {"messageId": mid, "message": text, "streaming": True}})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("policy,expected", [
+    (OverflowPolicy.DROP_OLDEST, ["m0", "m2", "m3"]),
+    (OverflowPolicy.DROP_NEWEST, ["m0", "m1", "m2"]),
+])
+async def test_outbound_queue_drop_policies(policy, expected):
+    mgr, ws = await _queued_client(policy)
+    results = [await mgr.send_to_group("g", "m0")]
+    await asyncio.sleep(0)
+    results += [await mgr.send_to_group("g", f"m{i}") for i in range(1, 4)]
+    # m0 is already held by the writer; m1, m2 fill the queue; m3 overflows
+    assert all(r[0].ok for r in results[:3])
+    assert results[3][0].ok is (policy is OverflowPolicy.DROP_OLDEST)
+    stats = mgr.outbound_stats()["c1"]
+    assert stats["dropped"] == 1 and stats["depth"] == 2
+    ws.gate.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert ws.sent == expected
+    await mgr.remove_client("c1")
+
+
+@pytest.mark.asyncio
+async def test_outbound_queue_coalesces_streaming_chunks():
+    mgr, ws = await _queued_client(OverflowPolicy.COALESCE)
+    await mgr.send_to_group("g", _chunk("m-1", "a"))
+    await asyncio.sleep(0)
+    for text in ["b", "c", "d", "e"]:
+        await mgr.send_to_group("g", _chunk("m-1", text))
+    assert mgr.outbound_stats()["c1"]["coalesced"] == 2
+    ws.gate.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert "".join(json.loads(f)["data"]["message"] for f in ws.sent) == "abcde"
+    assert len(ws.sent) == 3
+    await mgr.remove_client("c1")
+
+
+@pytest.mark.asyncio
+async def test_outbound_queue_disconnect_policy_closes_socket():
+    mgr, ws = await _queued_client(OverflowPolicy.DISCONNECT, size=1)
+    await mgr.send_to_group("g", "m0")
+    await asyncio.sleep(0)
+    await mgr.send_to_group("g", "m1")
+    overflow = await mgr.send_to_group("g", "m2")
+    assert not overflow[0].ok
+    await asyncio.sleep(0)
+    assert ws.closed_with is not None and ws.closed_with[0] == 1008
+    after = await mgr.send_to_connection("c1", "m3")
+    assert not after.ok
+    await mgr.remove_client("c1")
+
+
+class _BrokenWS(_GatedWS):
+    """Socket whose first write (once the gate opens) fails like a network blip."""
+    async def send(self, data: str):
+        await self.gate.wait()
+        raise ConnectionError("connection reset")
+
+
+def _msg(text):
+    return json.dumps({"type": "message", "from": "group", "group": "g", "dataType": "json", "data": {"message": text}})
+
+
+@pytest.mark.asyncio
+async def test_reliable_frames_queued_at_a_failed_write_are_replayed():
+    mgr = _InMemoryClientManager(outbound_queue_size=8)
+    broken = _BrokenWS()
+    await mgr.add_client("c1", ClientConnectionContext("/ws", "c1"), broken, reliable=True)
+    await mgr.add_client_to_group("c1", "g")
+    token = mgr.session("c1").reconnection_token
+    for text in ("m1", "m2", "m3"):
+        assert (await mgr.send_to_group("g", _msg(text)))[0].ok
+    await asyncio.sleep(0)  # the writer holds m1, m2 and m3 are queued
+    broken.gate.set()
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert broken.closed_with is not None and broken.closed_with[0] == 1008
+    # fanned out after the failure but before the handler detaches the socket
+    assert (await mgr.send_to_group("g", _msg("m4")))[0].ok
+    assert await mgr.detach_client("c1")
+    assert (await mgr.send_to_group("g", _msg("m5")))[0].ok
+
+    fresh = _GatedWS()
+    fresh.gate.set()
+    try:
+        assert await mgr.resume_client("c1", token, fresh) is not None
+        assert await mgr.replay_unacked("c1") == 5
+        for _ in range(50):
+            if len(fresh.sent) == 5:
+                break
+            await asyncio.sleep(0)
+        replayed = [json.loads(f) for f in fresh.sent]
+        assert [(m["sequenceId"], m["data"]["message"]) for m in replayed] == [(i, f"m{i}") for i in range(1, 6)]
+    finally:
+        await mgr.remove_client("c1")
+
+
+def test_prepared_frame_encodes_once():
+    frame = PreparedFrame({"type": "message", "data": {"message": "héllo"}})
+    assert json.loads(frame.text)["data"]["message"] == "héllo"
+    assert frame.text is frame.text and frame.wire is frame.wire
+    # FIN + text opcode, unmasked 7-bit length, then the UTF-8 payload
+    assert frame.wire[0] == 0x81 and frame.wire[1] == len(frame.data)
+    assert frame.wire[2:] == frame.text.encode("utf-8")
+
+
+def test_sequenced_frame_splices_sequence_id():
+    frame = PreparedFrame({"type": "message", "data": "x"})
+    seq = SequencedFrame(frame, 42)
+    assert json.loads(seq.text) == {"sequenceId": 42, "type": "message", "data": "x"}
+    assert seq.wire[0] == 0x81 and seq.wire[2:] == seq.text.encode("utf-8")
+    assert json.loads(SequencedFrame(PreparedFrame({}), 7).text) == {"sequenceId": 7}
+
+
+def test_reliable_session_stamps_acks_and_trims():
+    session = ReliableSession("c1", buffer_size=3)
+    assert session.stamp('{"type": "ack", "ackId": 1}') == '{"type": "ack", "ackId": 1}'
+    stamped = [session.stamp(PreparedFrame({"type": "message", "data": i})) for i in range(4)]
+    assert [f.sequence_id for f in stamped] == [1, 2, 3, 4]
+    # buffer holds 3: seq 1 was evicted unacked, so replay would have a gap
+    assert [f.sequence_id for f in session.unacked()] == [2, 3, 4]
+    assert not session.resumable
+    session.ack(2)
+    assert [f.sequence_id for f in session.unacked()] == [3, 4]
+    assert session.resumable
+    assert not session.verify("wrong") and session.verify(session.reconnection_token)
+
+
+@needs_protobuf
+def test_protobuf_codec_maps_json_protocol_shapes():
+    from ..chat_service.transports import pubsub_pb2 as pb
+    up = pb.UpstreamMessage()
+    up.send_to_group_message.group = "room_x"
+    up.send_to_group_message.ack_id = 3
+    up.send_to_group_message.data.text_data = json.dumps({"message": "hi", "from": "u"})
+    assert decode_upstream(up.SerializeToString()) == {
+        "type": "sendToGroup", "group": "room_x", "ackId": 3, "dataType": "json", "data": {"message": "hi", "from": "u"},
+    }
+    join = pb.UpstreamMessage()
+    join.join_group_message.group = "room_x"
+    assert decode_upstream(join.SerializeToString()) == {"type": "joinGroup", "group": "room_x"}
+
+    frame = PreparedFrame({"type": "message", "from": "group", "group": "room_x", "dataType": "json", "data": {"message": "tok"}})
+    down = pb.DownstreamMessage.FromString(frame.protobuf)
+    assert down.data_message.group == "room_x" and json.loads(down.data_message.data.text_data) == {"message": "tok"}
+    assert len(frame.protobuf) < len(frame.data)
+    assert frame.protobuf_wire[0] == 0x82 and frame.protobuf_wire[2:] == frame.protobuf
+    ack = pb.DownstreamMessage.FromString(encode_downstream({"type": "ack", "ackId": 1, "success": False, "error": "nope"}))
+    assert ack.ack_message.ack_id == 1 and not ack.ack_message.success and ack.ack_message.error.message == "nope"
+    # room-list updates are group messages, not system events: protobuf clients get them
+    rooms = {"type": "message", "from": "group", "group": "sys_rooms", "dataType": "json", "data": {"type": "rooms-changed", "rooms": [{"roomId": "r1"}]}}
+    down = pb.DownstreamMessage.FromString(encode_downstream(rooms))
+    assert down.data_message.group == "sys_rooms" and json.loads(down.data_message.data.text_data) == rooms["data"]
+    assert encode_downstream({"type": "system", "event": "pong"}) is None  # no protobuf system message for it
+
+
+async def _tokens(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def _collect(chunks, config):
+    return [c async for c in batch_chunks(chunks, config)]
+
+
+@pytest.mark.asyncio
+async def test_batch_chunks_flushes_first_chunk_then_merges():
+    frames = await _collect(_tokens(["Hel"] + ["lo"] * 20), StreamBatchConfig(window=0.5))
+    assert frames == ["Hel", "lo" * 20]
+    # byte budget flushes before the window elapses
+    frames = await _collect(_tokens(["ab", "cd", "ef", "gh", "i"]), StreamBatchConfig(window=5, max_bytes=4))
+    assert frames == ["ab", "cdef", "ghi"]
+    # window 0 disables batching; empty chunks are dropped either way
+    assert await _collect(_tokens(["a", "", "b"]), StreamBatchConfig(window=0)) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_batch_chunks_window_bounds_added_latency():
+    started = time.monotonic()
+    stamps = []
+    async for frame in batch_chunks(_tokens(["t"] * 30, delay=0.01), StreamBatchConfig(window=0.05)):
+        stamps.append((time.monotonic() - started, frame))
+    assert "".join(f for _t, f in stamps) == "t" * 30
+    assert stamps[0][0] < 0.04  # first token is not held back
+    assert 3 <= len(stamps) <= 12
+
+
+@pytest.mark.asyncio
+async def test_self_host_streaming_batches_tokens_without_fixed_sleep():
+    mgr, ws1, _ws2 = await _prep_group()
+    await mgr.add_client_to_group("c1", "room_r")
+    svc = SelfChatService(client_manager=mgr, stream_batch=StreamBatchConfig(window=0.05))
+    started = time.monotonic()
+    full = await svc.streaming_to_group("r", _tokens([f"w{i} " for i in range(200)], delay=0.001))
+    elapsed = time.monotonic() - started
+    frames = [json.loads(m)["data"] for m in ws1.sent]
+    assert full == "".join(f"w{i} " for i in range(200))
+    assert "".join(f.get("message", "") for f in frames) == full
+    assert frames[0]["message"] == "w0 " and frames[-1].get("streamingEnd")
+    assert len(frames) <= 21  # >= 10x fewer frames than tokens
+    assert elapsed < 2.0
+
+
+@pytest.mark.asyncio
+async def test_self_host_failed_stream_is_ended_and_not_recorded():
+    mgr, ws1, _ws2 = await _prep_group()
+    await mgr.add_client_to_group("c1", "room_r")
+    store = InMemoryRoomStore()
+    svc = SelfChatService(client_manager=mgr, room_store=store, stream_batch=StreamBatchConfig(window=0))
+
+    async def cut_off():
+        yield "Hel"
+        yield "lo"
+        raise ConnectionError("model stream dropped")
+
+    with pytest.raises(ConnectionError):
+        await svc.streaming_to_group("r", cut_off())
+    frames = [json.loads(m)["data"] for m in ws1.sent]
+    assert [f.get("message") for f in frames[:-1]] == ["Hel", "lo"]
+    assert frames[-1].get("streamingEnd") and frames[-1]["messageId"] == frames[0]["messageId"]
+    assert await store.get_room_messages("r") == []
+
+
 @pytest.mark.asyncio
 async def test_schedule_and_cancel_all():
     loop = asyncio.new_event_loop()
@@ -112,6 +417,12 @@ async def test_schedule_and_cancel_all():
     loop.close()
 
 
+async def _until_listening(svc, server_task, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while svc._server is None and not server_task.done() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
 @pytest.mark.asyncio
 async def test_self_host_emits_connected_system_message():
     # pick a free port
@@ -121,7 +432,7 @@ async def test_self_host_emits_connected_system_message():
 
     svc = SelfChatService()
     server_task = asyncio.create_task(svc.start_chat(host='localhost', port=free_port))
-    await asyncio.sleep(0.05)
+    await _until_listening(svc, server_task)
     uri = f"ws://localhost:{free_port}/ws"
     import websockets
     async with websockets.connect(uri, subprotocols=['json.reliable.webpubsub.azure.v1']) as ws:
@@ -137,6 +448,163 @@ async def test_self_host_emits_connected_system_message():
             await server_task
 
 
+@pytest.mark.asyncio
+async def test_self_host_group_broadcast_uses_prepared_frames():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('localhost', 0))
+        _h, free_port = s.getsockname()
+
+    svc = SelfChatService()
+    server_task = asyncio.create_task(svc.start_chat(host='localhost', port=free_port))
+    await _until_listening(svc, server_task)
+    uri = f"ws://localhost:{free_port}/ws"
+    import websockets
+    protocols = ['json.webpubsub.azure.v1']
+    async with websockets.connect(uri, subprotocols=protocols) as a, websockets.connect(uri, subprotocols=protocols) as b:
+        for ws in (a, b):
+            await asyncio.wait_for(ws.recv(), timeout=1.0)  # connected
+            await ws.send(json.dumps({"type": "joinGroup", "group": "room_x", "ackId": 1}))
+        async def next_of_type(ws, kind):
+            while True:
+                msg = json.loads(await asyncio.wait_for(ws.recv(), timeout=1.0))
+                if msg.get("type") == kind and msg.get("group") == "room_x":
+                    return msg
+        await a.send(json.dumps({"type": "sendToGroup", "data": {"group": "room_x", "message": "hi ✓", "from": "u"}}))
+        got = await next_of_type(b, "message")
+        assert got["data"]["message"] == "hi ✓" and got["data"]["roomId"] == "x"
+    await asyncio.wait_for(svc.stop(), timeout=2)
+    await asyncio.sleep(0.05)
+    if not server_task.done():
+        server_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_self_host_reliable_connection_recovers_unacked_messages():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('localhost', 0))
+        _h, free_port = s.getsockname()
+
+    svc = SelfChatService()
+    server_task = asyncio.create_task(svc.start_chat(host='localhost', port=free_port))
+    await _until_listening(svc, server_task)
+    uri = f"ws://localhost:{free_port}/ws"
+    import websockets
+    reliable = ['json.reliable.webpubsub.azure.v1']
+
+    async def next_message(ws):
+        while True:
+            msg = json.loads(await asyncio.wait_for(ws.recv(), timeout=1.0))
+            if msg.get("type") == "message":
+                return msg
+
+    async with websockets.connect(uri, subprotocols=['json.webpubsub.azure.v1']) as sender:
+        await asyncio.wait_for(sender.recv(), timeout=1.0)
+        say = lambda text: sender.send(json.dumps({"type": "sendToGroup", "data": {"group": "room_r", "message": text, "from": "u"}}))
+
+        a = await websockets.connect(uri, subprotocols=reliable)
+        hello = json.loads(await asyncio.wait_for(a.recv(), timeout=1.0))
+        conn_id, token = hello["connectionId"], hello["reconnectionToken"]
+        await a.send(json.dumps({"type": "joinGroup", "group": "room_r", "ackId": 1}))
+        await say("one")
+        first = await next_message(a)
+        assert first["sequenceId"] == 1 and first["data"]["message"] == "one"
+        await a.send(json.dumps({"type": "sequenceAck", "sequenceId": 1}))
+        await asyncio.sleep(0.05)
+        a.transport.abort()  # drop without a close frame -> 1006 on the server
+        await asyncio.sleep(0.1)
+        await say("two")
+        await say("three")
+        await asyncio.sleep(0.05)
+
+        bad = await websockets.connect(f"{uri}?awps_connection_id={conn_id}&awps_reconnection_token=nope", subprotocols=reliable)
+        with pytest.raises(websockets.ConnectionClosed) as closed:
+            await asyncio.wait_for(bad.recv(), timeout=1.0)
+        assert closed.value.rcvd is not None and closed.value.rcvd.code == 1008
+
+        async with websockets.connect(f"{uri}?awps_connection_id={conn_id}&awps_reconnection_token={token}", subprotocols=reliable) as again:
+            hello = json.loads(await asyncio.wait_for(again.recv(), timeout=1.0))
+            assert hello["event"] == "connected" and hello["connectionId"] == conn_id
+            replayed = [await next_message(again), await next_message(again)]
+            assert [(m["sequenceId"], m["data"]["message"]) for m in replayed] == [(2, "two"), (3, "three")]
+            await say("four")
+            assert (await next_message(again))["sequenceId"] == 4
+    await asyncio.wait_for(svc.stop(), timeout=2)
+    await asyncio.sleep(0.05)
+    if not server_task.done():
+        server_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await server_task
+
+
+@needs_protobuf
+@pytest.mark.asyncio
+async def test_self_host_protobuf_and_json_clients_share_a_room():
+    from ..chat_service.transports import pubsub_pb2 as pb
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('localhost', 0))
+        _h, free_port = s.getsockname()
+
+    svc = SelfChatService()
+    server_task = asyncio.create_task(svc.start_chat(host='localhost', port=free_port))
+    await _until_listening(svc, server_task)
+    uri = f"ws://localhost:{free_port}/ws"
+    import websockets
+
+    async def next_down(ws, kind):
+        while True:
+            msg = pb.DownstreamMessage.FromString(await asyncio.wait_for(ws.recv(), timeout=1.0))
+            if msg.WhichOneof("message") == kind:
+                return msg
+
+    async with websockets.connect(uri, subprotocols=['protobuf.webpubsub.azure.v1']) as p, \
+            websockets.connect(uri, subprotocols=['json.webpubsub.azure.v1']) as j:
+        assert p.subprotocol == 'protobuf.webpubsub.azure.v1'
+        hello = await next_down(p, "system_message")
+        assert hello.system_message.connected_message.connection_id.startswith("conn-")
+        join = pb.UpstreamMessage()
+        join.join_group_message.group = "room_p"
+        join.join_group_message.ack_id = 7
+        await p.send(join.SerializeToString())
+        ack = await next_down(p, "ack_message")
+        assert ack.ack_message.ack_id == 7 and ack.ack_message.success
+        await asyncio.wait_for(j.recv(), timeout=1.0)  # connected
+        await j.send(json.dumps({"type": "joinGroup", "group": "room_p", "ackId": 1}))
+        await asyncio.wait_for(j.recv(), timeout=1.0)  # ack
+
+        await j.send(json.dumps({"type": "sendToGroup", "data": {"group": "room_p", "message": "from json", "from": "j"}}))
+        got = await next_down(p, "data_message")
+        assert got.data_message.group == "room_p"
+        assert json.loads(got.data_message.data.text_data)["message"] == "from json"
+
+        up = pb.UpstreamMessage()
+        up.send_to_group_message.group = "room_p"
+        up.send_to_group_message.data.text_data = json.dumps({"message": "from protobuf", "from": "p"})
+        await p.send(up.SerializeToString())
+        while True:
+            msg = json.loads(await asyncio.wait_for(j.recv(), timeout=1.0))
+            if msg.get("type") == "message" and msg["data"]["from"] == "p":
+                break
+        assert msg["group"] == "room_p" and msg["data"]["message"] == "from protobuf" and msg["data"]["roomId"] == "p"
+
+        join = pb.UpstreamMessage()
+        join.join_group_message.group = SYS_ROOMS_GROUP
+        join.join_group_message.ack_id = 8
+        await p.send(join.SerializeToString())
+        assert (await next_down(p, "ack_message")).ack_message.ack_id == 8
+        await svc.notify_rooms_changed()
+        rooms = await next_down(p, "data_message")
+        assert rooms.data_message.group == SYS_ROOMS_GROUP
+        assert json.loads(rooms.data_message.data.text_data)["type"] == "rooms-changed"
+    await asyncio.wait_for(svc.stop(), timeout=2)
+    await asyncio.sleep(0.05)
+    if not server_task.done():
+        server_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await server_task
+
+
 @pytest.mark.timeout(15)
 def test_server_negotiate_endpoint(monkeypatch):
     monkeypatch.setenv('TRANSPORT_MODE','self')
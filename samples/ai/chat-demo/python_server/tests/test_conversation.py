@@ -0,0 +1,174 @@
+"""
+Per-room conversation context tests:
+- Turns over the token budget are dropped, or folded into a capped digest
+- A room is read from the store once; later messages arrive through observe
+- Messages recorded while a room loads are neither lost nor duplicated
+- Least recently prompted rooms are evicted and reloaded on demand
+- CHAT_CONTEXT_* env resolution
+- The self-host service feeds sent and streamed messages into the context
+"""
+
+import asyncio
+import pytest
+
+from ..chat_service.conversation import (
+    ContextOverflow,
+    ConversationConfig,
+    ConversationContexts,
+    estimate_tokens,
+)
+from ..chat_service.factory import resolve_conversation_config
+from ..chat_service.transports.self_host import ChatService as SelfChatService
+from ..core.room_store import EventRecord, InMemoryRoomStore
+
+
+def msg(i, sender='u1', text=None):
+    return EventRecord('message', f'm{i}', sender, text or f'message number {i}', 1_714_521_600_000 + i)
+
+
+class CountingStore(InMemoryRoomStore):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.gate = None
+
+    async def get_room_messages(self, room):
+        self.reads += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return await super().get_room_messages(room)
+
+
+@pytest.fixture
+def store():
+    return CountingStore()
+
+
+async def test_roles_and_non_message_events(store):
+    await store.record_room_event('r', msg(0))
+    await store.record_room_event('r', EventRecord('system', 's1', None, 'joined', 1))
+    await store.record_room_event('r', msg(1, sender='AI Assistant', text='hi there'))
+    history = await ConversationContexts().history('r', store)
+    assert history == [
+        {'role': 'user', 'content': 'message number 0'},
+        {'role': 'assistant', 'content': 'hi there'},
+    ]
+
+
+async def test_drop_keeps_newest_turns_within_budget(store):
+    per_turn = estimate_tokens('message number 10')
+    contexts = ConversationContexts(ConversationConfig(max_tokens=per_turn * 5, overflow=ContextOverflow.DROP))
+    for i in range(10, 40):
+        await store.record_room_event('r', msg(i))
+    history = await contexts.history('r', store)
+    assert [h['content'] for h in history] == [f'message number {i}' for i in range(35, 40)]
+    assert contexts.tokens('r') <= per_turn * 5
+    assert contexts.stats()['turnsDropped'] == 25
+
+
+async def test_summarize_folds_old_turns_into_capped_digest(store):
+    contexts = ConversationContexts(ConversationConfig(max_tokens=200, summary_tokens=60))
+    for i in range(100):
+        await store.record_room_event('r', msg(i, text=f'turn {i} ' + 'x' * 400))
+    history = await contexts.history('r', store)
+    digest = history[0]
+    assert digest['role'] == 'system' and digest['content'].startswith('Earlier in this conversation')
+    lines = digest['content'].splitlines()[1:]
+    assert lines and all(len(line) < 200 for line in lines)  # clipped, not verbatim
+    assert lines[-1].startswith('- user: turn 9')  # newest folded turn is kept
+    assert contexts.tokens('r') <= 200
+    assert contexts.stats()['turnsSummarized'] > 0
+
+
+async def test_loaded_once_then_kept_current_by_observe(store):
+    contexts = ConversationContexts()
+    for i in range(3):
+        await store.record_room_event('r', msg(i))
+    assert len(await contexts.history('r', store)) == 3
+    contexts.observe('r', msg(3))
+    contexts.observe('other', msg(4))  # not loaded: ignored until its first prompt
+    history = await contexts.history('r', store)
+    assert history[-1]['content'] == 'message number 3'
+    assert store.reads == 1
+    assert contexts.stats()['rooms'] == 1
+
+
+async def test_messages_observed_during_load_are_not_duplicated(store):
+    contexts = ConversationContexts()
+    await store.record_room_event('r', msg(0))
+    store.gate = asyncio.Event()
+    first = asyncio.ensure_future(contexts.history('r', store))
+    await asyncio.sleep(0)
+    # recorded while the read is in flight: m1 also lands in the store, m2 does not
+    contexts.observe('r', msg(1))
+    await store.record_room_event('r', msg(1))
+    contexts.observe('r', msg(2))
+    second = asyncio.ensure_future(contexts.history('r', store))
+    store.gate.set()
+    histories = await asyncio.gather(first, second)
+    assert [h['content'] for h in histories[0]] == [f'message number {i}' for i in range(3)]
+    assert histories[1] == histories[0]
+    assert store.reads == 1
+
+
+async def test_cancelled_load_is_retried(store):
+    contexts = ConversationContexts()
+    await store.record_room_event('r', msg(0))
+    store.gate = asyncio.Event()
+    task = asyncio.ensure_future(contexts.history('r', store))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    store.gate.set()
+    assert len(await contexts.history('r', store)) == 1
+    assert store.reads == 2
+
+
+async def test_least_recently_prompted_room_is_evicted(store):
+    contexts = ConversationContexts(ConversationConfig(max_rooms=2))
+    for room in ('a', 'b', 'c'):
+        await store.record_room_event(room, msg(0))
+    await contexts.history('a', store)
+    await contexts.history('b', store)
+    await contexts.history('a', store)
+    await contexts.history('c', store)  # evicts b
+    assert contexts.stats()['rooms'] == 2
+    assert contexts.tokens('b') == 0 and contexts.tokens('a') > 0
+    await contexts.history('b', store)
+    assert store.reads == 4
+
+
+def test_resolve_conversation_config(monkeypatch):
+    cfg = resolve_conversation_config()
+    assert (cfg.max_tokens, cfg.overflow, cfg.summary_tokens) == (3000, ContextOverflow.SUMMARIZE, 300)
+    monkeypatch.setenv('CHAT_CONTEXT_MAX_TOKENS', '500')
+    monkeypatch.setenv('CHAT_CONTEXT_OVERFLOW', 'DROP')
+    cfg = resolve_conversation_config()
+    assert (cfg.max_tokens, cfg.overflow, cfg.turn_budget) == (500, ContextOverflow.DROP, 500)
+    for env, value in (('CHAT_CONTEXT_MAX_TOKENS', '0'), ('CHAT_CONTEXT_MAX_TOKENS', 'lots'), ('CHAT_CONTEXT_OVERFLOW', 'truncate')):
+        monkeypatch.setenv(env, value)
+        with pytest.raises(RuntimeError):
+            resolve_conversation_config()
+        monkeypatch.delenv(env)
+    monkeypatch.setenv('CHAT_CONTEXT_MAX_TOKENS', '200')
+    monkeypatch.setenv('CHAT_CONTEXT_SUMMARY_TOKENS', '200')
+    with pytest.raises(RuntimeError):
+        resolve_conversation_config()
+
+
+async def test_service_records_feed_the_context(store):
+    svc = SelfChatService(room_store=store)
+    assert await svc.conversations.history('r', store) == []
+    await svc.send_to_group('r', 'what is 2+2?', from_user_id='u1')
+
+    async def answer():
+        for token in ('it ', 'is ', '4'):
+            yield token
+
+    await svc.streaming_to_group('r', answer())
+    assert await svc.conversations.history('r', store) == [
+        {'role': 'user', 'content': 'what is 2+2?'},
+        {'role': 'assistant', 'content': 'it is 4'},
+    ]
+    assert store.reads == 1
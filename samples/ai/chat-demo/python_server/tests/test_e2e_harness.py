@@ -0,0 +1,58 @@
+"""
+End-to-end harness tests (loopback only, no real model):
+- The fake model streams the same answer for the same prompt through OpenAIChatClient
+- Injected errors answer HTTP 500; injected truncation drops the stream halfway
+- A small bench_e2e_latency run completes every answer and reports TTFT / fan-out samples
+"""
+
+import aiohttp
+import pytest
+
+from ..benchmarks import bench_e2e_latency
+from ..benchmarks.fake_model_server import FakeModelConfig, FakeModelServer
+from ..core.chat_model_client import OpenAIChatClient
+
+FAST = FakeModelConfig(tokens=8, tokens_per_sec=1000, first_token_ms=5, jitter=0)
+
+
+async def test_fake_model_streams_deterministic_answers():
+    server = FakeModelServer(FAST)
+    base_url = await server.start()
+    client = OpenAIChatClient(api_key='fake-token', model_name='fake-model', base_url=base_url)
+    try:
+        first = [t async for t in client.chat_stream_async('hello')]
+        second = [t async for t in client.chat_stream_async('hello')]
+    finally:
+        await client.aclose()
+        await server.stop()
+    assert first == second == server.answer('hello')
+    assert server.stats() == {'requests': 2, 'errors': 0, 'truncated': 0, 'tokensSent': 16}
+
+
+async def test_injected_errors_and_truncation():
+    server = FakeModelServer(FakeModelConfig(tokens=8, tokens_per_sec=1000, first_token_ms=0, error_rate=1))
+    base_url = await server.start()
+    body = {'model': 'm', 'stream': True, 'messages': [{'role': 'user', 'content': 'hi'}]}
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f'{base_url}/chat/completions', json=body) as resp:
+                assert resp.status == 500
+            server.config = FakeModelConfig(tokens=8, tokens_per_sec=1000, first_token_ms=0, truncate_rate=1)
+            async with session.post(f'{base_url}/chat/completions', json=body) as resp:
+                with pytest.raises(aiohttp.ClientError):
+                    await resp.read()
+    finally:
+        await server.stop()
+    stats = server.stats()
+    assert (stats['errors'], stats['truncated'], stats['tokensSent']) == (1, 1, 4)
+
+
+async def test_small_e2e_run_reports_latency_samples():
+    result = await bench_e2e_latency.run(rooms=2, clients=3, questions=2, model=FAST, batch_window_ms=0)
+    assert (result['answers'], result['failed']) == (4, 0)
+    assert len(result['ttft']) == 4 and all(t > 0 for t in result['ttft'])
+    assert result['inter_chunk'] and result['tokens_per_s']
+    # every frame of every answer reached all three members of its room
+    assert len(result['fanout']) % 3 == 0 and len(result['fanout']) >= 4 * 3 * 2
+    assert min(result['fanout']) == 0
+    assert result['model']['requests'] == 4
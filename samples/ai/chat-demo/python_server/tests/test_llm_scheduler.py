@@ -0,0 +1,258 @@
+"""
+LLM scheduler tests (fake streaming model, no network):
+- Concurrent model calls never exceed the in-flight cap
+- Waiters are admitted round-robin across rooms, then across users in a room
+- Queue-time deadline, queue bound and per-user bound reject with a reason
+- A cancelled waiter leaves the queue; a cancelled holder frees its slot
+- Waiters cancelled together with the holder are skipped, not handed the slot
+- sendToAI reports queue position / rejection to the room as an ai-status notice
+- A model failure mid-answer is reported as an ai-status error
+- AI_* env resolution
+"""
+
+import asyncio
+import pytest
+
+from .. import chat_handlers
+from ..chat_handlers import register_chat_handlers
+from ..chat_service.base import ChatServiceBase, ClientConnectionContext
+from ..chat_service.factory import resolve_llm_scheduler_config
+from ..core.llm_scheduler import LLMScheduler, LLMSchedulerConfig, QueueFull, QueueTimeout
+from ..core.room_store import InMemoryRoomStore
+from ..task_manager import ConnectionTaskManager
+
+
+class FakeModel:
+    """Streams ``tokens`` tokens per call and tracks concurrent calls."""
+
+    def __init__(self, tokens=5, delay=0.001):
+        self.tokens = tokens
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.gate = None
+
+    async def stream(self, text_input, **_kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if self.gate is not None:
+                await self.gate.wait()
+            for i in range(self.tokens):
+                await asyncio.sleep(self.delay)
+                yield f"{text_input}-{i} "
+        finally:
+            self.active -= 1
+
+
+def scheduler(**kwargs):
+    return LLMScheduler(LLMSchedulerConfig(**kwargs))
+
+
+async def test_in_flight_cap_is_respected():
+    llm = scheduler(max_in_flight=3, max_queued_per_user=100)
+    model = FakeModel()
+
+    async def call(i):
+        async with llm.slot(f'room{i % 4}', f'u{i}'):
+            return [t async for t in model.stream(str(i))]
+
+    results = await asyncio.gather(*(call(i) for i in range(20)))
+    assert model.peak == 3
+    assert all(len(r) == 5 for r in results)
+    stats = llm.stats()
+    assert (stats['inFlight'], stats['queued'], stats['admitted'], stats['queuedTotal']) == (0, 0, 20, 17)
+
+
+async def test_round_robin_across_rooms_then_users():
+    llm = scheduler(max_in_flight=1, max_queued_per_user=10)
+    order = []
+    release = asyncio.Event()
+
+    async def holder():
+        async with llm.slot('busy', 'u0'):
+            await release.wait()
+
+    async def call(room, user, tag):
+        async with llm.slot(room, user):
+            order.append(tag)
+
+    first = asyncio.ensure_future(holder())
+    await asyncio.sleep(0)
+    # room a is flooded by one user, then another user joins; room b asks once
+    waiters = [asyncio.ensure_future(call('a', 'u1', f'a-u1-{i}')) for i in range(3)]
+    waiters.append(asyncio.ensure_future(call('a', 'u2', 'a-u2-0')))
+    waiters.append(asyncio.ensure_future(call('b', 'u3', 'b-u3-0')))
+    await asyncio.sleep(0)
+    assert llm.queued == 5
+    assert llm.position('b', 'u3') == 2 and llm.position('a', 'u2') == 3
+    release.set()
+    await asyncio.gather(first, *waiters)
+    assert order == ['a-u1-0', 'b-u3-0', 'a-u2-0', 'a-u1-1', 'a-u1-2']
+
+
+async def test_rejections_full_and_expired():
+    llm = scheduler(max_in_flight=1, max_queue=2, max_queued_per_user=1, queue_timeout=0.05)
+    release = asyncio.Event()
+    positions = []
+
+    async def holder():
+        async with llm.slot('r', 'u0'):
+            await release.wait()
+
+    async def on_queued(position):
+        positions.append(position)
+
+    async def call(user):
+        async with llm.slot('r', user, on_queued=on_queued):
+            pass
+
+    first = asyncio.ensure_future(holder())
+    await asyncio.sleep(0)
+    a = asyncio.ensure_future(call('u1'))
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFull):
+        await call('u1')  # per-user bound
+    b = asyncio.ensure_future(call('u2'))
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFull) as full:
+        await call('u3')  # queue bound
+    assert full.value.reason == 'full'
+    for waiter in (a, b):
+        with pytest.raises(QueueTimeout) as expired:
+            await waiter
+        assert expired.value.reason == 'expired'
+    assert positions == [1, 2]
+    release.set()
+    await first
+    assert llm.stats()['rejected'] == 2 and llm.stats()['expired'] == 2
+    assert (llm.in_flight, llm.queued) == (0, 0)
+
+
+async def test_cancellation_frees_queue_entry_and_slot():
+    llm = scheduler(max_in_flight=1)
+    model = FakeModel()
+    model.gate = asyncio.Event()
+
+    async def call(user):
+        async with llm.slot('r', user):
+            return [t async for t in model.stream(user)]
+
+    running = asyncio.ensure_future(call('u1'))
+    await asyncio.sleep(0.01)
+    waiting = asyncio.ensure_future(call('u2'))
+    await asyncio.sleep(0)
+    assert llm.queued == 1
+    waiting.cancel()
+    await asyncio.sleep(0)
+    assert llm.queued == 0
+    running.cancel()  # e.g. the client disconnected mid-stream
+    await asyncio.gather(running, waiting, return_exceptions=True)
+    assert llm.in_flight == 0
+    model.gate.set()
+    assert len(await call('u3')) == 5
+
+
+async def test_waiter_cancelled_while_slot_is_released():
+    llm = scheduler(max_in_flight=1, queue_timeout=1)
+    model = FakeModel()
+    model.gate = asyncio.Event()
+
+    async def call(user):
+        async with llm.slot('r', user):
+            return [t async for t in model.stream(user)]
+
+    running = asyncio.ensure_future(call('u1'))
+    await asyncio.sleep(0.01)
+    queued = asyncio.ensure_future(call('u1'))
+    await asyncio.sleep(0)
+    # a disconnect cancels the connection's tasks together (task_manager.cancel_all):
+    # the holder releases its slot before the queued waiter has resumed
+    running.cancel()
+    queued.cancel()
+    results = await asyncio.gather(running, queued, return_exceptions=True)
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+    assert (llm.in_flight, llm.queued) == (0, 0)
+    model.gate.set()
+    assert len(await asyncio.wait_for(call('u2'), 1)) == 5
+
+
+class _Log:
+    def info(self, *a, **k): pass
+    def debug(self, *a, **k): pass
+    def warning(self, *a, **k): pass
+
+
+class _Service(ChatServiceBase):
+    def __init__(self):
+        super().__init__(room_store=InMemoryRoomStore())
+        self.notices = []
+        self.responses = []
+
+    async def send_to_group(self, group, message, exclude_ids=None, from_user_id=None):
+        await self._record_message(group, {'type': 'message', 'messageId': f'm-{message}', 'from': from_user_id, 'message': message})
+
+    async def streaming_to_group(self, group, chunks, exclude_ids=None, from_user_id=None):
+        text = ''.join([c async for c in chunks])
+        self.responses.append(text)
+        return text
+
+    async def send_room_notice(self, group, data):
+        self.notices.append((group, data))
+
+
+async def test_send_to_ai_reports_queue_state(monkeypatch):
+    model = FakeModel(tokens=2)
+    model.gate = asyncio.Event()
+    monkeypatch.setattr(chat_handlers, 'chat_stream_async', model.stream)
+    svc = _Service()
+    llm = scheduler(max_in_flight=1, max_queue=1)
+    task_manager = ConnectionTaskManager(asyncio.get_running_loop())
+    register_chat_handlers(svc, _Log(), task_manager, llm)
+
+    async def send(conn_id, text):
+        conn = ClientConnectionContext('', conn_id)
+        await svc._emit(svc._on_event_message, conn, 'sendToAI', {'message': text, 'roomId': 'r'})
+
+    for conn_id, text in (('c1', 'first'), ('c2', 'second'), ('c3', 'third')):
+        await send(conn_id, text)
+        await asyncio.sleep(0.01)
+    model.gate.set()
+    while task_manager.total_active():
+        await asyncio.sleep(0.01)
+    states = [(data['state'], data.get('position')) for _room, data in svc.notices]
+    assert states[0] == ('queued', 1)
+    assert ('full', None) in states and states[-1][0] == 'started'
+    assert all(room == 'r' and data['type'] == 'ai-status' for room, data in svc.notices)
+    assert svc.responses == ['first-0 first-1 ', 'second-0 second-1 ']
+
+
+async def test_send_to_ai_reports_model_failure(monkeypatch):
+    async def failing(text_input, **_kwargs):
+        yield 'partial '
+        raise ConnectionError('model stream dropped')
+
+    monkeypatch.setattr(chat_handlers, 'chat_stream_async', failing)
+    svc = _Service()
+    task_manager = ConnectionTaskManager(asyncio.get_running_loop())
+    register_chat_handlers(svc, _Log(), task_manager, scheduler())
+    conn = ClientConnectionContext('', 'c1')
+    await svc._emit(svc._on_event_message, conn, 'sendToAI', {'message': 'hi', 'roomId': 'r'})
+    while task_manager.total_active():
+        await asyncio.sleep(0.01)
+    assert [data['state'] for _room, data in svc.notices] == ['error']
+    assert svc.responses == []
+
+
+def test_resolve_llm_scheduler_config(monkeypatch):
+    assert resolve_llm_scheduler_config() == LLMSchedulerConfig()
+    monkeypatch.setenv('AI_MAX_IN_FLIGHT', '2')
+    monkeypatch.setenv('AI_MAX_QUEUE', '0')
+    monkeypatch.setenv('AI_QUEUE_TIMEOUT_SECONDS', '2.5')
+    cfg = resolve_llm_scheduler_config()
+    assert (cfg.max_in_flight, cfg.max_queue, cfg.queue_timeout) == (2, 0, 2.5)
+    for env, value in (('AI_MAX_IN_FLIGHT', '0'), ('AI_MAX_QUEUE', '-1'), ('AI_MAX_QUEUED_PER_USER', 'x'), ('AI_QUEUE_TIMEOUT_SECONDS', '0')):
+        monkeypatch.setenv(env, value)
+        with pytest.raises(RuntimeError):
+            resolve_llm_scheduler_config()
+        monkeypatch.delenv(env)
@@ -0,0 +1,236 @@
+"""
+AI response cache tests (fake streaming model):
+- Keys normalize whitespace / case and depend on model, history tail and prompt
+- A completed response is replayed (paced when configured); LRU and TTL eviction
+- Identical in-flight requests share one model stream, late joiners get earlier chunks
+- The stream survives its first caller leaving; the model call stops when all leave
+- Errors reach every caller and are not cached; empty responses are not cached
+- A model stream cut off midway (fake model server) is raised, not cached
+- Repeated sendToAI prompts make one model call and report hits / tokens saved
+- AI_CACHE_* env resolution
+"""
+
+import asyncio
+import time
+import pytest
+
+from .. import chat_handlers
+from ..benchmarks.fake_model_server import FakeModelConfig, FakeModelServer
+from ..chat_handlers import register_chat_handlers
+from ..chat_service.base import ChatServiceBase, ClientConnectionContext
+from ..chat_service.factory import resolve_response_cache_config
+from ..core.chat_model_client import OpenAIChatClient
+from ..core.llm_scheduler import LLMScheduler
+from ..core.response_cache import ResponseCache, ResponseCacheConfig
+from ..core.room_store import InMemoryRoomStore
+from ..task_manager import ConnectionTaskManager
+
+
+class FakeModel:
+    def __init__(self, tokens=('Hello', ' there', '!'), delay=0.0):
+        self.tokens = tokens
+        self.delay = delay
+        self.calls = 0
+        self.finished = 0
+        self.gate = None
+        self.fail = None
+
+    async def stream(self, *_args, **_kwargs):
+        self.calls += 1
+        for i, token in enumerate(self.tokens):
+            if self.gate is not None and i == 1:
+                await self.gate.wait()
+            await asyncio.sleep(self.delay)
+            if self.fail is not None:
+                raise self.fail
+            yield token
+        self.finished += 1
+
+
+async def collect(chunks):
+    return [c async for c in chunks]
+
+
+def test_key_normalization():
+    cache = ResponseCache(ResponseCacheConfig(history_turns=1))
+    history = [{'role': 'user', 'content': 'old'}, {'role': 'assistant', 'content': 'Hi!'}]
+    key = cache.key('What is  Web PubSub?', history, 'gpt')
+    assert cache.key(' what is web pubsub? ', [{'role': 'user', 'content': 'different'}, history[1]], 'gpt') == key
+    assert cache.key('What is Web PubSub?', history[:1], 'gpt') != key
+    assert cache.key('What is Web PubSub?', history, 'other-model') != key
+    assert cache.key('What is Web PubSub?', history, None) is None
+
+
+async def test_hit_replays_cached_chunks():
+    cache = ResponseCache()
+    model = FakeModel()
+    assert await collect(cache.stream('k', model.stream)) == ['Hello', ' there', '!']
+    assert await collect(cache.stream('k', model.stream)) == ['Hello', ' there', '!']
+    assert model.calls == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['tokensSaved'], stats['entries']) == (1, 1, 3, 1)
+
+
+async def test_replay_is_paced():
+    cache = ResponseCache(ResponseCacheConfig(replay_rate=50))
+    model = FakeModel(tokens=tuple(str(i) for i in range(6)))
+    await collect(cache.stream('k', model.stream))
+    started = time.monotonic()
+    assert len(await collect(cache.stream('k', model.stream))) == 6
+    assert time.monotonic() - started >= 0.09  # 5 gaps of 20ms
+
+
+async def test_lru_and_ttl_eviction(monkeypatch):
+    cache = ResponseCache(ResponseCacheConfig(max_entries=2, ttl=10))
+    model = FakeModel()
+    for key in ('a', 'b', 'a', 'c'):  # b is least recently used when c arrives
+        await collect(cache.stream(key, model.stream))
+    assert model.calls == 3
+    await collect(cache.stream('b', model.stream))
+    assert model.calls == 4
+    now = time.monotonic()
+    monkeypatch.setattr('python_server.core.response_cache.time.monotonic', lambda: now + 11)
+    await collect(cache.stream('b', model.stream))
+    assert model.calls == 5
+    assert cache.stats()['evictions'] >= 3
+
+
+async def test_identical_in_flight_requests_share_one_stream():
+    cache = ResponseCache()
+    model = FakeModel()
+    model.gate = asyncio.Event()
+    leader = asyncio.ensure_future(collect(cache.stream('k', model.stream)))
+    await asyncio.sleep(0.01)  # leader has its first chunk
+    followers = [asyncio.ensure_future(collect(cache.stream('k', model.stream))) for _ in range(3)]
+    await asyncio.sleep(0)
+    model.gate.set()
+    results = await asyncio.gather(leader, *followers)
+    assert all(r == ['Hello', ' there', '!'] for r in results)
+    assert model.calls == 1
+    stats = cache.stats()
+    assert (stats['coalesced'], stats['tokensSaved'], stats['inFlight']) == (3, 9, 0)
+
+
+async def test_stream_outlives_first_caller_and_stops_when_all_leave():
+    cache = ResponseCache()
+    model = FakeModel()
+    model.gate = asyncio.Event()
+    leader = asyncio.ensure_future(collect(cache.stream('k', model.stream)))
+    await asyncio.sleep(0.01)
+    follower = asyncio.ensure_future(collect(cache.stream('k', model.stream)))
+    await asyncio.sleep(0)
+    leader.cancel()  # first client disconnected
+    await asyncio.sleep(0)
+    model.gate.set()
+    assert await follower == ['Hello', ' there', '!']
+    assert model.finished == 1
+
+    model.gate = asyncio.Event()
+    only = asyncio.ensure_future(collect(cache.stream('k2', model.stream)))
+    await asyncio.sleep(0.01)
+    only.cancel()
+    await asyncio.sleep(0.01)
+    assert cache.stats()['inFlight'] == 0
+    model.gate.set()
+    await asyncio.sleep(0.01)
+    assert model.finished == 1  # the abandoned model call was stopped
+    assert cache.stats()['entries'] == 1
+
+
+async def test_errors_reach_every_caller_and_are_not_cached():
+    cache = ResponseCache()
+    model = FakeModel()
+    model.gate = asyncio.Event()
+    model.fail = RuntimeError('upstream failed')
+    first = asyncio.ensure_future(collect(cache.stream('k', model.stream)))
+    second = asyncio.ensure_future(collect(cache.stream('k', model.stream)))
+    await asyncio.sleep(0.01)
+    model.gate.set()
+    for caller in (first, second):
+        with pytest.raises(RuntimeError):
+            await caller
+    assert cache.stats()['entries'] == 0
+    empty = FakeModel(tokens=())
+    await collect(cache.stream('e', empty.stream))
+    await collect(cache.stream('e', empty.stream))
+    assert empty.calls == 2
+
+
+async def test_truncated_model_stream_is_not_cached():
+    config = FakeModelConfig(tokens=8, tokens_per_sec=1000, first_token_ms=0, jitter=0, truncate_rate=1)
+    server = FakeModelServer(config)
+    client = OpenAIChatClient(api_key='fake-token', model_name='fake-model', base_url=await server.start())
+    cache = ResponseCache()
+    received = []
+
+    def produce():
+        return client.chat_stream_async('What is this demo?')
+
+    try:
+        with pytest.raises(Exception):  # the dropped connection, not a short answer
+            async for chunk in cache.stream('k', produce):
+                received.append(chunk)
+        assert 0 < len(received) < 8
+        assert cache.stats()['entries'] == 0
+        server.config = FakeModelConfig(tokens=8, tokens_per_sec=1000, first_token_ms=0, jitter=0)
+        full = await collect(cache.stream('k', produce))
+        assert full == server.answer('What is this demo?')
+        assert await collect(cache.stream('k', produce)) == full
+    finally:
+        await client.aclose()
+        await server.stop()
+    assert server.stats()['requests'] == 2 and cache.stats()['entries'] == 1
+
+
+class _Log:
+    def info(self, *a, **k): pass
+    def debug(self, *a, **k): pass
+    def warning(self, *a, **k): pass
+
+
+class _Service(ChatServiceBase):
+    def __init__(self):
+        super().__init__(room_store=InMemoryRoomStore())
+        self.responses = []
+
+    async def send_to_group(self, group, message, exclude_ids=None, from_user_id=None):
+        pass
+
+    async def streaming_to_group(self, group, chunks, exclude_ids=None, from_user_id=None):
+        text = ''.join([c async for c in chunks])
+        self.responses.append((group, text))
+        return text
+
+    async def send_room_notice(self, group, data):
+        pass
+
+
+async def test_repeated_send_to_ai_prompts_use_one_model_call(monkeypatch):
+    model = FakeModel(delay=0.005)
+    monkeypatch.setattr(chat_handlers, 'chat_stream_async', model.stream)
+    monkeypatch.setattr(chat_handlers, 'model_signature', lambda: 'fake-model')
+    svc = _Service()
+    cache = ResponseCache()
+    task_manager = ConnectionTaskManager(asyncio.get_running_loop())
+    register_chat_handlers(svc, _Log(), task_manager, LLMScheduler(), cache)
+    for i in range(4):  # a fresh demo room each, same question
+        conn = ClientConnectionContext('', f'c{i}')
+        await svc._emit(svc._on_event_message, conn, 'sendToAI', {'message': 'What is this demo?', 'roomId': f'room{i}'})
+    while task_manager.total_active():
+        await asyncio.sleep(0.01)
+    assert model.calls == 1
+    assert sorted(svc.responses) == [(f'room{i}', 'Hello there!') for i in range(4)]
+    assert cache.stats()['tokensSaved'] == 9
+
+
+def test_resolve_response_cache_config(monkeypatch):
+    assert resolve_response_cache_config() == ResponseCacheConfig()
+    monkeypatch.setenv('AI_CACHE_MAX_ENTRIES', '0')
+    monkeypatch.setenv('AI_CACHE_REPLAY_TOKENS_PER_SEC', '40')
+    cfg = resolve_response_cache_config()
+    assert (cfg.max_entries, cfg.replay_rate) == (0, 40.0)
+    for env, value in (('AI_CACHE_MAX_ENTRIES', '-1'), ('AI_CACHE_TTL_SECONDS', '0'), ('AI_CACHE_HISTORY_TURNS', '1.5')):
+        monkeypatch.setenv(env, value)
+        with pytest.raises(RuntimeError):
+            resolve_response_cache_config()
+        monkeypatch.delenv(env)
@@ -1,11 +1,19 @@
 """
 RoomStore tests consolidated:
-- InMemoryRoomStore message/history behavior
+- InMemoryRoomStore message/history behavior; an empty page (limit 0) has no next cursor
+- Ring-buffer history: in-place overwrite, views over absolute positions, cursors across wrap-around
+- Standard events are stored as compact EventRecords and render back to the event JSON shape
 - Metadata CRUD, isolation, existence
+- Metadata indexes: owner lookup, recently-updated and name-prefix pages stay in sync with CRUD
+- A room id has one owner: another user cannot create or delete it out of the index
 """
 
+import random
+
 import pytest
-from ..core.room_store import InMemoryRoomStore, RoomMetadata
+from ..core.room_store import EventRecord, InMemoryRoomStore, RoomMetadata, render_events
+from ..core.room_store.metadata_index import SortedKeys
+from ..core.room_store.ring_buffer import RingBuffer
 from ..config import DEFAULT_ROOM_ID
 
 
@@ -28,6 +36,64 @@ async def test_memory_append_and_limit():
     assert [m['id'] for m in msgs] == [2, 3, 4]
 
 
+def test_ring_buffer_overwrites_oldest_in_place():
+    ring = RingBuffer(4)
+    for i in range(10):
+        ring.append(i)
+    assert len(ring) == 4 and ring.first == 6 and ring.appended == 10
+    assert list(ring) == [6, 7, 8, 9] and len(ring._items) == 4
+    view = ring.tail(3)
+    assert list(view) == [7, 8, 9] and view[0] == 7 and view[-1] == 9 and view[1:] == [8, 9]
+    assert list(ring.view(0, 7)) == [6]  # clamped to what is retained
+    ring.append(10)
+    ring.append(11)
+    assert view[-1] == 9
+    with pytest.raises(IndexError):
+        view[0]  # position 7 has been overwritten
+
+
+@pytest.mark.asyncio
+async def test_memory_cursor_pages_across_wrap_around():
+    store = InMemoryRoomStore(max_messages=5)
+    for i in range(13):
+        await store.append_message('r', {'id': i})
+    msgs, cursor = await store.get_room_messages_page('r', 3)
+    assert [m['id'] for m in msgs] == [10, 11, 12] and cursor == '10'
+    msgs, cursor = await store.get_room_messages_page('r', 3, cursor)
+    assert [m['id'] for m in msgs] == [8, 9] and cursor is None
+    assert [m['id'] for m in store.messages_view('r', 2)] == [11, 12]
+    assert [m['id'] for m in await store.get_room_messages('r')] == [8, 9, 10, 11, 12]
+    assert {r['name']: r['messages'] for r in await store.list_rooms()}['r'] == 5
+
+
+@pytest.mark.asyncio
+async def test_memory_empty_page_ends_paging():
+    store = InMemoryRoomStore()
+    for i in range(4):
+        await store.append_message('r', {'id': i})
+    _msgs, cursor = await store.get_room_messages_page('r', 2)
+    assert await store.get_room_messages_page('r', 0) == ([], None)
+    assert await store.get_room_messages_page('r', 0, cursor) == ([], None)
+
+
+@pytest.mark.asyncio
+async def test_memory_stores_standard_events_as_records():
+    store = InMemoryRoomStore()
+    sender = ''.join(['ali', 'ce'])  # a fresh string, as decoded from a frame
+    event = {'type': 'message', 'messageId': 'm-1', 'from': sender, 'message': 'hi', 'timestamp': '2024-05-01T10:20:30.123456+00:00'}
+    await store.record_room_event('r', event)
+    await store.record_room_event('r', EventRecord.now('message', 'm-2', 'alice', 'yo'))
+    await store.record_room_event('r', {'id': 3, 'custom': True})
+    first, second, other = await store.get_room_messages('r')
+    assert isinstance(first, EventRecord) and isinstance(second, EventRecord) and other == {'id': 3, 'custom': True}
+    assert first.sender is second.sender  # interned
+    assert first.ts_ms == 1714558830123 and first['timestamp'] == '2024-05-01T10:20:30.123+00:00'
+    assert first.get('message') == 'hi' and first.get('missing', 0) == 0
+    rendered = render_events([first, other])
+    assert rendered[0] == {**event, 'timestamp': '2024-05-01T10:20:30.123+00:00'} and type(rendered[0]) is dict
+    assert rendered[1] == other
+
+
 @pytest.mark.asyncio
 async def test_register_room_creates_room_by_name():
     store = InMemoryRoomStore()
@@ -103,3 +169,70 @@ async def test_list_user_rooms_isolation():
     assert {'a1', DEFAULT_ROOM_ID} == {r.room_id for r in alice_rooms}
     assert {'b1', DEFAULT_ROOM_ID} == {r.room_id for r in bob_rooms}
 
+
+
+# -------- Index tests --------
+
+def test_sorted_keys_match_a_sorted_list():
+    rnd = random.Random(7)
+    keys, ref = SortedKeys(load=4), []
+    for _ in range(2000):
+        key = (f"{rnd.randrange(300):03d}", f"r{rnd.randrange(50)}")
+        if key in ref and rnd.random() < 0.4:
+            ref.remove(key)
+            assert keys.remove(key)
+        elif key not in ref:
+            ref.append(key)
+            keys.add(key)
+    ref.sort()
+    assert len(keys) == len(ref) and list(keys.iter_from()) == ref
+    probe = ("150", "r0")
+    assert list(keys.iter_from(probe)) == [k for k in ref if k > probe]
+    assert list(keys.iter_from(probe, reverse=True)) == [k for k in reversed(ref) if k < probe]
+    assert not keys.remove(("999", "nope"))
+
+
+@pytest.mark.asyncio
+async def test_recent_rooms_follow_updates_and_deletes():
+    store = InMemoryRoomStore()
+    for i in range(5):
+        await store.create_room_metadata(f'user{i % 2}', f'Room {i}', room_id=f'r{i}')
+    await store.update_room_metadata('user0', 'r0', room_name='Renamed')
+    await store.delete_room_metadata('user1', 'r3')
+    assert await store.get_room_owner('r1') == 'user1' and await store.get_room_owner('r3') is None
+    assert (await store.find_room('r0')).room_name == 'Renamed'
+    seen, cursor = [], None
+    while True:
+        rooms, cursor = await store.list_recent_rooms(2, cursor)
+        seen += [r.room_id for r in rooms]
+        if cursor is None:
+            break
+    assert seen == ['r0', 'r4', 'r2', 'r1', DEFAULT_ROOM_ID]
+    with pytest.raises(ValueError):
+        await store.list_recent_rooms(2, 'garbage')
+
+
+@pytest.mark.asyncio
+async def test_room_id_has_one_owner():
+    store = InMemoryRoomStore()
+    await store.create_room_metadata('alice', 'Design', room_id='shared')
+    with pytest.raises(ValueError):
+        await store.create_room_metadata('bob', 'Mine', room_id='shared')
+    assert await store.delete_room_metadata('bob', 'shared') is False
+    assert await store.get_room_owner('shared') == 'alice'
+    assert (await store.find_room('shared')).room_name == 'Design'
+    assert [r.room_id for r in (await store.search_rooms('design', 10))[0]] == ['shared']
+    assert not await store.room_exists('bob', 'shared')
+
+@pytest.mark.asyncio
+async def test_search_rooms_by_name_prefix():
+    store = InMemoryRoomStore()
+    for i, name in enumerate(['Alpha', 'alpine', 'Beta', 'ALPS', 'Al', 'Gamma']):
+        await store.create_room_metadata('u', name, room_id=f'r{i}')
+    rooms, cursor = await store.search_rooms('al', 2)
+    assert [r.room_name for r in rooms] == ['Al', 'Alpha'] and cursor is not None
+    rooms, cursor = await store.search_rooms('al', 2, cursor)
+    assert [r.room_name for r in rooms] == ['alpine', 'ALPS'] and cursor is None
+    await store.update_room_metadata('u', 'r2', room_name='Alphabet')
+    assert [r.room_name for r in (await store.search_rooms('ALPHA', 10))[0]] == ['Alpha', 'Alphabet']
+    assert (await store.search_rooms('beta', 10))[0] == []
@@ -1,4 +1,4 @@
-from ..core.runtime_config import resolve_runtime_config, TransportMode, StorageMode
+from ..core.runtime_config import resolve_runtime_config, resolve_http_server, env_float, env_int, TransportMode, StorageMode, HttpServer
 import os
 import pytest
 
@@ -40,3 +40,61 @@ def test_invalid_storage(monkeypatch):
     monkeypatch.setenv('STORAGE_MODE','bogus')
     with pytest.raises(RuntimeError):
         resolve_runtime_config()
+
+
+def test_wal_storage_mode_builds_wal_store(monkeypatch, tmp_path):
+    import logging
+    from ..core.room_store import WalRoomStore, build_room_store
+
+    monkeypatch.setenv('STORAGE_MODE', 'wal')
+    monkeypatch.setenv('CHAT_WAL_DIR', str(tmp_path))
+    monkeypatch.setenv('CHAT_WAL_FSYNC', 'off')
+    cfg = resolve_runtime_config()
+    assert cfg.storage == StorageMode.WAL
+    store = build_room_store(logging.getLogger('test'), storage_mode=cfg.storage)
+    assert isinstance(store, WalRoomStore)
+    assert store.data_dir == str(tmp_path) and store._log.fsync is False
+
+    monkeypatch.setenv('CHAT_WAL_SNAPSHOT_EVERY', '0')
+    with pytest.raises(RuntimeError):
+        build_room_store(logging.getLogger('test'), storage_mode=cfg.storage)
+
+
+def test_log_storage_mode_builds_segment_log_store(monkeypatch, tmp_path):
+    import logging
+    from ..core.room_store import SegmentLogRoomStore, build_room_store
+
+    monkeypatch.setenv('STORAGE_MODE', 'log')
+    monkeypatch.setenv('CHAT_LOG_DIR', str(tmp_path))
+    cfg = resolve_runtime_config()
+    assert cfg.storage == StorageMode.LOG
+    store = build_room_store(logging.getLogger('test'), storage_mode=cfg.storage)
+    assert isinstance(store, SegmentLogRoomStore) and store.data_dir == str(tmp_path)
+
+
+def test_http_server(monkeypatch):
+    assert resolve_http_server() is HttpServer.FLASK
+    monkeypatch.setenv('HTTP_SERVER', 'ASGI')
+    assert resolve_http_server() is HttpServer.ASGI
+    monkeypatch.setenv('HTTP_SERVER', 'gunicorn')
+    with pytest.raises(RuntimeError):
+        resolve_http_server()
+
+
+def test_numeric_env_settings(monkeypatch):
+    assert env_int('CHAT_TEST_INT', 7) == 7
+    monkeypatch.setenv('CHAT_TEST_INT', ' 3 ')
+    assert env_int('CHAT_TEST_INT', 7, minimum=1) == 3
+    with pytest.raises(RuntimeError, match='CHAT_TEST_INT=3'):
+        env_int('CHAT_TEST_INT', 7, minimum=4)
+    monkeypatch.setenv('CHAT_TEST_INT', '1.5')
+    with pytest.raises(RuntimeError):
+        env_int('CHAT_TEST_INT', 7)
+
+    monkeypatch.setenv('CHAT_TEST_FLOAT', '0')
+    assert env_float('CHAT_TEST_FLOAT', 2.5) == 0.0
+    with pytest.raises(RuntimeError):
+        env_float('CHAT_TEST_FLOAT', 2.5, exclusive=True)
+    monkeypatch.setenv('CHAT_TEST_FLOAT', '-1')
+    with pytest.raises(RuntimeError):
+        env_float('CHAT_TEST_FLOAT', 2.5)
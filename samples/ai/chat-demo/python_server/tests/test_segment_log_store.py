@@ -0,0 +1,136 @@
+"""
+SegmentLogRoomStore tests:
+- Latest-N reads and cursor pages across segment boundaries
+- History, rooms and metadata survive a restart
+- A torn record (data without index entry, or a torn index entry) is cut off on open
+- Handles of idle rooms are closed beyond max_open_rooms and reopen on use
+- File access runs on the store's I/O thread, not on the event loop
+- Room ids too long for a hex directory name are hashed and survive a restart
+"""
+
+import os
+import threading
+
+import pytest
+from ..core.room_store import EventRecord, SegmentLogRoomStore
+from ..core.room_store import segment_log
+from ..config import DEFAULT_ROOM_ID
+
+
+def _event(i):
+    return {'type': 'message', 'messageId': f'm{i}', 'from': 'alice', 'message': f'hello {i}', 'timestamp': '2024-05-01T00:00:00+00:00'}
+
+
+@pytest.mark.asyncio
+async def test_tail_and_pages_across_segments(tmp_path):
+    store = SegmentLogRoomStore(str(tmp_path), segment_records=4)
+    for i in range(10):
+        await store.record_room_event('r1', _event(i))
+    await store.record_room_event('r1', {'type': 'custom', 'extra': [1]})
+    assert len([n for n in os.listdir(tmp_path / 'rooms' / 'r1'.encode().hex()) if n.endswith('.idx')]) == 3
+
+    latest = await store.get_room_messages('r1', 3)
+    assert [m.get('messageId') for m in latest] == ['m8', 'm9', None]
+    assert isinstance(latest[0], EventRecord) and latest[-1] == {'type': 'custom', 'extra': [1]}
+    assert len(await store.get_room_messages('r1')) == 11
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = await store.get_room_messages_page('r1', 3, cursor)
+        seen = page + seen
+        if cursor is None:
+            break
+    assert [m.get('messageId') for m in seen[:-1]] == [f'm{i}' for i in range(10)]
+    with pytest.raises(ValueError):
+        await store.get_room_messages_page('r1', 3, 'bogus')
+    assert await store.get_room_messages_page('r1', 0) == ([], None)  # an empty page ends paging
+    assert await store.get_room_messages('missing', 5) == []
+
+
+@pytest.mark.asyncio
+async def test_restart_recovers_history_rooms_and_metadata(tmp_path):
+    store = SegmentLogRoomStore(str(tmp_path), segment_records=4)
+    for i in range(6):
+        await store.record_room_event('r1', _event(i))
+    await store.register_room('empty')
+    await store.register_room('gone')
+    await store.remove_room_if_empty('gone')
+    await store.create_room_metadata('u1', 'Design', room_id='room_a')
+    await store.create_room_metadata('u1', 'Ops', room_id='room_b')
+    await store.update_room_metadata('u1', 'room_a', room_name='Design review')
+    await store.delete_room_metadata('u1', 'room_b')
+    await store.close()
+
+    again = SegmentLogRoomStore(str(tmp_path), segment_records=4)
+    assert [m['messageId'] for m in await again.get_room_messages('r1', 2)] == ['m4', 'm5']
+    rooms = {r['name']: r['messages'] for r in await again.list_rooms()}
+    assert rooms == {DEFAULT_ROOM_ID: 0, 'r1': 6, 'empty': 0}
+    assert [r.room_name for r in (await again.list_user_rooms('u1'))[1:]] == ['Design review']
+    assert await again.find_room('room_b') is None
+    await again.record_room_event('r1', _event(6))
+    assert (await again.get_room_messages_page('r1', 2))[1] == '5'
+
+
+@pytest.mark.asyncio
+async def test_torn_tail_is_cut_off(tmp_path):
+    store = SegmentLogRoomStore(str(tmp_path))
+    for i in range(3):
+        await store.record_room_event('r1', _event(i))
+    await store.close()
+    base = tmp_path / 'rooms' / 'r1'.encode().hex() / f'{0:016d}'
+    with open(f'{base}.log', 'ab') as f:
+        f.write(b'["message","m3"')  # record written, index entry never was
+    with open(f'{base}.idx', 'ab') as f:
+        f.write(b'\x01\x02')  # torn index entry
+
+    again = SegmentLogRoomStore(str(tmp_path))
+    assert [m['messageId'] for m in await again.get_room_messages('r1', 10)] == ['m0', 'm1', 'm2']
+    await again.record_room_event('r1', _event(3))
+    assert [m['messageId'] for m in await again.get_room_messages('r1', 2)] == ['m2', 'm3']
+
+
+@pytest.mark.asyncio
+async def test_idle_rooms_are_closed_and_reopened(tmp_path):
+    store = SegmentLogRoomStore(str(tmp_path), max_open_rooms=2)
+    for i in range(5):
+        await store.record_room_event(f'r{i}', _event(i))
+    assert len(store._open) == 2
+    assert [m['messageId'] for m in await store.get_room_messages('r0', 5)] == ['m0']
+    await store.record_room_event('r0', _event(9))
+    assert [m['messageId'] for m in await store.get_room_messages('r0', 5)] == ['m0', 'm9']
+
+
+@pytest.mark.asyncio
+async def test_file_access_runs_off_the_event_loop(tmp_path, monkeypatch):
+    threads = set()
+    for cls, name in ((segment_log._RoomLog, 'append'), (segment_log._Segment, 'read')):
+        real = getattr(cls, name)
+
+        def spy(*args, _real=real, **kwargs):
+            threads.add(threading.current_thread().name)
+            return _real(*args, **kwargs)
+
+        monkeypatch.setattr(cls, name, spy)
+    store = SegmentLogRoomStore(str(tmp_path))
+    await store.record_room_event('r1', _event(0))
+    assert [m['messageId'] for m in await store.get_room_messages('r1', 5)] == ['m0']
+    await store.create_room_metadata('u1', 'Design', room_id='room_a')
+    await store.close()
+    assert threads and all(name.startswith('segment-log') for name in threads)
+
+
+@pytest.mark.asyncio
+async def test_long_room_ids_are_hashed(tmp_path):
+    long_ids = ['r' * 300, 'ü' * 100]  # 300 and 200 bytes: hex names would be 600 / 400 chars
+    store = SegmentLogRoomStore(str(tmp_path))
+    for i, room in enumerate(long_ids):
+        await store.record_room_event(room, _event(i))
+    await store.close()
+    assert all(len(name) <= 255 for name in os.listdir(tmp_path / 'rooms'))
+
+    again = SegmentLogRoomStore(str(tmp_path))
+    rooms = {r['name']: r['messages'] for r in await again.list_rooms()}
+    assert all(rooms[room] == 1 for room in long_ids)
+    assert [m['messageId'] for m in await again.get_room_messages(long_ids[1], 5)] == ['m1']
+    await again.record_room_event(long_ids[0], _event(2))
+    assert [m['messageId'] for m in await again.get_room_messages(long_ids[0], 5)] == ['m0', 'm2']
@@ -0,0 +1,199 @@
+"""
+WalRoomStore tests:
+- Messages, ring positions (cursors) and room metadata survive a restart
+- A torn last log line (crash mid-write) is skipped on replay
+- Concurrent appends share commits (group commit)
+- A failed write fails its callers, is retried in a fresh segment and never acked early
+- Snapshots replace the log segments they cover; later writes replay on top
+- A failed snapshot covers nothing: lines whose write failed before it are still retried
+- Ring restore keeps absolute positions
+"""
+
+import asyncio
+import os
+
+import pytest
+from ..core.room_store import EventRecord, WalRoomStore
+from ..core.room_store.ring_buffer import RingBuffer
+
+
+def _event(i):
+    return {'type': 'message', 'messageId': f'm{i}', 'from': 'alice', 'message': f'hello {i}', 'timestamp': '2024-05-01T00:00:00+00:00'}
+
+
+def _segments(path):
+    return sorted(name for name in os.listdir(path) if name.startswith('wal-'))
+
+
+@pytest.mark.asyncio
+async def test_restart_recovers_history_cursors_and_metadata(tmp_path):
+    store = WalRoomStore(str(tmp_path), max_messages=5, fsync=False)
+    for i in range(8):
+        await store.record_room_event('r1', _event(i))
+    await store.record_room_event('r1', {'type': 'custom', 'extra': [1, 2]})
+    await store.register_room('empty')
+    await store.register_room('gone')
+    await store.remove_room_if_empty('gone')
+    await store.create_room_metadata('u1', 'Design', room_id='room_a')
+    await store.create_room_metadata('u1', 'Ops', room_id='room_b')
+    await store.update_room_metadata('u1', 'room_a', room_name='Design review')
+    await store.delete_room_metadata('u1', 'room_b')
+    page, cursor = await store.get_room_messages_page('r1', 2)
+    store._log.close()  # crash: no final snapshot
+
+    again = WalRoomStore(str(tmp_path), max_messages=5, fsync=False)
+    msgs = await again.get_room_messages('r1')
+    assert [m.get('messageId') for m in msgs] == ['m4', 'm5', 'm6', 'm7', None]
+    assert isinstance(msgs[0], EventRecord) and msgs[-1] == {'type': 'custom', 'extra': [1, 2]}
+    assert await again.get_room_messages_page('r1', 2) == (page, cursor)
+    names = {r['name'] for r in await again.list_rooms()}
+    assert {'r1', 'empty'} <= names and 'gone' not in names
+    assert [r.room_name for r in (await again.list_user_rooms('u1'))[1:]] == ['Design review']
+    assert await again.get_room_owner('room_a') == 'u1'
+    assert await again.find_room('room_b') is None
+
+
+@pytest.mark.asyncio
+async def test_torn_tail_is_ignored(tmp_path):
+    store = WalRoomStore(str(tmp_path), fsync=False)
+    for i in range(3):
+        await store.record_room_event('r1', _event(i))
+    store._log.close()
+    with open(tmp_path / _segments(tmp_path)[-1], 'ab') as f:
+        f.write(b'["e","r1",["message","m3"')
+
+    again = WalRoomStore(str(tmp_path), fsync=False)
+    assert [m['messageId'] for m in await again.get_room_messages('r1')] == ['m0', 'm1', 'm2']
+    await again.record_room_event('r1', _event(9))  # goes to a fresh segment
+    again._log.close()
+    third = WalRoomStore(str(tmp_path), fsync=False)
+    assert [m['messageId'] for m in await third.get_room_messages('r1')] == ['m0', 'm1', 'm2', 'm9']
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_share_commits(tmp_path):
+    store = WalRoomStore(str(tmp_path), fsync=False)
+    await asyncio.gather(*(store.record_room_event(f'r{i % 4}', _event(i)) for i in range(200)))
+    stats = store.wal_stats()
+    assert stats['records'] == 200 and store._log.durable == 200
+    assert stats['commits'] < 20
+
+
+@pytest.mark.asyncio
+async def test_failed_write_fails_its_batch_and_is_retried(tmp_path, monkeypatch):
+    store = WalRoomStore(str(tmp_path), fsync=True)
+    await store.record_room_event('r1', _event(0))
+    fsync = os.fsync
+    failures = []
+
+    def failing_fsync(fd):
+        if not failures:
+            failures.append(fd)
+            raise OSError(5, 'Input/output error')
+        fsync(fd)
+
+    monkeypatch.setattr(os, 'fsync', failing_fsync)
+    # m1 is written alone and fails; m2 waits for that commit, then leads the retry
+    results = await asyncio.gather(*(store.record_room_event('r1', _event(i)) for i in (1, 2)), return_exceptions=True)
+    assert isinstance(results[0], OSError) and results[1] is None
+    assert store._log.durable == store._log.appended == 3
+    await store.record_room_event('r1', _event(3))
+    assert store.wal_stats()['failedCommits'] == 1
+    assert len(_segments(tmp_path)) == 2  # the retry went to a fresh segment
+    store._log.close()
+
+    again = WalRoomStore(str(tmp_path), fsync=False)
+    assert [m['messageId'] for m in await again.get_room_messages('r1')] == ['m0', 'm1', 'm2', 'm3']
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_not_acked(tmp_path, monkeypatch):
+    store = WalRoomStore(str(tmp_path), fsync=True)
+
+    def broken_fsync(fd):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(os, 'fsync', broken_fsync)
+    for i in range(3):
+        with pytest.raises(OSError):
+            await store.record_room_event('r1', _event(i))
+    assert store._log.durable == 0
+    with pytest.raises(OSError):
+        await store.flush()
+    monkeypatch.undo()
+    await store.flush()  # the disk is back: everything queued is written once
+    store._log.close()
+    again = WalRoomStore(str(tmp_path), fsync=False)
+    assert [m['messageId'] for m in await again.get_room_messages('r1')] == ['m0', 'm1', 'm2']
+
+
+@pytest.mark.asyncio
+async def test_async_commit_is_written_by_flush(tmp_path):
+    store = WalRoomStore(str(tmp_path), fsync=False, sync_commit=False)
+    for i in range(50):
+        await store.record_room_event('r1', _event(i))
+    await store.flush()
+    assert store._log.durable == 50
+    store._log.close()
+    again = WalRoomStore(str(tmp_path), fsync=False)
+    assert len(await again.get_room_messages('r1')) == 50
+
+
+@pytest.mark.asyncio
+async def test_snapshot_truncates_log_and_later_writes_replay(tmp_path):
+    store = WalRoomStore(str(tmp_path), max_messages=10, fsync=False, snapshot_every=25)
+    for i in range(60):
+        await store.record_room_event('r1', _event(i))
+    await store.create_room_metadata('u1', 'Design', room_id='room_a')
+    await store._snapshot_task
+    assert store.snapshots >= 2
+    assert (tmp_path / 'snapshot.jsonl').exists()
+    assert len(_segments(tmp_path)) <= 2
+    await store.record_room_event('r1', _event(60))
+    store._log.close()
+
+    again = WalRoomStore(str(tmp_path), max_messages=10, fsync=False)
+    assert [m['messageId'] for m in await again.get_room_messages('r1')] == [f'm{i}' for i in range(51, 61)]
+    assert (await again.get_room_messages_page('r1', 3))[1] == '58'
+    assert await again.get_room_owner('room_a') == 'u1'
+
+    await again.close()
+    assert _segments(tmp_path) == [] or all(os.path.getsize(tmp_path / s) == 0 for s in _segments(tmp_path))
+    third = WalRoomStore(str(tmp_path), max_messages=10, fsync=False)
+    assert len(await third.get_room_messages('r1')) == 10
+
+
+@pytest.mark.asyncio
+async def test_failed_snapshot_keeps_unwritten_lines(tmp_path, monkeypatch):
+    store = WalRoomStore(str(tmp_path), fsync=True)
+
+    def broken_fsync(fd):
+        raise OSError(5, 'Input/output error')
+
+    monkeypatch.setattr(os, 'fsync', broken_fsync)
+    with pytest.raises(OSError):
+        await store.record_room_event('r1', _event(0))
+    with pytest.raises(OSError):
+        await store.snapshot()  # the snapshot file never replaces the old one
+    assert not (tmp_path / 'snapshot.jsonl').exists()
+    with pytest.raises(OSError):
+        await store.record_room_event('r1', _event(1))  # this failure requeues m0 again
+    monkeypatch.undo()
+    await store.flush()
+    store._log.close()
+
+    again = WalRoomStore(str(tmp_path), fsync=False)
+    assert [m['messageId'] for m in await again.get_room_messages('r1')] == ['m0', 'm1']
+
+
+def test_ring_restore_keeps_positions():
+    ring = RingBuffer(4)
+    for i in range(11):
+        ring.append(i)
+    restored = RingBuffer.restore(4, ring.newest(4), ring.appended)
+    assert restored.appended == 11 and restored.newest(4) == [7, 8, 9, 10]
+    assert restored.copy(8, 10) == [8, 9]
+    restored.append(11)
+    assert restored.newest(4) == [8, 9, 10, 11]
+    grown = RingBuffer.restore(8, ring.newest(4), ring.appended)  # capacity raised: positions restart
+    assert grown.appended == 4 and grown.newest(8) == [7, 8, 9, 10]
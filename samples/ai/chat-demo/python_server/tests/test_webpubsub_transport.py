@@ -0,0 +1,216 @@
+"""
+Web PubSub transport tests against a local stub of the service REST API:
+- Concurrent room broadcasts overlap on the pooled async client
+- Calls from a foreign event loop are handed to the service loop
+- Negotiate signs a client URL without blocking the service loop
+- The blocking negotiate refuses to run on an event loop
+- Only a credential the service created is closed on stop
+- CloudEvents and negotiate served by the ASGI app on the service loop
+- Streaming keeps several chunk sends in flight, indexed for client reordering
+"""
+
+import json
+import time
+import random
+import asyncio
+import threading
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+
+from ..core.room_store import InMemoryRoomStore  # noqa: E402
+from ..chat_service.streaming import StreamBatchConfig  # noqa: E402
+from ..chat_service.transports import webpubsub  # noqa: E402
+from ..chat_service.transports.webpubsub import WebPubSubChatService  # noqa: E402
+from ..core.asgi_api import create_chat_asgi_app  # noqa: E402
+from .test_asgi_api import call  # noqa: E402
+
+
+class StubWebPubSub:
+    """Records REST calls and answers them after an injected latency."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self._rnd = random.Random(7)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.peer_ports = set()
+
+    async def handle(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        peer = request.transport.get_extra_info("peername") if request.transport else None
+        if peer:
+            self.peer_ports.add(peer[1])
+        try:
+            body = await request.read()
+            await asyncio.sleep(self.latency + self._rnd.uniform(0, self.jitter))
+            self.calls.append((request.method, request.path, json.loads(body) if body else None))
+            return web.Response(status=202 if request.method == "POST" else 200)
+        finally:
+            self.in_flight -= 1
+
+    def sends(self, group=None):
+        return [body for method, path, body in self.calls
+                if method == "POST" and path.endswith("/:send") and (group is None or f"/groups/{group}/" in path)]
+
+
+@pytest.fixture
+async def stub_service():
+    stub = StubWebPubSub()
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    stub.connection_string = f"Endpoint=http://127.0.0.1:{port};AccessKey=c3R1Yi1hY2Nlc3Mta2V5LWZvci1sb2NhbC10ZXN0cy1vbmx5;Version=1.0;"
+    yield stub
+    await runner.cleanup()
+
+
+def _service(stub, **kwargs):
+    return WebPubSubChatService(hub="chat", connection_string=stub.connection_string, room_store=InMemoryRoomStore(), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_room_broadcasts_overlap(stub_service):
+    stub_service.latency = 0.2
+    svc = _service(stub_service)
+    try:
+        started = time.monotonic()
+        await asyncio.gather(*(svc.send_to_group(f"r{i}", f"hello {i}", from_user_id="u") for i in range(5)))
+        elapsed = time.monotonic() - started
+    finally:
+        await svc.stop()
+    assert len(stub_service.sends()) == 5
+    assert stub_service.max_in_flight == 5
+    assert elapsed < 0.6  # serialized blocking calls would take >= 1.0s
+    assert {body["message"] for body in stub_service.sends()} == {f"hello {i}" for i in range(5)}
+
+
+@pytest.mark.asyncio
+async def test_calls_from_other_loops_use_the_service_loop(stub_service):
+    svc = _service(stub_service, loop=asyncio.get_running_loop())
+    errors = []
+
+    def other_thread():
+        try:
+            asyncio.run(svc.add_to_group("conn-1", "r1"))
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    try:
+        await svc.send_to_group("r1", "warm up")
+        t = threading.Thread(target=other_thread)
+        t.start()
+        while t.is_alive():
+            await asyncio.sleep(0.01)
+        await svc.remove_from_group("conn-1", "r1")
+    finally:
+        await svc.stop()
+    assert not errors
+    methods = [(m, p.split("/groups/")[1]) for m, p, _b in stub_service.calls]
+    assert ("PUT", "room_r1/connections/conn-1") in methods and ("DELETE", "room_r1/connections/conn-1") in methods
+    assert len(stub_service.peer_ports) == 1  # one pooled keep-alive connection
+
+
+@pytest.mark.asyncio
+async def test_negotiate_from_worker_thread(stub_service):
+    svc = _service(stub_service, loop=asyncio.get_running_loop())
+    try:
+        url = await asyncio.to_thread(svc.negotiate)
+    finally:
+        await svc.stop()
+    assert url.startswith("ws://127.0.0.1:") and "/client/hubs/chat?access_token=" in url
+
+
+@pytest.mark.asyncio
+async def test_blocking_negotiate_on_the_loop_raises(stub_service):
+    svc = _service(stub_service, loop=asyncio.get_running_loop())
+    try:
+        with pytest.raises(RuntimeError, match="negotiate_async"):
+            svc.negotiate()  # on the service loop: would wait on itself
+        url = await svc.negotiate_async()
+    finally:
+        await svc.stop()
+    assert "/client/hubs/chat?access_token=" in url
+
+
+class _Credential:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_only_own_credential_is_closed(monkeypatch):
+    given = _Credential()
+    svc = WebPubSubChatService(endpoint="http://127.0.0.1:1", credential=given, room_store=InMemoryRoomStore())
+    await svc.stop()
+    assert not given.closed  # the caller's credential may be shared
+
+    monkeypatch.setattr(webpubsub, "DefaultAzureCredential", _Credential)
+    svc = WebPubSubChatService(endpoint="http://127.0.0.1:1", room_store=InMemoryRoomStore())
+    await svc.stop()
+    assert svc._credential.closed
+
+
+@pytest.mark.asyncio
+async def test_cloudevents_and_negotiate_via_asgi(stub_service):
+    svc = _service(stub_service, loop=asyncio.get_running_loop())
+    events = []
+    svc.on_connecting(lambda client, _svc: setattr(client, "user_id", "alice"))
+    svc.on_event_message(lambda client, name, payload, _svc: events.append((client.user_id, name, payload)))
+    app = create_chat_asgi_app(room_store_ref=svc.room_store, chat_service_ref=svc)
+    try:
+        status, headers, _b = await call(app, "OPTIONS", "/eventhandler", headers={"WebHook-Request-Origin": "x.webpubsub.azure.com"})
+        assert (status, headers["webhook-allowed-origin"]) == (200, "*")
+        connect = {"ce-type": "azure.webpubsub.sys.connect", "ce-connectionId": "c1"}
+        status, _h, data = await call(app, "POST", "/eventhandler", body={"query": {}}, headers=connect)
+        assert (status, data) == (200, {"userId": "alice"})
+        message = {"ce-type": "azure.webpubsub.user.message", "ce-connectionId": "c1", "ce-userId": "alice"}
+        assert (await call(app, "POST", "/eventhandler", body={"text": "hi"}, headers=message))[0] == 204
+        assert (await call(app, "POST", "/eventhandler", body={}, headers={**message, "ce-connectionId": "nope"}))[0] == 404
+        status, _h, data = await call(app, "GET", "/api/negotiate")
+    finally:
+        await svc.stop()
+    assert events == [("alice", "message", {"text": "hi"})]
+    assert status == 200 and "/client/hubs/chat?access_token=" in data["url"]
+
+
+async def _tokens(items, delay=0.0):
+    for item in items:
+        await asyncio.sleep(delay)
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_streaming_pipelines_indexed_chunks(stub_service):
+    stub_service.latency, stub_service.jitter = 0.05, 0.05
+    svc = _service(stub_service, stream_batch=StreamBatchConfig(window=0), stream_max_in_flight=4)
+    tokens = [f"t{i} " for i in range(60)]
+    try:
+        started = time.monotonic()
+        full = await svc.streaming_to_group("r", _tokens(tokens, delay=0.002), from_user_id="AI")
+        elapsed = time.monotonic() - started
+    finally:
+        await svc.stop()
+    sends = stub_service.sends("room_r")
+    chunks = [b for b in sends if not b.get("streamingEnd")]
+    eos = [b for b in sends if b.get("streamingEnd")]
+    assert full == "".join(tokens)
+    assert sorted(c["index"] for c in chunks) == list(range(len(chunks)))
+    assert "".join(c["message"] for c in sorted(chunks, key=lambda c: c["index"])) == full
+    assert len(eos) == 1 and eos[0]["index"] == len(chunks) and sends[-1] is eos[0]
+    stats = svc.stream_stats()[-1]
+    assert stats["maxInFlight"] == 4 and stub_service.max_in_flight == 4
+    assert stats["aggregated"] > 0 and stats["requests"] == len(chunks) < len(tokens)
+    assert stats["latencyP50Ms"] >= 50
+    assert elapsed < 1.5  # one request per token, sequentially, would take >= 3s
@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from typing import Any, Dict, List
 
 import pytest
@@ -11,13 +13,14 @@ class _DummyDelta:
 
 
 class _DummyChoice:
-    def __init__(self, content: str) -> None:
+    def __init__(self, content: str, finish_reason: str | None = None) -> None:
         self.delta = _DummyDelta(content)
+        self.finish_reason = finish_reason
 
 
 class _DummyChunk:
-    def __init__(self, content: str) -> None:
-        self.choices = [_DummyChoice(content)]
+    def __init__(self, content: str, finish_reason: str | None = None) -> None:
+        self.choices = [_DummyChoice(content, finish_reason)]
 
 
 class _DummyCompletions:
@@ -42,7 +45,7 @@ class _DummyCompletions:
             "top_p": top_p,
             **kwargs,
         }
-        yield _DummyChunk("stub-response")
+        yield _DummyChunk("stub-response", "stop")
 
 
 class _DummyChat:
@@ -104,3 +107,209 @@ def test_chat_client_without_system_prompt(monkeypatch: pytest.MonkeyPatch) -> N
     assert captured["top_p"] == 0.8
     messages = captured["messages"]
     assert messages[0] == {"role": "user", "content": "ping"}
+
+
+class _DummyAsyncStream:
+    def __init__(self, owner: "_DummyAsyncOpenAI", contents: List[str]) -> None:
+        self._owner = owner
+        self._contents = list(contents)
+        self.closed = False
+
+    def __aiter__(self) -> "_DummyAsyncStream":
+        return self
+
+    async def __anext__(self) -> _DummyChunk:
+        if not self._contents:
+            if self._owner.fail is not None:
+                raise self._owner.fail
+            raise StopAsyncIteration
+        content = self._contents.pop(0)
+        last = not self._contents and self._owner.fail is None and self._owner.finish
+        return _DummyChunk(content, "stop" if last else None)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class _DummyAsyncCompletions:
+    def __init__(self, owner: "_DummyAsyncOpenAI") -> None:
+        self._owner = owner
+
+    async def create(self, **kwargs: Any) -> _DummyAsyncStream:
+        self._owner.last_kwargs = kwargs
+        stream = _DummyAsyncStream(self._owner, ["Hel", "lo", ""])
+        self._owner.streams.append(stream)
+        return stream
+
+
+class _DummyAsyncOpenAI:
+    instances: List["_DummyAsyncOpenAI"] = []
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.kwargs = kwargs
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = _DummyAsyncCompletions(self)
+        self.last_kwargs: Dict[str, Any] | None = None
+        self.streams: List[_DummyAsyncStream] = []
+        self.closed = False
+        self.fail: Exception | None = None
+        self.finish = True
+        _DummyAsyncOpenAI.instances.append(self)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def async_openai(monkeypatch: pytest.MonkeyPatch) -> List[_DummyAsyncOpenAI]:
+    _DummyAsyncOpenAI.instances = []
+    monkeypatch.setattr(chat_model_client, "AsyncOpenAI", _DummyAsyncOpenAI)
+    monkeypatch.setattr(chat_model_client, "DefaultAsyncHttpxClient", lambda: "pooled-http-client")
+    return _DummyAsyncOpenAI.instances
+
+
+async def _collect(stream: Any) -> List[str]:
+    return [chunk async for chunk in stream]
+
+
+def test_async_stream_shares_one_pooled_client(async_openai: List[_DummyAsyncOpenAI]) -> None:
+    client = chat_model_client.OpenAIChatClient(
+        api_key="token",
+        model_name="gpt-4o-mini",
+        model_parameters={"temperature": 0.5},
+        system_prompt="be brief",
+    )
+
+    async def run() -> List[List[str]]:
+        results = await asyncio.gather(*(_collect(client.chat_stream_async(f"q{i}", conversation_history=[{"role": "assistant", "content": "earlier"}])) for i in range(3)))
+        await client.aclose()
+        return list(results)
+
+    assert asyncio.run(run()) == [["Hel", "lo"]] * 3
+    assert len(async_openai) == 1  # one client (one connection pool) for all concurrent streams
+    sdk = async_openai[0]
+    assert sdk.kwargs["http_client"] == "pooled-http-client"
+    assert sdk.kwargs["default_query"] == {"api-version": "2024-08-01-preview"}
+    assert sdk.last_kwargs is not None
+    assert sdk.last_kwargs["messages"][0] == {"role": "system", "content": "be brief"}
+    assert sdk.last_kwargs["messages"][-1] == {"role": "user", "content": "q2"}
+    assert sdk.last_kwargs["temperature"] == 0.5 and sdk.last_kwargs["stream"] is True
+    assert all(stream.closed for stream in sdk.streams)
+    assert sdk.closed
+
+
+def test_async_stream_closes_response_when_consumer_stops(async_openai: List[_DummyAsyncOpenAI]) -> None:
+    client = chat_model_client.OpenAIChatClient(api_key="token", model_name="gpt-4o-mini")
+
+    async def run() -> str:
+        stream = client.chat_stream_async("hi")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(run()) == "Hel"
+    assert async_openai[0].streams[0].closed
+
+
+def test_async_stream_raises_when_cut_off(async_openai: List[_DummyAsyncOpenAI]) -> None:
+    client = chat_model_client.OpenAIChatClient(api_key="token", model_name="gpt-4o-mini")
+    received: List[str] = []
+
+    async def run() -> None:
+        client.async_client().fail = ConnectionError("stream dropped")
+        async for chunk in client.chat_stream_async("hi"):
+            received.append(chunk)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+    assert received == ["Hel", "lo"]  # a cut-off answer is not passed off as a finished one
+    assert async_openai[0].streams[0].closed
+
+
+def test_stream_without_finish_reason_is_incomplete(async_openai: List[_DummyAsyncOpenAI]) -> None:
+    client = chat_model_client.OpenAIChatClient(api_key="token", model_name="gpt-4o-mini")
+
+    async def run() -> None:
+        client.async_client().finish = False  # ends cleanly, but the finish chunk never comes
+        await _collect(client.chat_stream_async("hi"))
+
+    with pytest.raises(chat_model_client.IncompleteModelResponse):
+        asyncio.run(run())
+
+
+def test_async_client_of_a_finished_loop_is_closed(async_openai: List[_DummyAsyncOpenAI]) -> None:
+    client = chat_model_client.OpenAIChatClient(api_key="token", model_name="gpt-4o-mini")
+
+    async def run() -> List[str]:
+        chunks = await _collect(client.chat_stream_async("hi"))
+        await asyncio.sleep(0)  # let a stale client's close run
+        return chunks
+
+    assert asyncio.run(run()) == ["Hel", "lo"]
+    assert asyncio.run(run()) == ["Hel", "lo"]
+    assert len(async_openai) == 2
+    assert async_openai[0].closed and not async_openai[1].closed
+    asyncio.run(client.aclose())
+    assert async_openai[1].closed
+
+
+def test_stale_client_close_failure_is_logged(async_openai: List[_DummyAsyncOpenAI], caplog: pytest.LogCaptureFixture) -> None:
+    client = chat_model_client.OpenAIChatClient(api_key="token", model_name="gpt-4o-mini")
+
+    async def broken_close() -> None:
+        raise ConnectionError("pool died with its loop")
+
+    async def run() -> None:
+        client.async_client()
+        await asyncio.sleep(0)  # let a stale client's close run
+
+    asyncio.run(run())
+    async_openai[0].close = broken_close  # type: ignore[method-assign]
+    with caplog.at_level(logging.WARNING, logger=client.logger.name):
+        asyncio.run(run())
+    assert "Failed to close a stale AsyncOpenAI client" in caplog.text and not client._closing
+    asyncio.run(client.aclose())
+
+
+def _failing_create(**_kwargs: Any):
+    yield _DummyChunk("partial")
+    raise ConnectionError("stream dropped")
+
+
+def test_sync_helpers_log_and_end_the_stream_on_failure(monkeypatch: pytest.MonkeyPatch) -> None:
+    """chat() / chat_stream() keep ending quietly; only the async stream (and its thread bridge) raise."""
+    monkeypatch.setattr(chat_model_client, "AsyncOpenAI", None)
+    client = chat_model_client.OpenAIChatClient(api_key="token", model_name="gpt-4o-mini")
+    client.client.chat.completions.create = _failing_create  # type: ignore[method-assign]
+    monkeypatch.setattr(chat_model_client, "get_openai_chat_client", lambda: client)
+
+    assert list(client.chat_stream("hi")) == ["partial"]
+    assert chat_model_client.chat("hi") == "partial"
+    with pytest.raises(ConnectionError):
+        asyncio.run(_collect(chat_model_client.chat_stream_async("hi")))
+
+
+def test_module_stream_falls_back_to_thread_bridge(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(chat_model_client, "AsyncOpenAI", None)
+    client = chat_model_client.OpenAIChatClient(api_key="token", model_name="gpt-4o-mini")
+    monkeypatch.setattr(chat_model_client, "get_openai_chat_client", lambda: client)
+    assert not client.supports_async
+    assert asyncio.run(_collect(chat_model_client.chat_stream_async("ping"))) == ["stub-response"]
+
+
+def test_signature_tracks_what_shapes_the_reply(monkeypatch: pytest.MonkeyPatch) -> None:
+    def make(**kwargs: Any) -> chat_model_client.OpenAIChatClient:
+        base: Dict[str, Any] = {"api_key": "token", "model_name": "gpt-4o-mini", "model_parameters": {"temperature": 0.2}}
+        return chat_model_client.OpenAIChatClient(**{**base, **kwargs})
+
+    signature = make().signature()
+    assert make(api_key="other-token").signature() == signature
+    assert make(model_parameters={"temperature": 0.9}).signature() != signature
+    assert make(system_prompt="be brief").signature() != signature
+    assert make(model_name="gpt-4o").signature() != signature
+
+    def missing_token() -> chat_model_client.OpenAIChatClient:
+        raise ValueError("GITHUB_TOKEN environment variable is required for AI model access")
+
+    monkeypatch.setattr(chat_model_client, "get_openai_chat_client", missing_token)
+    assert chat_model_client.model_signature() is None